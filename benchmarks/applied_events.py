@@ -0,0 +1,50 @@
+"""Benchmark the applied events of long conversations.
+
+A conversation is logged turn by turn, every turn adds two events and
+calls `applied_events()` like the processor and the policies do. Run it
+from the root of the repository:
+
+    python benchmarks/applied_events.py --repeat 3
+"""
+import argparse
+import timeit
+
+from rasa_core.events import ActionExecuted, UserUttered
+from rasa_core.trackers import DialogueStateTracker
+
+DEFAULT_LENGTHS = [1000, 10000]
+
+
+def create_argument_parser():
+    parser = argparse.ArgumentParser(
+        description="Measure how long logging a conversation takes if the "
+                    "applied events are used at every turn.")
+    parser.add_argument("--lengths", type=int, nargs="+",
+                        default=DEFAULT_LENGTHS,
+                        help="number of events of the conversations")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="number of timed runs, the fastest is reported")
+    return parser
+
+
+def log_conversation(num_events):
+    tracker = DialogueStateTracker("benchmark", [])
+    for _ in range(num_events // 2):
+        tracker.update(ActionExecuted("action_listen"))
+        tracker.update(UserUttered("hi", {"name": "greet",
+                                          "confidence": 1.0}))
+        tracker.applied_events()
+
+
+def main():
+    args = create_argument_parser().parse_args()
+
+    print("{:<10}{:>12}".format("events", "time (s)"))
+    for num_events in args.lengths:
+        duration = min(timeit.repeat(lambda: log_conversation(num_events),
+                                     number=1, repeat=args.repeat))
+        print("{:<10}{:>12.2f}".format(num_events, duration))
+
+
+if __name__ == '__main__':
+    main()
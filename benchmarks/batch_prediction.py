@@ -0,0 +1,127 @@
+"""Benchmark predicting the next action of many trackers in one batch.
+
+The policies are trained on the stories of the default test domain and
+predict all partial trackers of these stories, once tracker by tracker
+and once in a batch. Afterwards the stories of the restaurant bot
+example are evaluated with a `KerasPolicy`, which predicts the actions
+of all stories side by side. Run it from the root of the repository:
+
+    python benchmarks/batch_prediction.py --trackers 256
+"""
+import argparse
+import logging
+import random
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from rasa_core import training
+from rasa_core.agent import Agent
+from rasa_core.domain import Domain
+from rasa_core.featurizers import (
+    BinarySingleStateFeaturizer, MaxHistoryTrackerFeaturizer)
+from rasa_core.interpreter import RegexInterpreter
+from rasa_core.policies.embedding_policy import EmbeddingPolicy
+from rasa_core.policies.keras_policy import KerasPolicy
+from rasa_core.test import _generate_trackers, collect_story_predictions
+from rasa_core.trackers import DialogueStateTracker
+
+DEFAULT_DOMAIN = "data/test_domains/default_with_slots.yml"
+DEFAULT_STORIES = "data/test_stories/stories_defaultdomain.md"
+EVALUATION_DOMAIN = "examples/restaurantbot/restaurant_domain.yml"
+EVALUATION_STORIES = "examples/restaurantbot/data/babi_stories.md"
+
+
+def create_argument_parser():
+    parser = argparse.ArgumentParser(
+        description="Compare predicting trackers one by one and in a "
+                    "batch.")
+    parser.add_argument("--trackers", type=int, default=256,
+                        help="number of partial trackers predicted by the "
+                             "policies")
+    parser.add_argument("--max-stories", type=int, default=None,
+                        help="number of evaluated stories, all by default")
+    parser.add_argument("--skip-evaluation", action="store_true",
+                        help="only compare the predictions of the policies")
+    return parser
+
+
+def keras_policy(epochs):
+    featurizer = MaxHistoryTrackerFeaturizer(BinarySingleStateFeaturizer(),
+                                             max_history=5)
+    return KerasPolicy(featurizer, epochs=epochs)
+
+
+def partial_trackers(trackers, domain, limit):
+    """All prefixes of the trackers, like they are predicted during the
+    evaluation of the stories."""
+
+    partial = []
+    for tracker in trackers:
+        evts = list(tracker.events)
+        for i in range(1, len(evts) + 1):
+            partial.append(DialogueStateTracker.from_events(
+                tracker.sender_id, evts[:i], domain.slots))
+    return partial[:limit]
+
+
+def compare_policies(num_trackers):
+    domain = Domain.load(DEFAULT_DOMAIN)
+    trackers = training.load_data(DEFAULT_STORIES, domain)
+    partial = partial_trackers(trackers, domain, num_trackers)
+
+    print("{:<16}{:>10}{:>14}{:>14}{:>12}".format(
+        "policy", "trackers", "looped (ms)", "batched (ms)", "max diff"))
+    for name, policy in [("KerasPolicy", keras_policy(epochs=1)),
+                         ("EmbeddingPolicy", EmbeddingPolicy(epochs=1))]:
+        policy.train(trackers, domain)
+        # warm up, the first prediction builds parts of the graph
+        policy.predict_action_probabilities(partial[0], domain)
+
+        start = time.perf_counter()
+        looped = [policy.predict_action_probabilities(t, domain)
+                  for t in partial]
+        looped_time = time.perf_counter() - start
+
+        if hasattr(policy, "predict_batch"):
+            start = time.perf_counter()
+            batched = policy.predict_batch(partial, domain)
+            batched_time = time.perf_counter() - start
+            diff = np.max(np.abs(np.array(looped) - np.array(batched)))
+            print("{:<16}{:>10}{:>14.1f}{:>14.1f}{:>12.1e}".format(
+                name, len(partial), looped_time * 1000,
+                batched_time * 1000, diff))
+        else:
+            print("{:<16}{:>10}{:>14.1f}{:>14}{:>12}".format(
+                name, len(partial), looped_time * 1000, "-", "-"))
+
+
+def evaluate_stories(max_stories):
+    agent = Agent(EVALUATION_DOMAIN, policies=[keras_policy(epochs=3)],
+                  interpreter=RegexInterpreter())
+    agent.train(agent.load_data(EVALUATION_STORIES, augmentation_factor=0))
+    trackers = _generate_trackers(EVALUATION_STORIES, agent, max_stories)
+
+    start = time.perf_counter()
+    evaluation, num_stories = collect_story_predictions(trackers, agent)
+    duration = time.perf_counter() - start
+    print("evaluated {} stories ({} actions) in {:.1f}s, {} failed".format(
+        num_stories, len(evaluation.action_list), duration,
+        len(evaluation.failed_stories)))
+
+
+def main():
+    args = create_argument_parser().parse_args()
+    logging.disable(logging.WARNING)
+    random.seed(1)
+    np.random.seed(1)
+    tf.set_random_seed(1)
+
+    compare_policies(args.trackers)
+    if not args.skip_evaluation:
+        evaluate_stories(args.max_stories)
+
+
+if __name__ == '__main__':
+    main()
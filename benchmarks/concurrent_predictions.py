@@ -0,0 +1,108 @@
+"""Benchmark batching the predictions of concurrent conversations.
+
+A `KerasPolicy` is trained on the mood bot example. Every thread then
+predicts the next action of single trackers, once directly and once
+through an `InferenceScheduler` which batches the concurrent
+predictions. Run it from the root of the repository:
+
+    python benchmarks/concurrent_predictions.py --threads 1 16 64
+"""
+import argparse
+import logging
+import threading
+import time
+
+from rasa_core.agent import Agent
+from rasa_core.batching import InferenceScheduler
+from rasa_core.featurizers import (
+    BinarySingleStateFeaturizer, MaxHistoryTrackerFeaturizer)
+from rasa_core.policies.keras_policy import KerasPolicy
+
+DEFAULT_DOMAIN = "examples/moodbot/domain.yml"
+DEFAULT_STORIES = "examples/moodbot/data/stories.md"
+
+
+def create_argument_parser():
+    parser = argparse.ArgumentParser(
+        description="Compare the throughput and the latency of direct and "
+                    "batched predictions.")
+    parser.add_argument("--threads", type=int, nargs="+",
+                        default=[1, 16, 64],
+                        help="number of concurrent conversations")
+    parser.add_argument("--predictions", type=int, default=40,
+                        help="number of predictions of every thread")
+    parser.add_argument("--batch_size", type=int, default=32,
+                        help="maximal size of a batch")
+    parser.add_argument("--batch_wait", type=float, default=2,
+                        help="time in ms a prediction waits for others")
+    return parser
+
+
+def train_agent():
+    featurizer = MaxHistoryTrackerFeaturizer(BinarySingleStateFeaturizer(),
+                                             max_history=5)
+    agent = Agent(DEFAULT_DOMAIN,
+                  policies=[KerasPolicy(featurizer, epochs=1)])
+    trackers = agent.load_data(DEFAULT_STORIES)
+    agent.train(trackers)
+    return agent, trackers[:64]
+
+
+def run(agent, trackers, num_threads, num_predictions):
+    """Returns the predictions per second and the median and 99th
+    percentile of the latency in seconds."""
+
+    latencies = []
+    lock = threading.Lock()
+
+    def predict(i):
+        for j in range(num_predictions):
+            tracker = trackers[(i + j) % len(trackers)]
+            start = time.perf_counter()
+            agent.predict_trackers([tracker])
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=predict, args=(i,))
+               for i in range(num_threads)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    duration = time.perf_counter() - start
+
+    latencies.sort()
+    return (len(latencies) / duration,
+            latencies[len(latencies) // 2],
+            latencies[int(len(latencies) * 0.99)])
+
+
+def main():
+    args = create_argument_parser().parse_args()
+    logging.disable(logging.WARNING)
+    agent, trackers = train_agent()
+    # warm up, the first predictions build parts of the graph
+    run(agent, trackers, 4, 10)
+
+    print("{:>8}  {:<8}{:>10}{:>10}{:>10}{:>8}".format(
+        "threads", "mode", "pred/s", "p50 (ms)", "p99 (ms)", "batch"))
+    for num_threads in args.threads:
+        agent.inference_scheduler = None
+        result = run(agent, trackers, num_threads, args.predictions)
+        print("{:>8}  {:<8}{:>10.0f}{:>10.1f}{:>10.1f}{:>8}".format(
+            num_threads, "direct", result[0], result[1] * 1000,
+            result[2] * 1000, "-"))
+
+        scheduler = InferenceScheduler(args.batch_size,
+                                       args.batch_wait / 1000)
+        agent.inference_scheduler = scheduler
+        result = run(agent, trackers, num_threads, args.predictions)
+        scheduler.shutdown()
+        print("{:>8}  {:<8}{:>10.0f}{:>10.1f}{:>10.1f}{:>8.1f}".format(
+            num_threads, "batched", result[0], result[1] * 1000,
+            result[2] * 1000, scheduler.metrics()["mean_batch_size"]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Benchmark the deserialisation of events.
+
+The events of a conversation are dumped as dicts like the tracker stores
+do and deserialised again. Every turn is a user message, a slot, an
+action, a bot message and `action_listen`. Run it from the root of the
+repository:
+
+    python benchmarks/deserialise_events.py --repeat 5
+"""
+import argparse
+import timeit
+
+from rasa_core.events import (
+    ActionExecuted, BotUttered, SlotSet, UserUttered, deserialise_events)
+
+
+def create_argument_parser():
+    parser = argparse.ArgumentParser(
+        description="Measure how fast events are deserialised.")
+    parser.add_argument("--turns", type=int, default=2000,
+                        help="number of turns of the conversation")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="number of timed runs, the fastest is reported")
+    return parser
+
+
+def create_events(num_turns):
+    evts = []
+    for i in range(num_turns):
+        evts.append(UserUttered("message {}".format(i),
+                                {"name": "greet", "confidence": 0.9},
+                                [{"entity": "cuisine", "value": "thai"}]))
+        evts.append(SlotSet("cuisine", "thai"))
+        evts.append(ActionExecuted("utter_greet"))
+        evts.append(BotUttered("reply {}".format(i)))
+        evts.append(ActionExecuted("action_listen"))
+    return evts
+
+
+def main():
+    args = create_argument_parser().parse_args()
+    evts = create_events(args.turns)
+    dumped = [e.as_dict() for e in evts]
+    assert deserialise_events(dumped) == evts
+
+    duration = min(timeit.repeat(lambda: deserialise_events(dumped),
+                                 number=1, repeat=args.repeat))
+    print("{} events: {:.1f} ms, {:.0f} events/s".format(
+        len(dumped), duration * 1000, len(dumped) / duration))
+
+
+if __name__ == '__main__':
+    main()
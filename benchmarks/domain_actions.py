@@ -0,0 +1,80 @@
+"""Benchmark the lookup of the actions of a domain.
+
+Domains with a growing number of actions are created and random actions
+are looked up by their name and by their index, like the policies and
+the processor do for every predicted action. Run it from the root of
+the repository:
+
+    python benchmarks/domain_actions.py --actions 10 1000 5000
+"""
+import argparse
+import random
+import time
+
+from rasa_core.domain import Domain
+from rasa_core.utils import EndpointConfig
+
+
+def create_argument_parser():
+    parser = argparse.ArgumentParser(
+        description="Measure how fast the actions of a domain are found.")
+    parser.add_argument("--actions", type=int, nargs="+",
+                        default=[10, 1000, 5000],
+                        help="number of actions of the domains")
+    parser.add_argument("--lookups", type=int, default=1000,
+                        help="number of random lookups per measurement")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="number of timed runs, the mean is reported")
+    return parser
+
+
+def create_domain(num_actions):
+    action_names = ["utter_{}".format(i) if i % 2 else "action_{}".format(i)
+                    for i in range(num_actions)]
+    return Domain({"greet": {}}, [], [], {}, action_names, [])
+
+
+def timed(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    args = create_argument_parser().parse_args()
+    endpoint = EndpointConfig("http://localhost:5055/webhook")
+    rnd = random.Random(0)
+
+    print("{:>8}{:>12}{:>12}{:>14}{:>14}{:>14}".format(
+        "actions", "domain (ms)", "index (us)", "by name (us)",
+        "by index (us)", "actions (ms)"))
+    for num_actions in args.actions:
+        start = time.perf_counter()
+        domain = create_domain(num_actions)
+        create_time = time.perf_counter() - start
+
+        names = [rnd.choice(domain.action_names)
+                 for _ in range(args.lookups)]
+        indices = [rnd.randrange(domain.num_actions)
+                   for _ in range(args.lookups)]
+        # warm up, the instances of the actions may be created once
+        domain.action_for_index(0, endpoint)
+
+        index_time = timed(lambda: [domain.index_for_action(a)
+                                    for a in names], args.repeat)
+        name_time = timed(lambda: [domain.action_for_name(a, endpoint)
+                                   for a in names], args.repeat)
+        by_index_time = timed(lambda: [domain.action_for_index(i, endpoint)
+                                       for i in indices], args.repeat)
+        actions_time = timed(lambda: domain.actions(endpoint), args.repeat)
+        print("{:>8}{:>12.2f}{:>12.2f}{:>14.2f}{:>14.2f}{:>14.2f}".format(
+            num_actions, create_time * 1000,
+            index_time / args.lookups * 1e6,
+            name_time / args.lookups * 1e6,
+            by_index_time / args.lookups * 1e6,
+            actions_time * 1000))
+
+
+if __name__ == '__main__':
+    main()
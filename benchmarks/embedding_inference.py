@@ -0,0 +1,103 @@
+"""Benchmark the predictions of a loaded `EmbeddingPolicy`.
+
+The policy is trained on the stories of the restaurant bot example,
+persisted and loaded again. The time to load it, to predict single
+trackers and to predict a batch of trackers and the size of the
+persisted files are measured, with and without attention. Run it from
+the root of the repository:
+
+    python benchmarks/embedding_inference.py --epochs 2
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from rasa_core import training
+from rasa_core.domain import Domain
+from rasa_core.policies.embedding_policy import EmbeddingPolicy
+
+DEFAULT_DOMAIN = "examples/restaurantbot/restaurant_domain.yml"
+DEFAULT_STORIES = "examples/restaurantbot/data/babi_stories.md"
+
+
+def create_argument_parser():
+    parser = argparse.ArgumentParser(
+        description="Measure loading and predicting with a persisted "
+                    "embedding policy.")
+    parser.add_argument("--epochs", type=int, default=2,
+                        help="number of training epochs")
+    parser.add_argument("--stories", type=int, default=200,
+                        help="number of training stories")
+    parser.add_argument("--batch_size", type=int, default=64,
+                        help="number of trackers predicted in a batch")
+    parser.add_argument("--repeat", type=int, default=20,
+                        help="number of timed batches, the median is "
+                             "reported")
+    return parser
+
+
+def durations(func, repeat):
+    result = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        result.append(time.perf_counter() - start)
+    return result
+
+
+def predict_batch(policy, trackers, domain):
+    if hasattr(policy, "predict_batch"):
+        return policy.predict_batch(trackers, domain)
+    return [policy.predict_action_probabilities(t, domain)
+            for t in trackers]
+
+
+def main():
+    args = create_argument_parser().parse_args()
+    logging.disable(logging.WARNING)
+    domain = Domain.load(DEFAULT_DOMAIN)
+    trackers = training.load_data(DEFAULT_STORIES, domain,
+                                  augmentation_factor=0)
+    sample = trackers[:args.batch_size]
+
+    print("{:<10}{:>10}{:>13}{:>13}{:>12}".format(
+        "attention", "load (s)", "single (ms)", "batch (ms)", "files (KB)"))
+    for attention in (False, True):
+        np.random.seed(0)
+        kwargs = {}
+        if "rnn_state_cache_size" in EmbeddingPolicy.defaults:
+            # the same trackers are predicted again and again, which
+            # should run the network every time
+            kwargs["rnn_state_cache_size"] = 0
+        policy = EmbeddingPolicy(epochs=args.epochs,
+                                 attn_before_rnn=attention,
+                                 attn_after_rnn=attention,
+                                 **kwargs)
+        policy.train(trackers[:args.stories], domain)
+        path = tempfile.mkdtemp()
+        policy.persist(path)
+        size = sum(os.path.getsize(os.path.join(path, f))
+                   for f in os.listdir(path))
+
+        load_time = min(durations(lambda: EmbeddingPolicy.load(path), 3))
+        loaded = EmbeddingPolicy.load(path)
+        # warm up, the first prediction is slower than the following ones
+        predict_batch(loaded, sample, domain)
+
+        single_time = np.median([
+            durations(lambda: loaded.predict_action_probabilities(
+                t, domain), 1)[0]
+            for t in sample])
+        batch_time = np.median(durations(
+            lambda: predict_batch(loaded, sample, domain), args.repeat))
+        print("{:<10}{:>10.2f}{:>13.1f}{:>13.1f}{:>12.0f}".format(
+            "yes" if attention else "no", load_time, single_time * 1000,
+            batch_time * 1000, size / 1024))
+
+
+if __name__ == '__main__':
+    main()
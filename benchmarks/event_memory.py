@@ -0,0 +1,79 @@
+"""Benchmark the memory used by the events of a conversation.
+
+The events are created from json decoded messages like the ones loaded
+from a tracker store, so no names are shared between them. Every turn is
+a user message with a ranking of 10 intents, a slot, an action, a bot
+message and `action_listen`. The memory is measured with `tracemalloc`.
+Run it from the root of the repository:
+
+    python benchmarks/event_memory.py --turns 2000
+"""
+import argparse
+import json
+import tracemalloc
+
+from rasa_core.events import ActionExecuted, BotUttered, SlotSet, UserUttered
+from rasa_core.slots import TextSlot
+from rasa_core.trackers import DialogueStateTracker
+
+INTENTS = ["greet", "goodbye", "affirm", "deny", "inform", "request_info",
+           "thankyou", "mood_great", "mood_unhappy", "bot_challenge"]
+
+# how the events of the tracker are compacted after they were logged
+MODES = ["none", "compact", "strip"]
+
+
+def create_argument_parser():
+    parser = argparse.ArgumentParser(
+        description="Measure the memory used per 1000 events.")
+    parser.add_argument("--turns", type=int, default=2000,
+                        help="number of turns of the conversation")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES,
+                        help="compaction of the events, `strip` drops the "
+                             "intent rankings")
+    return parser
+
+
+def decoded_events(num_turns):
+    evts = []
+    for i in range(num_turns):
+        name = INTENTS[i % len(INTENTS)]
+        parse_data = json.loads(json.dumps({
+            "text": "message {}".format(i),
+            "intent": {"name": name, "confidence": 0.9},
+            "entities": [{"entity": "cuisine", "value": "thai",
+                          "start": 0, "end": 4}],
+            "intent_ranking": [{"name": n, "confidence": 0.1}
+                               for n in INTENTS]}))
+        evts.append(UserUttered(parse_data["text"], parse_data["intent"],
+                                parse_data["entities"], parse_data))
+        evts.append(SlotSet(json.loads('"cuisine"'), "thai"))
+        evts.append(ActionExecuted(json.loads('"utter_{}"'.format(name))))
+        evts.append(BotUttered("reply {}".format(i), {"buttons": None}))
+        evts.append(ActionExecuted(json.loads('"action_listen"')))
+    return evts
+
+
+def memory_per_event(num_turns, mode):
+    tracemalloc.start()
+    tracker = DialogueStateTracker.from_events("benchmark",
+                                               decoded_events(num_turns),
+                                               [TextSlot("cuisine")])
+    if mode != "none":
+        tracker.compact_events(strip_intent_ranking=mode == "strip")
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return retained / len(tracker.events)
+
+
+def main():
+    args = create_argument_parser().parse_args()
+
+    print("{:<10}{:>22}".format("mode", "memory per 1k events"))
+    for mode in args.modes:
+        memory = memory_per_event(args.turns, mode)
+        print("{:<10}{:>19.0f} KB".format(mode, memory * 1000 / 1024))
+
+
+if __name__ == '__main__':
+    main()
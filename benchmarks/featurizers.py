@@ -0,0 +1,82 @@
+"""Benchmark the featurization of the training trackers.
+
+The trackers of the restaurant bot example are generated with story
+augmentation and featurized by the tracker featurizers of the policies.
+Besides the time, a digest of the training data is printed, so the
+output of two versions of the featurizers can be compared. Run it from
+the root of the repository:
+
+    python benchmarks/featurizers.py --augmentation 2
+"""
+import argparse
+import hashlib
+import random
+import time
+
+import numpy as np
+
+from rasa_core import training
+from rasa_core.domain import Domain
+from rasa_core.featurizers import (
+    BinarySingleStateFeaturizer, FullDialogueTrackerFeaturizer,
+    LabelTokenizerSingleStateFeaturizer, MaxHistoryTrackerFeaturizer)
+
+DEFAULT_DOMAIN = "examples/restaurantbot/restaurant_domain.yml"
+DEFAULT_STORIES = "examples/restaurantbot/data/babi_stories.md"
+
+
+def create_argument_parser():
+    parser = argparse.ArgumentParser(
+        description="Measure how long featurizing the training trackers "
+                    "takes.")
+    parser.add_argument("--domain", default=DEFAULT_DOMAIN,
+                        help="domain of the conversations")
+    parser.add_argument("--stories", default=DEFAULT_STORIES,
+                        help="stories the trackers are generated from")
+    parser.add_argument("--augmentation", type=int, default=2,
+                        help="augmentation factor of the stories")
+    return parser
+
+
+def create_featurizers():
+    return [
+        ("max history", MaxHistoryTrackerFeaturizer(
+            BinarySingleStateFeaturizer(), max_history=5)),
+        ("max history, duplicates", MaxHistoryTrackerFeaturizer(
+            BinarySingleStateFeaturizer(), max_history=5,
+            remove_duplicates=False)),
+        ("full dialogue", FullDialogueTrackerFeaturizer(
+            BinarySingleStateFeaturizer())),
+        ("full dialogue, label tokens", FullDialogueTrackerFeaturizer(
+            LabelTokenizerSingleStateFeaturizer())),
+    ]
+
+
+def digest(data):
+    md5 = hashlib.md5(data.X.tobytes())
+    md5.update(data.y.tobytes())
+    md5.update(str((data.X.dtype, data.X.shape, data.y.dtype,
+                    data.y.shape)).encode("utf-8"))
+    return md5.hexdigest()
+
+
+def main():
+    args = create_argument_parser().parse_args()
+    domain = Domain.load(args.domain)
+    # the augmentation samples the stories which are glued together
+    random.seed(42)
+    np.random.seed(42)
+    trackers = training.load_data(args.stories, domain,
+                                  augmentation_factor=args.augmentation)
+    print("{} trackers".format(len(trackers)))
+
+    print("{:<30}{:>10}  {}".format("featurizer", "time (s)", "digest"))
+    for name, featurizer in create_featurizers():
+        start = time.perf_counter()
+        data = featurizer.featurize_trackers(trackers, domain)
+        duration = time.perf_counter() - start
+        print("{:<30}{:>10.2f}  {}".format(name, duration, digest(data)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Benchmark the lookup keys of the memoization policy.
+
+Random dialogue states with a history of 5 are memorised with the keys
+of older models (compressed json of the states) and with the hashed keys
+of the current ones. Building the lookup, looking up states, the size of
+the persisted lookup and its memory after loading it are compared. Run
+it from the root of the repository:
+
+    python benchmarks/memoization.py --keys 1000000
+"""
+import argparse
+import base64
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+import zlib
+
+from rasa_core.policies.memoization import MemoizationPolicy
+
+FEATURE_NAMES = (["intent_{}".format(i) for i in range(300)] +
+                 ["prev_utter_{}".format(i) for i in range(300)] +
+                 ["slot_s{}_0".format(i) for i in range(100)])
+
+
+def create_argument_parser():
+    parser = argparse.ArgumentParser(
+        description="Compare the legacy and the hashed memoization keys.")
+    parser.add_argument("--keys", type=int, default=1000000,
+                        help="number of memorised dialogue states")
+    parser.add_argument("--lookups", type=int, default=100000,
+                        help="number of timed lookups")
+    return parser
+
+
+def random_states():
+    return [None if random.random() < 0.1
+            else {n: 1.0 for n in random.sample(FEATURE_NAMES, 5)}
+            for _ in range(5)]
+
+
+def legacy_key(states):
+    feature_str = json.dumps(states, sort_keys=True).replace("\"", "")
+    compressed = zlib.compress(bytes(feature_str, "utf-8"))
+    return base64.b64encode(compressed).decode("utf-8")
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def persisted_size_and_memory(lookup):
+    with tempfile.NamedTemporaryFile("w", suffix=".json",
+                                     delete=False) as f:
+        json.dump({"lookup": lookup}, f)
+    try:
+        with open(f.name) as f_in:
+            _, load_time = timed(lambda: json.load(f_in))
+        tracemalloc.start()
+        with open(f.name) as f_in:
+            loaded = json.load(f_in)
+        memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del loaded
+        return os.path.getsize(f.name), load_time, memory
+    finally:
+        os.remove(f.name)
+
+
+def main():
+    args = create_argument_parser().parse_args()
+    random.seed(1)
+    examples = [random_states() for _ in range(args.keys)]
+    policy = MemoizationPolicy(max_history=5)
+    create_keys = [("legacy", legacy_key),
+                   ("hashed", policy._create_feature_key)]
+
+    lookups = {}
+    print("{:<8}{:>12}{:>14}{:>12}{:>12}{:>14}".format(
+        "format", "build (s)", "lookup (us)", "file (MB)", "load (s)",
+        "memory (MB)"))
+    for name, create_key in create_keys:
+        lookup, build_time = timed(lambda: {
+            create_key(s): i % 50 for i, s in enumerate(examples)})
+        queries = examples[:args.lookups]
+        _, lookup_time = timed(lambda: [lookup.get(create_key(s))
+                                        for s in queries])
+        size, load_time, memory = persisted_size_and_memory(lookup)
+        lookups[name] = lookup
+        print("{:<8}{:>12.1f}{:>14.1f}{:>12.1f}{:>12.2f}{:>14.1f}".format(
+            name, build_time, lookup_time / len(queries) * 1e6, size / 1e6,
+            load_time, memory / 1e6))
+
+    migrated, migrate_time = timed(
+        lambda: MemoizationPolicy._migrate_lookup(lookups["legacy"]))
+    assert migrated == lookups["hashed"]
+    print("migrating the legacy keys takes {:.1f}s".format(migrate_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Benchmark the recall of the augmented memoization policy on a miss.
+
+The policy memorises the stories of the restaurant bot example. Random
+conversations, which are not part of the stories, are predicted, so the
+policy cuts off old turns until it recalls a memorised history. Every
+turn is a user message, sometimes a slot, an action and `action_listen`.
+Run it from the root of the repository:
+
+    python benchmarks/memoization_recall.py --turns 10 100 400
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from rasa_core import training
+from rasa_core.domain import Domain
+from rasa_core.events import ActionExecuted, SlotSet, UserUttered
+from rasa_core.policies.memoization import AugmentedMemoizationPolicy
+from rasa_core.trackers import DialogueStateTracker
+
+DEFAULT_DOMAIN = "examples/restaurantbot/restaurant_domain.yml"
+DEFAULT_STORIES = "examples/restaurantbot/data/babi_stories.md"
+
+
+def create_argument_parser():
+    parser = argparse.ArgumentParser(
+        description="Measure how long a prediction takes if the "
+                    "conversation was not memorised.")
+    parser.add_argument("--domain", default=DEFAULT_DOMAIN,
+                        help="domain of the conversations")
+    parser.add_argument("--stories", default=DEFAULT_STORIES,
+                        help="stories the policy memorises")
+    parser.add_argument("--turns", type=int, nargs="+",
+                        default=[10, 50, 100, 200, 400],
+                        help="number of turns of the conversations")
+    parser.add_argument("--conversations", type=int, default=5,
+                        help="number of conversations per number of turns")
+    return parser
+
+
+def random_conversation(domain, num_turns, seed):
+    rnd = random.Random(seed)
+    actions = [a for a in domain.user_actions if a.startswith("utter")]
+    slots = [s.name for s in domain.slots]
+
+    def user_message():
+        return UserUttered("message", {"name": rnd.choice(domain.intents),
+                                       "confidence": 1.0})
+
+    evts = [ActionExecuted("action_listen")]
+    for _ in range(num_turns):
+        evts.append(user_message())
+        if rnd.random() < 0.3:
+            evts.append(SlotSet(rnd.choice(slots), "value"))
+        evts.append(ActionExecuted(rnd.choice(actions)))
+        evts.append(ActionExecuted("action_listen"))
+    evts.append(user_message())
+    return DialogueStateTracker.from_events("benchmark_{}".format(seed),
+                                            evts, domain.slots)
+
+
+def main():
+    args = create_argument_parser().parse_args()
+    domain = Domain.load(args.domain)
+    random.seed(42)
+    np.random.seed(42)
+    trackers = training.load_data(args.stories, domain,
+                                  augmentation_factor=0)
+    policy = AugmentedMemoizationPolicy(max_history=5)
+    policy.train(trackers, domain)
+    # warm up, the first prediction is slower than the following ones
+    policy.predict_action_probabilities(
+        random_conversation(domain, 1, seed=-1), domain)
+
+    print("{:>6}{:>20}{:>10}".format("turns", "prediction (ms)",
+                                     "recalled"))
+    for num_turns in args.turns:
+        conversations = [random_conversation(domain, num_turns, seed)
+                         for seed in range(args.conversations)]
+        start = time.perf_counter()
+        predictions = [policy.predict_action_probabilities(t, domain)
+                       for t in conversations]
+        duration = (time.perf_counter() - start) / len(conversations)
+        recalled = sum(max(p) > 0 for p in predictions)
+        print("{:>6}{:>20.1f}{:>10}".format(
+            num_turns, duration * 1000,
+            "{}/{}".format(recalled, len(conversations))))
+
+
+if __name__ == '__main__':
+    main()
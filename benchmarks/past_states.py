@@ -0,0 +1,71 @@
+"""Benchmark the featurization of long conversations.
+
+A conversation is logged turn by turn, at every turn three policies with
+a `max_history` of 5 featurize the tracker like an ensemble does before
+the next action is predicted. Run it from the root of the repository:
+
+    python benchmarks/past_states.py --repeat 3
+"""
+import argparse
+import timeit
+
+from rasa_core.domain import Domain
+from rasa_core.events import ActionExecuted, UserUttered
+from rasa_core.featurizers import (
+    BinarySingleStateFeaturizer, MaxHistoryTrackerFeaturizer)
+from rasa_core.trackers import DialogueStateTracker
+
+DEFAULT_DOMAIN = "data/test_domains/default_with_slots.yml"
+DEFAULT_TURNS = [100, 500]
+
+
+def create_argument_parser():
+    parser = argparse.ArgumentParser(
+        description="Measure how long featurizing a conversation at every "
+                    "turn takes.")
+    parser.add_argument("--domain", default=DEFAULT_DOMAIN,
+                        help="domain of the conversations")
+    parser.add_argument("--turns", type=int, nargs="+",
+                        default=DEFAULT_TURNS,
+                        help="number of turns of the conversations")
+    parser.add_argument("--policies", type=int, default=3,
+                        help="number of policies featurizing every turn")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="number of timed runs, the fastest is reported")
+    return parser
+
+
+def create_featurizer(domain):
+    featurizer = MaxHistoryTrackerFeaturizer(BinarySingleStateFeaturizer(),
+                                             max_history=5)
+    featurizer.state_featurizer.prepare_from_domain(domain)
+    return featurizer
+
+
+def featurize_conversation(featurizer, domain, num_turns, num_policies):
+    tracker = DialogueStateTracker("benchmark", domain.slots)
+    for _ in range(num_turns):
+        tracker.update(ActionExecuted("action_listen"))
+        tracker.update(UserUttered("hi", {"name": "greet",
+                                          "confidence": 1.0}, []))
+        for _ in range(num_policies):
+            featurizer.create_X([tracker], domain)
+        tracker.update(ActionExecuted("utter_greet"))
+
+
+def main():
+    args = create_argument_parser().parse_args()
+    domain = Domain.load(args.domain)
+    featurizer = create_featurizer(domain)
+
+    print("{:<10}{:>12}".format("turns", "time (s)"))
+    for num_turns in args.turns:
+        duration = min(timeit.repeat(
+            lambda: featurize_conversation(featurizer, domain, num_turns,
+                                           args.policies),
+            number=1, repeat=args.repeat))
+        print("{:<10}{:>12.2f}".format(num_turns, duration))
+
+
+if __name__ == '__main__':
+    main()
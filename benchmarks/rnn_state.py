@@ -0,0 +1,122 @@
+"""Benchmark the prediction latency of the recurrent policies depending on
+the length of the dialogue.
+
+Every policy is trained on the test stories of the default domain, then
+the next action of dialogues of increasing length is predicted. The
+latency of the prediction after the next turn was appended is measured
+with and without continuing the rnn from the state cached at the previous
+prediction. Run it from the
+root of the repository:
+
+    python benchmarks/rnn_state.py --repeat 15
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from rasa_core import training
+from rasa_core.domain import Domain
+from rasa_core.events import ActionExecuted
+from rasa_core.featurizers import (
+    BinarySingleStateFeaturizer, FullDialogueTrackerFeaturizer)
+from rasa_core.policies.embedding_policy import EmbeddingPolicy
+from rasa_core.policies.keras_policy import KerasPolicy
+from rasa_core.trackers import DialogueStateTracker
+
+DEFAULT_DOMAIN = "data/test_domains/default_with_slots.yml"
+DEFAULT_STORIES = "data/test_stories/stories_defaultdomain.md"
+DEFAULT_LENGTHS = [10, 25, 50, 100, 200]
+
+POLICIES = {
+    "embedding": lambda epochs: EmbeddingPolicy(attn_before_rnn=False,
+                                                attn_after_rnn=False,
+                                                epochs=epochs),
+    "attention": lambda epochs: EmbeddingPolicy(attn_before_rnn=True,
+                                                attn_after_rnn=True,
+                                                epochs=epochs),
+    "keras": lambda epochs: KerasPolicy(
+        FullDialogueTrackerFeaturizer(BinarySingleStateFeaturizer()),
+        epochs=epochs),
+}
+
+
+def create_argument_parser():
+    parser = argparse.ArgumentParser(
+        description="Compare the latency of full and incremental "
+                    "predictions of the recurrent policies.")
+    parser.add_argument("--domain", default=DEFAULT_DOMAIN,
+                        help="domain of the conversations")
+    parser.add_argument("--stories", default=DEFAULT_STORIES,
+                        help="stories the policies are trained on")
+    parser.add_argument("--policies", nargs="+", choices=sorted(POLICIES),
+                        default=["embedding", "attention", "keras"],
+                        help="policies to benchmark")
+    parser.add_argument("--lengths", type=int, nargs="+",
+                        default=DEFAULT_LENGTHS,
+                        help="number of turns before the predicted one")
+    parser.add_argument("--epochs", type=int, default=2,
+                        help="training epochs, they don't change the "
+                             "latency")
+    parser.add_argument("--repeat", type=int, default=15,
+                        help="number of timed runs, the median is reported")
+    return parser
+
+
+def train_policy(name, domain, trackers, epochs):
+    policy = POLICIES[name](epochs)
+    policy.train(trackers, domain)
+    # the persisted inference graph is used to predict
+    path = tempfile.mkdtemp()
+    policy.persist(path)
+    return type(policy).load(path)
+
+
+def latency(policy, domain, events, turns, num_turns, incremental, repeat):
+    previous = DialogueStateTracker.from_events(
+        "benchmark", events[:turns[num_turns - 1]], domain.slots)
+    current = DialogueStateTracker.from_events(
+        "benchmark", events[:turns[num_turns]], domain.slots)
+    policy.rnn_state_cache_size = 1000 if incremental else 0
+
+    times = []
+    for _ in range(repeat):
+        policy.rnn_state_cache.clear()
+        policy.predict_batch([previous], domain)
+        start = time.perf_counter()
+        policy.predict_batch([current], domain)
+        times.append(time.perf_counter() - start)
+    return np.median(times)
+
+
+def main():
+    args = create_argument_parser().parse_args()
+    domain = Domain.load(args.domain)
+    trackers = training.load_data(args.stories, domain)
+
+    longest = list(max(trackers, key=lambda t: len(t.events)).events)
+    # repeat the longest story to get dialogues of any length
+    num_actions = sum(isinstance(e, ActionExecuted) for e in longest)
+    events = longest * (max(args.lengths) // num_actions + 2)
+    turns = [i for i, e in enumerate(events) if isinstance(e, ActionExecuted)]
+
+    for name in args.policies:
+        policy = train_policy(name, domain, trackers, args.epochs)
+        # the first predictions build the graph of the session
+        latency(policy, domain, events, turns, 5, True, 1)
+
+        print("{} policy".format(name))
+        print("{:<10}{:>12}{:>18}".format(
+            "states", "full (ms)", "incremental (ms)"))
+        for num_turns in args.lengths:
+            full_time, incremental_time = [
+                latency(policy, domain, events, turns, num_turns,
+                        incremental, args.repeat)
+                for incremental in [False, True]]
+            print("{:<10}{:>12.1f}{:>18.1f}".format(
+                num_turns + 1, full_time * 1000, incremental_time * 1000))
+
+
+if __name__ == '__main__':
+    main()
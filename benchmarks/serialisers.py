@@ -0,0 +1,70 @@
+"""Benchmark the dialogue serialisers of the tracker stores.
+
+Trackers are generated from the stories of the restaurant bot example and
+every serialiser dumps and loads all of their dialogues. Run it from the
+root of the repository:
+
+    python benchmarks/serialisers.py --repeat 5
+"""
+import argparse
+import pickle
+import timeit
+
+from rasa_core import training
+from rasa_core.domain import Domain
+from rasa_core.serialisers import BUILTIN_SERIALISERS, create_serialiser
+
+DEFAULT_DOMAIN = "examples/restaurantbot/restaurant_domain.yml"
+DEFAULT_STORIES = "examples/restaurantbot/data/babi_stories.md"
+
+
+def create_argument_parser():
+    parser = argparse.ArgumentParser(
+        description="Compare the size and speed of the dialogue "
+                    "serialisers.")
+    parser.add_argument("--domain", default=DEFAULT_DOMAIN,
+                        help="domain of the conversations")
+    parser.add_argument("--stories", default=DEFAULT_STORIES,
+                        help="stories the conversations are generated from")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="number of timed runs, the fastest is reported")
+    return parser
+
+
+def load_dialogues(domain_path, stories_path):
+    domain = Domain.load(domain_path)
+    trackers = training.load_data(stories_path, domain,
+                                  augmentation_factor=0)
+    return [t.as_dialogue() for t in trackers]
+
+
+def benchmark(serialiser, dialogues, repeat):
+    dumped = [serialiser.dumps(d) for d in dialogues]
+
+    dump_time = min(timeit.repeat(
+        lambda: [serialiser.dumps(d) for d in dialogues],
+        number=1, repeat=repeat))
+    load_time = min(timeit.repeat(
+        lambda: [serialiser.loads(d) for d in dumped],
+        number=1, repeat=repeat))
+    return sum(len(d) for d in dumped), dump_time, load_time
+
+
+def main():
+    args = create_argument_parser().parse_args()
+    dialogues = load_dialogues(args.domain, args.stories)
+    num_events = sum(len(d.events) for d in dialogues)
+    print("{} conversations with {} events, pickle protocol {}"
+          "".format(len(dialogues), num_events, pickle.DEFAULT_PROTOCOL))
+
+    print("{:<10}{:>12}{:>12}{:>12}".format(
+        "format", "size (kB)", "dump (ms)", "load (ms)"))
+    for name in BUILTIN_SERIALISERS:
+        size, dump_time, load_time = benchmark(create_serialiser(name),
+                                               dialogues, args.repeat)
+        print("{:<10}{:>12.1f}{:>12.1f}{:>12.1f}".format(
+            name, size / 1000, dump_time * 1000, load_time * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Benchmark the retrieval of conversations from the redis tracker store.
+
+Conversations of increasing length are stored in an append only event log,
+with and without snapshots, and the time to retrieve them is measured. The
+store uses an in memory fake of redis unless a host is passed. Run it from
+the root of the repository:
+
+    python benchmarks/tracker_store.py --repeat 5
+"""
+import argparse
+import timeit
+
+from rasa_core.domain import Domain
+from rasa_core.events import ActionExecuted, SlotSet, UserUttered
+from rasa_core.tracker_store import RedisTrackerStore
+
+DEFAULT_DOMAIN = "examples/restaurantbot/restaurant_domain.yml"
+DEFAULT_LENGTHS = [100, 1000, 10000]
+
+
+def create_argument_parser():
+    parser = argparse.ArgumentParser(
+        description="Measure how long retrieving a conversation takes "
+                    "depending on its length.")
+    parser.add_argument("--domain", default=DEFAULT_DOMAIN,
+                        help="domain of the conversations")
+    parser.add_argument("--host", default=None,
+                        help="redis host, an in memory fake is used if "
+                             "it isn't set")
+    parser.add_argument("--lengths", type=int, nargs="+",
+                        default=DEFAULT_LENGTHS,
+                        help="number of events of the conversations")
+    parser.add_argument("--snapshot-interval", type=int, default=100,
+                        help="number of events between two snapshots")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="number of timed runs, the fastest is reported")
+    return parser
+
+
+def create_store(domain, host, snapshot_interval):
+    store = RedisTrackerStore(domain, host=host or "localhost",
+                              append_only=True,
+                              snapshot_interval=snapshot_interval)
+    if host is None:
+        import fakeredis
+        store.red = fakeredis.FakeStrictRedis()
+    return store
+
+
+def store_conversation(store, sender_id, num_events):
+    tracker = store.get_or_create_tracker(sender_id)
+    while tracker.num_events < num_events:
+        # one turn of the conversation is saved at a time
+        tracker.update(UserUttered("hi", {"name": "greet"}))
+        tracker.update(SlotSet("cuisine", "italian"))
+        tracker.update(ActionExecuted("utter_ack_dosearch"))
+        tracker.update(ActionExecuted("action_listen"))
+        store.save(tracker)
+
+
+def benchmark(store, num_events, repeat):
+    sender_id = "benchmark-{}-{}".format(num_events,
+                                         store.snapshot_interval)
+    store_conversation(store, sender_id, num_events)
+    return min(timeit.repeat(lambda: store.retrieve(sender_id),
+                             number=1, repeat=repeat))
+
+
+def main():
+    args = create_argument_parser().parse_args()
+    domain = Domain.load(args.domain)
+    stores = [create_store(domain, args.host, None),
+              create_store(domain, args.host, args.snapshot_interval)]
+    for store in stores:
+        store.red.flushdb()
+
+    print("{:<10}{:>18}{:>18}".format(
+        "events", "no snapshots (ms)", "snapshots (ms)"))
+    for num_events in args.lengths:
+        times = [benchmark(store, num_events, args.repeat)
+                 for store in stores]
+        print("{:<10}{:>18.2f}{:>18.2f}".format(
+            num_events, times[0] * 1000, times[1] * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""Benchmark the generation of the training trackers from stories.
+
+The trackers of the restaurant bot example are generated with story
+augmentation and the time and the memory used by them are measured with
+`tracemalloc`. Run it from the root of the repository:
+
+    python benchmarks/training_data.py --augmentation 20
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+import numpy as np
+
+from rasa_core import training
+from rasa_core.domain import Domain
+
+DEFAULT_DOMAIN = "examples/restaurantbot/restaurant_domain.yml"
+DEFAULT_STORIES = "examples/restaurantbot/data/babi_stories.md"
+
+
+def create_argument_parser():
+    parser = argparse.ArgumentParser(
+        description="Measure the time and memory used to generate the "
+                    "training trackers.")
+    parser.add_argument("--domain", default=DEFAULT_DOMAIN,
+                        help="domain of the conversations")
+    parser.add_argument("--stories", default=DEFAULT_STORIES,
+                        help="stories the trackers are generated from")
+    parser.add_argument("--augmentation", type=int, default=20,
+                        help="augmentation factor of the stories")
+    return parser
+
+
+def main():
+    args = create_argument_parser().parse_args()
+    domain = Domain.load(args.domain)
+    # the augmentation samples the stories which are glued together
+    random.seed(42)
+    np.random.seed(42)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    trackers = training.load_data(args.stories, domain,
+                                  augmentation_factor=args.augmentation)
+    duration = time.perf_counter() - start
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print("{} trackers with {} events".format(
+        len(trackers), sum(len(t.events) for t in trackers)))
+    print("time {:.1f}s, peak {:.0f} MB, retained {:.0f} MB".format(
+        duration, peak / 1e6, retained / 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,7 @@ from typing import List, Text, Optional, Dict, Any
 
 import requests
 import copy
+from collections import OrderedDict
 
 import rasa_core
 from rasa_core import events
@@ -36,6 +37,9 @@ ACTION_DEFAULT_ASK_AFFIRMATION_NAME = 'action_default_ask_affirmation'
 
 ACTION_DEFAULT_ASK_REPHRASE_NAME = 'action_default_ask_rephrase'
 
+# created on first use, see `_default_actions_by_name`
+_DEFAULT_ACTIONS_BY_NAME = None
+
 
 def default_actions() -> List['Action']:
     """List default actions."""
@@ -47,7 +51,20 @@ def default_actions() -> List['Action']:
 
 def default_action_names() -> List[Text]:
     """List default action names."""
-    return [a.name() for a in default_actions()]
+    return list(_default_actions_by_name())
+
+
+def _default_actions_by_name() -> Dict[Text, 'Action']:
+    """Instances of the default actions by their name, created only once.
+
+    The default actions don't have any state, so the instances are shared.
+    """
+    global _DEFAULT_ACTIONS_BY_NAME
+
+    if _DEFAULT_ACTIONS_BY_NAME is None:
+        _DEFAULT_ACTIONS_BY_NAME = OrderedDict(
+            (a.name(), a) for a in default_actions())
+    return _DEFAULT_ACTIONS_BY_NAME
 
 
 def combine_user_with_default_actions(user_actions):
@@ -58,10 +75,11 @@ def combine_user_with_default_actions(user_actions):
     # implicitly assume that e.g. "action_listen" is always at location
     # 0 in this array. to keep it that way, we remove the duplicate
     # action names from the users list instead of the defaults
+    defaults = _default_actions_by_name()
     unique_user_actions = [a
                            for a in user_actions
-                           if a not in default_action_names()]
-    return default_action_names() + unique_user_actions
+                           if a not in defaults]
+    return list(defaults) + unique_user_actions
 
 
 def ensure_action_name_uniqueness(action_names: List[Text]) -> None:
@@ -81,7 +99,7 @@ def action_from_name(name: Text, action_endpoint: Optional[EndpointConfig],
                      user_actions: List[Text]) -> 'Action':
     """Return an action instance for the name."""
 
-    defaults = {a.name(): a for a in default_actions()}
+    defaults = _default_actions_by_name()
 
     if name in defaults and name not in user_actions:
         return defaults.get(name)
@@ -96,6 +114,7 @@ def actions_from_names(action_names: List[Text],
                        user_actions: List[Text]) -> List['Action']:
     """Converts the names of actions into class instances."""
 
+    user_actions = set(user_actions)
     return [action_from_name(name, action_endpoint, user_actions)
             for name in action_names]
 
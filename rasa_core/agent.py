@@ -8,15 +8,17 @@ import uuid
 from gevent.pywsgi import WSGIServer
 from requests.exceptions import InvalidURL, RequestException
 from threading import Thread
-from typing import Text, List, Optional, Callable, Any, Dict, Union
+from typing import Text, List, Optional, Callable, Any, Dict, Tuple, Union
 
 from rasa_core import training, constants, utils
+from rasa_core.batching import InferenceScheduler
 from rasa_core.channels import UserMessage, OutputChannel, InputChannel
 from rasa_core.constants import DEFAULT_REQUEST_TIMEOUT
 from rasa_core.dispatcher import Dispatcher
 from rasa_core.domain import Domain, check_domain_sanity, InvalidDomain
 from rasa_core.exceptions import AgentNotReady
 from rasa_core.interpreter import NaturalLanguageInterpreter
+from rasa_core.lanes import LaneDispatcher
 from rasa_core.nlg import NaturalLanguageGenerator
 from rasa_core.policies import Policy, FormPolicy
 from rasa_core.policies.ensemble import SimplePolicyEnsemble, PolicyEnsemble
@@ -212,7 +214,9 @@ class Agent(object):
         generator: Union[EndpointConfig, 'NLG', None] = None,
         tracker_store: Optional['TrackerStore'] = None,
         action_endpoint: Optional[EndpointConfig] = None,
-        fingerprint: Optional[Text] = None
+        fingerprint: Optional[Text] = None,
+        lanes: Optional[LaneDispatcher] = None,
+        inference_scheduler: Optional[InferenceScheduler] = None
     ):
         # Initializing variables with the passed parameters.
         self.domain = self._create_domain(domain)
@@ -231,6 +235,12 @@ class Agent(object):
         self.tracker_store = self.create_tracker_store(
             tracker_store, self.domain)
         self.action_endpoint = action_endpoint
+        # if set, the messages of a conversation are handled in order on
+        # the worker lane of the conversation
+        self.lanes = lanes
+        # if set, the predictions of concurrently handled conversations
+        # are batched together
+        self.inference_scheduler = inference_scheduler
 
         self._set_fingerprint(fingerprint)
 
@@ -319,7 +329,8 @@ class Agent(object):
             return noop(message)  #
 
         processor = self.create_processor(message_preprocessor)
-        return processor.handle_message(message)
+        return self._run_in_lane(message.sender_id,
+                                 processor.handle_message, message)
 
     # noinspection PyUnusedLocal
     def predict_next(
@@ -332,6 +343,33 @@ class Agent(object):
         processor = self.create_processor()
         return processor.predict_next(sender_id)
 
+    def predict_next_batch(
+        self,
+        sender_ids: List[Text]
+    ) -> List[Optional[Dict[Text, Any]]]:
+        """Predict the next action of many conversations at once."""
+
+        processor = self.create_processor()
+        return processor.predict_next_batch(sender_ids)
+
+    def predict_trackers(
+        self,
+        trackers: List[DialogueStateTracker]
+    ) -> List[Tuple[List[float], Text]]:
+        """Predict the next action of trackers which aren't stored.
+
+        Returns the probabilities of the actions and the name of the
+        policy which predicted them for every tracker."""
+
+        if not self.is_ready():
+            raise AgentNotReady("Can't predict without a policy ensemble.")
+
+        if self.inference_scheduler is not None:
+            return self.inference_scheduler.predict(self.policy_ensemble,
+                                                    trackers,
+                                                    self.domain)
+        return self.policy_ensemble.predict_batch(trackers, self.domain)
+
     # noinspection PyUnusedLocal
     def log_message(
         self,
@@ -342,7 +380,8 @@ class Agent(object):
         """Append a message to a dialogue - does not predict actions."""
 
         processor = self.create_processor(message_preprocessor)
-        return processor.log_message(message)
+        return self._run_in_lane(message.sender_id,
+                                 processor.log_message, message)
 
     def execute_action(
         self,
@@ -358,8 +397,17 @@ class Agent(object):
         dispatcher = Dispatcher(sender_id,
                                 output_channel,
                                 self.nlg)
-        return processor.execute_action(sender_id, action, dispatcher, policy,
-                                        confidence)
+        return self._run_in_lane(sender_id, processor.execute_action,
+                                 sender_id, action, dispatcher, policy,
+                                 confidence)
+
+    def _run_in_lane(self,
+                     sender_id: Text,
+                     func: Callable[..., Any],
+                     *args: Any) -> Any:
+        if self.lanes is None:
+            return func(*args)
+        return self.lanes.run(sender_id, func, *args)
 
     def handle_text(
         self,
@@ -561,9 +609,25 @@ class Agent(object):
         http_server.start()
 
         if serve_forever:
-            http_server.serve_forever()
+            try:
+                http_server.serve_forever()
+            finally:
+                self.shutdown()
         return http_server
 
+    def shutdown(self, wait: bool = True) -> None:
+        """Finish the pending work of the agent.
+
+        Stops the worker lanes and the inference scheduler and writes the
+        deferred saves of the tracker store."""
+
+        if self.lanes is not None:
+            self.lanes.shutdown(wait)
+        if self.inference_scheduler is not None:
+            self.inference_scheduler.shutdown(wait)
+        if self.tracker_store is not None:
+            self.tracker_store.flush()
+
     def _set_fingerprint(self, fingerprint: Optional[Text] = None) -> None:
 
         if fingerprint:
@@ -658,7 +722,9 @@ class Agent(object):
             self.tracker_store,
             self.nlg,
             action_endpoint=self.action_endpoint,
-            message_preprocessor=preprocessor)
+            message_preprocessor=preprocessor,
+            inference_scheduler=self.inference_scheduler,
+            lanes=self.lanes)
 
     @staticmethod
     def _create_domain(domain: Union[None, Domain, Text]) -> Domain:
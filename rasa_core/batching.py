@@ -0,0 +1,179 @@
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from typing import Any, Dict, List, Text, Tuple
+
+from rasa_core.lanes import wait_for
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceScheduler(object):
+    """Runs the predictions of concurrently handled conversations together.
+
+    A prediction waits for at most `max_wait` seconds for other predictions
+    to arrive, or until `max_batch_size` trackers are pending. The policy
+    ensemble then predicts the next action of all pending trackers in one
+    batch on the thread of the scheduler and every request gets its own
+    results back. This trades a little latency for a higher throughput,
+    as the neural policies run their model once per batch instead of
+    once per tracker."""
+
+    def __init__(self,
+                 max_batch_size: int = 32,
+                 max_wait: float = 0.002) -> None:
+        if max_batch_size < 1:
+            raise ValueError("The batch size must be at least 1, "
+                             "got {}.".format(max_batch_size))
+        if max_wait < 0:
+            raise ValueError("The waiting time can't be negative, "
+                             "got {}.".format(max_wait))
+
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self.num_batches = 0
+        self.num_requests = 0
+        self.num_predictions = 0
+        # number of batches of every size
+        self.batch_sizes = Counter()
+        # seconds between requesting a prediction and running its batch
+        self.total_queueing_delay = 0.0
+        self.max_queueing_delay = 0.0
+        self._thread = threading.Thread(target=self._run,
+                                        name="inference-scheduler",
+                                        daemon=True)
+        self._thread.start()
+
+    def predict(self,
+                ensemble: 'PolicyEnsemble',
+                trackers: List['DialogueStateTracker'],
+                domain: 'Domain'
+                ) -> List[Tuple[List[float], Text]]:
+        """Predict the next action of the trackers like
+        `ensemble.predict_batch`, together with other pending predictions."""
+
+        if not trackers:
+            return []
+
+        request = _PredictionRequest(ensemble, trackers, domain)
+        self._queue.put(request)
+        if threading.current_thread() is threading.main_thread():
+            # keep the gevent based web server handling other requests,
+            # which can then join the batch
+            return wait_for(request.future)
+        return request.future.result()
+
+    def _run(self) -> None:
+        while True:
+            request = self._queue.get()
+            if request is None:
+                return
+
+            batch = [request]
+            num_trackers = len(request.trackers)
+            deadline = request.submitted + self.max_wait
+            stopped = False
+            while num_trackers < self.max_batch_size:
+                try:
+                    request = self._queue.get(
+                        timeout=max(0.0, deadline - time.time()))
+                except queue.Empty:
+                    break
+                if request is None:
+                    stopped = True
+                    break
+                batch.append(request)
+                num_trackers += len(request.trackers)
+
+            self._predict(batch)
+            if stopped:
+                return
+
+    def _predict(self, batch: List['_PredictionRequest']) -> None:
+        # requests can use different models if the model of the agent was
+        # replaced in the meantime
+        groups = []
+        for request in batch:
+            for group in groups:
+                if (group[0].ensemble is request.ensemble and
+                        group[0].domain is request.domain):
+                    group.append(request)
+                    break
+            else:
+                groups.append([request])
+
+        for group in groups:
+            self._predict_group(group)
+
+    def _predict_group(self, group: List['_PredictionRequest']) -> None:
+        started = time.time()
+        trackers = [t for request in group for t in request.trackers]
+        self._record(len(trackers), [started - request.submitted
+                                     for request in group])
+        try:
+            results = group[0].ensemble.predict_batch(trackers,
+                                                      group[0].domain)
+        except Exception as e:
+            logger.debug("Batch of {} predictions failed: {}"
+                         "".format(len(trackers), e))
+            for request in group:
+                request.future.set_exception(e)
+            return
+
+        start = 0
+        for request in group:
+            end = start + len(request.trackers)
+            request.future.set_result(results[start:end])
+            start = end
+
+    def _record(self, batch_size: int, delays: List[float]) -> None:
+        with self._lock:
+            self.num_batches += 1
+            self.num_requests += len(delays)
+            self.num_predictions += batch_size
+            self.batch_sizes[batch_size] += 1
+            self.total_queueing_delay += sum(delays)
+            self.max_queueing_delay = max([self.max_queueing_delay] +
+                                          delays)
+
+    def metrics(self) -> Dict[Text, Any]:
+        """Batch size distribution and queueing delays of the predictions."""
+
+        with self._lock:
+            mean_batch_size = (self.num_predictions / self.num_batches
+                               if self.num_batches else 0.0)
+            return {
+                "queue_depth": self._queue.qsize(),
+                "batches": self.num_batches,
+                "requests": self.num_requests,
+                "predictions": self.num_predictions,
+                "mean_batch_size": mean_batch_size,
+                "batch_sizes": dict(self.batch_sizes),
+                "mean_queueing_delay": (
+                    self.total_queueing_delay / self.num_requests
+                    if self.num_requests else 0.0),
+                "max_queueing_delay": self.max_queueing_delay
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the scheduler after the pending predictions."""
+
+        self._queue.put(None)
+        if wait:
+            self._thread.join()
+
+
+class _PredictionRequest(object):
+    __slots__ = ("ensemble", "trackers", "domain", "submitted", "future")
+
+    def __init__(self, ensemble, trackers, domain):
+        self.ensemble = ensemble
+        self.trackers = trackers
+        self.domain = domain
+        self.submitted = time.time()
+        self.future = Future()
@@ -23,6 +23,27 @@ def add_run_arguments(parser):
         '--enable_api',
         action="store_true",
         help="Start the web server api in addition to the input channel")
+    server_arguments.add_argument(
+        '--worker_lanes',
+        default=0,
+        type=int,
+        help="Number of worker threads handling the messages. Messages of "
+             "the same conversation are always handled in order by the "
+             "same worker. If 0, messages are handled by the web server "
+             "directly")
+    server_arguments.add_argument(
+        '--inference_batch_wait',
+        default=0,
+        type=float,
+        help="Milliseconds a prediction waits for the predictions of other "
+             "conversations to run them through the policies as one batch. "
+             "If 0, every conversation is predicted on its own")
+    server_arguments.add_argument(
+        '--inference_batch_size',
+        default=32,
+        type=int,
+        help="Maximum number of conversations predicted in one batch if "
+             "'--inference_batch_wait' is set")
 
     parser.add_argument(
         '-o', '--log_file',
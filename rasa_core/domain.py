@@ -1,10 +1,12 @@
 import typing
 
 import collections
+import hashlib
 import json
 import logging
 import os
 import pkg_resources
+import threading
 from pykwalify.errors import SchemaError
 
 from rasa_core import utils
@@ -76,6 +78,9 @@ class Domain(object):
     A Domain subclass provides the actions the bot can take, the intents
     and entities it can recognise"""
 
+    # number of action endpoints whose action instances are kept
+    MAX_CACHED_ENDPOINTS = 8
+
     @classmethod
     def load(cls, filename):
         if not os.path.isfile(filename):
@@ -247,6 +252,12 @@ class Domain(object):
         self.restart_intent = restart_intent
 
         action.ensure_action_name_uniqueness(self.action_names)
+        # indices of the actions by their name
+        self.action_index_map = {a: i for i, a in enumerate(self.action_names)}
+        # action instances of the recently used action endpoints, in the
+        # order of the action names, see `actions`
+        self._actions_by_endpoint = collections.OrderedDict()
+        self._actions_lock = threading.Lock()
 
     @utils.lazyproperty
     def user_actions_and_forms(self):
@@ -278,12 +289,8 @@ class Domain(object):
                         ) -> Optional[Action]:
         """Looks up which action corresponds to this action name."""
 
-        if action_name not in self.action_names:
-            self._raise_action_not_found_exception(action_name)
-
-        return action.action_from_name(action_name,
-                                       action_endpoint,
-                                       self.user_actions_and_forms)
+        return self.actions(action_endpoint)[
+            self.index_for_action(action_name)]
 
     def action_for_index(self,
                          index: int,
@@ -298,20 +305,44 @@ class Domain(object):
                              "Domain has {} actions."
                              "".format(index, self.num_actions))
 
-        return self.action_for_name(self.action_names[index],
-                                    action_endpoint)
-
-    def actions(self, action_endpoint):
-        return [self.action_for_name(name, action_endpoint)
-                for name in self.action_names]
+        return self.actions(action_endpoint)[index]
+
+    def actions(self,
+                action_endpoint: Optional[EndpointConfig]
+                ) -> List[Action]:
+        """Instances of all actions in the order of the action names.
+
+        The instances are created once per action endpoint and shared by
+        all callers, so they must not be modified. Only the instances of
+        the `MAX_CACHED_ENDPOINTS` most recently used endpoints are
+        kept."""
+
+        # endpoints can't be hashed, they are stored by their id together
+        # with the actions, which keeps the ids from being reused while
+        # the endpoint is cached
+        key = id(action_endpoint)
+        with self._actions_lock:
+            cached = self._actions_by_endpoint.get(key)
+            if cached is not None:
+                self._actions_by_endpoint.move_to_end(key)
+                return cached[1]
+
+        actions = action.actions_from_names(self.action_names,
+                                            action_endpoint,
+                                            self.user_actions_and_forms)
+        with self._actions_lock:
+            self._actions_by_endpoint[key] = (action_endpoint, actions)
+            while len(self._actions_by_endpoint) > self.MAX_CACHED_ENDPOINTS:
+                self._actions_by_endpoint.popitem(last=False)
+        return actions
 
     def index_for_action(self, action_name: Text) -> Optional[int]:
         """Looks up which action index corresponds to this action name"""
 
-        try:
-            return self.action_names.index(action_name)
-        except ValueError:
+        idx = self.action_index_map.get(action_name)
+        if idx is None:
             self._raise_action_not_found_exception(action_name)
+        return idx
 
     def _raise_action_not_found_exception(self, action_name):
         action_names = "\n".join(["\t - {}".format(a)
@@ -336,9 +367,19 @@ class Domain(object):
         # type: () -> List[Text]
         """Returns all available slot state strings."""
 
-        return ["slot_{}_{}".format(s.name, i)
+        return [state_name
                 for s in self.slots
-                for i in range(0, s.feature_dimensionality())]
+                for state_name in self.slot_state_names[s.name]]
+
+    # noinspection PyTypeChecker
+    @utils.lazyproperty
+    def slot_state_names(self):
+        # type: () -> Dict[Text, List[Text]]
+        """State strings of the features of every slot by the slot name."""
+
+        return {s.name: ["slot_{}_{}".format(s.name, i)
+                         for i in range(0, s.feature_dimensionality())]
+                for s in self.slots}
 
     # noinspection PyTypeChecker
     @utils.lazyproperty
@@ -395,6 +436,15 @@ class Domain(object):
             self.prev_action_states + \
             self.form_states
 
+    @utils.lazyproperty
+    def fingerprint(self):
+        # type: () -> Text
+        """Hash of everything which influences the states of a tracker."""
+
+        dumped = json.dumps([self.input_states, self.intent_properties],
+                            sort_keys=True)
+        return hashlib.md5(dumped.encode("utf-8")).hexdigest()
+
     def get_parsing_states(self,
                            tracker: 'DialogueStateTracker'
                            ) -> Dict[Text, float]:
@@ -413,20 +463,27 @@ class Domain(object):
                     state_dict[key] = 1.0
 
         # Set all set slots with the featurization of the stored value
+        slot_state_names = self.slot_state_names
         for key, slot in tracker.slots.items():
             if slot is not None:
+                state_names = slot_state_names.get(key, ())
                 for i, slot_value in enumerate(slot.as_feature()):
                     if slot_value != 0:
-                        slot_id = "slot_{}_{}".format(key, i)
+                        if i < len(state_names):
+                            slot_id = state_names[i]
+                        else:
+                            # slot which isn't part of the domain
+                            slot_id = "slot_{}_{}".format(key, i)
                         state_dict[slot_id] = slot_value
 
         latest_message = tracker.latest_message
+        ranked_intents = latest_message.ranked_intents
 
-        if "intent_ranking" in latest_message.parse_data:
-            for intent in latest_message.parse_data["intent_ranking"]:
-                if intent.get("name"):
-                    intent_id = "intent_{}".format(intent["name"])
-                    state_dict[intent_id] = intent["confidence"]
+        if ranked_intents is not None:
+            for intent_name, confidence in ranked_intents:
+                if intent_name:
+                    intent_id = "intent_{}".format(intent_name)
+                    state_dict[intent_id] = confidence
 
         elif latest_message.intent.get("name"):
             intent_id = "intent_{}".format(latest_message.intent["name"])
@@ -1,14 +1,14 @@
+import sys
 import time
 import typing
 
+import array
 import json
 import jsonpickle
 import logging
 import uuid
 from dateutil import parser
-from typing import List, Dict, Text, Any, Type, Optional
-
-from rasa_core import utils
+from typing import List, Dict, Text, Any, Type, Optional, Tuple
 
 if typing.TYPE_CHECKING:
     from rasa_core.trackers import DialogueStateTracker
@@ -25,15 +25,26 @@ def deserialise_events(serialized_events: List[Dict[Text, Any]]
     """
 
     deserialised = []
+    # the event classes are resolved only once per type of event
+    event_classes = {}
 
     for e in serialized_events:
-        if "event" in e:
-            event = Event.from_parameters(e)
-            if event:
-                deserialised.append(event)
-            else:
-                logger.warning("Ignoring event ({}) while deserialising "
-                               "events. Couldn't parse it.")
+        event_name = e.get("event")
+        if event_name is None:
+            continue
+
+        if event_name in event_classes:
+            event_class = event_classes[event_name]
+        else:
+            event_class = Event.resolve_by_type(event_name)
+            event_classes[event_name] = event_class
+
+        event = event_class._from_parameters(e) if event_class else None
+        if event:
+            deserialised.append(event)
+        else:
+            logger.warning("Ignoring event ({}) while deserialising "
+                           "events. Couldn't parse it.".format(e))
 
     return deserialised
 
@@ -57,6 +68,15 @@ def md_format_message(text, intent, entities):
     )
 
 
+def intern_name(name: Any) -> Any:
+    """Intern the name of an intent, action, slot or entity.
+
+    Events of different conversations refer to the same few names, interning
+    them keeps only a single copy of each name in memory."""
+
+    return sys.intern(name) if type(name) is str else name
+
+
 def first_key(d, default_key):
     if len(d) > 1:
         for k, v in d.items():
@@ -69,17 +89,48 @@ def first_key(d, default_key):
         return None
 
 
+class _EventType(type):
+    """Registers the subclasses of `Event` by their type name.
+
+    A metaclass instead of `__init_subclass__`, which needs python 3.6."""
+
+    def __init__(cls, name, bases, namespace):
+        super(_EventType, cls).__init__(name, bases, namespace)
+        if "_registry" not in namespace:
+            # the first class wins, so subclasses which inherit the type
+            # name of an event (e.g. `EndToEndUserUtterance`) don't
+            # replace it
+            cls._registry.setdefault(cls.type_name, cls)
+
+
 # noinspection PyProtectedMember
-class Event(object):
+class Event(object, metaclass=_EventType):
     """Events describe everything that occurs in
     a conversation and tell the :class:`rasa_core.trackers.DialogueStateTracker`
     how to update its state."""
 
     type_name = "event"
 
+    # events are kept in memory for every conversation, so the builtin events
+    # don't have an instance `__dict__`. custom events defined without
+    # `__slots__` get one as usual.
+    __slots__ = ("timestamp",)
+
+    # event classes by their type name, every subclass (including custom
+    # events) is registered by `_EventType` when it is defined
+    _registry = {}  # type: Dict[Text, Type[Event]]
+
     def __init__(self, timestamp=None):
         self.timestamp = timestamp if timestamp else time.time()
 
+    def __setstate__(self, state):
+        if isinstance(state, tuple):
+            # `(__dict__, slots)` as pickled by the default protocol
+            state = dict(state[0] or {}, **state[1])
+        # a plain dict for events pickled before they used `__slots__`
+        for name, value in state.items():
+            setattr(self, name, value)
+
     def __ne__(self, other):
         # Not strictly necessary, but to avoid having both x==y and x!=y
         # True at the same time
@@ -107,9 +158,6 @@ class Event(object):
 
         event_name = parameters.get("event")
         if event_name is not None:
-            copied = parameters.copy()
-            del copied["event"]
-
             event = Event.resolve_by_type(event_name, default)
             if event:
                 return event._from_parameters(parameters)
@@ -154,12 +202,12 @@ class Event(object):
         type_name: Text,
         default: Optional[Type['Event']] = None
     ) -> Optional[Type['Event']]:
-        """Returns a slots class by its type name."""
+        """Returns an event class by its type name."""
 
-        for cls in utils.all_subclasses(Event):
-            if cls.type_name == type_name:
-                return cls
-        if type_name == "topic":
+        cls = Event._registry.get(type_name)
+        if cls is not None:
+            return cls
+        elif type_name == "topic":
             return None  # backwards compatibility to support old TopicSet evts
         elif default is not None:
             return default
@@ -178,6 +226,9 @@ class UserUttered(Event):
 
     type_name = "user"
 
+    __slots__ = ("text", "intent", "entities", "input_channel", "message_id",
+                 "parse_data", "_intent_ranking")
+
     def __init__(self, text,
                  intent=None,
                  entities=None,
@@ -200,8 +251,61 @@ class UserUttered(Event):
                 "text": text,
             }
 
+        if "name" in self.intent:
+            self.intent["name"] = intern_name(self.intent["name"])
+        for entity in self.entities:
+            if isinstance(entity, dict) and "entity" in entity:
+                entity["entity"] = intern_name(entity["entity"])
+
         super(UserUttered, self).__init__(timestamp)
 
+    @property
+    def ranked_intents(self) -> Optional[List[Tuple[Text, float]]]:
+        """Names and confidences of the intent ranking of the message.
+
+        `None` if the message doesn't have an intent ranking."""
+
+        # only set for compacted messages, see `compact`
+        compacted = getattr(self, "_intent_ranking", None)
+        if compacted is not None:
+            return list(zip(*compacted))
+        elif "intent_ranking" in self.parse_data:
+            return [(intent.get("name"), intent.get("confidence"))
+                    for intent in self.parse_data["intent_ranking"]]
+        else:
+            return None
+
+    def compact(self, strip_intent_ranking: bool = False) -> None:
+        """Reduce the memory used by the parse data of the message.
+
+        The intent ranking is moved out of ``parse_data`` and stored as a
+        tuple of interned intent names and an array of confidences. It is
+        still available through ``ranked_intents`` and ``as_dict``. If
+        ``strip_intent_ranking`` is set, the ranking is removed completely,
+        which changes how the message is featurized. Hence this should only
+        be used for messages whose states were already created."""
+
+        ranking = self.ranked_intents
+        if ranking is None:
+            return
+
+        parse_data = {k: v
+                      for k, v in self.parse_data.items()
+                      if k != "intent_ranking"}
+        if strip_intent_ranking:
+            self.parse_data = parse_data
+            if getattr(self, "_intent_ranking", None) is not None:
+                del self._intent_ranking
+        elif getattr(self, "_intent_ranking", None) is None:
+            try:
+                confidences = array.array("d", [c for _, c in ranking])
+            except TypeError:
+                # rankings with missing confidences are kept as they are
+                return
+            self.parse_data = parse_data
+            self._intent_ranking = (tuple(intern_name(n) for n, _ in ranking),
+                                    confidences)
+
     @staticmethod
     def _from_parse_data(text, parse_data, timestamp=None, input_channel=None):
         return UserUttered(text, parse_data["intent"], parse_data["entities"],
@@ -233,9 +337,15 @@ class UserUttered(Event):
         input_channel = None   # for backwards compatibility (persisted evemts)
         if hasattr(self, "input_channel"):
             input_channel = self.input_channel
+        parse_data = self.parse_data
+        if getattr(self, "_intent_ranking", None) is not None:
+            parse_data = dict(parse_data,
+                              intent_ranking=[
+                                  {"name": name, "confidence": confidence}
+                                  for name, confidence in self.ranked_intents])
         d.update({
             "text": self.text,
-            "parse_data": self.parse_data,
+            "parse_data": parse_data,
             "input_channel": input_channel
         })
         return d
@@ -289,6 +399,8 @@ class BotUttered(Event):
 
     type_name = "bot"
 
+    __slots__ = ("text", "data")
+
     def __init__(self, text=None, data=None, timestamp=None):
         self.text = text
         self.data = data
@@ -349,8 +461,10 @@ class SlotSet(Event):
 
     type_name = "slot"
 
+    __slots__ = ("key", "value")
+
     def __init__(self, key, value=None, timestamp=None):
-        self.key = key
+        self.key = intern_name(key)
         self.value = value
         super(SlotSet, self).__init__(timestamp)
 
@@ -416,6 +530,8 @@ class Restarted(Event):
 
     type_name = "restart"
 
+    __slots__ = ()
+
     def __hash__(self):
         return hash(32143124312)
 
@@ -444,6 +560,8 @@ class UserUtteranceReverted(Event):
 
     type_name = "rewind"
 
+    __slots__ = ()
+
     def __hash__(self):
         return hash(32143124315)
 
@@ -471,6 +589,8 @@ class AllSlotsReset(Event):
 
     type_name = "reset_slots"
 
+    __slots__ = ()
+
     def __hash__(self):
         return hash(32143124316)
 
@@ -496,6 +616,9 @@ class ReminderScheduled(Event):
 
     type_name = "reminder"
 
+    __slots__ = ("action_name", "trigger_date_time", "kill_on_user_message",
+                 "name")
+
     def __init__(self, action_name, trigger_date_time, name=None,
                  kill_on_user_message=True, timestamp=None):
         """Creates the reminder
@@ -511,7 +634,7 @@ class ReminderScheduled(Event):
             timestamp: creation date of the event
         """
 
-        self.action_name = action_name
+        self.action_name = intern_name(action_name)
         self.trigger_date_time = trigger_date_time
         self.kill_on_user_message = kill_on_user_message
         self.name = name if name is not None else str(uuid.uuid1())
@@ -576,6 +699,8 @@ class ActionReverted(Event):
 
     type_name = "undo"
 
+    __slots__ = ()
+
     def __hash__(self):
         return hash(32143124318)
 
@@ -599,6 +724,8 @@ class StoryExported(Event):
 
     type_name = "export"
 
+    __slots__ = ("path",)
+
     def __init__(self, path=None, timestamp=None):
         self.path = path
         super(StoryExported, self).__init__(timestamp)
@@ -626,8 +753,10 @@ class FollowupAction(Event):
 
     type_name = "followup"
 
+    __slots__ = ("action_name",)
+
     def __init__(self, name, timestamp=None):
-        self.action_name = name
+        self.action_name = intern_name(name)
         super(FollowupAction, self).__init__(timestamp)
 
     def __hash__(self):
@@ -672,6 +801,8 @@ class ConversationPaused(Event):
 
     type_name = "pause"
 
+    __slots__ = ()
+
     def __hash__(self):
         return hash(32143124313)
 
@@ -697,6 +828,8 @@ class ConversationResumed(Event):
 
     type_name = "resume"
 
+    __slots__ = ()
+
     def __hash__(self):
         return hash(32143124314)
 
@@ -722,13 +855,15 @@ class ActionExecuted(Event):
 
     type_name = "action"
 
+    __slots__ = ("action_name", "policy", "confidence", "unpredictable")
+
     def __init__(self,
                  action_name,
                  policy=None,
                  confidence=None,
                  timestamp=None):
-        self.action_name = action_name
-        self.policy = policy
+        self.action_name = intern_name(action_name)
+        self.policy = intern_name(policy)
         self.confidence = confidence
         self.unpredictable = False
         super(ActionExecuted, self).__init__(timestamp)
@@ -791,6 +926,8 @@ class AgentUttered(Event):
 
     type_name = "agent"
 
+    __slots__ = ("text", "data")
+
     def __init__(self, text=None, data=None, timestamp=None):
         self.text = text
         self.data = data
@@ -846,8 +983,10 @@ class Form(Event):
     """
     type_name = "form"
 
+    __slots__ = ("name",)
+
     def __init__(self, name, timestamp=None):
-        self.name = name
+        self.name = intern_name(name)
         super(Form, self).__init__(timestamp)
 
     def __str__(self):
@@ -887,6 +1026,8 @@ class FormValidation(Event):
 
     type_name = "form_validation"
 
+    __slots__ = ("validate",)
+
     def __init__(self,
                  validate,
                  timestamp=None):
@@ -924,13 +1065,15 @@ class ActionExecutionRejected(Event):
 
     type_name = 'action_execution_rejected'
 
+    __slots__ = ("action_name", "policy", "confidence")
+
     def __init__(self,
                  action_name,
                  policy=None,
                  confidence=None,
                  timestamp=None):
-        self.action_name = action_name
-        self.policy = policy
+        self.action_name = intern_name(action_name)
+        self.policy = intern_name(policy)
         self.confidence = confidence
         super(ActionExecutionRejected, self).__init__(timestamp)
 
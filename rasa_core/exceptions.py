@@ -34,3 +34,20 @@ class AgentNotReady(RasaCoreException):
 
     def __init__(self, message):
         self.message = message
+
+
+class TrackerConflictError(RasaCoreException):
+    """Raised if trackers were changed by someone else since they were
+    retrieved.
+
+    Attributes:
+        sender_ids -- ids of the conversations which were not saved
+    """
+
+    def __init__(self, sender_ids):
+        self.sender_ids = sender_ids
+        self.message = ("The conversations {} were changed concurrently "
+                        "and were not saved.".format(sender_ids))
+
+    def __str__(self):
+        return self.message
@@ -3,19 +3,93 @@ import jsonpickle
 import logging
 import numpy as np
 import os
+import scipy.sparse
+import threading
 from tqdm import tqdm
-from typing import Tuple, List, Optional, Dict, Text, Any
+from typing import Tuple, List, Optional, Dict, Text, Any, Callable
 
 from rasa_core import utils
 from rasa_core.actions.action import ACTION_LISTEN_NAME
 from rasa_core.domain import PREV_PREFIX, Domain
 from rasa_core.events import ActionExecuted
 from rasa_core.trackers import DialogueStateTracker
-from rasa_core.training.data import DialogueTrainingData
+from rasa_core.training.data import DialogueTrainingData, SparseFeatureArray
 
 logger = logging.getLogger(__name__)
 
 
+def _encode_distinct(sequences: List[List[Any]],
+                     encode: Callable[[Any], np.ndarray]
+                     ) -> Tuple[np.ndarray, np.ndarray]:
+    """Encode every distinct element (by identity) of the sequences once.
+
+    Returns the encodings and, for every element of the equally long
+    sequences, the index of its encoding."""
+
+    encodings = []
+    encoding_indices = {}
+
+    def encoding_index(element):
+        # the sequences keep the elements alive, so their ids are unique
+        key = id(element)
+        idx = encoding_indices.get(key)
+        if idx is None:
+            idx = len(encodings)
+            encodings.append(encode(element))
+            encoding_indices[key] = idx
+        return idx
+
+    indices = np.array([[encoding_index(element) for element in sequence]
+                        for sequence in sequences],
+                       dtype=np.intp)
+    return np.array(encodings), indices
+
+
+def _stack_encodings(sequences: List[List[Any]],
+                     encode: Callable[[Any], np.ndarray]) -> np.ndarray:
+    """Stack the encodings of the elements of equally long sequences.
+
+    The array of shape `(sequences, elements, features)` is filled from the
+    distinct encodings at once, instead of converting nested lists of
+    vectors."""
+
+    encodings, indices = _encode_distinct(sequences, encode)
+    return encodings[indices]
+
+
+def _sparse_encodings(sequences: List[List[Any]],
+                      encode: Callable[[Any], np.ndarray]
+                      ) -> SparseFeatureArray:
+    """Like `_stack_encodings`, but without creating the dense array.
+
+    `None` elements are padding, their encoding is only kept in the
+    padding mask of the sparse array."""
+
+    encodings, indices = _encode_distinct(sequences, encode)
+    padding = np.array([[element is None for element in sequence]
+                        for sequence in sequences],
+                       dtype=bool).reshape(indices.shape)
+    # the padding isn't stored in the matrix
+    encodings[indices[padding]] = 0
+
+    distinct = scipy.sparse.csr_matrix(encodings)
+    matrix = scipy.sparse.hstack([distinct[indices[:, step]]
+                                  for step in range(indices.shape[1])],
+                                 format="csr")
+    return SparseFeatureArray(matrix, padding)
+
+
+def last_state_indices(X: np.ndarray, pad_value: int = -1) -> np.ndarray:
+    """Time step of the last state of every tracker which isn't padding.
+
+    The states of trackers featurized together are padded to the same
+    number, at the end by the `FullDialogueTrackerFeaturizer`, so the
+    last time step isn't necessarily the current state of a tracker."""
+
+    is_state = (X != pad_value).any(axis=-1)
+    return X.shape[1] - 1 - np.argmax(is_state[:, ::-1], axis=1)
+
+
 class SingleStateFeaturizer(object):
     """Base class for mechanisms to transform the conversations state
     into machine learning formats.
@@ -38,6 +112,18 @@ class SingleStateFeaturizer(object):
                                   "the capacity to "
                                   "encode states to a feature vector")
 
+    def encode_batch(
+        self,
+        trackers_as_states: List[List[Optional[Dict[Text, float]]]]
+    ) -> np.ndarray:
+        """Encode the states of many trackers at once.
+
+        All trackers need to have the same number of states. The result
+        is the same as stacking the vectors returned by `encode`, but every
+        distinct state object is encoded only once."""
+
+        return _stack_encodings(trackers_as_states, self.encode)
+
     @staticmethod
     def action_as_one_hot(action: Text, domain: Domain) -> np.ndarray:
         if action is None:
@@ -261,75 +347,106 @@ class TrackerFeaturizer(object):
     def _create_states(self,
                        tracker: DialogueStateTracker,
                        domain: Domain,
-                       is_binary_training: bool = False
+                       is_binary_training: bool = False,
+                       max_history: Optional[int] = None,
+                       created_states: Optional[Dict[frozenset, Dict]] = None
                        ) -> List[Dict[Text, float]]:
         """Create states: a list of dictionaries.
             If use_intent_probabilities is False (default behaviour),
             pick the most probable intent out of all provided ones and
-            set its probability to 1.0, while all the others to 0.0."""
-        states = tracker.past_states(domain)
+            set its probability to 1.0, while all the others to 0.0.
+            If max_history is set, only the latest max_history states
+            are created. If `created_states` is passed, equal states of
+            all trackers featurized with it share the same dictionary,
+            which must not be modified."""
+        states = tracker.past_states(domain, max_history)
 
-        # during training we encounter only 1 or 0
-        if not self.use_intent_probabilities and not is_binary_training:
-            bin_states = []
-            for state in states:
-                # copy state dict to preserve internal order of keys
-                bin_state = dict(state)
-                best_intent = None
-                best_intent_prob = -1.0
-                for state_name, prob in state:
-                    if state_name.startswith('intent_'):
-                        if prob > best_intent_prob:
-                            # finding the maximum confidence intent
-                            if best_intent is not None:
-                                # delete previous best intent
-                                del bin_state[best_intent]
-                            best_intent = state_name
-                            best_intent_prob = prob
-                        else:
-                            # delete other intents
-                            del bin_state[state_name]
+        if created_states is None:
+            created_states = {}
 
-                if best_intent is not None:
-                    # set the confidence of best intent to 1.0
-                    bin_state[best_intent] = 1.0
+        # during training we encounter only 1 or 0
+        binarize = not self.use_intent_probabilities and not is_binary_training
+
+        tracker_states = []
+        for state in states:
+            created = created_states.get(state)
+            if created is None:
+                if binarize:
+                    created = self._binarize_intents(state)
+                else:
+                    created = dict(state)
+                created_states[state] = created
+            tracker_states.append(created)
+        return tracker_states
 
-                bin_states.append(bin_state)
-            return bin_states
-        else:
-            return [dict(state) for state in states]
+    @staticmethod
+    def _binarize_intents(state: frozenset) -> Dict[Text, float]:
+        # copy state dict to preserve internal order of keys
+        bin_state = dict(state)
+        best_intent = None
+        best_intent_prob = -1.0
+        for state_name, prob in state:
+            if state_name.startswith('intent_'):
+                if prob > best_intent_prob:
+                    # finding the maximum confidence intent
+                    if best_intent is not None:
+                        # delete previous best intent
+                        del bin_state[best_intent]
+                    best_intent = state_name
+                    best_intent_prob = prob
+                else:
+                    # delete other intents
+                    del bin_state[state_name]
+
+        if best_intent is not None:
+            # set the confidence of best intent to 1.0
+            bin_state[best_intent] = 1.0
+
+        return bin_state
 
     def _pad_states(self, states: List[Any]) -> List[Any]:
         return states
 
     def _featurize_states(
         self,
-        trackers_as_states: List[List[Dict[Text, float]]]
+        trackers_as_states: List[List[Dict[Text, float]]],
+        sparse: bool = False
     ) -> Tuple[np.ndarray, List[int]]:
-        """Create X"""
-        features = []
-        true_lengths = []
-
-        for tracker_states in trackers_as_states:
-            dialogue_len = len(tracker_states)
-
-            # len(trackers_as_states) = 1 means
-            # it is called during prediction or we have
-            # only one story, so no padding is needed
-
-            if len(trackers_as_states) > 1:
-                tracker_states = self._pad_states(tracker_states)
-
-            story_features = [self.state_featurizer.encode(state)
-                              for state in tracker_states]
+        """Create X
+
+        If `sparse` is `True`, X is a `SparseFeatureArray`, unless the
+        trackers don't have the same number of states after padding."""
+        true_lengths = [len(tracker_states)
+                        for tracker_states in trackers_as_states]
+
+        # len(trackers_as_states) = 1 means
+        # it is called during prediction or we have
+        # only one story, so no padding is needed
+        if len(trackers_as_states) > 1:
+            trackers_as_states = [self._pad_states(tracker_states)
+                                  for tracker_states in trackers_as_states]
+
+        if self._have_same_length(trackers_as_states) and sparse:
+            # noinspection PyPep8Naming
+            X = _sparse_encodings(trackers_as_states,
+                                  self.state_featurizer.encode)
+        elif self._have_same_length(trackers_as_states):
+            # noinspection PyPep8Naming
+            X = self.state_featurizer.encode_batch(trackers_as_states)
+        else:
+            # noinspection PyPep8Naming
+            X = np.array([[self.state_featurizer.encode(state)
+                           for state in tracker_states]
+                          for tracker_states in trackers_as_states])
 
-            features.append(story_features)
-            true_lengths.append(dialogue_len)
+        return X, true_lengths
 
-        # noinspection PyPep8Naming
-        X = np.array(features)
+    @staticmethod
+    def _have_same_length(sequences: List[List[Any]]) -> bool:
+        """Check that there are sequences and all have the same length."""
 
-        return X, true_lengths
+        return (len(sequences) > 0 and len(sequences[0]) > 0 and
+                all(len(s) == len(sequences[0]) for s in sequences))
 
     def _featurize_labels(
         self,
@@ -338,20 +455,22 @@ class TrackerFeaturizer(object):
     ) -> np.ndarray:
         """Create y"""
 
-        labels = []
-        for tracker_actions in trackers_as_actions:
-
-            if len(trackers_as_actions) > 1:
-                tracker_actions = self._pad_states(tracker_actions)
+        if len(trackers_as_actions) > 1:
+            trackers_as_actions = [self._pad_states(tracker_actions)
+                                   for tracker_actions in trackers_as_actions]
 
-            story_labels = [self.state_featurizer.action_as_one_hot(action,
-                                                                    domain)
-                            for action in tracker_actions]
+        def action_as_one_hot(action):
+            return self.state_featurizer.action_as_one_hot(action, domain)
 
-            labels.append(story_labels)
+        if self._have_same_length(trackers_as_actions):
+            labels = _stack_encodings(trackers_as_actions, action_as_one_hot)
+        else:
+            labels = np.array([[action_as_one_hot(action)
+                                for action in tracker_actions]
+                               for tracker_actions in trackers_as_actions])
 
         # if it is MaxHistoryFeaturizer, squeeze out time axis
-        y = np.array(labels).squeeze()
+        y = labels.squeeze()
 
         return y
 
@@ -366,9 +485,13 @@ class TrackerFeaturizer(object):
 
     def featurize_trackers(self,
                            trackers: List[DialogueStateTracker],
-                           domain: Domain
+                           domain: Domain,
+                           sparse: bool = False
                            ) -> DialogueTrainingData:
-        """Create training data"""
+        """Create training data
+
+        If `sparse` is `True`, the features of the training data are
+        stored in a `SparseFeatureArray` instead of a dense array."""
         self.state_featurizer.prepare_from_domain(domain)
 
         (trackers_as_states,
@@ -376,7 +499,7 @@ class TrackerFeaturizer(object):
                                                                  domain)
 
         # noinspection PyPep8Naming
-        X, true_lengths = self._featurize_states(trackers_as_states)
+        X, true_lengths = self._featurize_states(trackers_as_states, sparse)
         y = self._featurize_labels(trackers_as_actions, domain)
 
         return DialogueTrainingData(X, y, true_lengths)
@@ -386,6 +509,16 @@ class TrackerFeaturizer(object):
                           domain: Domain
                           ) -> List[List[Dict[Text, float]]]:
         """Transforms list of trackers to lists of states for prediction"""
+
+        context = FeaturizationContext.current()
+        if context is not None:
+            return context.prediction_states(self, trackers, domain)
+        return self._prediction_states(trackers, domain)
+
+    def _prediction_states(self,
+                           trackers: List[DialogueStateTracker],
+                           domain: Domain
+                           ) -> List[List[Dict[Text, float]]]:
         raise NotImplementedError("Featurizer must have the capacity to "
                                   "create feature vector")
 
@@ -396,10 +529,47 @@ class TrackerFeaturizer(object):
                  ) -> np.ndarray:
         """Create X for prediction"""
 
+        context = FeaturizationContext.current()
+        if context is not None:
+            return context.create_X(self, trackers, domain)
+        return self._create_X(trackers, domain)
+
+    # noinspection PyPep8Naming
+    def _create_X(self,
+                  trackers: List[DialogueStateTracker],
+                  domain: Domain
+                  ) -> np.ndarray:
         trackers_as_states = self.prediction_states(trackers, domain)
         X, _ = self._featurize_states(trackers_as_states)
         return X
 
+    def _states_config(self) -> Tuple:
+        """Everything besides the tracker which influences its states."""
+
+        return type(self), self.use_intent_probabilities
+
+    def creates_same_states(self, other: 'TrackerFeaturizer') -> bool:
+        """Check if both featurizers create the same prediction states."""
+
+        return self._states_config() == other._states_config()
+
+    def creates_same_features(self, other: 'TrackerFeaturizer') -> bool:
+        """Check if both featurizers create the same feature vectors."""
+
+        if self is other:
+            return True
+        elif type(self) is not type(other) or not self.creates_same_states(
+                other):
+            return False
+
+        attributes = dict(vars(self), state_featurizer=None)
+        other_attributes = dict(vars(other), state_featurizer=None)
+        sf = self.state_featurizer
+        other_sf = other.state_featurizer
+        return (attributes == other_attributes and
+                type(sf) is type(other_sf) and
+                vars(sf) == vars(other_sf))
+
     def persist(self, path):
         featurizer_file = os.path.join(path, "featurizer.json")
         utils.create_dir_for_file(featurizer_file)
@@ -444,7 +614,7 @@ class FullDialogueTrackerFeaturizer(TrackerFeaturizer):
         """Pads states up to max_len"""
 
         if len(states) < self.max_len:
-            states += [None] * (self.max_len - len(states))
+            states = states + [None] * (self.max_len - len(states))
 
         return states
 
@@ -456,6 +626,8 @@ class FullDialogueTrackerFeaturizer(TrackerFeaturizer):
 
         trackers_as_states = []
         trackers_as_actions = []
+        # equal states of the trackers share their dictionary
+        created_states = {}
 
         logger.debug("Creating states and action examples from "
                      "collected trackers (by {}({}))..."
@@ -466,7 +638,8 @@ class FullDialogueTrackerFeaturizer(TrackerFeaturizer):
                     disable=(not logger.isEnabledFor(logging.DEBUG)))
         for tracker in pbar:
             states = self._create_states(tracker, domain,
-                                         is_binary_training=True)
+                                         is_binary_training=True,
+                                         created_states=created_states)
 
             delete_first_state = False
             actions = []
@@ -498,16 +671,30 @@ class FullDialogueTrackerFeaturizer(TrackerFeaturizer):
 
         return trackers_as_states, trackers_as_actions
 
-    def prediction_states(self,
-                          trackers: List[DialogueStateTracker],
-                          domain: Domain
-                          ) -> List[List[Dict[Text, float]]]:
+    def _prediction_states(self,
+                           trackers: List[DialogueStateTracker],
+                           domain: Domain
+                           ) -> List[List[Dict[Text, float]]]:
 
         trackers_as_states = [self._create_states(tracker, domain)
                               for tracker in trackers]
 
         return trackers_as_states
 
+    # noinspection PyPep8Naming
+    def _create_X(self,
+                  trackers: List[DialogueStateTracker],
+                  domain: Domain
+                  ) -> np.ndarray:
+        trackers_as_states = self.prediction_states(trackers, domain)
+        # dialogues to predict for can be longer than the longest training
+        # dialogue, so they are padded to the longest one among them
+        max_len = max([len(states) for states in trackers_as_states],
+                      default=0)
+        return self.state_featurizer.encode_batch(
+            [states + [None] * (max_len - len(states))
+             for states in trackers_as_states])
+
 
 class MaxHistoryTrackerFeaturizer(TrackerFeaturizer):
     """Tracker featurizer that takes the trackers,
@@ -529,6 +716,10 @@ class MaxHistoryTrackerFeaturizer(TrackerFeaturizer):
         self.max_history = max_history or self.MAX_HISTORY_DEFAULT
         self.remove_duplicates = remove_duplicates
 
+    def _states_config(self) -> Tuple:
+        return (super(MaxHistoryTrackerFeaturizer, self)._states_config() +
+                (self.max_history,))
+
     @staticmethod
     def slice_state_history(
         states: List[Dict[Text, float]],
@@ -547,12 +738,23 @@ class MaxHistoryTrackerFeaturizer(TrackerFeaturizer):
         return state_features
 
     @staticmethod
-    def _hash_example(states, action):
-        frozen_states = tuple((s if s is None
-                               else frozenset(s.items())
-                               for s in states))
+    def _hash_example(states, action, frozen_states=None):
+        # `frozen_states` caches the frozen states by the id of their
+        # dictionary, which is only valid as long as the dictionaries exist
+        if frozen_states is None:
+            frozen_states = {}
+
+        frozen = []
+        for s in states:
+            if s is not None:
+                frozen_state = frozen_states.get(id(s))
+                if frozen_state is None:
+                    frozen_state = frozenset(s.items())
+                    frozen_states[id(s)] = frozen_state
+                s = frozen_state
+            frozen.append(s)
         frozen_actions = (action,)
-        return hash((frozen_states, frozen_actions))
+        return hash((tuple(frozen), frozen_actions))
 
     def training_states_and_actions(
         self,
@@ -566,6 +768,9 @@ class MaxHistoryTrackerFeaturizer(TrackerFeaturizer):
         # from multiple states that create equal featurizations
         # we only need to keep one.
         hashed_examples = set()
+        # equal states of the trackers share their dictionary
+        created_states = {}
+        frozen_states = {}
 
         logger.debug("Creating states and action examples from "
                      "collected trackers (by {}({}))..."
@@ -574,7 +779,8 @@ class MaxHistoryTrackerFeaturizer(TrackerFeaturizer):
         pbar = tqdm(trackers, desc="Processed trackers",
                     disable=(not logger.isEnabledFor(logging.DEBUG)))
         for tracker in pbar:
-            states = self._create_states(tracker, domain, True)
+            states = self._create_states(tracker, domain, True,
+                                         created_states=created_states)
 
             idx = 0
             for event in tracker.applied_events():
@@ -587,7 +793,8 @@ class MaxHistoryTrackerFeaturizer(TrackerFeaturizer):
 
                         if self.remove_duplicates:
                             hashed = self._hash_example(sliced_states,
-                                                        event.action_name)
+                                                        event.action_name,
+                                                        frozen_states)
 
                             # only continue with tracker_states that created a
                             # hashed_featurization we haven't observed
@@ -598,25 +805,112 @@ class MaxHistoryTrackerFeaturizer(TrackerFeaturizer):
                         else:
                             trackers_as_states.append(sliced_states)
                             trackers_as_actions.append([event.action_name])
-
-                        pbar.set_postfix({"# actions": "{:d}".format(
-                            len(trackers_as_actions))})
                     idx += 1
 
+            pbar.set_postfix({"# actions": "{:d}".format(
+                len(trackers_as_actions))})
+
         logger.debug("Created {} action examples."
                      "".format(len(trackers_as_actions)))
 
         return trackers_as_states, trackers_as_actions
 
-    def prediction_states(self,
-                          trackers: List[DialogueStateTracker],
-                          domain: Domain
-                          ) -> List[List[Dict[Text, float]]]:
+    def _prediction_states(self,
+                           trackers: List[DialogueStateTracker],
+                           domain: Domain
+                           ) -> List[List[Dict[Text, float]]]:
 
-        trackers_as_states = [self._create_states(tracker, domain)
+        trackers_as_states = [self._create_states(tracker, domain,
+                                                  max_history=self.max_history)
                               for tracker in trackers]
         trackers_as_states = [self.slice_state_history(states,
                                                        self.max_history)
                               for states in trackers_as_states]
 
         return trackers_as_states
+
+
+class FeaturizationContext(object):
+    """Featurizations of trackers shared during a prediction.
+
+    While the context is active, featurizers which create the same states
+    or feature vectors reuse the ones created by an equivalent featurizer
+    for the same trackers instead of creating them again. The results are
+    shared, so they must not be modified.
+
+    Usage:
+        with FeaturizationContext() as context:
+            ...
+        logger.debug(context.num_reused)
+    """
+
+    _local = threading.local()
+
+    def __init__(self) -> None:
+        self._states = []
+        self._features = []
+        # number of featurizations which were created
+        self.num_created = 0
+        # number of featurizations which were reused instead of created
+        self.num_reused = 0
+
+    @classmethod
+    def current(cls) -> Optional['FeaturizationContext']:
+        """Innermost active context of the current thread."""
+
+        stack = getattr(cls._local, "stack", None)
+        return stack[-1] if stack else None
+
+    def __enter__(self) -> 'FeaturizationContext':
+        if getattr(self._local, "stack", None) is None:
+            self._local.stack = []
+        self._local.stack.append(self)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._local.stack.pop()
+
+    def prediction_states(self,
+                          featurizer: TrackerFeaturizer,
+                          trackers: List[DialogueStateTracker],
+                          domain: Domain
+                          ) -> List[List[Dict[Text, float]]]:
+        return self._shared(self._states, featurizer,
+                            featurizer.creates_same_states,
+                            featurizer._prediction_states,
+                            trackers, domain)
+
+    # noinspection PyPep8Naming
+    def create_X(self,
+                 featurizer: TrackerFeaturizer,
+                 trackers: List[DialogueStateTracker],
+                 domain: Domain
+                 ) -> np.ndarray:
+        return self._shared(self._features, featurizer,
+                            featurizer.creates_same_features,
+                            featurizer._create_X,
+                            trackers, domain)
+
+    def _shared(self, created, featurizer, is_equivalent, create,
+                trackers, domain):
+        # trackers can change during a prediction (e.g. the `FormPolicy`
+        # adds events), so the number of events is part of the key. The
+        # length of the events stays the same once `max_event_history`
+        # is reached, hence the number of all events is used
+        num_events = [t.num_events for t in trackers]
+        for (other, other_trackers, other_num_events, other_domain,
+             result) in created:
+            if (other_domain is domain and
+                    other_num_events == num_events and
+                    len(other_trackers) == len(trackers) and
+                    all(a is b for a, b in zip(other_trackers, trackers)) and
+                    is_equivalent(other)):
+                self.num_reused += 1
+                return result
+
+        result = create(trackers, domain)
+        self.num_created += 1
+        # the trackers are kept, so their ids can't be reused by others
+        created.append((featurizer, list(trackers), num_events, domain,
+                        result))
+        return result
@@ -0,0 +1,127 @@
+import logging
+import threading
+import time
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Text
+
+import gevent
+
+logger = logging.getLogger(__name__)
+
+
+class LaneDispatcher(object):
+    """Runs the work of conversations on a fixed number of ordered lanes.
+
+    The sender id of a conversation is hashed onto one of the lanes. Every
+    lane has a single worker thread which processes its work strictly in
+    the order it was submitted. Hence the messages of one conversation are
+    never handled concurrently, while different conversations are handled
+    in parallel on the different lanes."""
+
+    def __init__(self, num_lanes: int = 4) -> None:
+        if num_lanes < 1:
+            raise ValueError("At least one worker lane is required, "
+                             "got {}.".format(num_lanes))
+        self.lanes = [Lane(i) for i in range(num_lanes)]
+
+    def lane_for(self, sender_id: Text) -> 'Lane':
+        # the builtin `hash` of strings differs between processes,
+        # crc32 keeps the assignment of conversations to lanes stable
+        idx = zlib.crc32(str(sender_id).encode("utf-8")) % len(self.lanes)
+        return self.lanes[idx]
+
+    def run(self,
+            sender_id: Text,
+            func: Callable[..., Any],
+            *args: Any,
+            **kwargs: Any) -> Any:
+        """Run `func` on the lane of the conversation and return its result.
+
+        Work which is already running on the lane of the conversation
+        (e.g. `Agent.handle_text` calling `Agent.handle_message`) is
+        executed directly."""
+
+        lane = self.lane_for(sender_id)
+        if lane.is_current_thread():
+            return func(*args, **kwargs)
+        return wait_for(lane.submit(func, *args, **kwargs))
+
+    def metrics(self) -> List[Dict[Text, Any]]:
+        """Queue depth and latencies of every lane."""
+
+        return [lane.metrics() for lane in self.lanes]
+
+    def shutdown(self, wait: bool = True) -> None:
+        for lane in self.lanes:
+            lane.shutdown(wait)
+
+
+class Lane(object):
+    """Single worker thread with a queue of pending work."""
+
+    def __init__(self, idx: int) -> None:
+        self.idx = idx
+        self.name = "lane-{}".format(idx)
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.queue_depth = 0
+        self.num_processed = 0
+        # seconds between submitting work and its completion
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def submit(self,
+               func: Callable[..., Any],
+               *args: Any,
+               **kwargs: Any) -> Future:
+        submitted = time.time()
+        with self._lock:
+            self.queue_depth += 1
+
+        def work():
+            if not self.is_current_thread():
+                # `thread_name_prefix` of the executor requires python 3.6
+                threading.current_thread().name = self.name
+                self._local.is_lane = True
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._done(time.time() - submitted)
+
+        return self._executor.submit(work)
+
+    def is_current_thread(self) -> bool:
+        return getattr(self._local, "is_lane", False)
+
+    def _done(self, latency: float) -> None:
+        with self._lock:
+            self.queue_depth -= 1
+            self.num_processed += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+
+    def metrics(self) -> Dict[Text, Any]:
+        with self._lock:
+            mean_latency = (self.total_latency / self.num_processed
+                            if self.num_processed else 0.0)
+            return {
+                "lane": self.idx,
+                "queue_depth": self.queue_depth,
+                "processed": self.num_processed,
+                "mean_latency": mean_latency,
+                "max_latency": self.max_latency
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait)
+
+
+def wait_for(future: Future) -> Any:
+    """Wait for the result of the future.
+
+    The waiting happens in the threadpool of gevent, so the gevent based
+    web server keeps handling other requests in the meantime."""
+
+    return gevent.get_hub().threadpool.apply(future.result)
@@ -7,7 +7,6 @@ import os
 import warnings
 
 import numpy as np
-import typing
 from tqdm import tqdm
 from typing import (
     Any, List, Optional, Text, Dict, Tuple, Union)
@@ -18,18 +17,18 @@ from rasa_core.domain import Domain
 from rasa_core.featurizers import (
     TrackerFeaturizer,
     FullDialogueTrackerFeaturizer,
-    LabelTokenizerSingleStateFeaturizer)
+    LabelTokenizerSingleStateFeaturizer,
+    last_state_indices)
 from rasa_core.policies.policy import Policy
+from rasa_core.policies.rnn_state_cache import RnnStateCache
 
 import tensorflow as tf
 from rasa_core.policies.tf_utils import (
     TimeAttentionWrapper,
+    TimeAttentionWrapperState,
     ChronoBiasLayerNormBasicLSTMCell)
 from rasa_core.trackers import DialogueStateTracker
 
-if typing.TYPE_CHECKING:
-    from rasa_core.policies.tf_utils import TimeAttentionWrapperState
-
 try:
     import cPickle as pickle
 except ImportError:
@@ -123,6 +122,12 @@ class EmbeddingPolicy(Policy):
         # the range of allowed location-based attention shifts
         "attn_shift_range": None,  # if None, set to mean dialogue length / 2
 
+        # inference parameters
+        # number of conversations for which the state of the rnn is kept,
+        # so that only the new states of a dialogue are run through the
+        # rnn at its next prediction, set to 0 to run the whole dialogue
+        "rnn_state_cache_size": 1000,
+
         # visualization of accuracy
         # how often calculate train accuracy
         "evaluate_every_num_epochs": 20,  # small values may hurt performance
@@ -162,6 +167,12 @@ class EmbeddingPolicy(Policy):
         attn_embed: Optional[tf.Tensor] = None,
         copy_attn_debug: Optional[tf.Tensor] = None,
         all_time_masks: Optional[tf.Tensor] = None,
+        all_actions_embed: Optional[np.ndarray] = None,
+        actions_embed_placeholder: Optional[tf.Tensor] = None,
+        prediction_similarity_op: Optional[tf.Tensor] = None,
+        start_placeholder: Optional[tf.Tensor] = None,
+        initial_state_placeholders: Optional[List[tf.Tensor]] = None,
+        final_state: Optional[List[tf.Tensor]] = None,
         **kwargs: Any
     ) -> None:
         if featurizer:
@@ -182,6 +193,8 @@ class EmbeddingPolicy(Policy):
 
         # chrono initialization for forget bias
         self.characteristic_time = None
+        # constant forget bias of the rnn which is created with it
+        self._forget_bias = None
 
         # encode all actions with numbers
         # persist this array for prediction time
@@ -216,6 +229,19 @@ class EmbeddingPolicy(Policy):
 
         self.all_time_masks = all_time_masks
 
+        # embeddings of all actions, they don't change after training,
+        # so they are computed once and fed to the prediction op
+        self.all_actions_embed = all_actions_embed
+        self._all_actions_embed_in = actions_embed_placeholder
+        self.pred_sim_op = prediction_similarity_op
+
+        # the inference graph can continue the rnn of a dialogue
+        # from the time step `start` with a given state
+        self._start_in = start_placeholder
+        self._initial_state_in = initial_state_placeholders
+        self._final_state = final_state
+        self.rnn_state_cache = RnnStateCache(self.rnn_state_cache_size)
+
         # internal tf instances
         self._train_op = None
         self._is_training = None
@@ -287,6 +313,7 @@ class EmbeddingPolicy(Policy):
         self._load_regularization_params(config)
         self._load_attn_params(config)
         self._load_visual_params(config)
+        self.rnn_state_cache_size = config['rnn_state_cache_size']
 
     # data helpers
     # noinspection PyPep8Naming
@@ -362,18 +389,18 @@ class EmbeddingPolicy(Policy):
             # training time
             actions_for_Y = self._actions_for_Y(data_Y)
             Y = self._action_features_for_Y(actions_for_Y)
+            # is needed to calculate train accuracy
+            all_Y_d = self._create_all_Y_d(X.shape[1])
         else:
             # prediction time
             actions_for_Y = None
             Y = None
+            all_Y_d = None
 
         x_for_no_intent = self._create_zero_vector(X)
         y_for_no_action = self._create_zero_vector(previous_actions)
         y_for_action_listen = self._create_y_for_action_listen(domain)
 
-        # is needed to calculate train accuracy
-        all_Y_d = self._create_all_Y_d(X.shape[1])
-
         return SessionData(
             X=X, Y=Y, slots=slots,
             previous_actions=previous_actions,
@@ -489,9 +516,19 @@ class EmbeddingPolicy(Policy):
         # left border that initializes forget gate close to 0
         bias_0 = -1.0
 
-        # right border that initializes forget gate close to 1
-        bias_1 = np.log(self.characteristic_time - 1.0)
-        fbias = (bias_1 - bias_0) * np.random.random(self.rnn_size) + bias_0
+        if self._is_training is False:
+            # the inference graph uses the same constant bias as the
+            # trained rnn and doesn't contain dropout
+            fbias = self._forget_bias
+            keep_prob = 1.0
+        else:
+            # right border that initializes forget gate close to 1
+            bias_1 = np.log(self.characteristic_time - 1.0)
+            fbias = ((bias_1 - bias_0) * np.random.random(self.rnn_size) +
+                     bias_0)
+            self._forget_bias = fbias
+            keep_prob = 1.0 - (self.droprate['rnn'] *
+                               tf.cast(self._is_training, tf.float32))
 
         if self.attn_after_rnn:
             # since attention is copied to rnn output,
@@ -500,9 +537,6 @@ class EmbeddingPolicy(Policy):
         else:
             embed_layer_size = None
 
-        keep_prob = 1.0 - (self.droprate['rnn'] *
-                           tf.cast(self._is_training, tf.float32))
-
         return ChronoBiasLayerNormBasicLSTMCell(
             num_units=self.rnn_size,
             layer_norm=self.layer_norm,
@@ -700,7 +734,7 @@ class EmbeddingPolicy(Policy):
             embed_for_no_intent: tf.Tensor,
             embed_for_no_action: tf.Tensor,
             embed_for_action_listen: tf.Tensor
-    ) -> Tuple[tf.Tensor, Union[tf.Tensor, 'TimeAttentionWrapperState']]:
+    ) -> Tuple[tf.Tensor, Union[tf.Tensor, TimeAttentionWrapperState]]:
         """Create rnn for dialogue level embedding."""
 
         cell_input = tf.concat([embed_utter, embed_slots,
@@ -717,16 +751,135 @@ class EmbeddingPolicy(Policy):
                                           embed_for_no_action,
                                           embed_for_action_listen)
 
-        return tf.nn.dynamic_rnn(
+        if self._is_training is False:
+            # the inference graph can continue the dialogues, the memory
+            # of the attention still contains all states of the dialogues
+            initial_state = self._create_tf_initial_state(cell)
+            cell_input = cell_input[:, self._start_in:]
+            sequence_length = real_length - self._start_in
+        else:
+            initial_state = None
+            sequence_length = real_length
+
+        cell_output, final_state = tf.nn.dynamic_rnn(
             cell, cell_input,
+            initial_state=initial_state,
             dtype=tf.float32,
-            sequence_length=real_length,
+            sequence_length=sequence_length,
             scope='rnn_decoder'
         )
 
+        if self._is_training is False:
+            self._final_state = self._tf_state_leaves(final_state)
+
+        return cell_output, final_state
+
+    def _create_tf_initial_state(
+        self,
+        cell: tf.contrib.rnn.RNNCell
+    ) -> Union[tf.contrib.rnn.LSTMStateTuple, TimeAttentionWrapperState]:
+        """Create the initial state of the rnn of the inference graph.
+
+        By default the rnn starts with its zero state at the beginning of
+        the dialogues. To continue the dialogues, the time step `start` of
+        the first state to run through the rnn and the state of the rnn
+        before it are fed. Tensor arrays are fed as tensors of their
+        elements up to `start` with the batch as first dimension. States
+        along the dialogue are cut or padded with zeros to its length,
+        since the dialogues could have been shorter or longer before.
+        """
+
+        zero_state = cell.zero_state(tf.shape(self.a_in)[0], tf.float32)
+
+        self._start_in = tf.placeholder_with_default(0, shape=(),
+                                                     name='start')
+        self._initial_state_in = []
+
+        def state_in(default: tf.Tensor,
+                     along_dialogue: bool = False) -> tf.Tensor:
+            shape = [None] + default.shape.as_list()[1:]
+            state = tf.placeholder_with_default(default, shape)
+            self._initial_state_in.append(state)
+            if along_dialogue:
+                return self._fit_to_dialogue_len(state)
+            else:
+                return state
+
+        def array_in(array: tf.TensorArray,
+                     along_dialogue: bool = False) -> tf.TensorArray:
+            default = tf.expand_dims(array.read(0), 1)
+            shape = [None, None] + default.shape.as_list()[2:]
+            elements = tf.placeholder_with_default(default, shape)
+            self._initial_state_in.append(elements)
+            elements = elements[:, :self._start_in + 1]
+            if along_dialogue:
+                elements = self._fit_to_dialogue_len(elements)
+            return tf.TensorArray(
+                array.dtype,
+                size=self._dialogue_len + 1,
+                dynamic_size=False,
+                clear_after_read=False
+            ).unstack(tf.transpose(elements, [1, 0, 2]))
+
+        nest = tf.contrib.framework.nest
+        if not isinstance(zero_state, TimeAttentionWrapperState):
+            return nest.map_structure(state_in, zero_state)
+
+        # the placeholders are created in the order of `_tf_state_leaves`
+        cell_state = nest.map_structure(state_in, zero_state.cell_state)
+        attention = state_in(zero_state.attention)
+        alignments = nest.map_structure(lambda a: state_in(a, True),
+                                        zero_state.alignments)
+        attention_state = nest.map_structure(lambda a: state_in(a, True),
+                                             zero_state.attention_state)
+        all_time_masks = array_in(zero_state.all_time_masks, True)
+        if self.attn_after_rnn:
+            # the cell states are only kept for the copy mechanism
+            all_cell_states = nest.map_structure(array_in,
+                                                 zero_state.all_cell_states)
+        else:
+            all_cell_states = zero_state.all_cell_states
+
+        return zero_state._replace(cell_state=cell_state,
+                                   time=self._start_in,
+                                   attention=attention,
+                                   alignments=alignments,
+                                   attention_state=attention_state,
+                                   all_time_masks=all_time_masks,
+                                   all_cell_states=all_cell_states)
+
+    def _fit_to_dialogue_len(self, state: tf.Tensor) -> tf.Tensor:
+        """Cut or pad the last dimension of a state to the dialogue length."""
+
+        state = state[..., :self._dialogue_len]
+        paddings = [[0, 0]] * (len(state.shape) - 1)
+        paddings.append([0, self._dialogue_len - tf.shape(state)[-1]])
+        return tf.pad(state, paddings)
+
+    def _tf_state_leaves(
+        self,
+        state: Union[tf.contrib.rnn.LSTMStateTuple, TimeAttentionWrapperState]
+    ) -> List[tf.Tensor]:
+        """Tensors of the rnn state which can be fed to continue the rnn."""
+
+        nest = tf.contrib.framework.nest
+        if not isinstance(state, TimeAttentionWrapperState):
+            return nest.flatten(state)
+
+        arrays = [state.all_time_masks]
+        if self.attn_after_rnn:
+            arrays.extend(nest.flatten(state.all_cell_states))
+
+        return (nest.flatten([state.cell_state,
+                              state.attention,
+                              state.alignments,
+                              state.attention_state]) +
+                [tf.transpose(array.stack(), [1, 0, 2])
+                 for array in arrays])
+
     @staticmethod
     def _alignments_history_from(
-        final_state: 'TimeAttentionWrapperState'
+        final_state: TimeAttentionWrapperState
     ) -> tf.Tensor:
         """Extract alignments history form final rnn cell state."""
 
@@ -744,7 +897,7 @@ class EmbeddingPolicy(Policy):
 
     @staticmethod
     def _all_time_masks_from(
-        final_state: 'TimeAttentionWrapperState'
+        final_state: TimeAttentionWrapperState
     ) -> tf.Tensor:
         """Extract all time masks form final rnn cell state."""
 
@@ -856,6 +1009,40 @@ class EmbeddingPolicy(Policy):
                              "should be 'cosine' or 'inner'"
                              "".format(self.similarity_type))
 
+    def _tf_sim_for_prediction(self,
+                               embed_dialogue: tf.Tensor,
+                               mask: tf.Tensor) -> tf.Tensor:
+        """Define similarity of the last dialogue state with all actions.
+
+        The embeddings of all actions are fed to the placeholder,
+        so at prediction time only the dialogue is embedded.
+        """
+
+        self._all_actions_embed_in = tf.placeholder(
+            dtype=tf.float32,
+            shape=(None, self.embed_dim),
+            name='all_actions_embed'
+        )
+
+        # the dialogues are padded at the end
+        last = tf.maximum(tf.cast(tf.reduce_sum(mask, 1), tf.int32) - 1, 0)
+        embed_last = tf.gather_nd(
+            embed_dialogue,
+            tf.stack([tf.range(tf.shape(embed_dialogue)[0]), last], -1))
+        embed_action = self._all_actions_embed_in
+
+        if self.similarity_type == 'cosine':
+            # normalize embedding vectors for cosine similarity
+            embed_last = tf.nn.l2_normalize(embed_last, -1)
+            embed_action = tf.nn.l2_normalize(embed_action, -1)
+
+        if self.similarity_type in {'cosine', 'inner'}:
+            return tf.matmul(embed_last, embed_action, transpose_b=True)
+        else:
+            raise ValueError("Wrong similarity type {}, "
+                             "should be 'cosine' or 'inner'"
+                             "".format(self.similarity_type))
+
     def _regularization_loss(self):
         # type: () -> Union[tf.Tensor, int]
         """Add regularization to the embed layer inside rnn cell."""
@@ -928,6 +1115,9 @@ class EmbeddingPolicy(Policy):
         # set numpy random seed
         np.random.seed(self.random_seed)
 
+        # the cached rnn states were computed with the old weights
+        self.rnn_state_cache.clear()
+
         # dealing with training data
         training_data = self.featurize_for_training(training_trackers,
                                                     domain,
@@ -960,94 +1150,17 @@ class EmbeddingPolicy(Policy):
             # set random seed in tf
             tf.set_random_seed(self.random_seed)
 
-            dialogue_len = None  # use dynamic time for rnn
-            # create placeholders
-            self.a_in = tf.placeholder(
-                dtype=tf.float32,
-                shape=(None, dialogue_len,
-                       session_data.X.shape[-1]),
-                name='a'
-            )
-            self.b_in = tf.placeholder(
-                dtype=tf.float32,
-                shape=(None, dialogue_len,
-                       None, session_data.Y.shape[-1]),
-                name='b'
-            )
-            self.c_in = tf.placeholder(
-                dtype=tf.float32,
-                shape=(None, dialogue_len,
-                       session_data.slots.shape[-1]),
-                name='slt'
-            )
-            self.b_prev_in = tf.placeholder(
-                dtype=tf.float32,
-                shape=(None, dialogue_len,
-                       session_data.Y.shape[-1]),
-                name='b_prev'
-            )
-            self._dialogue_len = tf.placeholder(
-                dtype=tf.int32,
-                shape=(),
-                name='dialogue_len'
-            )
-            self._x_for_no_intent_in = tf.placeholder(
-                dtype=tf.float32,
-                shape=(1, session_data.X.shape[-1]),
-                name='x_for_no_intent'
-            )
-            self._y_for_no_action_in = tf.placeholder(
-                dtype=tf.float32,
-                shape=(1, session_data.Y.shape[-1]),
-                name='y_for_no_action'
-            )
-            self._y_for_action_listen_in = tf.placeholder(
-                dtype=tf.float32,
-                shape=(1, session_data.Y.shape[-1]),
-                name='y_for_action_listen'
-            )
-            self._is_training = tf.placeholder_with_default(False, shape=())
-
-            self._loss_scales = tf.placeholder(dtype=tf.float32,
-                                               shape=(None, dialogue_len))
-
-            # create embedding vectors
-            self.user_embed = self._create_tf_user_embed(self.a_in)
-            self.bot_embed = self._create_tf_bot_embed(self.b_in)
-            self.slot_embed = self._create_embed(self.c_in,
-                                                 layer_name_suffix='slt')
-
-            embed_prev_action = self._create_tf_bot_embed(self.b_prev_in)
-            embed_for_no_intent = self._create_tf_no_intent_embed(
-                self._x_for_no_intent_in)
-            embed_for_no_action = self._create_tf_no_action_embed(
-                self._y_for_no_action_in)
-            embed_for_action_listen = self._create_tf_no_action_embed(
-                self._y_for_action_listen_in)
-
-            # mask different length sequences
-            # if there is at least one `-1` it should be masked
-            mask = tf.sign(tf.reduce_max(self.a_in, -1) + 1)
-
-            # get rnn output
-            cell_output, final_state = self._create_tf_dial_embed(
-                self.user_embed, self.slot_embed, embed_prev_action, mask,
-                embed_for_no_intent, embed_for_no_action,
-                embed_for_action_listen
-            )
-            # process rnn output
-            if self.is_using_attention():
-                self.alignment_history = \
-                    self._alignments_history_from(final_state)
-
-                self.all_time_masks = self._all_time_masks_from(final_state)
+            self._create_tf_placeholders(session_data.X.shape[-1],
+                                         session_data.slots.shape[-1],
+                                         session_data.Y.shape[-1])
 
-            sims_rnn_to_max = self._sims_rnn_to_max_from(cell_output)
-            self.dial_embed = self._embed_dialogue_from(cell_output)
+            mask, sims_rnn_to_max = self._create_tf_dialogue()
 
             # calculate similarities
             self.sim_op, sim_act = self._tf_sim(self.dial_embed,
                                                 self.bot_embed, mask)
+            self.pred_sim_op = self._tf_sim_for_prediction(self.dial_embed,
+                                                           mask)
             # construct loss
             loss = self._tf_loss(self.sim_op, sim_act, sims_rnn_to_max, mask)
 
@@ -1059,6 +1172,171 @@ class EmbeddingPolicy(Policy):
 
             self._train_tf(session_data, loss, mask)
 
+        self.all_actions_embed = self._embed_all_actions()
+
+    def _create_tf_placeholders(self,
+                                x_dim: int,
+                                slots_dim: int,
+                                y_dim: int,
+                                for_training: bool = True) -> None:
+        """Create placeholders.
+
+        The placeholders of the candidate actions and the loss scales
+        as well as the switch for the dropout only exist for training.
+        """
+
+        dialogue_len = None  # use dynamic time for rnn
+        self.a_in = tf.placeholder(
+            dtype=tf.float32,
+            shape=(None, dialogue_len, x_dim),
+            name='a'
+        )
+        if for_training:
+            self.b_in = tf.placeholder(
+                dtype=tf.float32,
+                shape=(None, dialogue_len, None, y_dim),
+                name='b'
+            )
+        else:
+            self.b_in = None
+        self.c_in = tf.placeholder(
+            dtype=tf.float32,
+            shape=(None, dialogue_len, slots_dim),
+            name='slt'
+        )
+        self.b_prev_in = tf.placeholder(
+            dtype=tf.float32,
+            shape=(None, dialogue_len, y_dim),
+            name='b_prev'
+        )
+        self._dialogue_len = tf.placeholder(
+            dtype=tf.int32,
+            shape=(),
+            name='dialogue_len'
+        )
+        self._x_for_no_intent_in = tf.placeholder(
+            dtype=tf.float32,
+            shape=(1, x_dim),
+            name='x_for_no_intent'
+        )
+        self._y_for_no_action_in = tf.placeholder(
+            dtype=tf.float32,
+            shape=(1, y_dim),
+            name='y_for_no_action'
+        )
+        self._y_for_action_listen_in = tf.placeholder(
+            dtype=tf.float32,
+            shape=(1, y_dim),
+            name='y_for_action_listen'
+        )
+        if for_training:
+            self._is_training = tf.placeholder_with_default(False, shape=())
+
+            self._loss_scales = tf.placeholder(dtype=tf.float32,
+                                               shape=(None, dialogue_len))
+            # only the inference graph can continue dialogues
+            self._start_in = None
+            self._initial_state_in = None
+            self._final_state = None
+        else:
+            # no dropout layers are created
+            self._is_training = False
+            self._loss_scales = None
+
+    def _create_tf_dialogue(self) -> Tuple[tf.Tensor, List[tf.Tensor]]:
+        """Create the embedding vectors and the rnn of the dialogue.
+
+        Returns the mask of the dialogue states and the similarities
+        of the rnn which should be maximized during training.
+        """
+
+        # create embedding vectors
+        self.user_embed = self._create_tf_user_embed(self.a_in)
+        if self.b_in is not None:
+            self.bot_embed = self._create_tf_bot_embed(self.b_in)
+        else:
+            self.bot_embed = None
+        self.slot_embed = self._create_embed(self.c_in,
+                                             layer_name_suffix='slt')
+
+        embed_prev_action = self._create_tf_bot_embed(self.b_prev_in)
+        embed_for_no_intent = self._create_tf_no_intent_embed(
+            self._x_for_no_intent_in)
+        embed_for_no_action = self._create_tf_no_action_embed(
+            self._y_for_no_action_in)
+        embed_for_action_listen = self._create_tf_no_action_embed(
+            self._y_for_action_listen_in)
+
+        # mask different length sequences
+        # if there is at least one `-1` it should be masked
+        mask = tf.sign(tf.reduce_max(self.a_in, -1) + 1)
+
+        # get rnn output
+        cell_output, final_state = self._create_tf_dial_embed(
+            self.user_embed, self.slot_embed, embed_prev_action, mask,
+            embed_for_no_intent, embed_for_no_action,
+            embed_for_action_listen
+        )
+        if self._is_training is False:
+            # the mask of the states which are run through the rnn
+            mask = mask[:, self._start_in:]
+
+        # process rnn output
+        if self.is_using_attention():
+            self.alignment_history = \
+                self._alignments_history_from(final_state)
+
+            self.all_time_masks = self._all_time_masks_from(final_state)
+
+        sims_rnn_to_max = self._sims_rnn_to_max_from(cell_output)
+        self.dial_embed = self._embed_dialogue_from(cell_output)
+
+        return mask, sims_rnn_to_max
+
+    def _create_inference_policy(self) -> 'EmbeddingPolicy':
+        """Create a copy of the trained policy with a graph for prediction.
+
+        The graph only embeds the dialogue and compares it with the
+        precomputed embeddings of all actions. It contains neither the
+        optimizer and the loss nor the dropout and the placeholders which
+        are only used for training. The trained weights are copied.
+        """
+
+        policy = copy.copy(self)
+        policy.graph = tf.Graph()
+        with policy.graph.as_default():
+            policy._create_tf_placeholders(self.a_in.shape[-1].value,
+                                           self.c_in.shape[-1].value,
+                                           self.b_prev_in.shape[-1].value,
+                                           for_training=False)
+            mask, _ = policy._create_tf_dialogue()
+            policy.pred_sim_op = policy._tf_sim_for_prediction(
+                policy.dial_embed, mask)
+            policy.sim_op = None
+            policy._train_op = None
+
+            inference_variables = tf.global_variables()
+            policy.session = tf.Session(config=self._tf_config)
+
+        with self.graph.as_default():
+            trained_variables = {v.op.name: v
+                                 for v in tf.global_variables()}
+        values = self.session.run([trained_variables[v.op.name]
+                                   for v in inference_variables])
+        for variable, value in zip(inference_variables, values):
+            variable.load(value, policy.session)
+
+        return policy
+
+    def _embed_all_actions(self) -> np.ndarray:
+        """Embed all actions with the trained bot embedding network."""
+
+        all_actions_embed = self.session.run(
+            self.bot_embed,
+            feed_dict={self.b_in: self.encoded_all_actions[np.newaxis,
+                                                           np.newaxis]})
+        return all_actions_embed[0, 0]
+
     # training helpers
     def _linearly_increasing_batch_size(self, epoch: int) -> int:
         """Linearly increase batch size with every epoch.
@@ -1263,11 +1541,22 @@ class EmbeddingPolicy(Policy):
                           training_trackers: List[DialogueStateTracker],
                           domain: Domain,
                           **kwargs: Any) -> None:
-        """Continue training an already trained policy."""
+        """Continue training an already trained policy.
+
+        Only possible for a policy trained in this process, the persisted
+        graphs don't contain the optimizer."""
+
+        if self._train_op is None:
+            raise ValueError("Training of the EmbeddingPolicy can't be "
+                             "continued after it was loaded, only a policy "
+                             "which was trained in this process can be "
+                             "trained further.")
 
         batch_size = kwargs.get("batch_size", 5)
         epochs = kwargs.get("epochs", 50)
 
+        self.rnn_state_cache.clear()
+
         for _ in range(epochs):
             training_data = self._training_data_for_continue_training(
                 batch_size, training_trackers, domain)
@@ -1306,6 +1595,8 @@ class EmbeddingPolicy(Policy):
                 }
             )
 
+        self.all_actions_embed = self._embed_all_actions()
+
     def predict_action_probabilities(self,
                                      tracker: DialogueStateTracker,
                                      domain: Domain) -> List[float]:
@@ -1314,51 +1605,193 @@ class EmbeddingPolicy(Policy):
         Return the list of probabilities for the next actions.
         """
 
+        return self.predict_batch([tracker], domain)[0]
+
+    def predict_batch(self,
+                      trackers: List[DialogueStateTracker],
+                      domain: Domain) -> List[List[float]]:
+        """Predict the next action for many trackers at once.
+
+        The dialogues are run through the network in one batch.
+        """
+
         if self.session is None:
             logger.error("There is no trained tf.session: "
                          "component is either not trained or "
                          "didn't receive enough training data")
-            return [0.0] * domain.num_actions
+            return [[0.0] * domain.num_actions for _ in trackers]
+
+        if not trackers:
+            return []
 
         # noinspection PyPep8Naming
-        data_X = self.featurizer.create_X([tracker], domain)
+        data_X = self.featurizer.create_X(trackers, domain)
+
+        if self._start_in is not None and self.rnn_state_cache_size > 0:
+            return self._predict_incrementally(trackers, domain, data_X)
+
         session_data = self._create_tf_session_data(domain, data_X)
-        # noinspection PyPep8Naming
-        all_Y_d_x = np.stack([session_data.all_Y_d
-                              for _ in range(session_data.X.shape[0])])
+        feed_dict = self._create_prediction_feed_dict(session_data)
 
-        _sim = self.session.run(
-            self.sim_op,
-            feed_dict={
-                self.a_in: session_data.X,
-                self.b_in: all_Y_d_x,
-                self.c_in: session_data.slots,
-                self.b_prev_in: session_data.previous_actions,
-                self._dialogue_len: session_data.X.shape[1],
-                self._x_for_no_intent_in:
-                    session_data.x_for_no_intent,
-                self._y_for_no_action_in:
-                    session_data.y_for_no_action,
-                self._y_for_action_listen_in:
-                    session_data.y_for_action_listen
-            }
-        )
+        if self.pred_sim_op is not None:
+            result = self.session.run(self.pred_sim_op, feed_dict=feed_dict)
+        else:
+            # models persisted without the prediction op embed all
+            # actions once per batch and compare them with every state
+            feed_dict[self.b_in] = self.encoded_all_actions[np.newaxis,
+                                                            np.newaxis]
+            _sim = self.session.run(self.sim_op, feed_dict=feed_dict)
+            result = _sim[np.arange(len(trackers)),
+                          last_state_indices(data_X)]
+
+        return self._probabilities_from(result).tolist()
+
+    def _create_prediction_feed_dict(
+        self,
+        session_data: SessionData
+    ) -> Dict[tf.Tensor, Any]:
+        feed_dict = {
+            self.a_in: session_data.X,
+            self.c_in: session_data.slots,
+            self.b_prev_in: session_data.previous_actions,
+            self._dialogue_len: session_data.X.shape[1],
+            self._x_for_no_intent_in: session_data.x_for_no_intent,
+            self._y_for_no_action_in: session_data.y_for_no_action,
+            self._y_for_action_listen_in: session_data.y_for_action_listen
+        }
+        if self.pred_sim_op is not None:
+            feed_dict[self._all_actions_embed_in] = self.all_actions_embed
+        return feed_dict
+
+    def _probabilities_from(self, result: np.ndarray) -> np.ndarray:
+        """Turn the similarities with all actions into probabilities."""
 
-        result = _sim[0, -1, :]
         if self.similarity_type == 'cosine':
             # clip negative values to zero
             result[result < 0] = 0
         elif self.similarity_type == 'inner':
             # normalize result to [0, 1] with softmax
             result = np.exp(result)
-            result /= np.sum(result)
-
-        return result.tolist()
+            result /= np.sum(result, axis=-1, keepdims=True)
+
+        return result
+
+    def _predict_incrementally(self,
+                               trackers: List[DialogueStateTracker],
+                               domain: Domain,
+                               data_X: np.ndarray) -> List[List[float]]:
+        """Only run the states which were appended to the dialogues
+        since their last prediction through the rnn.
+
+        The attention keeps one time step for the whole batch, so the
+        dialogues which continue from the same time step are run
+        together."""
+
+        lengths = last_state_indices(data_X) + 1
+        predictions = [None] * len(trackers)
+        # time step to continue from -> dialogues and their rnn states
+        batches = {}
+        for i, tracker in enumerate(trackers):
+            cached = self.rnn_state_cache.get(tracker.sender_id,
+                                              data_X[i, :lengths[i]])
+            if cached is None:
+                batches.setdefault(0, []).append((i, None))
+            elif len(cached.X) == lengths[i]:
+                # nothing happened since the last prediction, the ensemble
+                # changes the returned predictions, so the cached one is
+                # copied
+                predictions[i] = list(cached.prediction)
+            else:
+                batches.setdefault(len(cached.X), []).append(
+                    (i, cached.state))
+
+        for start, batch in sorted(batches.items()):
+            rows = [i for i, _ in batch]
+            session_data = self._create_tf_session_data(
+                domain, data_X[rows, :max(lengths[rows])])
+            feed_dict = self._create_prediction_feed_dict(session_data)
+            if start > 0:
+                feed_dict[self._start_in] = start
+                for k, state_in in enumerate(self._initial_state_in):
+                    feed_dict[state_in] = self._stack_states(
+                        [state[k] for _, state in batch])
+
+            result, final_state = self.session.run(
+                [self.pred_sim_op, self._final_state], feed_dict=feed_dict)
+            probabilities = self._probabilities_from(result)
+
+            for k, i in enumerate(rows):
+                predictions[i] = probabilities[k].tolist()
+                self.rnn_state_cache.put(trackers[i].sender_id,
+                                         data_X[i, :lengths[i]],
+                                         [state[k] for state in final_state],
+                                         list(predictions[i]))
+        return predictions
 
-    def _persist_tensor(self, name: Text, tensor: tf.Tensor) -> None:
+    @staticmethod
+    def _stack_states(states: List[np.ndarray]) -> np.ndarray:
+        """Stack the states of several dialogues to a batch.
+
+        The states were computed in batches of different dialogue
+        lengths, so they are padded with zeros to the same shape."""
+
+        shape = np.max([state.shape for state in states], axis=0)
+        stacked = np.zeros((len(states),) + tuple(shape),
+                           dtype=states[0].dtype)
+        for k, state in enumerate(states):
+            stacked[(k,) + tuple(slice(0, n) for n in state.shape)] = state
+        return stacked
+
+    def _tf_tensors(self) -> Dict[Text, Optional[tf.Tensor]]:
+        """Tensors of the graph by the name they are persisted with."""
+
+        return {
+            'intent_placeholder': self.a_in,
+            'action_placeholder': self.b_in,
+            'slots_placeholder': self.c_in,
+            'prev_act_placeholder': self.b_prev_in,
+            'dialogue_len': self._dialogue_len,
+            'x_for_no_intent': self._x_for_no_intent_in,
+            'y_for_no_action': self._y_for_no_action_in,
+            'y_for_action_listen': self._y_for_action_listen_in,
+            'actions_embed_placeholder': self._all_actions_embed_in,
+            'similarity_op': self.sim_op,
+            'prediction_similarity_op': self.pred_sim_op,
+            'alignment_history': self.alignment_history,
+            'user_embed': self.user_embed,
+            'bot_embed': self.bot_embed,
+            'slot_embed': self.slot_embed,
+            'dial_embed': self.dial_embed,
+            'rnn_embed': self.rnn_embed,
+            'attn_embed': self.attn_embed,
+            'copy_attn_debug': self.copy_attn_debug,
+            'all_time_masks': self.all_time_masks,
+            'start_placeholder': self._start_in,
+            'initial_state_placeholders': self._initial_state_in,
+            'final_state': self._final_state
+        }
+
+    # tensors which are persisted as a list in one collection
+    _tensor_lists = {'initial_state_placeholders', 'final_state'}
+
+    def _persist_tensor(self,
+                        name: Text,
+                        tensor: Union[tf.Tensor, List[tf.Tensor]]) -> None:
         if tensor is not None:
             self.graph.clear_collection(name)
-            self.graph.add_to_collection(name, tensor)
+            if name in self._tensor_lists:
+                for t in tensor:
+                    self.graph.add_to_collection(name, t)
+            else:
+                self.graph.add_to_collection(name, tensor)
+
+    def _persist_tf_graph(self, checkpoint: Text) -> None:
+        with self.graph.as_default():
+            for name, tensor in self._tf_tensors().items():
+                self._persist_tensor(name, tensor)
+
+            saver = tf.train.Saver()
+            saver.save(self.session, checkpoint)
 
     def persist(self, path: Text) -> None:
         """Persists the policy to a storage."""
@@ -1371,57 +1804,38 @@ class EmbeddingPolicy(Policy):
 
         self.featurizer.persist(path)
 
-        meta = {"priority": self.priority}
+        meta = {"priority": self.priority,
+                "rnn_state_cache_size": self.rnn_state_cache_size}
 
         meta_file = os.path.join(path, 'embedding_policy.json')
         utils.dump_obj_as_json_to_file(meta_file, meta)
 
         file_name = 'tensorflow_embedding.ckpt'
         checkpoint = os.path.join(path, file_name)
+        inference_checkpoint = os.path.join(
+            path, 'tensorflow_embedding_inference.ckpt')
         utils.create_dir_for_file(checkpoint)
 
-        with self.graph.as_default():
-            self._persist_tensor('intent_placeholder',
-                                 self.a_in)
-            self._persist_tensor('action_placeholder',
-                                 self.b_in)
-            self._persist_tensor('slots_placeholder',
-                                 self.c_in)
-            self._persist_tensor('prev_act_placeholder',
-                                 self.b_prev_in)
-            self._persist_tensor('dialogue_len',
-                                 self._dialogue_len)
-            self._persist_tensor('x_for_no_intent',
-                                 self._x_for_no_intent_in)
-            self._persist_tensor('y_for_no_action',
-                                 self._y_for_no_action_in)
-            self._persist_tensor('y_for_action_listen',
-                                 self._y_for_action_listen_in)
-
-            self._persist_tensor('similarity_op', self.sim_op)
-
-            self._persist_tensor('alignment_history',
-                                 self.alignment_history)
-
-            self._persist_tensor('user_embed', self.user_embed)
-            self._persist_tensor('bot_embed', self.bot_embed)
-            self._persist_tensor('slot_embed', self.slot_embed)
-            self._persist_tensor('dial_embed', self.dial_embed)
-
-            self._persist_tensor('rnn_embed', self.rnn_embed)
-            self._persist_tensor('attn_embed', self.attn_embed)
-            self._persist_tensor('copy_attn_debug', self.copy_attn_debug)
-
-            self._persist_tensor('all_time_masks', self.all_time_masks)
-
-            saver = tf.train.Saver()
-            saver.save(self.session, checkpoint)
+        if self.b_in is None:
+            # the policy was loaded from the inference graph
+            self._persist_tf_graph(inference_checkpoint)
+        else:
+            self._persist_tf_graph(checkpoint)
+            if self._train_op is not None:
+                inference_policy = self._create_inference_policy()
+                inference_policy._persist_tf_graph(inference_checkpoint)
+                inference_policy.session.close()
 
         encoded_actions_file = os.path.join(
             path, file_name + ".encoded_all_actions.pkl")
         with io.open(encoded_actions_file, 'wb') as f:
             pickle.dump(self.encoded_all_actions, f)
 
+        actions_embed_file = os.path.join(
+            path, file_name + ".all_actions_embed.pkl")
+        with io.open(actions_embed_file, 'wb') as f:
+            pickle.dump(self.all_actions_embed, f)
+
         tf_config_file = os.path.join(path, file_name + ".tf_config.pkl")
         with io.open(tf_config_file, 'wb') as f:
             pickle.dump(self._tf_config, f)
@@ -1444,7 +1858,14 @@ class EmbeddingPolicy(Policy):
         featurizer = TrackerFeaturizer.load(path)
 
         file_name = 'tensorflow_embedding.ckpt'
-        checkpoint = os.path.join(path, file_name)
+        inference_checkpoint = os.path.join(
+            path, 'tensorflow_embedding_inference.ckpt')
+
+        if os.path.exists(inference_checkpoint + '.meta'):
+            checkpoint = inference_checkpoint
+        else:
+            # models persisted before there was an inference graph
+            checkpoint = os.path.join(path, file_name)
 
         if not os.path.exists(checkpoint + '.meta'):
             return cls(featurizer=featurizer)
@@ -1465,29 +1886,14 @@ class EmbeddingPolicy(Policy):
 
             saver.restore(sess, checkpoint)
 
-            a_in = cls.load_tensor('intent_placeholder')
-            b_in = cls.load_tensor('action_placeholder')
-            c_in = cls.load_tensor('slots_placeholder')
-            b_prev_in = cls.load_tensor('prev_act_placeholder')
-            dialogue_len = cls.load_tensor('dialogue_len')
-            x_for_no_intent = cls.load_tensor('x_for_no_intent')
-            y_for_no_action = cls.load_tensor('y_for_no_action')
-            y_for_action_listen = cls.load_tensor('y_for_action_listen')
-
-            sim_op = cls.load_tensor('similarity_op')
-
-            alignment_history = cls.load_tensor('alignment_history')
-
-            user_embed = cls.load_tensor('user_embed')
-            bot_embed = cls.load_tensor('bot_embed')
-            slot_embed = cls.load_tensor('slot_embed')
-            dial_embed = cls.load_tensor('dial_embed')
-
-            rnn_embed = cls.load_tensor('rnn_embed')
-            attn_embed = cls.load_tensor('attn_embed')
-            copy_attn_debug = cls.load_tensor('copy_attn_debug')
-
-            all_time_masks = cls.load_tensor('all_time_masks')
+            # the tensors are persisted in collections named like
+            # the arguments of the constructor
+            arguments = utils.arguments_of(cls.__init__)
+            tensors = {name: (tf.get_collection(name)
+                              if name in cls._tensor_lists
+                              else cls.load_tensor(name))
+                       for name in graph.get_all_collection_keys()
+                       if name in arguments}
 
         encoded_actions_file = os.path.join(
             path, "{}.encoded_all_actions.pkl".format(file_name))
@@ -1495,26 +1901,21 @@ class EmbeddingPolicy(Policy):
         with io.open(encoded_actions_file, 'rb') as f:
             encoded_all_actions = pickle.load(f)
 
+        actions_embed_file = os.path.join(
+            path, "{}.all_actions_embed.pkl".format(file_name))
+        if os.path.exists(actions_embed_file):
+            with io.open(actions_embed_file, 'rb') as f:
+                all_actions_embed = pickle.load(f)
+        else:
+            all_actions_embed = None
+
         return cls(featurizer=featurizer,
                    priority=meta["priority"],
+                   rnn_state_cache_size=meta.get(
+                       "rnn_state_cache_size",
+                       cls.defaults["rnn_state_cache_size"]),
                    encoded_all_actions=encoded_all_actions,
+                   all_actions_embed=all_actions_embed,
                    graph=graph,
                    session=sess,
-                   intent_placeholder=a_in,
-                   action_placeholder=b_in,
-                   slots_placeholder=c_in,
-                   prev_act_placeholder=b_prev_in,
-                   dialogue_len=dialogue_len,
-                   x_for_no_intent=x_for_no_intent,
-                   y_for_no_action=y_for_no_action,
-                   y_for_action_listen=y_for_action_listen,
-                   similarity_op=sim_op,
-                   alignment_history=alignment_history,
-                   user_embed=user_embed,
-                   bot_embed=bot_embed,
-                   slot_embed=slot_embed,
-                   dial_embed=dial_embed,
-                   rnn_embed=rnn_embed,
-                   attn_embed=attn_embed,
-                   copy_attn_debug=copy_attn_debug,
-                   all_time_masks=all_time_masks)
+                   **tensors)
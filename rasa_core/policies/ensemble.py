@@ -15,7 +15,8 @@ from rasa_core.actions.action import ACTION_LISTEN_NAME
 from rasa_core.domain import Domain
 from rasa_core.events import SlotSet, ActionExecuted, ActionExecutionRejected
 from rasa_core.exceptions import UnsupportedDialogueModelError
-from rasa_core.featurizers import MaxHistoryTrackerFeaturizer
+from rasa_core.featurizers import (
+    MaxHistoryTrackerFeaturizer, FeaturizationContext)
 from rasa_core.policies import Policy
 from rasa_core.policies.fallback import FallbackPolicy
 from rasa_core.policies.memoization import (
@@ -35,6 +36,9 @@ class PolicyEnsemble(object):
         self.policies = policies
         self.training_trackers = None
         self.date_trained = None
+        # featurizations which policies with equivalent featurizers shared
+        # instead of creating them again
+        self.num_reused_featurizations = 0
 
         if action_fingerprints:
             self.action_fingerprints = action_fingerprints
@@ -91,6 +95,16 @@ class PolicyEnsemble(object):
                                         ) -> Tuple[List[float], Text]:
         raise NotImplementedError
 
+    def predict_batch(self,
+                      trackers: List[DialogueStateTracker],
+                      domain: Domain
+                      ) -> List[Tuple[List[float], Text]]:
+        """Predicts the probabilities and the used policy for the next
+        action of every tracker."""
+
+        return [self.probabilities_using_best_policy(tracker, domain)
+                for tracker in trackers]
+
     def _max_histories(self):
         # type: () -> List[Optional[int]]
         """Return max history."""
@@ -330,14 +344,47 @@ class SimplePolicyEnsemble(PolicyEnsemble):
                                         tracker: DialogueStateTracker,
                                         domain: Domain
                                         ) -> Tuple[List[float], Text]:
+        return self.predict_batch([tracker], domain)[0]
+
+    def predict_batch(self,
+                      trackers: List[DialogueStateTracker],
+                      domain: Domain
+                      ) -> List[Tuple[List[float], Text]]:
+        """Every policy predicts for all trackers at once, the best
+        prediction is then picked for each tracker separately."""
+
+        if not trackers:
+            return []
+
+        with FeaturizationContext() as context:
+            predictions = [p.predict_batch(trackers, domain)
+                           for p in self.policies]
+
+        self.num_reused_featurizations += context.num_reused
+
+        results = []
+        for i, tracker in enumerate(trackers):
+            result, best_policy_name = self._best_policy_prediction(
+                tracker, domain, [p[i] for p in predictions])
+            logger.debug("Predicted next action using {} ({} featurizations "
+                         "created, {} reused)".format(best_policy_name,
+                                                      context.num_created,
+                                                      context.num_reused))
+            results.append((result, best_policy_name))
+        return results
+
+    def _best_policy_prediction(self,
+                                tracker: DialogueStateTracker,
+                                domain: Domain,
+                                predictions: List[List[float]]
+                                ) -> Tuple[List[float], Text]:
         result = None
         max_confidence = -1
         best_policy_name = None
         best_policy_priority = -1
 
-        for i, p in enumerate(self.policies):
-            probabilities = p.predict_action_probabilities(tracker, domain)
-
+        for i, (p, probabilities) in enumerate(zip(self.policies,
+                                                   predictions)):
             if isinstance(tracker.events[-1], ActionExecutionRejected):
                 probabilities[domain.index_for_action(
                     tracker.events[-1].action_name)] = 0.0
@@ -382,8 +429,6 @@ class SimplePolicyEnsemble(PolicyEnsemble):
         if np.sum(result) != 0:
             result = result / np.nansum(result)
 
-        logger.debug("Predicted next action using {}"
-                     "".format(best_policy_name))
         return result, best_policy_name
 
 
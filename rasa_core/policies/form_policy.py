@@ -14,8 +14,6 @@ logger = logging.getLogger(__name__)
 class FormPolicy(MemoizationPolicy):
     """Policy which handles prediction of Forms"""
 
-    ENABLE_FEATURE_STRING_COMPRESSION = True
-
     def __init__(self,
                  featurizer: Optional[TrackerFeaturizer] = None,
                  priority: int = 4,
@@ -3,6 +3,7 @@ import io
 import json
 import logging
 import os
+import threading
 import tensorflow as tf
 import numpy as np
 import warnings
@@ -11,10 +12,13 @@ from typing import Any, List, Dict, Text, Optional, Tuple
 from rasa_core import utils
 from rasa_core.domain import Domain
 from rasa_core.featurizers import (
-    MaxHistoryTrackerFeaturizer, BinarySingleStateFeaturizer)
-from rasa_core.featurizers import TrackerFeaturizer
+    MaxHistoryTrackerFeaturizer, BinarySingleStateFeaturizer,
+    FullDialogueTrackerFeaturizer)
+from rasa_core.featurizers import TrackerFeaturizer, last_state_indices
 from rasa_core.policies.policy import Policy
+from rasa_core.policies.rnn_state_cache import RnnStateCache
 from rasa_core.trackers import DialogueStateTracker
+from rasa_core.training.data import SparseFeatureArray
 
 try:
     import cPickle as pickle
@@ -24,6 +28,26 @@ except ImportError:
 logger = logging.getLogger(__name__)
 
 
+class DenseBatches(tf.keras.utils.Sequence):
+    """Mini-batches of sparse training data, densified one at a time."""
+
+    def __init__(self,
+                 X: SparseFeatureArray,
+                 y: np.ndarray,
+                 batch_size: int
+                 ) -> None:
+        self.X = X
+        self.y = y
+        self.batch_size = batch_size
+
+    def __len__(self) -> int:
+        return int(np.ceil(len(self.X) / float(self.batch_size)))
+
+    def __getitem__(self, idx: int) -> Tuple[np.ndarray, np.ndarray]:
+        batch = slice(idx * self.batch_size, (idx + 1) * self.batch_size)
+        return self.X[batch].toarray(), self.y[batch]
+
+
 class KerasPolicy(Policy):
     SUPPORTS_ONLINE_TRAINING = True
 
@@ -33,8 +57,16 @@ class KerasPolicy(Policy):
         "epochs": 100,
         "batch_size": 32,
         "validation_split": 0.1,
+        # store the training data sparse and only densify the
+        # mini-batches, for large domains and many training stories
+        "use_sparse_features": False,
         # set random seed to any int to get reproducible results
-        "random_seed": None
+        "random_seed": None,
+        # number of conversations for which the state of the rnn is kept,
+        # so that only the new states of a dialogue are run through the
+        # rnn at its next prediction, set to 0 to run the whole dialogue
+        # (only used with the `FullDialogueTrackerFeaturizer`)
+        "rnn_state_cache_size": 1000
     }
 
     @staticmethod
@@ -65,6 +97,13 @@ class KerasPolicy(Policy):
 
         self.current_epoch = current_epoch
 
+        self.rnn_state_cache = RnnStateCache(self.rnn_state_cache_size)
+        # the model which continues the rnn from the cached states,
+        # it is created at the first prediction
+        self._step_model = None
+        self._step_model_created = False
+        self._step_model_lock = threading.Lock()
+
     def _load_params(self, **kwargs: Dict[Text, Any]) -> None:
         config = copy.deepcopy(self.defaults)
         config.update(kwargs)
@@ -75,7 +114,9 @@ class KerasPolicy(Policy):
         self.epochs = config.pop('epochs')
         self.batch_size = config.pop('batch_size')
         self.validation_split = config.pop('validation_split')
+        self.use_sparse_features = config.pop('use_sparse_features')
         self.random_seed = config.pop('random_seed')
+        self.rnn_state_cache_size = config.pop('rnn_state_cache_size')
 
         self._train_params = config
 
@@ -153,9 +194,11 @@ class KerasPolicy(Policy):
         # set numpy random seed
         np.random.seed(self.random_seed)
 
-        training_data = self.featurize_for_training(training_trackers,
-                                                    domain,
-                                                    **kwargs)
+        self._reset_rnn_state()
+
+        training_data = self.featurize_for_training(
+            training_trackers, domain,
+            sparse=self.use_sparse_features, **kwargs)
         # noinspection PyPep8Naming
         shuffled_X, shuffled_y = training_data.shuffled_X_y()
 
@@ -175,15 +218,27 @@ class KerasPolicy(Policy):
                             "".format(training_data.num_examples(),
                                       self.validation_split))
 
-                # filter out kwargs that cannot be passed to fit
-                self._train_params = self._get_valid_params(
-                    self.model.fit, **self._train_params)
-
-                self.model.fit(shuffled_X, shuffled_y,
-                               epochs=self.epochs,
-                               batch_size=self.batch_size,
-                               shuffle=False,
-                               **self._train_params)
+                if training_data.is_sparse():
+                    # filter out kwargs that cannot be passed to fit
+                    self._train_params = self._get_valid_params(
+                        self.model.fit_generator, **self._train_params)
+
+                    batches = DenseBatches(shuffled_X, shuffled_y,
+                                           self.batch_size)
+                    self.model.fit_generator(batches,
+                                             epochs=self.epochs,
+                                             shuffle=False,
+                                             **self._train_params)
+                else:
+                    # filter out kwargs that cannot be passed to fit
+                    self._train_params = self._get_valid_params(
+                        self.model.fit, **self._train_params)
+
+                    self.model.fit(shuffled_X, shuffled_y,
+                                   epochs=self.epochs,
+                                   batch_size=self.batch_size,
+                                   shuffle=False,
+                                   **self._train_params)
                 # the default parameter for epochs in keras fit is 1
                 self.current_epoch = self.defaults.get("epochs", 1)
                 logger.info("Done fitting keras policy model")
@@ -203,6 +258,8 @@ class KerasPolicy(Policy):
         batch_size = kwargs.get('batch_size', 5)
         epochs = kwargs.get('epochs', 50)
 
+        self._reset_rnn_state()
+
         with self.graph.as_default(), self.session.as_default():
             for _ in range(epochs):
                 training_data = self._training_data_for_continue_training(
@@ -221,16 +278,163 @@ class KerasPolicy(Policy):
                                      tracker: DialogueStateTracker,
                                      domain: Domain) -> List[float]:
 
+        return self.predict_batch([tracker], domain)[0]
+
+    def predict_batch(self,
+                      trackers: List[DialogueStateTracker],
+                      domain: Domain) -> List[List[float]]:
+        if not trackers:
+            return []
+
         # noinspection PyPep8Naming
-        X = self.featurizer.create_X([tracker], domain)
+        X = self.featurizer.create_X(trackers, domain)
+
+        if self._can_predict_incrementally():
+            return self._predict_incrementally(trackers, X)
 
         with self.graph.as_default(), self.session.as_default():
-            y_pred = self.model.predict(X, batch_size=1)
+            y_pred = self.model.predict(X, batch_size=len(trackers))
 
         if len(y_pred.shape) == 2:
-            return y_pred[-1].tolist()
+            return y_pred.tolist()
         elif len(y_pred.shape) == 3:
-            return y_pred[0, -1].tolist()
+            return y_pred[np.arange(len(trackers)),
+                          last_state_indices(X)].tolist()
+
+    def _reset_rnn_state(self) -> None:
+        # the cached states were computed with the old weights
+        self.rnn_state_cache.clear()
+        self._step_model = None
+        self._step_model_created = False
+
+    def _can_predict_incrementally(self) -> bool:
+        if (self.rnn_state_cache_size <= 0 or self.model is None or
+                not isinstance(self.featurizer,
+                               FullDialogueTrackerFeaturizer)):
+            return False
+
+        with self._step_model_lock:
+            if not self._step_model_created:
+                with self.graph.as_default(), self.session.as_default():
+                    self._step_model = self._create_step_model()
+                self._step_model_created = True
+                if self._step_model is None:
+                    logger.debug("The model can't continue a dialogue "
+                                 "from the state of its rnn, so the whole "
+                                 "dialogue is run at every prediction.")
+            return self._step_model is not None
+
+    def _create_step_model(self) -> Optional[tf.keras.models.Model]:
+        """Create a model which continues the rnn of the model from a state.
+
+        Besides the new dialogue states the model takes the initial states
+        of the rnn layers as inputs and additionally outputs their final
+        states. Returns `None` if the model can't continue a dialogue,
+        e.g. because it only predicts from the last state or contains
+        layers which look at other time steps than the current one."""
+
+        from tensorflow.keras.layers import (
+            Activation, Dense, Dropout, Input, Masking, RNN, TimeDistributed)
+        from tensorflow.keras.models import Model
+
+        output_shape = self.model.output_shape
+        if not isinstance(output_shape, tuple) or len(output_shape) != 3:
+            return None
+
+        inputs = Input(batch_shape=self.model.input_shape)
+        x = inputs
+        states_in = []
+        states_out = []
+        for layer in self.model.layers:
+            if isinstance(layer, RNN):
+                if (layer.go_backwards or layer.stateful or
+                        not layer.return_sequences):
+                    return None
+
+                config = layer.get_config()
+                config["return_state"] = True
+                rnn = layer.__class__.from_config(config)
+                state_size = layer.cell.state_size
+                if not isinstance(state_size, (list, tuple)):
+                    state_size = [state_size]
+                initial_state = [Input(batch_shape=(None, size))
+                                 for size in state_size]
+
+                outputs = rnn(x, initial_state=initial_state)
+                rnn.set_weights(layer.get_weights())
+
+                x = outputs[0]
+                states_in.extend(initial_state)
+                states_out.extend(outputs[1:])
+            elif isinstance(layer, (Masking, TimeDistributed, Dense,
+                                    Activation, Dropout)):
+                x = layer(x)
+            else:
+                return None
+
+        if not states_in:
+            return None
+
+        return Model([inputs] + states_in, [x] + states_out)
+
+    def _predict_incrementally(self,
+                               trackers: List[DialogueStateTracker],
+                               X: np.ndarray) -> List[List[float]]:
+        """Only run the states which were appended to the dialogues
+        since their last prediction through the rnn."""
+
+        lengths = last_state_indices(X) + 1
+        predictions = [None] * len(trackers)
+        rows = []
+        starts = []
+        states = []
+        for i, tracker in enumerate(trackers):
+            cached = self.rnn_state_cache.get(tracker.sender_id,
+                                              X[i, :lengths[i]])
+            if cached is None:
+                rows.append(i)
+                starts.append(0)
+                states.append(None)
+            elif len(cached.X) == lengths[i]:
+                # nothing happened since the last prediction, the ensemble
+                # changes the returned predictions, so the cached one is
+                # copied
+                predictions[i] = list(cached.prediction)
+            else:
+                rows.append(i)
+                starts.append(len(cached.X))
+                states.append(cached.state)
+
+        if not rows:
+            return predictions
+
+        # the new states of every dialogue start at the first time step
+        num_new = lengths[rows] - starts
+        new_X = np.full((len(rows), max(num_new), X.shape[-1]), -1,
+                        dtype=X.dtype)
+        for k, (i, start) in enumerate(zip(rows, starts)):
+            new_X[k, :num_new[k]] = X[i, start:lengths[i]]
+
+        initial_state = []
+        for j, state_in in enumerate(self._step_model.inputs[1:]):
+            zero_state = np.zeros(state_in.shape[-1].value, np.float32)
+            initial_state.append(np.stack(
+                [zero_state if state is None else state[j]
+                 for state in states]))
+
+        with self.graph.as_default(), self.session.as_default():
+            outputs = self._step_model.predict([new_X] + initial_state,
+                                               batch_size=len(rows))
+        y_pred = outputs[0]
+        final_state = outputs[1:]
+
+        for k, i in enumerate(rows):
+            predictions[i] = y_pred[k, num_new[k] - 1].tolist()
+            self.rnn_state_cache.put(trackers[i].sender_id,
+                                     X[i, :lengths[i]],
+                                     [state[k] for state in final_state],
+                                     list(predictions[i]))
+        return predictions
 
     def persist(self, path: Text) -> None:
 
@@ -239,7 +443,8 @@ class KerasPolicy(Policy):
 
             meta = {"priority": self.priority,
                     "model": "keras_model.h5",
-                    "epochs": self.current_epoch}
+                    "epochs": self.current_epoch,
+                    "rnn_state_cache_size": self.rnn_state_cache_size}
 
             meta_file = os.path.join(path, 'keras_policy.json')
             utils.dump_obj_as_json_to_file(meta_file, meta)
@@ -286,7 +491,10 @@ class KerasPolicy(Policy):
                            model=model,
                            graph=graph,
                            session=session,
-                           current_epoch=meta["epochs"])
+                           current_epoch=meta["epochs"],
+                           rnn_state_cache_size=meta.get(
+                               "rnn_state_cache_size",
+                               cls.defaults["rnn_state_cache_size"]))
             else:
                 return cls(featurizer=featurizer)
         else:
@@ -1,15 +1,17 @@
 import zlib
 
 import base64
+import hashlib
 import json
 import logging
 import os
 from tqdm import tqdm
-from typing import Optional, Any, Dict, List, Text
+from typing import Optional, Any, Dict, Iterator, List, Text
 
 from rasa_core import utils
 from rasa_core.domain import Domain
-from rasa_core.events import ActionExecuted
+from rasa_core.events import (
+    ActionExecuted, AgentUttered, BotUttered, Event, SlotSet, UserUttered)
 from rasa_core.featurizers import (
     TrackerFeaturizer, MaxHistoryTrackerFeaturizer)
 from rasa_core.policies.policy import Policy
@@ -39,7 +41,9 @@ class MemoizationPolicy(Policy):
         training stories for this, use AugmentedMemoizationPolicy.
     """
 
-    ENABLE_FEATURE_STRING_COMPRESSION = True
+    # format of the keys of the lookup, persisted to detect lookups
+    # which need to be migrated when they are loaded
+    FEATURE_KEY_FORMAT = "md5"
 
     SUPPORTS_ONLINE_TRAINING = True
 
@@ -87,13 +91,15 @@ class MemoizationPolicy(Policy):
              "instead of {}".format(len(trackers_as_actions[0])))
 
         ambiguous_feature_keys = set()
+        # the examples share the dictionaries of equal states
+        state_strings = {}
 
         pbar = tqdm(zip(trackers_as_states, trackers_as_actions),
                     desc="Processed actions", disable=online)
         for states, actions in pbar:
             action = actions[0]
 
-            feature_key = self._create_feature_key(states)
+            feature_key = self._create_feature_key(states, state_strings)
             feature_item = domain.index_for_action(action)
 
             if feature_key not in ambiguous_feature_keys:
@@ -118,13 +124,61 @@ class MemoizationPolicy(Policy):
             pbar.set_postfix({"# examples": "{:d}".format(
                 len(self.lookup))})
 
-    def _create_feature_key(self, states):
-        feature_str = json.dumps(states, sort_keys=True).replace("\"", "")
-        if self.ENABLE_FEATURE_STRING_COMPRESSION:
-            compressed = zlib.compress(bytes(feature_str, "utf-8"))
-            return base64.b64encode(compressed).decode("utf-8")
+    @staticmethod
+    def _state_feature_string(state: Optional[Dict[Text, float]],
+                              state_strings: Dict[int, Text]
+                              ) -> Text:
+        if state is None:
+            return "null"
+
+        # `state_strings` caches the strings by the id of the dictionary,
+        # which is only valid as long as the dictionaries exist
+        state_str = state_strings.get(id(state))
+        if state_str is None:
+            state_str = json.dumps(state, sort_keys=True).replace("\"", "")
+            state_strings[id(state)] = state_str
+        return state_str
+
+    @staticmethod
+    def _hash_feature_string(feature_str: Text) -> Text:
+        # not a security measure, md5 is just a fast 128 bit hash which is
+        # available on all supported python versions
+        return hashlib.md5(feature_str.encode("utf-8")).hexdigest()
+
+    def _create_feature_key(self,
+                            states: List[Optional[Dict[Text, float]]],
+                            state_strings: Optional[Dict[int, Text]] = None
+                            ) -> Text:
+        """Stable 128 bit hash of the states as hex string.
+
+        The hashed feature string contains the sorted state names and values
+        of every state (like `json.dumps` without quotes), so it is the same
+        in every process. Pass `state_strings` to reuse the strings of
+        states which are shared by many examples."""
+
+        if state_strings is None:
+            feature_str = json.dumps(states, sort_keys=True).replace("\"", "")
         else:
-            return feature_str
+            feature_str = "[{}]".format(", ".join(
+                self._state_feature_string(state, state_strings)
+                for state in states))
+        return self._hash_feature_string(feature_str)
+
+    @classmethod
+    def _migrate_lookup(cls, lookup: Dict[Text, Any]) -> Dict[Text, Any]:
+        """Replace the feature strings which were used as keys in old
+        versions (optionally zlib compressed and base64 encoded) with
+        their hashes."""
+
+        migrated = {}
+        for feature_key, feature_item in lookup.items():
+            if feature_key.startswith("["):
+                feature_str = feature_key
+            else:
+                compressed = base64.b64decode(feature_key)
+                feature_str = zlib.decompress(compressed).decode("utf-8")
+            migrated[cls._hash_feature_string(feature_str)] = feature_item
+        return migrated
 
     def train(self,
               training_trackers: List[DialogueStateTracker],
@@ -210,6 +264,7 @@ class MemoizationPolicy(Policy):
         data = {
             "priority": self.priority,
             "max_history": self.max_history,
+            "key_format": self.FEATURE_KEY_FORMAT,
             "lookup": self.lookup
         }
         utils.create_dir_for_file(memorized_file)
@@ -222,8 +277,15 @@ class MemoizationPolicy(Policy):
         memorized_file = os.path.join(path, 'memorized_turns.json')
         if os.path.isfile(memorized_file):
             data = json.loads(utils.read_file(memorized_file))
+            lookup = data["lookup"]
+            if data.get("key_format") != cls.FEATURE_KEY_FORMAT:
+                logger.info("Migrating the lookup keys of the memorized "
+                            "turns in '{}'. Persist the policy again to "
+                            "skip the migration when it is loaded."
+                            "".format(memorized_file))
+                lookup = cls._migrate_lookup(lookup)
             return cls(featurizer=featurizer, priority=data["priority"],
-                       lookup=data["lookup"])
+                       lookup=lookup)
         else:
             logger.info("Couldn't load memoization for policy. "
                         "File '{}' doesn't exist. Falling back to empty "
@@ -279,13 +341,101 @@ class AugmentedMemoizationPolicy(MemoizationPolicy):
 
         return mcfly_tracker
 
+    # events which change nothing the states depend on but the slots, the
+    # latest user message and the latest action
+    SIMPLE_EVENT_TYPES = (ActionExecuted, UserUttered, SlotSet, BotUttered,
+                          AgentUttered)
+
+    def _future_trackers(self, tracker: DialogueStateTracker
+                         ) -> Iterator[Optional[DialogueStateTracker]]:
+        """Trackers with the same states as the trackers created by
+            going back to the future again and again.
+
+        Going back to the future replays all the events after the second
+        action, which is quadratic in the length of the conversation. Only
+        the latest `max_history` states matter though, and if the tracker
+        contains only simple events, everything that happened between the
+        cut and the first of these states boils down to the latest value of
+        every slot and the latest user message. So these trackers replay
+        just those events and the events of the latest states. `None` is
+        returned instead of a tracker with the same states as the previous
+        one."""
+
+        events = tracker.applied_events()
+        actions = [i for i, event in enumerate(events)
+                   if isinstance(event, ActionExecuted)]
+        max_history = getattr(self.featurizer, "max_history", None)
+
+        if (len(actions) < 2 or max_history is None or
+                not all(isinstance(event, self.SIMPLE_EVENT_TYPES)
+                        for event in events[actions[1]:])):
+            mcfly_tracker = self._back_to_the_future_again(tracker)
+            while mcfly_tracker is not None:
+                yield mcfly_tracker
+                mcfly_tracker = self._back_to_the_future_again(mcfly_tracker)
+            return
+
+        cuts = actions[1:]
+        # action before the first of the latest `max_history` states, the
+        # trackers cut after it replay all their events anyway
+        if len(actions) >= max_history > 0:
+            window_start = actions[-max_history]
+        else:
+            window_start = 0
+
+        # the latest slot events and user message between every cut and
+        # `window_start`, going backwards they only change if a new slot or
+        # the first user message appears
+        summaries = {}
+        slot_events = {}
+        user_message = []
+        i = window_start
+        for cut in reversed(cuts):
+            if cut >= window_start:
+                continue
+            while i > cut + 1:
+                i -= 1
+                event = events[i]
+                if isinstance(event, SlotSet):
+                    if event.key not in slot_events:
+                        slot_events[event.key] = event
+                elif isinstance(event, UserUttered) and not user_message:
+                    user_message.append(event)
+            summaries[cut] = (len(slot_events), len(user_message),
+                              list(slot_events.values()) + user_message)
+
+        previous_summary = None
+        for cut in cuts:
+            if cut < window_start:
+                summary = summaries[cut]
+                if previous_summary is not None and \
+                        summary[:2] == previous_summary[:2]:
+                    yield None
+                    continue
+                previous_summary = summary
+                replayed = [events[cut]] + summary[2] + events[window_start:]
+            else:
+                replayed = events[cut:]
+            yield self._replayed_tracker(tracker, replayed)
+
+    @staticmethod
+    def _replayed_tracker(tracker: DialogueStateTracker,
+                          events: List[Event]) -> DialogueStateTracker:
+        replayed = tracker.init_copy()
+        for e in events:
+            replayed.update(e)
+        return replayed
+
     def _recall_using_delorean(self, old_states, tracker, domain):
         """Recursively go to the past to correctly forget slots,
             and then back to the future to recall."""
 
         logger.debug("Launch DeLorean...")
-        mcfly_tracker = self._back_to_the_future_again(tracker)
-        while mcfly_tracker is not None:
+        for mcfly_tracker in self._future_trackers(tracker):
+            if mcfly_tracker is None:
+                # same states as the previous future
+                continue
+
             tracker_as_states = self.featurizer.prediction_states(
                 [mcfly_tracker], domain)
             states = tracker_as_states[0]
@@ -298,9 +448,6 @@ class AugmentedMemoizationPolicy(MemoizationPolicy):
                     return memorised
                 old_states = states
 
-            # go back again
-            mcfly_tracker = self._back_to_the_future_again(mcfly_tracker)
-
         # No match found
         logger.debug("Current tracker state {}".format(old_states))
         return None
@@ -66,14 +66,18 @@ class Policy(object):
         self,
         training_trackers: List[DialogueStateTracker],
         domain: Domain,
+        sparse: bool = False,
         **kwargs: Any
     ) -> DialogueTrainingData:
         """Transform training trackers into a vector representation.
         The trackers, consisting of multiple turns, will be transformed
-        into a float vector which can be used by a ML model."""
+        into a float vector which can be used by a ML model.
+        If `sparse` is `True`, the vectors are stored in a
+        `SparseFeatureArray` to save memory on large domains."""
 
         training_data = self.featurizer.featurize_trackers(training_trackers,
-                                                           domain)
+                                                           domain,
+                                                           sparse)
 
         max_training_samples = kwargs.get('max_training_samples')
         if max_training_samples is not None:
@@ -139,6 +143,18 @@ class Policy(object):
         raise NotImplementedError("Policy must have the capacity "
                                   "to predict.")
 
+    def predict_batch(self,
+                      trackers: List[DialogueStateTracker],
+                      domain: Domain) -> List[List[float]]:
+        """Predicts the next action for many trackers at once.
+
+        Returns the list of probabilities for the next actions of
+        every tracker. Policies which run a model should override this
+        to featurize the trackers and run the model once for all of them."""
+
+        return [self.predict_action_probabilities(tracker, domain)
+                for tracker in trackers]
+
     def persist(self, path: Text) -> None:
         """Persists the policy to a storage."""
         raise NotImplementedError("Policy must have the capacity "
@@ -0,0 +1,73 @@
+import threading
+from collections import OrderedDict, namedtuple
+from typing import Any, List, Optional, Text
+
+import numpy as np
+
+# the featurized dialogue states, which were run through the rnn,
+# the state of the rnn after the last of them and the prediction
+CachedRnnState = namedtuple("CachedRnnState", ("X", "state", "prediction"))
+
+
+class RnnStateCache(object):
+    """Keeps the rnn state at the end of recently predicted dialogues.
+
+    The recurrent policies predict the next action from all states of a
+    dialogue. With the state of the rnn after the previous prediction of a
+    conversation, only the states which were appended to the dialogue
+    since then have to be run through the rnn. A cached state is only used
+    if the dialogue still starts with the states it was computed for, e.g.
+    it is dropped once a conversation is rewound. The cache is a LRU cache
+    bounded by the number of conversations."""
+
+    def __init__(self, max_size: int = 1000) -> None:
+        self.max_size = max_size
+        # sender id -> cached rnn state
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, sender_id: Text, X: np.ndarray) -> Optional[CachedRnnState]:
+        """Return the cached state if the dialogue continues its states.
+
+        `X` are the featurized states of the dialogue without padding."""
+
+        with self._lock:
+            cached = self._cache.get(sender_id)
+
+        if (cached is not None and len(cached.X) <= len(X) and
+                np.array_equal(cached.X, X[:len(cached.X)])):
+            with self._lock:
+                if sender_id in self._cache:
+                    self._cache.move_to_end(sender_id)
+                self.hits += 1
+            return cached
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self,
+            sender_id: Text,
+            X: np.ndarray,
+            state: List[np.ndarray],
+            prediction: Any) -> None:
+        """Cache the rnn state after the states `X` of a dialogue."""
+
+        # don't keep the whole batch the states were featurized in alive
+        cached = CachedRnnState(np.array(X),
+                                [np.array(s) for s in state],
+                                prediction)
+        with self._lock:
+            self._cache[sender_id] = cached
+            self._cache.move_to_end(sender_id)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def __len__(self) -> int:
+        return len(self._cache)
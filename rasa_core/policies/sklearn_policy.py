@@ -4,6 +4,7 @@ import logging
 import numpy as np
 import os
 import pickle
+import scipy.sparse
 import warnings
 from sklearn.base import clone
 from sklearn.linear_model import LogisticRegression
@@ -39,6 +40,7 @@ class SklearnPolicy(Policy):
         scoring: Optional[Text or List or Dict or Callable] = 'accuracy',
         label_encoder: LabelEncoder = LabelEncoder(),
         shuffle: bool = True,
+        use_sparse_features: bool = False,
         **kwargs: Any
     ) -> None:
         """Create a new sklearn policy.
@@ -57,6 +59,9 @@ class SklearnPolicy(Policy):
             label_encoder: Encoder for the labels. Must implement an
                 *inverse_transform* method.
             shuffle: Whether to shuffle training data.
+            use_sparse_features: Whether to train on a sparse matrix
+                instead of a dense array, which saves memory on large
+                domains. The model needs to support sparse input.
         """
 
         if featurizer:
@@ -72,6 +77,7 @@ class SklearnPolicy(Policy):
         self.scoring = scoring
         self.label_encoder = label_encoder
         self.shuffle = shuffle
+        self.use_sparse_features = use_sparse_features
 
         # attributes that need to be restored after loading
         self._pickle_params = [
@@ -91,12 +97,17 @@ class SklearnPolicy(Policy):
     def _extract_training_data(self, training_data):
         # transform y from one-hot to num_classes
         X, y = training_data.X, training_data.y.argmax(axis=-1)
+        if training_data.is_sparse():
+            X = X.flattened()
         if self.shuffle:
             X, y = sklearn_shuffle(X, y)
         return X, y
 
     def _preprocess_data(self, X, y=None):
-        Xt = X.reshape(X.shape[0], -1)
+        if scipy.sparse.issparse(X):
+            Xt = X
+        else:
+            Xt = X.reshape(X.shape[0], -1)
         if y is None:
             return Xt
         else:
@@ -121,9 +132,9 @@ class SklearnPolicy(Policy):
               **kwargs: Any
               ) -> None:
 
-        training_data = self.featurize_for_training(training_trackers,
-                                                    domain,
-                                                    **kwargs)
+        training_data = self.featurize_for_training(
+            training_trackers, domain,
+            sparse=self.use_sparse_features, **kwargs)
 
         X, y = self._extract_training_data(training_data)
         model = self.model_architecture(**kwargs)
@@ -146,22 +157,28 @@ class SklearnPolicy(Policy):
             logger.info("Cross validation score: {:.5f}".format(score))
 
     def _postprocess_prediction(self, y_proba, domain):
-        yp = y_proba[0].tolist()
-
         # Some classes might not be part of the training labels. Since
         # sklearn does not predict labels it has never encountered
         # during training, it is necessary to insert missing classes.
-        indices = self.label_encoder.inverse_transform(np.arange(len(yp)))
-        y_filled = [0.0 for _ in range(domain.num_actions)]
-        for i, pred in zip(indices, yp):
-            y_filled[i] = pred
+        indices = self.label_encoder.inverse_transform(
+            np.arange(y_proba.shape[1]))
+        y_filled = np.zeros((len(y_proba), domain.num_actions))
+        y_filled[:, indices] = y_proba
 
-        return y_filled
+        return y_filled.tolist()
 
     def predict_action_probabilities(self,
                                      tracker: DialogueStateTracker,
                                      domain: Domain) -> List[float]:
-        X = self.featurizer.create_X([tracker], domain)
+        return self.predict_batch([tracker], domain)[0]
+
+    def predict_batch(self,
+                      trackers: List[DialogueStateTracker],
+                      domain: Domain) -> List[List[float]]:
+        if not trackers:
+            return []
+
+        X = self.featurizer.create_X(trackers, domain)
         Xt = self._preprocess_data(X)
         y_proba = self.model.predict_proba(Xt)
         return self._postprocess_prediction(y_proba, domain)
@@ -14,6 +14,7 @@ from rasa_core.actions.action import (
     ACTION_LISTEN_NAME,
     ACTION_RESTART_NAME,
     ActionExecutionRejection)
+from rasa_core.batching import InferenceScheduler
 from rasa_core.channels import CollectingOutputChannel
 from rasa_core.channels import UserMessage
 from rasa_core.dispatcher import Dispatcher
@@ -30,9 +31,10 @@ from rasa_core.interpreter import (
     RasaNLUHttpInterpreter,
     INTENT_MESSAGE_PREFIX)
 from rasa_core.interpreter import RegexInterpreter
+from rasa_core.lanes import LaneDispatcher
 from rasa_core.nlg import NaturalLanguageGenerator
 from rasa_core.policies.ensemble import PolicyEnsemble
-from rasa_core.tracker_store import TrackerStore
+from rasa_core.tracker_store import TrackerStore, TrackerSession
 from rasa_core.trackers import DialogueStateTracker, EventVerbosity
 from rasa_core.utils import EndpointConfig
 
@@ -57,7 +59,9 @@ class MessageProcessor(object):
                  action_endpoint: Optional[EndpointConfig] = None,
                  max_number_of_predictions: int = 10,
                  message_preprocessor: Optional[LambdaType] = None,
-                 on_circuit_break: Optional[LambdaType] = None
+                 on_circuit_break: Optional[LambdaType] = None,
+                 inference_scheduler: Optional[InferenceScheduler] = None,
+                 lanes: Optional[LaneDispatcher] = None
                  ):
         self.interpreter = interpreter
         self.nlg = generator
@@ -68,18 +72,34 @@ class MessageProcessor(object):
         self.message_preprocessor = message_preprocessor
         self.on_circuit_break = on_circuit_break
         self.action_endpoint = action_endpoint
+        # if set, the predictions are batched with the predictions of
+        # other concurrently handled conversations
+        self.inference_scheduler = inference_scheduler
+        # if set, reminders are handled on the worker lane of their
+        # conversation, in order with its messages
+        self.lanes = lanes
 
     def handle_message(self, message: UserMessage) -> Optional[List[Text]]:
-        """Handle a single message with this processor."""
-
-        # preprocess message if necessary
-        tracker = self.log_message(message)
-        if not tracker:
-            return None
-
-        self._predict_and_execute_next_action(message, tracker)
-        # save tracker state to continue conversation from this state
-        self._save_tracker(tracker)
+        """Handle a single message with this processor.
+
+        If predicting or executing the next actions fails, the logged
+        message is stored nevertheless, only the events of the actions
+        are discarded."""
+
+        with self.create_session() as session:
+            # preprocess message if necessary
+            tracker = self._log_message(message, session)
+            if not tracker:
+                return None
+
+            logged_events = session.new_events(tracker)
+            try:
+                self._predict_and_execute_next_action(message, tracker)
+            except Exception:
+                self._save_logged_events(tracker.sender_id, logged_events)
+                raise
+            # save tracker state to continue conversation from this state
+            session.save(tracker)
 
         if isinstance(message.output_channel, CollectingOutputChannel):
             return message.output_channel.messages
@@ -87,41 +107,93 @@ class MessageProcessor(object):
             return None
 
     def predict_next(self, sender_id: Text) -> Optional[Dict[Text, Any]]:
+        return self.predict_next_batch([sender_id])[0]
+
+    def predict_next_batch(self,
+                           sender_ids: List[Text]
+                           ) -> List[Optional[Dict[Text, Any]]]:
+        """Predict the next action of many conversations at once.
+
+        The result of a conversation whose tracker can't be retrieved
+        is `None`."""
+
+        with self.create_session() as session:
+            # we have a Tracker instance for each user
+            # which maintains conversation state
+            trackers = []
+            for sender_id in sender_ids:
+                tracker = self._get_tracker(sender_id, session)
+                if not tracker:
+                    logger.warning("Failed to retrieve or create tracker "
+                                   "for sender '{}'.".format(sender_id))
+                trackers.append(tracker)
+
+            found = [tracker for tracker in trackers if tracker]
+            predictions = iter(
+                self._get_next_action_probabilities_batch(found))
+            for tracker in found:
+                # save tracker state to continue conversation from this state
+                session.save(tracker)
+
+        results = []
+        for tracker in trackers:
+            if not tracker:
+                results.append(None)
+                continue
+
+            probabilities, policy = next(predictions)
+            scores = [{"action": a, "score": p}
+                      for a, p in zip(self.domain.action_names,
+                                      probabilities)]
+            results.append({
+                "scores": scores,
+                "policy": policy,
+                "confidence": np.max(probabilities),
+                "tracker": tracker.current_state(
+                    EventVerbosity.AFTER_RESTART)
+            })
+        return results
+
+    def _save_logged_events(self,
+                            sender_id: Text,
+                            events: List[Event]) -> None:
+        """Store the events of a message whose handling failed.
+
+        The session of the request is rolled back, so the events are
+        applied to the stored tracker in a session of their own."""
 
-        # we have a Tracker instance for each user
-        # which maintains conversation state
-        tracker = self._get_tracker(sender_id)
-        if not tracker:
-            logger.warning("Failed to retrieve or create tracker for sender "
-                           "'{}'.".format(sender_id))
-            return None
-
-        probabilities, policy = \
-            self._get_next_action_probabilities(tracker)
-        # save tracker state to continue conversation from this state
-        self._save_tracker(tracker)
-        scores = [{"action": a, "score": p}
-                  for a, p in zip(self.domain.action_names, probabilities)]
-        return {
-            "scores": scores,
-            "policy": policy,
-            "confidence": np.max(probabilities),
-            "tracker": tracker.current_state(EventVerbosity.AFTER_RESTART)
-        }
+        try:
+            with self.create_session() as session:
+                tracker = self._get_tracker(sender_id, session)
+                if tracker:
+                    for e in events:
+                        tracker.update(e)
+                    session.save(tracker)
+        except Exception as e:
+            logger.warning("Failed to store the message of sender '{}' "
+                           "whose handling failed: {}".format(sender_id, e))
 
     def log_message(self,
                     message: UserMessage) -> Optional[DialogueStateTracker]:
 
+        with self.create_session() as session:
+            return self._log_message(message, session)
+
+    def _log_message(self,
+                     message: UserMessage,
+                     session: TrackerSession
+                     ) -> Optional[DialogueStateTracker]:
+
         # preprocess message if necessary
         if self.message_preprocessor is not None:
             message.text = self.message_preprocessor(message.text)
         # we have a Tracker instance for each user
         # which maintains conversation state
-        tracker = self._get_tracker(message.sender_id)
+        tracker = self._get_tracker(message.sender_id, session)
         if tracker:
             self._handle_message_with_tracker(message, tracker)
             # save tracker state to continue conversation from this state
-            self._save_tracker(tracker)
+            session.save(tracker)
         else:
             logger.warning("Failed to retrieve or create tracker for sender "
                            "'{}'.".format(message.sender_id))
@@ -135,20 +207,21 @@ class MessageProcessor(object):
                        confidence: float
                        ) -> Optional[DialogueStateTracker]:
 
-        # we have a Tracker instance for each user
-        # which maintains conversation state
-        tracker = self._get_tracker(sender_id)
-        if tracker:
-            action = self._get_action(action_name)
-            self._run_action(action, tracker, dispatcher, policy,
-                             confidence)
-
-            # save tracker state to continue conversation from this state
-            self._save_tracker(tracker)
-        else:
-            logger.warning("Failed to retrieve or create tracker for sender "
-                           "'{}'.".format(sender_id))
-        return tracker
+        with self.create_session() as session:
+            # we have a Tracker instance for each user
+            # which maintains conversation state
+            tracker = self._get_tracker(sender_id, session)
+            if tracker:
+                action = self._get_action(action_name)
+                self._run_action(action, tracker, dispatcher, policy,
+                                 confidence)
+
+                # save tracker state to continue conversation from this state
+                session.save(tracker)
+            else:
+                logger.warning("Failed to retrieve or create tracker for "
+                               "sender '{}'.".format(sender_id))
+            return tracker
 
     def predict_next_action(self,
                             tracker: DialogueStateTracker
@@ -158,13 +231,26 @@ class MessageProcessor(object):
         This should be overwritten by more advanced policies to use
         ML to predict the action. Returns the index of the next action."""
 
-        probabilities, policy = self._get_next_action_probabilities(tracker)
+        return self.predict_next_action_batch([tracker])[0]
 
-        max_index = int(np.argmax(probabilities))
-        action = self.domain.action_for_index(max_index, self.action_endpoint)
-        logger.debug("Predicted next action '{}' with prob {:.2f}.".format(
-            action.name(), probabilities[max_index]))
-        return action, policy, probabilities[max_index]
+    def predict_next_action_batch(self,
+                                  trackers: List[DialogueStateTracker]
+                                  ) -> List[Tuple[Action, Text, float]]:
+        """Predicts the next action of every tracker.
+
+        The policies featurize the trackers and run their models once
+        for all of them."""
+
+        predictions = []
+        for probabilities, policy in \
+                self._get_next_action_probabilities_batch(trackers):
+            max_index = int(np.argmax(probabilities))
+            action = self.domain.action_for_index(max_index,
+                                                  self.action_endpoint)
+            logger.debug("Predicted next action '{}' with prob {:.2f}."
+                         "".format(action.name(), probabilities[max_index]))
+            predictions.append((action, policy, probabilities[max_index]))
+        return predictions
 
     @staticmethod
     def _is_reminder_still_valid(tracker: DialogueStateTracker,
@@ -198,7 +284,26 @@ class MessageProcessor(object):
                         ) -> None:
         """Handle a reminder that is triggered asynchronously."""
 
-        tracker = self._get_tracker(dispatcher.sender_id)
+        if self.lanes is not None:
+            self.lanes.run(dispatcher.sender_id, self._handle_reminder,
+                           reminder_event, dispatcher)
+        else:
+            self._handle_reminder(reminder_event, dispatcher)
+
+    def _handle_reminder(self,
+                         reminder_event: ReminderScheduled,
+                         dispatcher: Dispatcher
+                         ) -> None:
+        with self.create_session() as session:
+            self._handle_reminder_in_session(reminder_event, dispatcher,
+                                             session)
+
+    def _handle_reminder_in_session(self,
+                                    reminder_event: ReminderScheduled,
+                                    dispatcher: Dispatcher,
+                                    session: TrackerSession
+                                    ) -> None:
+        tracker = self._get_tracker(dispatcher.sender_id, session)
 
         if not tracker:
             logger.warning("Failed to retrieve or create tracker for sender "
@@ -223,7 +328,7 @@ class MessageProcessor(object):
                                        dispatcher.sender_id)
                 self._predict_and_execute_next_action(user_msg, tracker)
             # save tracker state to continue conversation from this state
-            self._save_tracker(tracker)
+            session.save(tracker)
 
     @staticmethod
     def _log_slots(tracker):
@@ -430,15 +535,21 @@ class MessageProcessor(object):
             e.timestamp = time.time()
             tracker.update(e)
 
-    def _get_tracker(self, sender_id: Text) -> Optional[DialogueStateTracker]:
+    def create_session(self) -> TrackerSession:
+        """Create the session which retrieves and saves the trackers of a
+        single request."""
+
+        return TrackerSession(self.tracker_store)
+
+    @staticmethod
+    def _get_tracker(sender_id: Text,
+                     session: TrackerSession
+                     ) -> Optional[DialogueStateTracker]:
 
         sender_id = sender_id or UserMessage.DEFAULT_SENDER_ID
-        tracker = self.tracker_store.get_or_create_tracker(sender_id)
+        tracker = session.get_or_create_tracker(sender_id)
         return tracker
 
-    def _save_tracker(self, tracker):
-        self.tracker_store.save(tracker)
-
     def _prob_array_for_action(self,
                                action_name: Text
                                ) -> Tuple[Optional[List[float]], None]:
@@ -454,6 +565,38 @@ class MessageProcessor(object):
         self,
         tracker: DialogueStateTracker
     ) -> Tuple[Optional[List[float]], Optional[Text]]:
+        return self._get_next_action_probabilities_batch([tracker])[0]
+
+    def _get_next_action_probabilities_batch(
+        self,
+        trackers: List[DialogueStateTracker]
+    ) -> List[Tuple[Optional[List[float]], Optional[Text]]]:
+
+        results = [self._forced_action_probabilities(tracker)
+                   for tracker in trackers]
+        # only the trackers without a forced action are run through
+        # the policies, all of them at once
+        predictions = iter(self._predict_batch(
+            [tracker for tracker, result in zip(trackers, results)
+             if result is None]))
+        return [result if result is not None else next(predictions)
+                for result in results]
+
+    def _predict_batch(
+        self,
+        trackers: List[DialogueStateTracker]
+    ) -> List[Tuple[List[float], Text]]:
+
+        if self.inference_scheduler is None:
+            return self.policy_ensemble.predict_batch(trackers, self.domain)
+        return self.inference_scheduler.predict(self.policy_ensemble,
+                                                trackers,
+                                                self.domain)
+
+    def _forced_action_probabilities(
+        self,
+        tracker: DialogueStateTracker
+    ) -> Optional[Tuple[Optional[List[float]], None]]:
 
         followup_action = tracker.followup_action
         if followup_action:
@@ -470,5 +613,4 @@ class MessageProcessor(object):
         if (tracker.latest_message.intent.get("name") ==
                 self.domain.restart_intent):
             return self._prob_array_for_action(ACTION_RESTART_NAME)
-        return self.policy_ensemble.probabilities_using_best_policy(
-            tracker, self.domain)
+        return None
@@ -8,7 +8,9 @@ from typing import Text, Optional, List
 
 from rasa_core import constants, cli, broker
 from rasa_core import utils
+from rasa_core.batching import InferenceScheduler
 from rasa_core.interpreter import NaturalLanguageInterpreter
+from rasa_core.lanes import LaneDispatcher
 from rasa_core.tracker_store import TrackerStore
 from rasa_core.utils import read_yaml_file, AvailableEndpoints
 
@@ -91,12 +93,21 @@ def start_server(input_channels,
                  initial_agent,
                  enable_api=True,
                  jwt_secret=None,
-                 jwt_method=None):
+                 jwt_method=None,
+                 worker_lanes=0,
+                 inference_batch_wait=0,
+                 inference_batch_size=32):
     """Run the agent."""
     from rasa_core import server
     from flask import Flask
     from flask_cors import CORS
 
+    if worker_lanes:
+        initial_agent.lanes = LaneDispatcher(worker_lanes)
+    if inference_batch_wait:
+        initial_agent.inference_scheduler = InferenceScheduler(
+            inference_batch_size, inference_batch_wait / 1000.0)
+
     if enable_api:
         app = server.create_app(initial_agent,
                                 cors_origins=cors,
@@ -132,6 +143,9 @@ def serve_application(initial_agent,
                       enable_api=True,
                       jwt_secret=None,
                       jwt_method=None,
+                      worker_lanes=0,
+                      inference_batch_wait=0,
+                      inference_batch_size=32
                       ):
     if not channel and not credentials_file:
         channel = "cmdline"
@@ -140,7 +154,8 @@ def serve_application(initial_agent,
 
     http_server = start_server(input_channels, cors, auth_token,
                                port, initial_agent, enable_api,
-                               jwt_secret, jwt_method)
+                               jwt_secret, jwt_method, worker_lanes,
+                               inference_batch_wait, inference_batch_size)
 
     if channel == "cmdline":
         start_cmdline_io(constants.DEFAULT_SERVER_FORMAT.format(port),
@@ -150,6 +165,8 @@ def serve_application(initial_agent,
         http_server.serve_forever()
     except Exception as exc:
         logger.exception(exc)
+    finally:
+        initial_agent.shutdown()
 
 
 def load_agent(core_model, interpreter, endpoints,
@@ -209,4 +226,7 @@ if __name__ == '__main__':
                       cmdline_args.auth_token,
                       cmdline_args.enable_api,
                       cmdline_args.jwt_secret,
-                      cmdline_args.jwt_method)
+                      cmdline_args.jwt_method,
+                      cmdline_args.worker_lanes,
+                      cmdline_args.inference_batch_wait,
+                      cmdline_args.inference_batch_size)
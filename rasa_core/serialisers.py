@@ -0,0 +1,318 @@
+import json
+import logging
+import pickle
+import struct
+from typing import Any, List, Text, Tuple, Union
+
+from rasa_core.conversation import Dialogue
+from rasa_core.events import deserialise_events
+from rasa_core.utils import class_from_module_path
+
+logger = logging.getLogger(__name__)
+
+
+def create_serialiser(serialiser: Union[Text, 'DialogueSerialiser', None]
+                      ) -> 'DialogueSerialiser':
+    """Instantiate a dialogue serialiser by its name or class path."""
+
+    if serialiser is None:
+        return PickleSerialiser()
+    elif isinstance(serialiser, DialogueSerialiser):
+        return serialiser
+    elif serialiser in BUILTIN_SERIALISERS:
+        return BUILTIN_SERIALISERS[serialiser]()
+    else:
+        try:
+            return class_from_module_path(serialiser)()
+        except (AttributeError, ImportError):
+            raise ValueError("Unknown dialogue serialiser '{}'. Use one of "
+                             "{} or the module path of a custom serialiser "
+                             "class.".format(serialiser,
+                                             list(BUILTIN_SERIALISERS)))
+
+
+class DialogueSerialiser(object):
+    """Converts a `Dialogue` to bytes which can be persisted and back."""
+
+    name = None
+
+    def dumps(self, dialogue: Dialogue) -> bytes:
+        raise NotImplementedError("Serialiser must implement `dumps`.")
+
+    def loads(self, data: bytes) -> Dialogue:
+        raise NotImplementedError("Serialiser must implement `loads`.")
+
+
+class PickleSerialiser(DialogueSerialiser):
+    """Pickles the complete dialogue object.
+
+    Only load pickled dialogues from sources you trust."""
+
+    name = "pickle"
+
+    def dumps(self, dialogue: Dialogue) -> bytes:
+        return pickle.dumps(dialogue)
+
+    def loads(self, data: bytes) -> Dialogue:
+        return pickle.loads(data)
+
+
+class JsonSerialiser(DialogueSerialiser):
+    """Stores the dialogue as json using the events' dict representation."""
+
+    name = "json"
+
+    version = 1
+
+    def dumps(self, dialogue: Dialogue) -> bytes:
+        return json.dumps({
+            "version": self.version,
+            "name": dialogue.name,
+            "events": [e.as_dict() for e in dialogue.events]
+        }).encode("utf-8")
+
+    def loads(self, data: bytes) -> Dialogue:
+        if isinstance(data, bytes):
+            data = data.decode("utf-8")
+        dumped = json.loads(data)
+
+        if dumped.get("version") != self.version:
+            raise ValueError("Unsupported version '{}' of json serialised "
+                             "dialogue.".format(dumped.get("version")))
+        return Dialogue(dumped["name"],
+                        deserialise_events(dumped["events"]))
+
+
+class BinarySerialiser(DialogueSerialiser):
+    """Compact binary format for dialogues.
+
+    The dialogue is stored as its name and the dict representation of its
+    events. Every string (event type names, intent names, slot keys,...)
+    is stored only once in a string table at the beginning of the data and
+    referenced by its index afterwards.
+
+    Layout: ``MAGIC | version | string table | body``
+
+    The data is about half the size of a pickled dialogue, but encoding
+    and decoding it is several times slower than pickling."""
+
+    name = "binary"
+
+    MAGIC = b"RCD"
+
+    version = 1
+
+    _TAGS = tuple(range(8))
+
+    _NONE, _FALSE, _TRUE, _INT, _FLOAT, _STR, _LIST, _DICT = _TAGS
+
+    _DOUBLE = struct.Struct("<d")
+
+    def dumps(self, dialogue: Dialogue) -> bytes:
+        strings = {}
+        body = bytearray()
+        self._encode([dialogue.name, [e.as_dict() for e in dialogue.events]],
+                     body, strings)
+
+        data = bytearray(self.MAGIC)
+        data.append(self.version)
+        self._write_varint(data, len(strings))
+        for s in sorted(strings, key=strings.get):
+            encoded = s.encode("utf-8")
+            self._write_varint(data, len(encoded))
+            data.extend(encoded)
+        data.extend(body)
+        return bytes(data)
+
+    def loads(self, data: bytes) -> Dialogue:
+        # indexing bytes is faster than indexing a memoryview
+        data = bytes(data)
+        if data[:len(self.MAGIC)] != self.MAGIC:
+            raise ValueError("Data is not a binary serialised dialogue.")
+
+        pos = len(self.MAGIC)
+        version = data[pos]
+        if version != self.version:
+            raise ValueError("Unsupported version '{}' of binary serialised "
+                             "dialogue.".format(version))
+        pos += 1
+
+        num_strings, pos = self._read_varint(data, pos)
+        strings = []
+        for _ in range(num_strings):
+            length, pos = self._read_varint(data, pos)
+            strings.append(data[pos:pos + length].decode("utf-8"))
+            pos += length
+
+        (name, events), _ = self._decode(data, pos, strings)
+        return Dialogue(name, deserialise_events(events))
+
+    @staticmethod
+    def _write_varint(buf: bytearray, n: int) -> None:
+        while n >= 0x80:
+            buf.append((n & 0x7f) | 0x80)
+            n >>= 7
+        buf.append(n)
+
+    @staticmethod
+    def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+        result = 0
+        shift = 0
+        while True:
+            b = data[pos]
+            pos += 1
+            result |= (b & 0x7f) << shift
+            if b < 0x80:
+                return result, pos
+            shift += 7
+
+    def _encode(self, value: Any, buf: bytearray, strings: dict) -> None:
+        """Append the encoded value to `buf`, new strings are added to
+        the string table `strings` (string -> index)."""
+
+        # the encoder runs once for every value of every event, hence all
+        # helpers are bound to local names and small numbers, which are the
+        # vast majority of varints, are written without a loop
+        _NONE, _FALSE, _TRUE, _INT, _FLOAT, _STR, _LIST, _DICT = self._TAGS
+        append = buf.append
+        extend = buf.extend
+        pack_double = self._DOUBLE.pack
+        write_varint = self._write_varint
+
+        def write_string(s):
+            idx = strings.get(s)
+            if idx is None:
+                idx = strings[s] = len(strings)
+            if idx < 0x80:
+                append(idx)
+            else:
+                write_varint(buf, idx)
+
+        def encode(value):
+            t = type(value)
+            if t is str:
+                append(_STR)
+                write_string(value)
+            elif t is dict:
+                append(_DICT)
+                n = len(value)
+                if n < 0x80:
+                    append(n)
+                else:
+                    write_varint(buf, n)
+                for k, v in value.items():
+                    write_string(k if type(k) is str else str(k))
+                    encode(v)
+            elif value is None:
+                append(_NONE)
+            elif t is bool:
+                append(_TRUE if value else _FALSE)
+            elif t is float:
+                append(_FLOAT)
+                extend(pack_double(value))
+            elif t is int:
+                append(_INT)
+                # zig-zag encoding to store negative numbers as varints
+                n = value << 1 if value >= 0 else ((-value) << 1) - 1
+                if n < 0x80:
+                    append(n)
+                else:
+                    write_varint(buf, n)
+            elif t is list or t is tuple:
+                append(_LIST)
+                n = len(value)
+                if n < 0x80:
+                    append(n)
+                else:
+                    write_varint(buf, n)
+                for v in value:
+                    encode(v)
+            else:
+                encode(self._builtin_value(value))
+
+        encode(value)
+
+    @staticmethod
+    def _builtin_value(value: Any) -> Any:
+        """Convert instances of subclasses of the supported types."""
+
+        if isinstance(value, bool):
+            return bool(value)
+        elif isinstance(value, int):
+            return int(value)
+        elif isinstance(value, float):
+            return float(value)
+        elif isinstance(value, str):
+            return str(value)
+        elif isinstance(value, (list, tuple)):
+            return list(value)
+        elif isinstance(value, dict):
+            return dict(value)
+        else:
+            raise TypeError("Can't serialise value '{}' of type '{}'."
+                            "".format(value, type(value).__name__))
+
+    def _decode(self,
+                data: bytes,
+                pos: int,
+                strings: List[Text]) -> Tuple[Any, int]:
+        """Decode the value at `pos`, returns it and the position after
+        it."""
+
+        _NONE, _FALSE, _TRUE, _INT, _FLOAT, _STR, _LIST, _DICT = self._TAGS
+        read_varint = self._read_varint
+        unpack_double = self._DOUBLE.unpack_from
+
+        def decode(pos):
+            tag = data[pos]
+            pos += 1
+            if tag == _STR:
+                idx = data[pos]
+                if idx < 0x80:
+                    return strings[idx], pos + 1
+                idx, pos = read_varint(data, pos)
+                return strings[idx], pos
+            elif tag == _DICT:
+                length = data[pos]
+                if length < 0x80:
+                    pos += 1
+                else:
+                    length, pos = read_varint(data, pos)
+                result = {}
+                for _ in range(length):
+                    idx = data[pos]
+                    if idx < 0x80:
+                        pos += 1
+                    else:
+                        idx, pos = read_varint(data, pos)
+                    result[strings[idx]], pos = decode(pos)
+                return result, pos
+            elif tag == _NONE:
+                return None, pos
+            elif tag == _TRUE:
+                return True, pos
+            elif tag == _FALSE:
+                return False, pos
+            elif tag == _FLOAT:
+                return unpack_double(data, pos)[0], pos + 8
+            elif tag == _INT:
+                n, pos = read_varint(data, pos)
+                return (n >> 1) if not n & 1 else -((n + 1) >> 1), pos
+            elif tag == _LIST:
+                length, pos = read_varint(data, pos)
+                result = []
+                for _ in range(length):
+                    value, pos = decode(pos)
+                    result.append(value)
+                return result, pos
+            else:
+                raise ValueError("Invalid type tag '{}' at position {} of "
+                                 "binary serialised dialogue."
+                                 "".format(tag, pos - 1))
+
+        return decode(pos)
+
+
+BUILTIN_SERIALISERS = {
+    s.name: s for s in [PickleSerialiser, JsonSerialiser, BinarySerialiser]
+}
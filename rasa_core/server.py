@@ -3,7 +3,7 @@ import os
 import tempfile
 import zipfile
 from functools import wraps
-from typing import List, Text, Optional, Union, Callable, Any
+from typing import List, Text, Optional, Union, Callable, Any, Dict
 
 from flask import Flask, request, abort, Response, jsonify, json
 from flask_cors import CORS, cross_origin
@@ -149,6 +149,22 @@ def event_verbosity_parameter(default_verbosity):
                     {"parameter": "include_events", "in": "query"}))
 
 
+def _prediction_as_dict(domain: Domain,
+                        tracker: DialogueStateTracker,
+                        probabilities: List[float],
+                        policy: Text,
+                        verbosity: EventVerbosity
+                        ) -> Dict[Text, Any]:
+    scores = [{"action": a, "score": p}
+              for a, p in zip(domain.action_names, probabilities)]
+
+    return {
+        "scores": scores,
+        "policy": policy,
+        "tracker": tracker.current_state(verbosity)
+    }
+
+
 def create_app(agent,
                cors_origins: Optional[Union[Text, List[Text]]] = None,
                auth_token: Optional[Text] = None,
@@ -178,6 +194,13 @@ def create_app(agent,
                     "some endpoints are not available until the agent "
                     "is ready though.")
 
+    def get_tracker(sender_id):
+        # creating a tracker saves it, hence this runs on the lane of the
+        # conversation like the handling of its messages
+        return agent._run_in_lane(sender_id,
+                                  agent.tracker_store.get_or_create_tracker,
+                                  sender_id)
+
     @app.route("/",
                methods=['GET', 'OPTIONS'])
     @cross_origin(origins=cors_origins)
@@ -222,7 +245,7 @@ def create_app(agent,
                                  confidence)
 
             # retrieve tracker and set to requested state
-            tracker = agent.tracker_store.get_or_create_tracker(sender_id)
+            tracker = get_tracker(sender_id)
             state = tracker.current_state(verbosity)
             return jsonify({"tracker": state,
                             "messages": out.messages})
@@ -248,12 +271,17 @@ def create_app(agent,
 
         request_params = request.get_json(force=True)
         evt = Event.from_parameters(request_params)
-        tracker = agent.tracker_store.get_or_create_tracker(sender_id)
         verbosity = event_verbosity_parameter(EventVerbosity.AFTER_RESTART)
 
-        if evt:
+        def append(evt):
+            tracker = agent.tracker_store.get_or_create_tracker(sender_id)
             tracker.update(evt)
             agent.tracker_store.save(tracker)
+            agent.tracker_store.flush()
+            return tracker
+
+        if evt:
+            tracker = agent._run_in_lane(sender_id, append, evt)
             return jsonify(tracker.current_state(verbosity))
         else:
             logger.warning(
@@ -278,8 +306,13 @@ def create_app(agent,
         tracker = DialogueStateTracker.from_dict(sender_id,
                                                  request_params,
                                                  agent.domain.slots)
-        # will override an existing tracker with the same id!
-        agent.tracker_store.save(tracker)
+
+        def replace(tracker):
+            # will override an existing tracker with the same id!
+            agent.tracker_store.save(tracker)
+            agent.tracker_store.flush()
+
+        agent._run_in_lane(sender_id, replace, tracker)
         return jsonify(tracker.current_state(verbosity))
 
     @app.route("/conversations",
@@ -287,11 +320,40 @@ def create_app(agent,
     @cross_origin(origins=cors_origins)
     @requires_auth(app, auth_token)
     def list_trackers():
-        if agent.tracker_store:
-            return jsonify(list(agent.tracker_store.keys()))
-        else:
+        if not agent.tracker_store:
             return jsonify([])
 
+        pagination = ["cursor", "limit", "active_since", "active_until"]
+        if not any(p in request.args for p in pagination):
+            # this is for backwards compatibility
+            return jsonify(list(agent.tracker_store.keys()))
+
+        try:
+            limit = int(request.args.get("limit", 100))
+            if limit < 1:
+                raise ValueError("Limit {} is not positive.".format(limit))
+        except ValueError:
+            return error(400, "InvalidParameter",
+                         "Parameter 'limit' needs to be a positive integer.",
+                         {"parameter": "limit", "in": "query"})
+
+        active_since = utils.float_arg("active_since")
+        active_until = utils.float_arg("active_until")
+        try:
+            sender_ids, next_cursor = agent.tracker_store.list_conversations(
+                request.args.get("cursor") or None,
+                limit,
+                active_since,
+                active_until)
+        except ValueError as e:
+            return error(400, "InvalidParameter",
+                         "Parameter 'cursor' is invalid. {}".format(e),
+                         {"parameter": "cursor", "in": "query"})
+        return jsonify({
+            "conversations": sender_ids,
+            "next_cursor": next_cursor
+        })
+
     @app.route("/conversations/<sender_id>/tracker",
                methods=['GET', 'OPTIONS'])
     @cross_origin(origins=cors_origins)
@@ -321,7 +383,7 @@ def create_app(agent,
         verbosity = event_verbosity_parameter(default_verbosity)
 
         # retrieve tracker and set to requested state
-        tracker = agent.tracker_store.get_or_create_tracker(sender_id)
+        tracker = get_tracker(sender_id)
         if not tracker:
             return error(503,
                          "NoDomain",
@@ -350,7 +412,7 @@ def create_app(agent,
                          "a tracker store when starting the server.")
 
         # retrieve tracker and set to requested state
-        tracker = agent.tracker_store.get_or_create_tracker(sender_id)
+        tracker = get_tracker(sender_id)
         if not tracker:
             return error(503,
                          "NoDomain",
@@ -572,10 +634,16 @@ def create_app(agent,
     @cross_origin(origins=cors_origins)
     @requires_auth(app, auth_token)
     def status():
-        return jsonify({
+        status = {
             "model_fingerprint": agent.fingerprint,
             "is_ready": agent.is_ready()
-        })
+        }
+        if agent.lanes is not None:
+            status["worker_lanes"] = agent.lanes.metrics()
+        if agent.inference_scheduler is not None:
+            status["inference_scheduler"] = (
+                agent.inference_scheduler.metrics())
+        return jsonify(status)
 
     @app.route("/predict",
                methods=['POST', 'OPTIONS'])
@@ -598,19 +666,41 @@ def create_app(agent,
                          "Supplied events are not valid. {}".format(e),
                          {"parameter": "", "in": "body"})
 
-        policy_ensemble = agent.policy_ensemble
-        probabilities, policy = \
-            policy_ensemble.probabilities_using_best_policy(tracker,
-                                                            agent.domain)
+        probabilities, policy = agent.predict_trackers([tracker])[0]
 
-        scores = [{"action": a, "score": p}
-                  for a, p in zip(agent.domain.action_names, probabilities)]
+        return jsonify(_prediction_as_dict(agent.domain, tracker,
+                                           probabilities, policy,
+                                           verbosity))
 
-        return jsonify({
-            "scores": scores,
-            "policy": policy,
-            "tracker": tracker.current_state(verbosity)
-        })
+    @app.route("/predict/batch",
+               methods=['POST', 'OPTIONS'])
+    @requires_auth(app, auth_token)
+    @cross_origin(origins=cors_origins)
+    @ensure_loaded_agent(agent)
+    def tracker_predict_batch():
+        """ Given lists of events, predicts the next action of each."""
+
+        sender_id = UserMessage.DEFAULT_SENDER_ID
+        request_params = request.get_json(force=True)
+        verbosity = event_verbosity_parameter(EventVerbosity.AFTER_RESTART)
+
+        try:
+            trackers = [DialogueStateTracker.from_dict(sender_id,
+                                                       events,
+                                                       agent.domain.slots)
+                        for events in request_params]
+        except Exception as e:
+            return error(400, "InvalidParameter",
+                         "Supplied events are not valid. {}".format(e),
+                         {"parameter": "", "in": "body"})
+
+        predictions = agent.predict_trackers(trackers)
+
+        return jsonify([_prediction_as_dict(agent.domain, tracker,
+                                            probabilities, policy,
+                                            verbosity)
+                        for tracker, (probabilities, policy)
+                        in zip(trackers, predictions)])
 
     @app.route("/parse",
                methods=['POST', 'OPTIONS'])
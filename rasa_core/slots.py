@@ -5,9 +5,26 @@ from rasa_core import utils
 logger = logging.getLogger(__name__)
 
 
-class Slot(object):
+class _SlotType(type):
+    """Registers the subclasses of `Slot` by their type name.
+
+    A metaclass instead of `__init_subclass__`, which needs python 3.6."""
+
+    def __init__(cls, name, bases, namespace):
+        super(_SlotType, cls).__init__(name, bases, namespace)
+        if "_registry" not in namespace:
+            # the first class wins, so subclasses which inherit the type
+            # name of a slot type don't replace it
+            cls._registry.setdefault(cls.type_name, cls)
+
+
+class Slot(object, metaclass=_SlotType):
     type_name = None
 
+    # slot classes by their type name, every subclass (including custom
+    # slot types) is registered by `_SlotType` when it is defined
+    _registry = {}
+
     def __init__(self, name,
                  initial_value=None,
                  value_reset_delay=None,
@@ -63,9 +80,8 @@ class Slot(object):
     @staticmethod
     def resolve_by_type(type_name):
         """Returns a slots class by its type name."""
-        for cls in utils.all_subclasses(Slot):
-            if cls.type_name == type_name:
-                return cls
+        if type_name in Slot._registry:
+            return Slot._registry[type_name]
         try:
             return utils.class_from_module_path(type_name)
         except(ImportError, AttributeError):
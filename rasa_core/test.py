@@ -281,11 +281,11 @@ def _collect_user_uttered_predictions(event,
     return user_uttered_eval_store
 
 
-def _collect_action_executed_predictions(processor, partial_tracker, event,
+def _collect_action_executed_predictions(prediction, partial_tracker, event,
                                          fail_on_prediction_errors):
     action_executed_eval_store = EvaluationStore()
 
-    action, policy, confidence = processor.predict_next_action(partial_tracker)
+    action, policy, confidence = prediction
 
     predicted = action.name()
     gold = event.action_name
@@ -308,24 +308,31 @@ def _collect_action_executed_predictions(processor, partial_tracker, event,
     return action_executed_eval_store, policy, confidence
 
 
-def _predict_tracker_actions(tracker, agent, fail_on_prediction_errors=False,
+def _predict_tracker_actions(tracker, domain, fail_on_prediction_errors=False,
                              use_e2e=False):
-    processor = agent.create_processor()
+    """Replay the story of the tracker.
+
+    Yields the partial tracker whenever the next action needs to be
+    predicted and expects the prediction to be sent back, so that the
+    actions of many stories can be predicted together. Returns the
+    evaluation of the story."""
+
     tracker_eval_store = EvaluationStore()
 
     events = list(tracker.events)
 
     partial_tracker = DialogueStateTracker.from_events(tracker.sender_id,
                                                        events[:1],
-                                                       agent.domain.slots)
+                                                       domain.slots)
 
     tracker_actions = []
 
     for event in events[1:]:
         if isinstance(event, ActionExecuted):
+            prediction = yield partial_tracker
             action_executed_result, policy, confidence = \
                 _collect_action_executed_predictions(
-                    processor, partial_tracker, event,
+                    prediction, partial_tracker, event,
                     fail_on_prediction_errors
                 )
             tracker_eval_store.merge_store(action_executed_result)
@@ -347,6 +354,56 @@ def _predict_tracker_actions(tracker, agent, fail_on_prediction_errors=False,
     return tracker_eval_store, partial_tracker, tracker_actions
 
 
+def _predict_stories_actions(completed_trackers, agent,
+                             fail_on_prediction_errors=False,
+                             use_e2e=False):
+    """Replay all stories side by side.
+
+    The next actions of all stories are predicted in one batch, as the
+    stories don't depend on each other. Returns the evaluation of every
+    story like `_predict_tracker_actions`, errors are raised for the
+    first failing story as if the stories were replayed one by one."""
+
+    from tqdm import tqdm
+
+    processor = agent.create_processor()
+    stories = [_predict_tracker_actions(tracker, agent.domain,
+                                        fail_on_prediction_errors, use_e2e)
+               for tracker in completed_trackers]
+    results = [None] * len(stories)
+    errors = {}
+    # partial trackers of the stories which wait for a prediction
+    pending = {}
+    pbar = tqdm(total=len(stories))
+
+    def replay(idx, prediction):
+        if errors and idx > min(errors):
+            # a previous story already failed
+            return
+        try:
+            pending[idx] = stories[idx].send(prediction)
+        except StopIteration as e:
+            results[idx] = e.value
+            pbar.update(1)
+        except Exception as e:
+            errors[idx] = e
+
+    for i in range(len(stories)):
+        replay(i, None)
+
+    while pending:
+        indices = sorted(pending)
+        predictions = processor.predict_next_action_batch(
+            [pending.pop(i) for i in indices])
+        for i, prediction in zip(indices, predictions):
+            replay(i, prediction)
+
+    pbar.close()
+    if errors:
+        raise errors[min(errors)]
+    return results
+
+
 def _in_training_data_fraction(action_list):
     """Given a list of action items, returns the fraction of actions
 
@@ -369,8 +426,6 @@ def collect_story_predictions(
 ) -> Tuple[StoryEvalution, int]:
     """Test the stories from a file, running them through the stored model."""
 
-    from tqdm import tqdm
-
     story_eval_store = EvaluationStore()
     failed = []
     correct_dialogues = []
@@ -381,11 +436,10 @@ def collect_story_predictions(
 
     action_list = []
 
-    for tracker in tqdm(completed_trackers):
-        tracker_results, predicted_tracker, tracker_actions = \
-            _predict_tracker_actions(tracker, agent,
-                                     fail_on_prediction_errors, use_e2e)
-
+    story_results = _predict_stories_actions(completed_trackers, agent,
+                                             fail_on_prediction_errors,
+                                             use_e2e)
+    for tracker_results, predicted_tracker, tracker_actions in story_results:
         story_eval_store.merge_store(tracker_results)
 
         action_list.extend(tracker_actions)
@@ -1,14 +1,22 @@
+import bisect
+import copy
 import itertools
 
 import json
 import logging
-import pickle
+import threading
+import time
+from collections import OrderedDict
 # noinspection PyPep8Naming
-from typing import Text, Optional, List, KeysView
+from typing import Text, Optional, List, KeysView, Dict, Any, Union, Tuple
 
 from rasa_core.actions.action import ACTION_LISTEN_NAME
 from rasa_core.broker import EventChannel
+from rasa_core.conversation import Dialogue
 from rasa_core.domain import Domain
+from rasa_core.events import Event, deserialise_events
+from rasa_core.exceptions import TrackerConflictError
+from rasa_core.serialisers import DialogueSerialiser, create_serialiser
 from rasa_core.trackers import (
     DialogueStateTracker, ActionExecuted,
     EventVerbosity)
@@ -20,13 +28,38 @@ logger = logging.getLogger(__name__)
 class TrackerStore(object):
     def __init__(self,
                  domain: Optional[Domain],
-                 event_broker: Optional[EventChannel] = None) -> None:
+                 event_broker: Optional[EventChannel] = None,
+                 serialiser: Union[Text, DialogueSerialiser, None] = None
+                 ) -> None:
         self.domain = domain
         self.event_broker = event_broker
+        self.serialiser = create_serialiser(serialiser)
         self.max_event_history = None
+        # number of events after which a new snapshot of the trackers
+        # state is stored, `None` disables snapshots
+        self.snapshot_interval = None
 
     @staticmethod
     def find_tracker_store(domain, store=None, event_broker=None):
+        # the cache has to see the results of the deferred writes, hence
+        # it is wrapped by the write behind store
+        if store is not None and store.kwargs.get("write_behind"):
+            store = copy.deepcopy(store)
+            del store.kwargs["write_behind"]
+            max_delay = store.kwargs.pop("write_behind_max_delay", None)
+            tracker_store = TrackerStore.find_tracker_store(domain, store,
+                                                            event_broker)
+            return WriteBehindTrackerStore(tracker_store, max_delay)
+
+        if store is not None and store.kwargs.get("cache"):
+            store = copy.deepcopy(store)
+            del store.kwargs["cache"]
+            max_events = store.kwargs.pop("cache_max_events", 100000)
+            ttl = store.kwargs.pop("cache_ttl", None)
+            tracker_store = TrackerStore.find_tracker_store(domain, store,
+                                                            event_broker)
+            return CachedTrackerStore(tracker_store, max_events, ttl)
+
         if store is None or store.type is None:
             return InMemoryTrackerStore(domain, event_broker=event_broker)
         elif store.type == 'redis':
@@ -89,16 +122,114 @@ class TrackerStore(object):
     def save(self, tracker):
         raise NotImplementedError()
 
+    def save_many(self,
+                  trackers: List[DialogueStateTracker],
+                  expected_versions: Optional[Dict[Text, int]] = None
+                  ) -> None:
+        """Store multiple trackers at once.
+
+        If `expected_versions` are passed, a tracker is only saved if the
+        stored version of its conversation is still the expected one. A
+        `TrackerConflictError` naming the conversations which were not
+        saved is raised after the other trackers were saved.
+
+        Stores which can write several trackers in a single round trip
+        or check the versions atomically should override this."""
+
+        expected_versions = expected_versions or {}
+        conflicts = []
+        for tracker in trackers:
+            expected = expected_versions.get(tracker.sender_id)
+            if (expected is not None and
+                    expected != self.get_version(tracker.sender_id)):
+                conflicts.append(tracker.sender_id)
+            else:
+                self.save(tracker)
+
+        if conflicts:
+            raise TrackerConflictError(conflicts)
+
     def retrieve(self, sender_id: Text) -> Optional[DialogueStateTracker]:
         raise NotImplementedError()
 
-    def stream_events(self, tracker: DialogueStateTracker) -> None:
-        old_tracker = self.retrieve(tracker.sender_id)
-        offset = len(old_tracker.events) if old_tracker else 0
+    def retrieve_with_version(self, sender_id: Text
+                              ) -> Tuple[Optional[DialogueStateTracker],
+                                         Optional[int]]:
+        """Retrieve the tracker together with the version of the
+        conversation.
+
+        The version is read first, hence it is never newer than the
+        returned tracker."""
+
+        version = self.get_version(sender_id)
+        return self.retrieve(sender_id), version
+
+    def get_version(self, sender_id: Text) -> Optional[int]:
+        """Return the version of the stored conversation.
+
+        The version is increased by one with every save of the tracker and
+        is `0` for unknown conversations. Stores which don't keep track of
+        versions return `None`."""
+        return None
+
+    def end_request(self) -> None:
+        """Called by the processor once it finished handling a request.
+
+        Stores which defer the saving of trackers can use this to
+        persist them."""
+        pass
+
+    def flush(self) -> None:
+        """Write all deferred saves of trackers.
+
+        Called after trackers were saved outside of the processor and when
+        the agent shuts down."""
+        pass
+
+    def stream_events(self,
+                      tracker: DialogueStateTracker,
+                      offset: Optional[int] = None) -> None:
+        """Publish the events which are not yet stored to the event broker.
+
+        If ``offset`` is not given, the number of already stored events is
+        determined by retrieving the stored tracker."""
+
+        self.publish_events(tracker.sender_id,
+                            self.events_to_stream(tracker, offset))
+
+    def events_to_stream(self,
+                         tracker: DialogueStateTracker,
+                         offset: Optional[int] = None) -> List[Event]:
+        """Events which are not yet stored and have to be published to the
+        event broker once they are, see `stream_events`."""
+
+        if not self.event_broker:
+            return []
+        if offset is None:
+            old_tracker = self.retrieve(tracker.sender_id)
+            offset = len(old_tracker.events) if old_tracker else 0
         evts = tracker.events
-        for evt in list(itertools.islice(evts, offset, len(evts))):
+        return list(itertools.islice(evts, offset, len(evts)))
+
+    def new_events_to_stream(self,
+                             tracker: DialogueStateTracker,
+                             num_stored: int) -> List[Event]:
+        """Events which are not yet stored and have to be published to the
+        event broker once they are.
+
+        `num_stored` is the number of stored events of the conversation,
+        see `events_since`."""
+
+        num_new = min(max(tracker.num_events - num_stored, 0),
+                      len(tracker.events))
+        return self.events_to_stream(tracker, len(tracker.events) - num_new)
+
+    def publish_events(self, sender_id: Text, events: List[Event]) -> None:
+        """Publish stored events of a conversation to the event broker."""
+
+        for evt in events:
             body = {
-                "sender_id": tracker.sender_id,
+                "sender_id": sender_id,
             }
             body.update(evt.as_dict())
             self.event_broker.publish(body)
@@ -107,31 +238,169 @@ class TrackerStore(object):
         # type: () -> Optional[List[Text]]
         raise NotImplementedError()
 
+    def list_conversations(self,
+                           cursor: Optional[Text] = None,
+                           limit: int = 100,
+                           active_since: Optional[float] = None,
+                           active_until: Optional[float] = None
+                           ) -> Tuple[List[Text], Optional[Text]]:
+        """Return a page of the sender ids of the stored conversations.
+
+        Returns the sender ids together with the cursor of the next page,
+        which is `None` for the last page. `active_since` and
+        `active_until` filter the conversations by the time of their
+        latest event. Raises a `ValueError` if the `limit` is not positive
+        or the `cursor` wasn't returned by this store.
+
+        This implementation sorts all `keys()`, stores should override it
+        with a listing which doesn't need to load all sender ids."""
+
+        self._check_limit(limit)
+        sender_ids = sorted(str(k) for k in self.keys() or [])
+        if cursor is not None:
+            sender_ids = sender_ids[bisect.bisect_right(sender_ids, cursor):]
+
+        page = []
+        for i, sender_id in enumerate(sender_ids):
+            if (active_since is not None or active_until is not None) and \
+                    not self._in_time_range(
+                        self.latest_event_time(sender_id),
+                        active_since, active_until):
+                continue
+
+            page.append(sender_id)
+            if len(page) >= limit:
+                has_more = i + 1 < len(sender_ids)
+                return page, sender_id if has_more else None
+        return page, None
+
     @staticmethod
-    def serialise_tracker(tracker):
+    def _check_limit(limit: int) -> None:
+        if limit < 1:
+            raise ValueError("The number of conversations per page has to "
+                             "be positive, got {}.".format(limit))
+
+    def latest_event_time(self, sender_id: Text) -> Optional[float]:
+        """Return the timestamp of the latest event of the conversation."""
+
+        tracker = self.retrieve(sender_id)
+        if tracker and tracker.events:
+            return tracker.events[-1].timestamp
+        return None
+
+    @staticmethod
+    def _in_time_range(timestamp: Optional[float],
+                       since: Optional[float],
+                       until: Optional[float]) -> bool:
+        if timestamp is None:
+            return False
+        return ((since is None or timestamp >= since) and
+                (until is None or timestamp < until))
+
+    def serialise_tracker(self, tracker):
         dialogue = tracker.as_dialogue()
-        return pickle.dumps(dialogue)
+        return self.serialiser.dumps(dialogue)
 
     def deserialise_tracker(self, sender_id, _json):
-        dialogue = pickle.loads(_json)
+        dialogue = self.serialiser.loads(_json)
         tracker = self.init_tracker(sender_id)
         tracker.recreate_from_dialogue(dialogue)
         return tracker
 
+    @staticmethod
+    def serialise_event(event: Event) -> Text:
+        return json.dumps(event.as_dict())
+
+    def tracker_from_events(self,
+                            sender_id: Text,
+                            events: List[Event],
+                            snapshot: Optional[Dict[Text, Any]] = None,
+                            event_offset: int = 0
+                            ) -> Optional[DialogueStateTracker]:
+        """Recreate a tracker from a list of stored events.
+
+        If a snapshot is passed, `events` are the events logged after the
+        snapshot. Otherwise `event_offset` is the number of events of the
+        conversation which were logged before `events`."""
+
+        tracker = self.init_tracker(sender_id)
+        if not tracker:
+            return None
+
+        if snapshot:
+            tracker.recreate_from_snapshot(snapshot, events)
+        else:
+            tracker.recreate_from_dialogue(Dialogue(sender_id, events))
+            # noinspection PyProtectedMember
+            tracker._num_previous_events = event_offset
+        return tracker
+
+    def should_snapshot(self, stored_events: int, num_events: int) -> bool:
+        """Check if a snapshot is due after storing `num_events` events."""
+
+        if not self.snapshot_interval:
+            return False
+        return (num_events // self.snapshot_interval >
+                stored_events // self.snapshot_interval)
+
+    @staticmethod
+    def events_since(tracker: DialogueStateTracker,
+                     num_stored: int) -> Optional[List[Event]]:
+        """Return the events of the tracker which are not stored yet.
+
+        `num_stored` is the number of events which are stored for the
+        conversation, including the ones which were compacted. Returns
+        `None` if the stored events can not be extended by appending the
+        new ones, e.g. because the tracker dropped some of its new events
+        due to its `max_event_history` or because other events were stored
+        since the tracker was retrieved. In this case the stored events
+        need to be rewritten."""
+
+        evts = tracker.events
+        num_new = tracker.num_events - num_stored
+        if num_new < 0 or num_new > len(evts):
+            return None
+        return list(itertools.islice(evts, len(evts) - num_new, len(evts)))
+
+    def create_snapshot(self,
+                        tracker: DialogueStateTracker) -> Dict[Text, Any]:
+        """Snapshot of the tracker including the states of its history."""
+
+        if self.domain is not None:
+            # the states are stored in the snapshot, so they don't have to
+            # be generated from the events before the snapshot again
+            tracker.past_states(self.domain)
+        return tracker.as_snapshot()
+
 
 class InMemoryTrackerStore(TrackerStore):
     def __init__(self,
                  domain: Domain,
-                 event_broker: Optional[EventChannel] = None
+                 event_broker: Optional[EventChannel] = None,
+                 serialiser: Union[Text, DialogueSerialiser, None] = None
                  ) -> None:
         self.store = {}
-        super(InMemoryTrackerStore, self).__init__(domain, event_broker)
+        self.versions = {}
+        self.latest_event_times = {}
+        super(InMemoryTrackerStore, self).__init__(domain, event_broker,
+                                                   serialiser)
 
     def save(self, tracker: DialogueStateTracker) -> None:
         if self.event_broker:
             self.stream_events(tracker)
-        serialised = InMemoryTrackerStore.serialise_tracker(tracker)
+        serialised = self.serialise_tracker(tracker)
         self.store[tracker.sender_id] = serialised
+        self.versions[tracker.sender_id] = self.get_version(
+            tracker.sender_id) + 1
+        if tracker.events:
+            self.latest_event_times[tracker.sender_id] = \
+                tracker.events[-1].timestamp
+
+    def get_version(self, sender_id: Text) -> int:
+        return self.versions.get(sender_id, 0)
+
+    def latest_event_time(self, sender_id: Text) -> Optional[float]:
+        return self.latest_event_times.get(sender_id)
 
     def retrieve(self, sender_id: Text) -> Optional[DialogueStateTracker]:
         if sender_id in self.store:
@@ -148,35 +417,478 @@ class InMemoryTrackerStore(TrackerStore):
 
 
 class RedisTrackerStore(TrackerStore):
-    def keys(self):
-        pass
-
     def __init__(self, domain, host='localhost',
                  port=6379, db=0, password=None, event_broker=None,
-                 record_exp=None):
+                 record_exp=None, append_only=False, snapshot_interval=None,
+                 serialiser=None, key_prefix="", sliding_expiration=False,
+                 compaction_horizon=None, compaction_interval=None):
 
         import redis
         self.red = redis.StrictRedis(host=host, port=port, db=db,
                                      password=password)
         self.record_exp = record_exp
-        super(RedisTrackerStore, self).__init__(domain, event_broker)
+        # if set, the events of a conversation are stored as a redis list
+        # and a save only appends the events which are not yet stored
+        self.append_only = append_only
+        # prepended to all keys, allows to share a redis with others
+        self.key_prefix = key_prefix
+        # if set, reading a conversation resets its expiration as well
+        self.sliding_expiration = sliding_expiration
+        # events older than this number of seconds are compacted into
+        # the base snapshot of an append only event log
+        self.compaction_horizon = compaction_horizon
+        self._compaction_timer = None
+        super(RedisTrackerStore, self).__init__(domain, event_broker,
+                                                serialiser)
+        # snapshots are only stored next to an append only event log
+        self.snapshot_interval = snapshot_interval if append_only else None
+
+        if compaction_interval and compaction_horizon and append_only:
+            self.start_compaction(compaction_interval)
+
+    # suffixes of the keys stored next to the tracker key of a conversation
+    _KEY_SUFFIXES = ("events", "snapshot", "base", "offset", "version",
+                     "activity")
+
+    def _key(self, sender_id: Text, suffix: Optional[Text] = None) -> Text:
+        key = "{}{}".format(self.key_prefix, sender_id)
+        return "{}:{}".format(key, suffix) if suffix else key
+
+    def tracker_key(self, sender_id: Text) -> Text:
+        return self._key(sender_id)
+
+    def event_log_key(self, sender_id: Text) -> Text:
+        return self._key(sender_id, "events")
+
+    def snapshot_key(self, sender_id: Text) -> Text:
+        return self._key(sender_id, "snapshot")
+
+    def base_snapshot_key(self, sender_id: Text) -> Text:
+        """State of the conversation before the first event of the log."""
+        return self._key(sender_id, "base")
+
+    def event_offset_key(self, sender_id: Text) -> Text:
+        """Number of events of the conversation before the first event of
+        the log."""
+        return self._key(sender_id, "offset")
+
+    def version_key(self, sender_id: Text) -> Text:
+        return self._key(sender_id, "version")
+
+    def activity_key(self, sender_id: Text) -> Text:
+        return self._key(sender_id, "activity")
+
+    def _conversation_keys(self, sender_id: Text) -> List[Text]:
+        if self.append_only:
+            keys = [self.event_log_key(sender_id),
+                    self.snapshot_key(sender_id),
+                    self.base_snapshot_key(sender_id),
+                    self.event_offset_key(sender_id)]
+        else:
+            keys = [self.tracker_key(sender_id)]
+        return keys + [self.version_key(sender_id),
+                       self.activity_key(sender_id)]
+
+    def _expire(self, sender_id, pipe, timeout):
+        for key in self._conversation_keys(sender_id):
+            pipe.expire(key, timeout)
+
+    def get_version(self, sender_id: Text) -> int:
+        return int(self.red.get(self.version_key(sender_id)) or 0)
+
+    def latest_event_time(self, sender_id: Text) -> Optional[float]:
+        stored = self.red.get(self.activity_key(sender_id))
+        return float(stored) if stored is not None else None
+
+    def keys(self):
+        return self._sender_ids_from_keys(
+            list(self.red.scan_iter(match=self._key("*"))))
+
+    def list_conversations(self,
+                           cursor=None,
+                           limit=100,
+                           active_since=None,
+                           active_until=None):
+        """List the conversations using `SCAN` over the keys of the store.
+
+        As `SCAN` returns the keys in batches, a page might contain a few
+        more than `limit` sender ids."""
+
+        self._check_limit(limit)
+        try:
+            scan_cursor = int(cursor or 0)
+        except ValueError:
+            raise ValueError("Invalid cursor '{}'.".format(cursor))
+        sender_ids = []
+        while True:
+            scan_cursor, keys = self.red.scan(scan_cursor,
+                                              match=self._key("*"),
+                                              count=limit)
+            found = self._sender_ids_from_keys(keys)
+            if active_since is not None or active_until is not None:
+                found = self._filter_by_activity(found, active_since,
+                                                 active_until)
+            sender_ids.extend(found)
+
+            if scan_cursor == 0:
+                return sender_ids, None
+            elif len(sender_ids) >= limit:
+                return sender_ids, str(scan_cursor)
+
+    def _filter_by_activity(self, sender_ids, since, until):
+        if not sender_ids:
+            return []
+        stored = self.red.mget([self.activity_key(s) for s in sender_ids])
+        return [s for s, t in zip(sender_ids, stored)
+                if t is not None and
+                self._in_time_range(float(t), since, until)]
+
+    def _sender_ids_from_keys(self, keys):
+        """Return the sender ids of the conversations among the `keys`.
+
+        Every conversation is found by its version key, except the ones
+        which were stored before versions were introduced. These only have
+        a tracker key and are listed if there is no version key next to
+        it and the key holds a serialised dialogue, so keys of other
+        applications sharing the database aren't listed."""
+
+        sender_ids = []
+        legacy = []
+        for key in keys:
+            if isinstance(key, bytes):
+                key = key.decode("utf-8")
+            key = key[len(self.key_prefix):]
+            sender_id, _, suffix = key.rpartition(":")
+            if sender_id and suffix == "version":
+                sender_ids.append(sender_id)
+            elif not sender_id or suffix not in self._KEY_SUFFIXES:
+                legacy.append(key)
+
+        if legacy:
+            pipe = self.red.pipeline()
+            for sender_id in legacy:
+                pipe.exists(self.version_key(sender_id))
+                pipe.type(self.tracker_key(sender_id))
+            stored = pipe.execute()
+            unversioned = [s for s, versioned, key_type
+                           in zip(legacy, stored[::2], stored[1::2])
+                           if not versioned and key_type in (b"string",
+                                                             "string")]
+            if unversioned:
+                dumped = self.red.mget([self.tracker_key(s)
+                                        for s in unversioned])
+                sender_ids.extend(s for s, d in zip(unversioned, dumped)
+                                  if self._is_dialogue(d))
+        return sender_ids
+
+    def _is_dialogue(self, dumped):
+        if dumped is None:
+            return False
+        try:
+            return isinstance(self.serialiser.loads(dumped), Dialogue)
+        except Exception:
+            return False
 
     def save(self, tracker, timeout=None):
-        if self.event_broker:
-            self.stream_events(tracker)
+        self.save_many([tracker], timeout=timeout)
+
+    def save_many(self, trackers, expected_versions=None, timeout=None):
+        """Store multiple trackers using a single redis pipeline.
+
+        If `expected_versions` are passed, the versions of the
+        conversations are watched and the trackers are written in a
+        transaction."""
 
         if not timeout and self.record_exp:
             timeout = self.record_exp
 
-        serialised_tracker = self.serialise_tracker(tracker)
-        self.red.set(tracker.sender_id, serialised_tracker, ex=timeout)
+        if expected_versions:
+            self._save_if_unchanged(trackers, timeout, expected_versions)
+        else:
+            pipe = self.red.pipeline()
+            to_stream = self._queue_writes(trackers, pipe, timeout)
+            pipe.execute()
+            self._publish_written(to_stream)
+
+    def _save_if_unchanged(self, trackers, timeout, expected_versions):
+        from redis import WatchError
+
+        keys = [self.version_key(t.sender_id) for t in trackers]
+        with self.red.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(*keys)
+                    versions = [int(v or 0) for v in pipe.mget(keys)]
+                    conflicts = [
+                        t.sender_id for t, v in zip(trackers, versions)
+                        if expected_versions.get(t.sender_id, v) != v]
+                    unchanged = [t for t in trackers
+                                 if t.sender_id not in conflicts]
+
+                    pipe.multi()
+                    to_stream = self._queue_writes(unchanged, pipe, timeout)
+                    pipe.execute()
+                    break
+                except WatchError:
+                    # a conversation changed after its version was checked
+                    continue
+
+        # only published once, after the events were actually written
+        self._publish_written(to_stream)
+        if conflicts:
+            raise TrackerConflictError(conflicts)
+
+    def _queue_writes(self, trackers, pipe, timeout=None):
+        """Queue the writes of the trackers on the pipeline.
+
+        Returns the events to publish to the event broker once the writes
+        were executed."""
+
+        to_stream = []
+        if self.append_only:
+            # changes of the event logs also change the watched versions,
+            # hence the offsets can be read outside of a transaction
+            offsets = self.red.pipeline(transaction=False)
+            for tracker in trackers:
+                offsets.llen(self.event_log_key(tracker.sender_id))
+                offsets.get(self.event_offset_key(tracker.sender_id))
+
+            stored = offsets.execute()
+            for tracker, num_logged, log_offset in zip(trackers, stored[::2],
+                                                       stored[1::2]):
+                evts = self._append_events(tracker, num_logged,
+                                           int(log_offset or 0), pipe)
+                to_stream.append((tracker.sender_id, evts))
+        else:
+            for tracker in trackers:
+                to_stream.append((tracker.sender_id,
+                                  self.events_to_stream(tracker)))
+
+                serialised_tracker = self.serialise_tracker(tracker)
+                pipe.set(self.tracker_key(tracker.sender_id),
+                         serialised_tracker)
+
+        for tracker in trackers:
+            self._update_metadata(tracker, pipe)
+            if timeout:
+                self._expire(tracker.sender_id, pipe, timeout)
+        return to_stream
+
+    def _publish_written(self, to_stream):
+        for sender_id, evts in to_stream:
+            self.publish_events(sender_id, evts)
+
+    def _update_metadata(self, tracker, pipe):
+        """Increase the version and store the time of the latest event."""
+
+        pipe.incr(self.version_key(tracker.sender_id))
+        if tracker.events:
+            pipe.set(self.activity_key(tracker.sender_id),
+                     tracker.events[-1].timestamp)
+
+    def _append_events(self, tracker, num_logged, log_offset, pipe):
+        """Queue the writes which append the new events to the log.
+
+        The log holds the events of the conversation after the first
+        `log_offset` ones, which were compacted. Returns the events to
+        publish to the event broker."""
+
+        num_stored = log_offset + num_logged
+        to_stream = self.new_events_to_stream(tracker, num_stored)
+
+        key = self.event_log_key(tracker.sender_id)
+        snapshot_key = self.snapshot_key(tracker.sender_id)
+        new_events = self.events_since(tracker, num_stored)
+
+        if new_events is None:
+            # stored events can't be extended, rewrite the whole log and
+            # keep the state of the dropped events in a snapshot
+            log_offset = tracker.num_events - len(tracker.events)
+            pipe.delete(key, self.base_snapshot_key(tracker.sender_id))
+            pipe.set(self.event_offset_key(tracker.sender_id), log_offset)
+            pipe.set(snapshot_key, json.dumps(self.create_snapshot(tracker)))
+            new_events = list(tracker.events)
+        elif self.should_snapshot(num_stored, tracker.num_events):
+            pipe.set(snapshot_key, json.dumps(self.create_snapshot(tracker)))
+        if new_events:
+            pipe.rpush(key, *[self.serialise_event(e) for e in new_events])
+        return to_stream
 
     def retrieve(self, sender_id):
-        stored = self.red.get(sender_id)
+        return self.retrieve_with_version(sender_id)[0]
+
+    def retrieve_with_version(self, sender_id):
+        if self.append_only:
+            return self._retrieve_from_log(sender_id)
+
+        pipe = self.red.pipeline()
+        pipe.get(self.version_key(sender_id))
+        pipe.get(self.tracker_key(sender_id))
+        if self.record_exp and self.sliding_expiration:
+            self._expire(sender_id, pipe, self.record_exp)
+
+        version, stored = pipe.execute()[:2]
+        version = int(version or 0)
         if stored is not None:
-            return self.deserialise_tracker(sender_id, stored)
+            return self.deserialise_tracker(sender_id, stored), version
         else:
-            return None
+            return None, version
+
+    def _retrieve_from_log(self, sender_id):
+        """Recreate the tracker from its latest snapshot and the events
+        which were logged after it.
+
+        The snapshot is read first to find the events after it, the
+        version of the conversation is watched so both are consistent."""
+        from redis import WatchError
+
+        version_key = self.version_key(sender_id)
+        with self.red.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(version_key)
+                    version, snapshot, base, log_offset = pipe.mget(
+                        version_key,
+                        self.snapshot_key(sender_id),
+                        self.base_snapshot_key(sender_id),
+                        self.event_offset_key(sender_id))
+
+                    # the latest snapshot is always taken after the base
+                    snapshot = snapshot if snapshot is not None else base
+                    if snapshot is not None:
+                        snapshot = json.loads(snapshot.decode("utf-8"))
+                    log_offset = int(log_offset or 0)
+                    first = (snapshot["event_offset"] - log_offset
+                             if snapshot else 0)
+
+                    pipe.multi()
+                    pipe.lrange(self.event_log_key(sender_id), first, -1)
+                    if self.record_exp and self.sliding_expiration:
+                        self._expire(sender_id, pipe, self.record_exp)
+                    stored = pipe.execute()[0]
+                    break
+                except WatchError:
+                    # the conversation changed while it was read
+                    continue
+
+        version = int(version or 0)
+        if not stored and snapshot is None:
+            return None, version
+        evts = self._deserialise_log(stored)
+        return self.tracker_from_events(sender_id, evts, snapshot,
+                                        log_offset), version
+
+    @staticmethod
+    def _deserialise_log(stored):
+        return deserialise_events([json.loads(e.decode("utf-8"))
+                                   for e in stored])
+
+    def start_compaction(self, interval: float) -> None:
+        """Compact the event logs every `interval` seconds."""
+
+        def run():
+            try:
+                self.compact()
+            except Exception as e:
+                logger.exception("Failed to compact the event logs: "
+                                 "{}".format(e))
+            self.start_compaction(interval)
+
+        self._compaction_timer = threading.Timer(interval, run)
+        self._compaction_timer.daemon = True
+        self._compaction_timer.start()
+
+    def stop_compaction(self) -> None:
+        if self._compaction_timer is not None:
+            self._compaction_timer.cancel()
+            self._compaction_timer = None
+
+    def compact(self, horizon: Optional[float] = None) -> int:
+        """Move the events older than `horizon` seconds into snapshots.
+
+        The state of the conversation before the remaining events is kept
+        in the base snapshot of the conversation, so the trackers keep
+        their state but only the recent events. The latest event of a
+        conversation is always kept. Returns the number of compacted
+        conversations."""
+
+        if not self.append_only:
+            logger.warning("Only append only event logs can be compacted.")
+            return 0
+
+        horizon = horizon if horizon is not None else self.compaction_horizon
+        if horizon is None:
+            raise ValueError("No compaction horizon configured.")
+
+        threshold = time.time() - horizon
+        num_compacted = 0
+        for sender_id in self.keys():
+            if self._compact_conversation(sender_id, threshold):
+                num_compacted += 1
+        logger.debug("Compacted the event logs of {} conversations."
+                     "".format(num_compacted))
+        return num_compacted
+
+    def _compact_conversation(self, sender_id, threshold):
+        from redis import WatchError
+
+        key = self.event_log_key(sender_id)
+        snapshot_key = self.snapshot_key(sender_id)
+        base_key = self.base_snapshot_key(sender_id)
+        offset_key = self.event_offset_key(sender_id)
+        with self.red.pipeline() as pipe:
+            try:
+                # every change of the conversation changes its version
+                pipe.watch(self.version_key(sender_id))
+                stored = pipe.lrange(key, 0, -1)
+                snapshot, base, log_offset = pipe.mget(snapshot_key,
+                                                       base_key, offset_key)
+                log_offset = int(log_offset or 0)
+                evts = self._deserialise_log(stored)
+
+                num_old = 0
+                while (num_old < len(evts) - 1 and
+                       evts[num_old].timestamp < threshold):
+                    num_old += 1
+                if not num_old:
+                    return False
+
+                # number of events before the remaining ones
+                num_compacted = log_offset + num_old
+                if snapshot is not None:
+                    snapshot = json.loads(snapshot.decode("utf-8"))
+                if base is not None:
+                    base = json.loads(base.decode("utf-8"))
+                # state after the old events
+                if snapshot and snapshot["event_offset"] <= num_compacted:
+                    state = snapshot
+                elif base or not log_offset:
+                    state = base
+                else:
+                    # the state before the log is unknown, e.g. because
+                    # the log was rewritten after the latest snapshot
+                    return False
+                first = state["event_offset"] - log_offset if state else 0
+                tracker = self.tracker_from_events(sender_id,
+                                                   evts[first:num_old], state)
+                if tracker is None:
+                    return False
+                new_base = self.create_snapshot(tracker)
+
+                pipe.multi()
+                pipe.ltrim(key, num_old, -1)
+                pipe.set(base_key, json.dumps(new_base))
+                pipe.set(offset_key, num_compacted)
+                if snapshot and snapshot["event_offset"] <= num_compacted:
+                    pipe.delete(snapshot_key)
+                pipe.incr(self.version_key(sender_id))
+                if self.record_exp:
+                    self._expire(sender_id, pipe, self.record_exp)
+                pipe.execute()
+                return True
+            except WatchError:
+                # the conversation changed, it is compacted the next time
+                return False
 
 
 class MongoTrackerStore(TrackerStore):
@@ -188,7 +900,9 @@ class MongoTrackerStore(TrackerStore):
                  password=None,
                  auth_source="admin",
                  collection="conversations",
-                 event_broker=None):
+                 event_broker=None,
+                 append_only=False,
+                 snapshot_interval=None):
         from pymongo.database import Database
         from pymongo import MongoClient
 
@@ -201,7 +915,12 @@ class MongoTrackerStore(TrackerStore):
 
         self.db = Database(self.client, db)
         self.collection = collection
+        # if set, a save only pushes the events which are not yet stored
+        # instead of replacing the complete list of events
+        self.append_only = append_only
         super(MongoTrackerStore, self).__init__(domain, event_broker)
+        # snapshots are only stored next to an append only event log
+        self.snapshot_interval = snapshot_interval if append_only else None
 
         self._ensure_indices()
 
@@ -213,18 +932,133 @@ class MongoTrackerStore(TrackerStore):
         self.conversations.create_index("sender_id")
 
     def save(self, tracker, timeout=None):
-        if self.event_broker:
-            self.stream_events(tracker)
+        self.save_many([tracker])
+
+    def save_many(self, trackers, expected_versions=None):
+        """Store multiple trackers using a single bulk write.
+
+        If `expected_versions` are passed, every tracker is stored with
+        an update which only matches the expected version instead."""
+        from pymongo import UpdateOne
+
+        if self.append_only:
+            offsets = self._number_of_stored_events(
+                [t.sender_id for t in trackers])
+        else:
+            offsets = {}
+
+        updates = []
+        conflicts = []
+        # events to publish to the event broker once they are written
+        to_stream = []
+        for tracker in trackers:
+            update, evts = self._update(tracker,
+                                        *offsets.get(tracker.sender_id,
+                                                     (0, 0)))
+            if expected_versions and tracker.sender_id in expected_versions:
+                expected = expected_versions[tracker.sender_id]
+                if self._update_if_unchanged(tracker.sender_id, update,
+                                             expected):
+                    self.publish_events(tracker.sender_id, evts)
+                else:
+                    conflicts.append(tracker.sender_id)
+            else:
+                updates.append(UpdateOne({"sender_id": tracker.sender_id},
+                                         update,
+                                         upsert=True))
+                to_stream.append((tracker.sender_id, evts))
+
+        if updates:
+            self.conversations.bulk_write(updates)
+        for sender_id, evts in to_stream:
+            self.publish_events(sender_id, evts)
+        if conflicts:
+            raise TrackerConflictError(conflicts)
+
+    def _update(self, tracker, num_logged, log_offset):
+        """Create the update of the conversation's document and return it
+        together with the events to publish to the event broker."""
+
+        if self.append_only:
+            update = self._append_events(tracker, num_logged, log_offset)
+            to_stream = self.new_events_to_stream(tracker,
+                                                  log_offset + num_logged)
+        else:
+            to_stream = self.events_to_stream(tracker)
+            state = tracker.current_state(EventVerbosity.ALL)
+            update = {"$set": state}
+        update["$inc"] = {"version": 1}
+        return update, to_stream
+
+    def _update_if_unchanged(self, sender_id, update, expected_version):
+        if expected_version == 0:
+            # conditional updates can't upsert, create the document first
+            self.conversations.update_one(
+                {"sender_id": sender_id},
+                {"$setOnInsert": {"version": 0}},
+                upsert=True)
+            # documents stored before versions were introduced have none
+            version = {"$in": [0, None]}
+        else:
+            version = expected_version
 
-        state = tracker.current_state(EventVerbosity.ALL)
+        result = self.conversations.update_one(
+            {"sender_id": sender_id, "version": version}, update)
+        return result.matched_count == 1
 
-        self.conversations.update_one(
-            {"sender_id": tracker.sender_id},
-            {"$set": state},
-            upsert=True)
+    def get_version(self, sender_id: Text) -> int:
+        stored = self.conversations.find_one({"sender_id": sender_id},
+                                             {"version": 1})
+        return stored.get("version", 0) if stored else 0
+
+    def _number_of_stored_events(self,
+                                 sender_ids: List[Text]
+                                 ) -> Dict[Text, Tuple[int, int]]:
+        """Number of stored events and the `event_offset` of the
+        conversations."""
+
+        result = self.conversations.aggregate([
+            {"$match": {"sender_id": {"$in": sender_ids}}},
+            {"$project": {"sender_id": 1,
+                          "num_events": {
+                              "$size": {"$ifNull": ["$events", []]}},
+                          "event_offset": {
+                              "$ifNull": ["$event_offset", 0]}}}
+        ])
+        return {r["sender_id"]: (r["num_events"], r["event_offset"])
+                for r in result}
+
+    def _append_events(self, tracker, num_logged, log_offset):
+        """Create the update which stores the events which are not stored
+        yet. The stored events follow the first `log_offset` events of the
+        conversation."""
+
+        num_stored = log_offset + num_logged
+        state = tracker.current_state(EventVerbosity.NONE)
+        del state["events"]
+        update = {"$set": state}
+
+        new_events = self.events_since(tracker, num_stored)
+        if new_events is None:
+            # stored events can't be extended, rewrite all of them and
+            # keep the state of the dropped events in a snapshot
+            log_offset = tracker.num_events - len(tracker.events)
+            state["events"] = [e.as_dict() for e in tracker.events]
+            state["event_offset"] = log_offset
+            state["snapshot"] = self.create_snapshot(tracker)
+        else:
+            if new_events:
+                update["$push"] = {
+                    "events": {"$each": [e.as_dict() for e in new_events]}}
+            if self.should_snapshot(num_stored, tracker.num_events):
+                state["snapshot"] = self.create_snapshot(tracker)
+        return update
 
     def retrieve(self, sender_id):
-        stored = self.conversations.find_one({"sender_id": sender_id})
+        return self.retrieve_with_version(sender_id)[0]
+
+    def retrieve_with_version(self, sender_id):
+        stored = self._find_conversation(sender_id)
 
         # look for conversations which have used an `int` sender_id in the past
         # and update them.
@@ -234,19 +1068,588 @@ class MongoTrackerStore(TrackerStore):
                 {"sender_id": int(sender_id)},
                 {"$set": {"sender_id": str(sender_id)}},
                 return_document=ReturnDocument.AFTER)
+            if stored is not None and self.append_only:
+                stored = self._find_conversation(sender_id)
 
         if stored is not None:
-            if self.domain:
+            version = stored.get("version", 0)
+            if self.domain and stored.get("snapshot"):
+                evts = deserialise_events(stored.get("events", []))
+                return self.tracker_from_events(
+                    sender_id, evts, stored["snapshot"],
+                    stored.get("event_offset", 0)), version
+            elif self.domain:
                 return DialogueStateTracker.from_dict(sender_id,
-                                                      stored.get("events"),
-                                                      self.domain.slots)
+                                                      stored.get("events",
+                                                                 []),
+                                                      self.domain.slots
+                                                      ), version
             else:
                 logger.warning("Can't recreate tracker from mongo storage "
                                "because no domain is set. Returning `None` "
                                "instead.")
-                return None
+                return None, version
         else:
-            return None
+            return None, 0
+
+    def _find_conversation(self, sender_id):
+        """Find the document of the conversation.
+
+        Of an append only event log only the events after the latest
+        snapshot are loaded."""
+
+        if not self.append_only:
+            return self.conversations.find_one({"sender_id": sender_id})
+
+        events = {"$ifNull": ["$events", []]}
+        log_offset = {"$ifNull": ["$event_offset", 0]}
+        # index of the first event after the snapshot within the log
+        first = {"$subtract": [
+            {"$ifNull": ["$snapshot.event_offset", log_offset]}, log_offset]}
+        result = self.conversations.aggregate([
+            {"$match": {"sender_id": sender_id}},
+            {"$limit": 1},
+            {"$project": {
+                "sender_id": 1, "version": 1, "snapshot": 1,
+                "event_offset": 1,
+                # `$slice` needs a positive number of events to return
+                "events": {"$slice": [events, first,
+                                      {"$max": [{"$size": events}, 1]}]}}}
+        ])
+        return next(result, None)
+
+    def keys(self):
+        return [c["sender_id"]
+                for c in self.conversations.find({}, {"sender_id": 1})]
+
+    def list_conversations(self,
+                           cursor=None,
+                           limit=100,
+                           active_since=None,
+                           active_until=None):
+        """List the conversations ordered by the id of their documents.
+
+        The cursor is the id of the last document of the previous page."""
+        from bson import ObjectId
+        from bson.errors import InvalidId
+
+        self._check_limit(limit)
+        query = {}
+        if cursor is not None:
+            try:
+                query["_id"] = {"$gt": ObjectId(cursor)}
+            except (InvalidId, TypeError):
+                raise ValueError("Invalid cursor '{}'.".format(cursor))
+        time_range = {}
+        if active_since is not None:
+            time_range["$gte"] = active_since
+        if active_until is not None:
+            time_range["$lt"] = active_until
+        if time_range:
+            query["latest_event_time"] = time_range
+
+        stored = self.conversations.find(query, {"sender_id": 1})
+        stored = list(stored.sort("_id", 1).limit(limit + 1))
+        page = stored[:limit]
+        has_more = page and len(stored) > limit
+        next_cursor = str(page[-1]["_id"]) if has_more else None
+        return [str(c["sender_id"]) for c in page], next_cursor
+
+    def latest_event_time(self, sender_id):
+        stored = self.conversations.find_one({"sender_id": sender_id},
+                                             {"latest_event_time": 1})
+        return stored.get("latest_event_time") if stored else None
+
+
+class WriteBehindTrackerStore(TrackerStore):
+    """Defers and coalesces the saves of another tracker store.
+
+    Saving a tracker only remembers its latest state. The pending trackers
+    are written to the wrapped store in one batch, either when the
+    processor finished the current request (`max_delay` is `None`) or
+    at most `max_delay` seconds after the first deferred save.
+
+    Saves with `expected_versions` are deferred as well, the versions are
+    checked by the wrapped store when the trackers are written. Until
+    then a pending tracker is returned with the version it will have after
+    its write, so further saves based on it are coalesced with it."""
+
+    def __init__(self,
+                 tracker_store: TrackerStore,
+                 max_delay: Optional[float] = None
+                 ) -> None:
+        self.tracker_store = tracker_store
+        self.max_delay = max_delay
+        # sender id -> (tracker, version expected in the wrapped store)
+        self._pending = {}
+        # sender ids saved by the request handled in the current thread
+        self._request = threading.local()
+        self._lock = threading.RLock()
+        self._timer = None
+        super(WriteBehindTrackerStore, self).__init__(tracker_store.domain)
+
+    @property
+    def domain(self):
+        return self.tracker_store.domain
+
+    @domain.setter
+    def domain(self, domain):
+        self.tracker_store.domain = domain
+
+    def save(self, tracker: DialogueStateTracker) -> None:
+        self.save_many([tracker])
+
+    def save_many(self,
+                  trackers: List[DialogueStateTracker],
+                  expected_versions: Optional[Dict[Text, int]] = None
+                  ) -> None:
+        expected_versions = expected_versions or {}
+        conflicts = []
+        with self._lock:
+            for tracker in trackers:
+                sender_id = tracker.sender_id
+                expected = expected_versions.get(sender_id)
+                pending = self._pending.get(sender_id)
+                if expected is not None and pending is not None:
+                    if pending[1] is None or expected != pending[1] + 1:
+                        # the tracker wasn't based on the pending one
+                        conflicts.append(sender_id)
+                        continue
+                    # the version is checked once both saves are written
+                    expected = pending[1]
+
+                self._pending[sender_id] = (frozen_copy(tracker), expected)
+                self._saved_in_request().add(sender_id)
+
+            if self.max_delay is not None and self._timer is None:
+                self._timer = threading.Timer(self.max_delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+        if conflicts:
+            raise TrackerConflictError(conflicts)
+
+    def _saved_in_request(self) -> set:
+        if not hasattr(self._request, "sender_ids"):
+            self._request.sender_ids = set()
+        return self._request.sender_ids
+
+    def retrieve(self, sender_id: Text) -> Optional[DialogueStateTracker]:
+        with self._lock:
+            pending = self._pending.get(sender_id)
+            if pending is not None:
+                # make sure we read our own writes
+                return frozen_copy(pending[0])
+        return self.tracker_store.retrieve(sender_id)
+
+    def retrieve_with_version(self, sender_id: Text
+                              ) -> Tuple[Optional[DialogueStateTracker],
+                                         Optional[int]]:
+        with self._lock:
+            pending = self._pending.get(sender_id)
+            if pending is not None and pending[1] is not None:
+                return frozen_copy(pending[0]), pending[1] + 1
+            # the version after an unconditional save is only known
+            # once it was written
+            self._write_pending(sender_id)
+            return self.tracker_store.retrieve_with_version(sender_id)
+
+    def get_version(self, sender_id: Text) -> Optional[int]:
+        with self._lock:
+            pending = self._pending.get(sender_id)
+            if pending is not None and pending[1] is not None:
+                return pending[1] + 1
+            self._write_pending(sender_id)
+            return self.tracker_store.get_version(sender_id)
+
+    def _write_pending(self, sender_id: Text) -> None:
+        if sender_id in self._pending:
+            self._write([sender_id])
+
+    def end_request(self) -> None:
+        """Write the trackers saved during the request if there is no
+        `max_delay`.
+
+        Raises a `TrackerConflictError` if the conversations of some of
+        them changed since they were retrieved."""
+
+        sender_ids = self._saved_in_request()
+        self._request.sender_ids = set()
+        if self.max_delay is None and sender_ids:
+            with self._lock:
+                self._write([s for s in sender_ids if s in self._pending])
+
+    def flush(self) -> None:
+        """Write all pending trackers to the wrapped tracker store."""
+
+        self._request.sender_ids = set()
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            try:
+                self._write(list(self._pending))
+            except TrackerConflictError as e:
+                # the requests which saved these trackers are finished,
+                # nobody is left to apply their events to the latest trackers
+                logger.warning("Dropped the deferred saves of the "
+                               "conversations {} because they were changed "
+                               "concurrently.".format(e.sender_ids))
+
+    def _write(self, sender_ids: List[Text]) -> None:
+        pending = [self._pending.pop(s) for s in sender_ids]
+        if not pending:
+            return
+
+        logger.debug("Writing {} deferred trackers.".format(len(pending)))
+        trackers = [tracker for tracker, _ in pending]
+        expected_versions = {tracker.sender_id: version
+                             for tracker, version in pending
+                             if version is not None}
+        if expected_versions:
+            self.tracker_store.save_many(
+                trackers, expected_versions=expected_versions)
+        else:
+            self.tracker_store.save_many(trackers)
+
+    def keys(self):
+        self.flush()
+        return self.tracker_store.keys()
+
+    def list_conversations(self,
+                           cursor: Optional[Text] = None,
+                           limit: int = 100,
+                           active_since: Optional[float] = None,
+                           active_until: Optional[float] = None
+                           ) -> Tuple[List[Text], Optional[Text]]:
+        self.flush()
+        return self.tracker_store.list_conversations(cursor, limit,
+                                                     active_since,
+                                                     active_until)
+
+    def latest_event_time(self, sender_id: Text) -> Optional[float]:
+        with self._lock:
+            pending = self._pending.get(sender_id)
+            if pending is not None and pending[0].events:
+                return pending[0].events[-1].timestamp
+        return self.tracker_store.latest_event_time(sender_id)
+
+
+class CachedTrackerStore(TrackerStore):
+    """Keeps recently used trackers of another tracker store in memory.
+
+    The cache is a LRU cache bounded by the total number of events of the
+    cached trackers. Before a cached tracker is returned, its version is
+    compared with the version in the wrapped store, so changes made by
+    other processes are never hidden by the cache. If the wrapped store
+    doesn't support versions, cached trackers are only dropped once their
+    `ttl` (in seconds) expired."""
+
+    def __init__(self,
+                 tracker_store: TrackerStore,
+                 max_events: int = 100000,
+                 ttl: Optional[float] = None
+                 ) -> None:
+        self.tracker_store = tracker_store
+        self.max_events = max_events
+        self.ttl = ttl
+        # sender id -> (tracker, version, expiration time)
+        self._cache = OrderedDict()
+        self._num_events = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        super(CachedTrackerStore, self).__init__(tracker_store.domain)
+
+    @property
+    def domain(self):
+        return self.tracker_store.domain
+
+    @domain.setter
+    def domain(self, domain):
+        self.tracker_store.domain = domain
+
+    def retrieve(self, sender_id: Text) -> Optional[DialogueStateTracker]:
+        return self.retrieve_with_version(sender_id)[0]
+
+    def retrieve_with_version(self, sender_id: Text
+                              ) -> Tuple[Optional[DialogueStateTracker],
+                                         Optional[int]]:
+        with self._lock:
+            cached = self._cache.get(sender_id)
+
+        if cached is not None:
+            tracker, version, expires = cached
+            if ((expires is None or time.time() < expires) and
+                    version == self.tracker_store.get_version(sender_id)):
+                with self._lock:
+                    if sender_id in self._cache:
+                        self._cache.move_to_end(sender_id)
+                    self.hits += 1
+                return (frozen_copy(tracker) if tracker else None), version
+
+        # the version is never newer than the tracker: if the conversation
+        # changes in between, the tracker is reloaded on the next retrieval
+        tracker, version = self.tracker_store.retrieve_with_version(sender_id)
+        with self._lock:
+            self.misses += 1
+            self._add(sender_id, tracker, version)
+        return tracker, version
+
+    def save(self, tracker: DialogueStateTracker) -> None:
+        self.save_many([tracker])
+
+    def save_many(self,
+                  trackers: List[DialogueStateTracker],
+                  expected_versions: Optional[Dict[Text, int]] = None
+                  ) -> None:
+        with self._lock:
+            versions = {t.sender_id: self._cache[t.sender_id][1]
+                        for t in trackers if t.sender_id in self._cache}
+        if expected_versions:
+            versions.update(expected_versions)
+
+        conflict = None
+        try:
+            if expected_versions:
+                self.tracker_store.save_many(
+                    trackers, expected_versions=expected_versions)
+            else:
+                self.tracker_store.save_many(trackers)
+        except TrackerConflictError as e:
+            conflict = e
+
+        with self._lock:
+            for tracker in trackers:
+                if (tracker.sender_id not in versions or
+                        conflict and tracker.sender_id in conflict.sender_ids):
+                    self._remove(tracker.sender_id)
+                    continue
+                version = versions[tracker.sender_id]
+                # if nobody else saved the tracker in the meantime,
+                # our save was the only change of the version
+                if version is not None:
+                    version += 1
+                self._add(tracker.sender_id, tracker, version)
+
+        if conflict:
+            raise conflict
+
+    def get_version(self, sender_id: Text) -> Optional[int]:
+        return self.tracker_store.get_version(sender_id)
+
+    def end_request(self) -> None:
+        self.tracker_store.end_request()
+
+    def flush(self) -> None:
+        self.tracker_store.flush()
 
     def keys(self):
-        return [c["sender_id"] for c in self.conversations.find()]
+        return self.tracker_store.keys()
+
+    def list_conversations(self,
+                           cursor: Optional[Text] = None,
+                           limit: int = 100,
+                           active_since: Optional[float] = None,
+                           active_until: Optional[float] = None
+                           ) -> Tuple[List[Text], Optional[Text]]:
+        return self.tracker_store.list_conversations(cursor, limit,
+                                                     active_since,
+                                                     active_until)
+
+    def latest_event_time(self, sender_id: Text) -> Optional[float]:
+        return self.tracker_store.latest_event_time(sender_id)
+
+    def _add(self,
+             sender_id: Text,
+             tracker: Optional[DialogueStateTracker],
+             version: Optional[int]) -> None:
+        self._remove(sender_id)
+        if version is None and not self.ttl:
+            # without versions and ttl the tracker could never be updated
+            return
+
+        expires = time.time() + self.ttl if self.ttl else None
+        tracker = frozen_copy(tracker) if tracker else None
+        self._cache[sender_id] = (tracker, version, expires)
+        self._num_events += self._size(tracker)
+
+        while self._num_events > self.max_events and len(self._cache) > 1:
+            evicted, (evicted_tracker, _, _) = self._cache.popitem(last=False)
+            self._num_events -= self._size(evicted_tracker)
+            self.evictions += 1
+            logger.debug("Evicted tracker '{}' from the cache."
+                         "".format(evicted))
+
+    def _remove(self, sender_id: Text) -> None:
+        cached = self._cache.pop(sender_id, None)
+        if cached is not None:
+            self._num_events -= self._size(cached[0])
+
+    @staticmethod
+    def _size(tracker: Optional[DialogueStateTracker]) -> int:
+        # unknown conversations are cached as well and count as one event
+        return max(len(tracker.events), 1) if tracker else 1
+
+
+def frozen_copy(tracker: DialogueStateTracker) -> DialogueStateTracker:
+    """Copy the tracker so later updates don't change the copied state."""
+
+    frozen = tracker.copy()
+    frozen.sender_id = tracker.sender_id
+    if tracker._past_states is not None:
+        frozen._past_states = tracker._past_states.copy()
+    return frozen
+
+
+class TrackerSession(object):
+    """Request scoped unit of work on top of a tracker store.
+
+    Within a session every tracker is retrieved from the store at most
+    once. Saving a tracker only marks it as modified, all modified
+    trackers are written in one batch when the session is committed.
+    Used as a context manager, the session is committed if the block
+    succeeds and rolled back if it raises.
+
+    If the store keeps track of versions, a tracker is only written if
+    its conversation didn't change since it was retrieved. Otherwise the
+    events added during this session are applied to the latest stored
+    tracker and the save is retried, so no events of concurrently handled
+    messages get lost."""
+
+    def __init__(self,
+                 tracker_store: TrackerStore,
+                 max_retries: int = 3
+                 ) -> None:
+        self.tracker_store = tracker_store
+        self.max_retries = max_retries
+        self._trackers = {}
+        self._modified = []
+        # versions of the conversations when they were retrieved
+        self._versions = {}
+        # number of events appended to every tracker when it was
+        # retrieved, all events after them were added during this session
+        self._event_offsets = {}
+        # counters to verify how often the store was accessed
+        self.num_retrieves = 0
+        self.num_saves = 0
+        self.num_conflicts = 0
+
+    def get_or_create_tracker(self,
+                              sender_id: Text
+                              ) -> Optional[DialogueStateTracker]:
+        if sender_id in self._trackers:
+            return self._trackers[sender_id]
+
+        tracker, version = self.tracker_store.retrieve_with_version(sender_id)
+        self.num_retrieves += 1
+        if tracker is None:
+            tracker = self.tracker_store.init_tracker(sender_id)
+            if tracker:
+                tracker.update(ActionExecuted(ACTION_LISTEN_NAME))
+                self.save(tracker)
+
+        self._track(sender_id, tracker, version)
+        return tracker
+
+    def __enter__(self) -> 'TrackerSession':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+
+    def save(self, tracker: DialogueStateTracker) -> None:
+        """Mark the tracker to be written when the session is committed."""
+
+        self._trackers[tracker.sender_id] = tracker
+        if tracker.sender_id not in self._modified:
+            self._modified.append(tracker.sender_id)
+
+    def commit(self) -> None:
+        """Write all modified trackers and finish the request."""
+
+        trackers = [self._trackers[s] for s in self._modified]
+        self._modified = []
+        self._save(trackers)
+        self.num_saves += len(trackers)
+
+    def rollback(self) -> None:
+        """Discard the changes made to the trackers of this session.
+
+        Trackers are retrieved again from the store when they are used
+        the next time."""
+
+        self._trackers = {}
+        self._modified = []
+        self._versions = {}
+        self._event_offsets = {}
+
+    def _save(self, trackers: List[DialogueStateTracker]) -> None:
+        for attempt in itertools.count():
+            expected_versions = {t.sender_id: self._versions[t.sender_id]
+                                 for t in trackers
+                                 if t.sender_id in self._versions}
+            try:
+                if expected_versions:
+                    self.tracker_store.save_many(
+                        trackers, expected_versions=expected_versions)
+                elif trackers:
+                    self.tracker_store.save_many(trackers)
+                # stores which defer the saves check the versions when
+                # the request ends
+                self.tracker_store.end_request()
+                return
+            except TrackerConflictError as e:
+                if attempt >= self.max_retries:
+                    logger.warning("Failed to save the conversations {} "
+                                   "after {} retries."
+                                   "".format(e.sender_ids, attempt))
+                    raise
+
+                self.num_conflicts += 1
+                logger.debug("Conversations {} were changed concurrently, "
+                             "retrying to save them.".format(e.sender_ids))
+                trackers = [self._rebase(t) for t in trackers
+                            if t.sender_id in e.sender_ids]
+
+    def _track(self,
+               sender_id: Text,
+               tracker: Optional[DialogueStateTracker],
+               version: Optional[int]) -> None:
+        self._trackers[sender_id] = tracker
+        if version is not None:
+            self._versions[sender_id] = version
+        # unlike the length of the events, the number of appended events
+        # keeps growing if the tracker has a `max_event_history`
+        self._event_offsets[sender_id] = (tracker.events.num_appended
+                                          if tracker else 0)
+
+    def _rebase(self, tracker: DialogueStateTracker) -> DialogueStateTracker:
+        """Apply the events added during this session to the latest
+        stored tracker of the conversation."""
+
+        sender_id = tracker.sender_id
+        new_events = self.new_events(tracker)
+        latest, version = self.tracker_store.retrieve_with_version(sender_id)
+        if latest is None:
+            latest = self.tracker_store.init_tracker(sender_id)
+
+        self._track(sender_id, latest, version)
+        for e in new_events:
+            latest.update(e)
+        return latest
+
+    def new_events(self, tracker: DialogueStateTracker) -> List[Event]:
+        """Events which were added to the tracker during this session."""
+
+        evts = tracker.events
+        num_new = (evts.num_appended -
+                   self._event_offsets.get(tracker.sender_id, 0))
+        # new events which were already dropped because of the
+        # `max_event_history` can't be applied anymore
+        num_new = min(max(num_new, 0), len(evts))
+        return list(evts[len(evts) - num_new:]) if num_new else []
@@ -3,6 +3,7 @@ from collections import deque
 
 import copy
 import io
+import itertools
 import logging
 from enum import Enum
 from typing import Generator, Dict, Text, Any, Optional, Iterator, Type
@@ -16,6 +17,7 @@ from rasa_core.events import (
     Event, SlotSet, Restarted, ActionReverted, UserUtteranceReverted,
     BotUttered, Form)
 from rasa_core.slots import Slot
+from rasa_core.utils import PersistentDeque
 
 logger = logging.getLogger(__name__)
 
@@ -87,6 +89,22 @@ class DialogueStateTracker(object):
         self._max_event_history = max_event_history
         # list of previously seen events
         self.events = self._create_events([])
+        # number of events of the conversation before the ones the tracker
+        # was created with, e.g. because a tracker store compacted them
+        self._num_previous_events = 0
+        # state before the first of the events if the tracker was
+        # recreated from a snapshot, see `recreate_from_snapshot`
+        self._snapshot = None  # type: Optional[Dict[Text, Any]]
+        # events which were not reverted, maintained incrementally for the
+        # events added since `applied_events` was called the last time
+        self._applied_events = []
+        self._indexed_events = None
+        self._num_indexed_events = 0
+        self._last_indexed_event = None
+        # states of the applied events, generated when they are needed
+        self._past_states = None  # type: Optional[PastStates]
+        # states persisted in the snapshot the tracker was recreated from
+        self._stored_past_states = None
         # id of the source of the messages
         self.sender_id = sender_id
         # slots that can be filled in this domain
@@ -125,15 +143,11 @@ class DialogueStateTracker(object):
         else:
             evts = None
 
-        latest_event_time = None
-        if len(self.events) > 0:
-            latest_event_time = self.events[-1].timestamp
-
         return {
             "sender_id": self.sender_id,
             "slots": self.current_slot_values(),
             "latest_message": self.latest_message.parse_data,
-            "latest_event_time": latest_event_time,
+            "latest_event_time": self._latest_event_time(),
             "followup_action": self.followup_action,
             "paused": self.is_paused(),
             "events": evts,
@@ -142,11 +156,60 @@ class DialogueStateTracker(object):
             "latest_action_name": self.latest_action_name
         }
 
-    def past_states(self, domain: 'Domain') -> deque:
-        """Generate the past states of this tracker based on the history."""
-
-        generated_states = domain.states_for_tracker_history(self)
-        return deque((frozenset(s.items()) for s in generated_states))
+    @property
+    def slots(self) -> Dict[Text, Slot]:
+        """Slots that can be filled in this domain by their name."""
+
+        if self._slots_shared:
+            # the slots are shared with a copy of this tracker, hence they
+            # are copied before they might get changed
+            self._slots = _copy_slots(self._slots)
+            self._slots_shared = False
+        return self._slots
+
+    @slots.setter
+    def slots(self, slots: Dict[Text, Slot]) -> None:
+        self._slots = slots
+        self._slots_shared = False
+
+    def past_states(self,
+                    domain: 'Domain',
+                    max_history: Optional[int] = None) -> deque:
+        """Generate the past states of this tracker based on the history.
+
+        The states are cached, only the states of the events which were
+        applied since the last call are generated. If `max_history` is set,
+        only the latest `max_history` states are returned."""
+
+        return deque(self._updated_past_states(domain).latest(max_history))
+
+    def _updated_past_states(self, domain: 'Domain') -> 'PastStates':
+        applied_events = self._index_applied_events()
+        past_states = self._past_states
+        if (past_states is None or
+                not past_states.is_valid_for(applied_events, domain)):
+            past_states = (self._restore_past_states(applied_events, domain) or
+                           PastStates(self, domain))
+            self._past_states = past_states
+
+        past_states.update(applied_events)
+        return past_states
+
+    def _restore_past_states(self,
+                             applied_events: List[Event],
+                             domain: 'Domain') -> Optional['PastStates']:
+        """Restore the states of the snapshot the tracker was recreated
+        from, the applied events are the ones after the snapshot.
+
+        The stored states are kept, so they can be restored again if the
+        applied events change, e.g. when the latest user message is
+        reverted."""
+
+        stored = self._stored_past_states
+        if (stored is None or stored["fingerprint"] != domain.fingerprint or
+                self._base_snapshot() is None):
+            return None
+        return PastStates.from_dict(stored, self, domain)
 
     def change_form_to(self, form_name: Text) -> None:
         """Activate or deactivate a form"""
@@ -248,6 +311,9 @@ class DialogueStateTracker(object):
         the trackers before each action."""
 
         tracker = self.init_copy()
+        snapshot = self._base_snapshot()
+        if snapshot is not None:
+            tracker._restore_snapshot(snapshot)
 
         ignored_trackers = []
         latest_message = tracker.latest_message
@@ -310,39 +376,105 @@ class DialogueStateTracker(object):
                 yield tr
             yield tracker
 
+    def _base_snapshot(self) -> Optional[Dict[Text, Any]]:
+        """Return the snapshot of the state before the first event.
+
+        `None` if the tracker wasn't recreated from a snapshot or if the
+        conversation was restarted since then."""
+
+        if self._snapshot is None or any(isinstance(e, Restarted)
+                                         for e in self.events):
+            return None
+        return self._snapshot
+
+    def _latest_event_time(self) -> Optional[float]:
+        if len(self.events) > 0:
+            return self.events[-1].timestamp
+        elif self._snapshot is not None:
+            return self._snapshot.get("latest_event_time")
+        return None
+
+    @property
+    def num_events(self) -> int:
+        """Number of events which were logged for the conversation.
+
+        Unlike `len(tracker.events)` this includes the events which are
+        not part of `events`, e.g. because of the `max_event_history`."""
+
+        return self._num_previous_events + self.events.num_appended
+
     def applied_events(self) -> List[Event]:
         """Returns all actions that should be applied - w/o reverted events."""
 
-        def undo_till_previous(event_type, done_events):
-            """Removes events from `done_events` until `event_type` is
-               found."""
-            # list gets modified - hence we need to copy events!
-            for e in reversed(done_events[:]):
-                del done_events[-1]
-                if isinstance(e, event_type):
-                    break
+        return list(self._index_applied_events())
 
-        applied_events = []
-        for event in self.events:
-            if isinstance(event, Restarted):
-                applied_events = []
-            elif isinstance(event, ActionReverted):
-                undo_till_previous(ActionExecuted, applied_events)
-            elif isinstance(event, UserUtteranceReverted):
-                # Seeing a user uttered event automatically implies there was
-                # a listen event right before it, so we'll first rewind the
-                # user utterance, then get the action right before it (the
-                # listen action).
-                undo_till_previous(UserUttered, applied_events)
-                undo_till_previous(ActionExecuted, applied_events)
-            else:
-                applied_events.append(event)
-        return applied_events
+    def _index_applied_events(self) -> List[Event]:
+        """Bring the applied events up to date with the logged events.
+
+        Only the events which were appended since the last call are
+        processed. If the logged events were replaced or changed in any
+        other way (e.g. the oldest event got dropped because of the
+        `max_event_history`) all events are processed again.
+
+        The returned list is updated in place, don't modify it."""
+
+        evts = self.events
+        num_indexed = self._num_indexed_events
+        if (evts is not self._indexed_events or
+                num_indexed > len(evts) or
+                num_indexed and
+                evts[num_indexed - 1] is not self._last_indexed_event):
+            self._applied_events = []
+            num_indexed = 0
+
+        if isinstance(evts, PersistentDeque):
+            # slicing only walks the new events
+            new_events = evts[num_indexed:]
+        else:
+            new_events = itertools.islice(evts, num_indexed, None)
+        for event in new_events:
+            self._index_event(event)
+
+        self._indexed_events = evts
+        self._num_indexed_events = len(evts)
+        self._last_indexed_event = evts[-1] if evts else None
+        return self._applied_events
+
+    def _index_event(self, event: Event) -> None:
+        applied_events = self._applied_events
+        if isinstance(event, Restarted):
+            del applied_events[:]
+        elif isinstance(event, ActionReverted):
+            self._undo_till_previous(ActionExecuted, applied_events)
+        elif isinstance(event, UserUtteranceReverted):
+            # Seeing a user uttered event automatically implies there was
+            # a listen event right before it, so we'll first rewind the
+            # user utterance, then get the action right before it (the
+            # listen action).
+            self._undo_till_previous(UserUttered, applied_events)
+            self._undo_till_previous(ActionExecuted, applied_events)
+        else:
+            applied_events.append(event)
+
+    @staticmethod
+    def _undo_till_previous(event_type: Type[Event],
+                            done_events: List[Event]) -> None:
+        """Removes events from `done_events` until `event_type` is found."""
+
+        while done_events:
+            if isinstance(done_events.pop(), event_type):
+                break
 
     def replay_events(self):
         # type: () -> None
-        """Update the tracker based on a list of events."""
+        """Update the tracker based on a list of events.
 
+        If the tracker was recreated from a snapshot, the events are
+        replayed on top of the state of the snapshot."""
+
+        snapshot = self._base_snapshot()
+        if snapshot is not None:
+            self._restore_snapshot(snapshot)
         applied_events = self.applied_events()
         for event in applied_events:
             event.apply_to(self)
@@ -359,12 +491,91 @@ class DialogueStateTracker(object):
                              "Have you deserialized it?".format(dialogue))
 
         self._reset()
+        self._snapshot = None
         self.events.extend(dialogue.events)
         self.replay_events()
 
+    def as_snapshot(self) -> Dict[Text, Any]:
+        """Return the current state of the tracker as a snapshot.
+
+        Together with the events logged after the snapshot was taken, the
+        snapshot can be used to recreate the tracker without replaying the
+        events which happened before it."""
+
+        snapshot = {
+            "event_offset": self.num_events,
+            "latest_event_time": self._latest_event_time(),
+            "slots": self.current_slot_values(),
+            "latest_message": self.latest_message.as_dict(),
+            "latest_bot_utterance": self.latest_bot_utterance.as_dict(),
+            "latest_action_name": self.latest_action_name,
+            "followup_action": self.followup_action,
+            "paused": self._paused,
+            "active_form": self.active_form
+        }
+
+        # the generated states are kept, so they don't have to be generated
+        # again for the events before the snapshot
+        past_states = self._past_states
+        applied_events = self._index_applied_events()
+        if (past_states is not None and self._max_event_history is None and
+                past_states.is_valid_for(applied_events, past_states.domain)):
+            past_states.update(applied_events)
+            snapshot["past_states"] = past_states.as_dict()
+        return snapshot
+
+    def recreate_from_snapshot(self,
+                               snapshot: Dict[Text, Any],
+                               evts: List[Event]) -> None:
+        """Use a snapshot and the events after it to update the trackers
+        state.
+
+        The state before the events is taken from the snapshot, so the
+        tracker only contains the events following the snapshot's
+        ``event_offset``. ``num_events`` still counts all events of the
+        conversation."""
+
+        self._reset()
+        self.events.clear()
+        self._num_previous_events = snapshot["event_offset"]
+        self._snapshot = snapshot
+        self._restore_snapshot(snapshot)
+        self._stored_past_states = snapshot.get("past_states")
+
+        for event in evts:
+            self.update(event)
+
+    def _restore_snapshot(self, snapshot: Dict[Text, Any]) -> None:
+        for key, value in snapshot["slots"].items():
+            if key in self.slots:
+                self.slots[key].value = value
+        self.latest_message = UserUttered._from_parameters(
+            snapshot["latest_message"])
+        self.latest_bot_utterance = BotUttered._from_parameters(
+            snapshot["latest_bot_utterance"])
+        self.latest_action_name = snapshot["latest_action_name"]
+        self.followup_action = snapshot["followup_action"]
+        self._paused = snapshot["paused"]
+        self.active_form = copy.deepcopy(snapshot["active_form"])
+
     def copy(self):
-        """Creates a duplicate of this tracker"""
-        return self.travel_back_in_time(float("inf"))
+        """Creates a duplicate of this tracker.
+
+        The events are not replayed, the copy shares the logged events
+        with this tracker. The slots are shared as well until one of the
+        trackers accesses them. Hence copying is O(1) no matter how long
+        the conversation is."""
+        from rasa_core.channels import UserMessage
+
+        copied = copy.copy(self)
+        copied.sender_id = UserMessage.DEFAULT_SENDER_ID
+        copied.events = self.events.copy()
+        copied.active_form = copy.deepcopy(self.active_form)
+        self._slots_shared = True
+        copied._slots_shared = True
+        # the states are cached for the events of this tracker
+        copied._past_states = None
+        return copied
 
     def travel_back_in_time(self,
                             target_time: float) -> 'DialogueStateTracker':
@@ -393,6 +604,21 @@ class DialogueStateTracker(object):
 
         return Dialogue(self.sender_id, list(self.events))
 
+    def compact_events(self, strip_intent_ranking: bool = False) -> None:
+        """Reduce the memory used by the user messages of the tracker.
+
+        See ``UserUttered.compact``. The messages which are still needed to
+        create the current state of the conversation are kept as they are.
+        """
+
+        in_use = {id(self.latest_message)}
+        if self._past_states is not None:
+            in_use.add(id(self._past_states.latest_message))
+
+        for event in self.events:
+            if isinstance(event, UserUttered) and id(event) not in in_use:
+                event.compact(strip_intent_ranking)
+
     def update(self, event: Event) -> None:
         """Modify the state of the tracker according to an ``Event``. """
         if not isinstance(event, Event):  # pragma: no cover
@@ -443,7 +669,8 @@ class DialogueStateTracker(object):
 
             return has_instance and not excluded
 
-        filtered = filter(filter_function, reversed(self.applied_events()))
+        filtered = filter(filter_function,
+                          reversed(self._index_applied_events()))
         for i in range(skip):
             next(filtered, None)
 
@@ -500,11 +727,11 @@ class DialogueStateTracker(object):
                          "added all your slots to your domain file."
                          "".format(key))
 
-    def _create_events(self, evts: List[Event]) -> deque:
+    def _create_events(self, evts: List[Event]) -> PersistentDeque:
 
         if evts and not isinstance(evts[0], Event):  # pragma: no cover
             raise ValueError("events, if given, must be a list of events")
-        return deque(evts, self._max_event_history)
+        return PersistentDeque(evts, self._max_event_history)
 
     def __eq__(self, other):
         if isinstance(self, type(other)):
@@ -540,3 +767,177 @@ class DialogueStateTracker(object):
         new_slots = [SlotSet(e["entity"], e["value"]) for e in entities if
                      e["entity"] in self.slots.keys()]
         return new_slots
+
+
+class PastStates(object):
+    """States of the history of a tracker which are extended incrementally.
+
+    The applied events of the tracker are replayed in the same way as in
+    `DialogueStateTracker.generate_all_prior_trackers`. The replayed
+    tracker and the generated states are kept, hence only the states of
+    events which were applied after the last update have to be generated.
+    """
+
+    def __init__(self,
+                 tracker: DialogueStateTracker,
+                 domain: 'Domain') -> None:
+        self.domain = domain
+        # tracker the applied events are replayed on, starting from the
+        # state before the first event of the tracker
+        self.tracker = tracker.init_copy()
+        snapshot = tracker._base_snapshot()
+        if snapshot is not None:
+            self.tracker._restore_snapshot(snapshot)
+        # latest user message before the active form
+        self.latest_message = self.tracker.latest_message
+        # states which stay in the history whatever happens next
+        self.states = PersistentDeque()
+        # states during an active form, these are only part of the history
+        # if the form rejects its execution
+        self.form_states = []
+        self.num_applied = 0
+        self.last_applied = None
+
+    def is_valid_for(self,
+                     applied_events: List[Event],
+                     domain: 'Domain') -> bool:
+        """Check that the replayed events are the start of `applied_events`.
+        """
+
+        num_applied = self.num_applied
+        return (domain is self.domain and
+                num_applied <= len(applied_events) and
+                (not num_applied or
+                 applied_events[num_applied - 1] is self.last_applied))
+
+    def update(self, applied_events: List[Event]) -> None:
+        """Generate the states for the events which weren't replayed yet."""
+
+        for i in range(self.num_applied, len(applied_events)):
+            self._replay(applied_events[i])
+
+        self.num_applied = len(applied_events)
+        if applied_events:
+            self.last_applied = applied_events[-1]
+
+    def latest(self, max_history: Optional[int] = None) -> List[frozenset]:
+        """States of the history including the current state."""
+
+        tracker = self.tracker
+        if tracker.active_form.get('name') is None:
+            current = [self._state()]
+        elif tracker.active_form.get('rejected'):
+            current = self.form_states + [self._state()]
+        else:
+            current = []
+
+        if max_history is None:
+            return list(self.states) + current
+        elif max_history <= 0:
+            return []
+        else:
+            return (self.states[-max_history:] + current)[-max_history:]
+
+    def _state(self, latest_message: Optional[UserUttered] = None
+               ) -> frozenset:
+        tracker = self.tracker
+        if latest_message is None:
+            return frozenset(self.domain.get_active_states(tracker).items())
+
+        current_message = tracker.latest_message
+        tracker.latest_message = latest_message
+        try:
+            return frozenset(self.domain.get_active_states(tracker).items())
+        finally:
+            tracker.latest_message = current_message
+
+    def _replay(self, event: Event) -> None:
+        tracker = self.tracker
+        form = tracker.active_form.get('name')
+
+        if isinstance(event, UserUttered):
+            if form is None:
+                # store latest user message before the form
+                self.latest_message = event
+
+        elif isinstance(event, Form):
+            # form got either activated or deactivated, so override
+            # tracker's latest message
+            tracker.latest_message = self.latest_message
+
+        elif isinstance(event, ActionExecuted):
+            if form is None:
+                self.states.append(self._state())
+
+            elif tracker.active_form.get('rejected'):
+                self.states.extend(self.form_states)
+                self.form_states = []
+
+                if (not tracker.active_form.get('validate') or
+                        event.action_name != form):
+                    # persist latest user message
+                    # that was rejected by the form
+                    self.latest_message = tracker.latest_message
+                else:
+                    # form was called with validation, so
+                    # override tracker's latest message
+                    tracker.latest_message = self.latest_message
+
+                self.states.append(self._state())
+
+            elif event.action_name != form:
+                # it is not known whether the form will be
+                # successfully executed, so store the state for later
+                self.form_states.append(self._state(self.latest_message))
+
+            if event.action_name == form:
+                # the form was successfully executed, so
+                # remove all stored states
+                self.form_states = []
+
+        # the replayed tracker doesn't need to log the events
+        event.apply_to(tracker)
+
+    def copy(self) -> 'PastStates':
+        """Copy the states so later updates don't change the copied ones."""
+
+        copied = copy.copy(self)
+        copied.tracker = self.tracker.copy()
+        copied.states = self.states.copy()
+        copied.form_states = list(self.form_states)
+        return copied
+
+    def as_dict(self) -> Dict[Text, Any]:
+        snapshot = self.tracker.as_snapshot()
+        snapshot["event_offset"] = 0
+        return {
+            "fingerprint": self.domain.fingerprint,
+            "tracker": snapshot,
+            "latest_message": self.latest_message.as_dict(),
+            "states": [sorted(s) for s in self.states],
+            "form_states": [sorted(s) for s in self.form_states]
+        }
+
+    @classmethod
+    def from_dict(cls,
+                  data: Dict[Text, Any],
+                  tracker: DialogueStateTracker,
+                  domain: 'Domain') -> 'PastStates':
+        past_states = cls(tracker, domain)
+        past_states.tracker.recreate_from_snapshot(data["tracker"], [])
+        past_states.latest_message = UserUttered._from_parameters(
+            data["latest_message"])
+        past_states.states = PersistentDeque(frozenset((k, v) for k, v in s)
+                                             for s in data["states"])
+        past_states.form_states = [frozenset((k, v) for k, v in s)
+                                   for s in data["form_states"]]
+        return past_states
+
+
+def _copy_slots(slots: Dict[Text, Slot]) -> Dict[Text, Slot]:
+    copied = {}
+    for name, slot in slots.items():
+        copied_slot = copy.copy(slot)
+        copied_slot.value = copy.deepcopy(slot.value)
+        copied[name] = copied_slot
+    return copied
@@ -1,3 +1,93 @@
+import numpy as np
+import scipy.sparse
+from typing import Tuple, Union
+
+
+class SparseFeatureArray(object):
+    """Sparse 3D array of shape `(examples, time steps, features)`.
+
+    The features of every example are stored in one row of a CSR matrix,
+    the time steps one after the other. Padded time steps aren't stored in
+    the matrix, but in a boolean mask, as they would be full of
+    `pad_value`. Indexing the examples with a slice or an array of indices
+    returns a sparse array again, `toarray` densifies it (e.g. for one
+    mini-batch at a time)."""
+
+    def __init__(self,
+                 matrix: scipy.sparse.csr_matrix,
+                 padding: np.ndarray,
+                 pad_value: int = -1
+                 ) -> None:
+        num_examples, num_steps = padding.shape
+        if matrix.shape[0] != num_examples or matrix.shape[1] % num_steps:
+            raise ValueError("Shape of the feature matrix {} doesn't match "
+                             "the shape of the padding {}."
+                             "".format(matrix.shape, padding.shape))
+
+        self.matrix = matrix.tocsr()
+        self.padding = padding.astype(bool)
+        self.pad_value = pad_value
+
+    @property
+    def shape(self) -> Tuple[int, int, int]:
+        num_examples, num_steps = self.padding.shape
+        return num_examples, num_steps, self.matrix.shape[1] // num_steps
+
+    @property
+    def ndim(self) -> int:
+        return 3
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self.matrix.dtype
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the stored features and the padding mask."""
+
+        return (self.matrix.data.nbytes + self.matrix.indices.nbytes +
+                self.matrix.indptr.nbytes + self.padding.nbytes)
+
+    def __len__(self) -> int:
+        return self.padding.shape[0]
+
+    def __getitem__(self, idx: Union[slice, np.ndarray]
+                    ) -> 'SparseFeatureArray':
+        if isinstance(idx, (int, np.integer)):
+            raise TypeError("Index a `SparseFeatureArray` with a slice or "
+                            "an array of indices to keep the example axis.")
+        return SparseFeatureArray(self.matrix[idx], self.padding[idx],
+                                  self.pad_value)
+
+    def toarray(self) -> np.ndarray:
+        """Dense array with `pad_value` at the padded time steps."""
+
+        dense = self.matrix.toarray().reshape(self.shape)
+        dense[self.padding] = self.pad_value
+        return dense
+
+    def flattened(self) -> scipy.sparse.csr_matrix:
+        """CSR matrix of the features of every example, as the dense array
+        reshaped to `(examples, time steps * features)` would be."""
+
+        num_features = self.shape[2]
+        padding = scipy.sparse.kron(
+            scipy.sparse.csr_matrix(self.padding, dtype=self.dtype),
+            np.full((1, num_features), self.pad_value, dtype=self.dtype))
+        return (self.matrix + padding).tocsr()
+
+    @classmethod
+    def from_dense(cls, X: np.ndarray, pad_value: int = -1
+                   ) -> 'SparseFeatureArray':
+        """Converts a dense array of shape `(examples, steps, features)`."""
+
+        padding = (X == pad_value).all(axis=-1)
+        features = np.where(padding[:, :, np.newaxis], 0, X)
+        matrix = scipy.sparse.csr_matrix(
+            features.reshape(X.shape[0], -1).astype(X.dtype))
+        return cls(matrix, padding, pad_value)
+
+
 # noinspection PyPep8Naming
 class DialogueTrainingData(object):
     def __init__(self, X, y, true_length=None):
@@ -14,15 +104,23 @@ class DialogueTrainingData(object):
         """Check if the training matrix does contain training samples."""
         return self.X.shape[0] == 0
 
+    def is_sparse(self):
+        """Check if the training matrix is a `SparseFeatureArray`."""
+        return isinstance(self.X, SparseFeatureArray)
+
     def max_history(self):
         return self.X.shape[1]
 
     def num_examples(self):
         return len(self.y)
 
-    def shuffled_X_y(self):
-        import numpy as np
+    def dense_X(self):
+        """Training matrix as dense array, even if it is stored sparse."""
+        if self.is_sparse():
+            return self.X.toarray()
+        return self.X
 
+    def shuffled_X_y(self):
         idx = np.arange(self.num_examples())
         np.random.shuffle(idx)
         shuffled_X = self.X[idx]
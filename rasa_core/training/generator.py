@@ -5,7 +5,7 @@ import copy
 import logging
 import random
 from tqdm import tqdm
-from typing import Optional, List, Text, Set, Dict, Tuple
+from typing import Optional, List, Text, Set, Dict, Tuple, FrozenSet
 
 from rasa_core import utils
 from rasa_core.domain import Domain
@@ -39,8 +39,13 @@ class TrackerWithCachedStates(DialogueStateTracker):
             sender_id, slots, max_event_history)
         self._states = None
         self.domain = domain
+        # equal states of different trackers are stored only once, the
+        # lookup is shared with all trackers copied from this one
+        self._unique_states = {}
 
-    def past_states(self, domain: Domain) -> deque:
+    def past_states(self,
+                    domain: Domain,
+                    max_history: Optional[int] = None) -> deque:
         """Return the states of the tracker based on the logged events."""
 
         # we need to make sure this is the same domain, otherwise things will
@@ -49,11 +54,16 @@ class TrackerWithCachedStates(DialogueStateTracker):
         assert domain == self.domain
 
         # if don't have it cached, we use the domain to calculate the states
-        # from the events
+        # from the events. the states are generated all at once, as the
+        # replayed tracker of the incremental generation isn't needed here
         if self._states is None:
-            self._states = super(TrackerWithCachedStates, self).past_states(
-                domain)
+            self._states = utils.PersistentDeque(
+                self._unique_state(s)
+                for s in domain.states_for_tracker_history(self))
 
+        if max_history is not None:
+            start = max(0, len(self._states) - max_history)
+            return deque(self._states[start:])
         return self._states
 
     def clear_states(self) -> None:
@@ -62,36 +72,34 @@ class TrackerWithCachedStates(DialogueStateTracker):
 
     def init_copy(self) -> 'TrackerWithCachedStates':
         """Create a new state tracker with the same initial values."""
-        return type(self)("",
-                          self.slots.values(),
-                          self._max_event_history,
-                          self.domain)
+        tracker = type(self)("",
+                             self.slots.values(),
+                             self._max_event_history,
+                             self.domain)
+        tracker._unique_states = self._unique_states
+        return tracker
 
     def copy(self, sender_id: Text = "") -> 'TrackerWithCachedStates':
         """Creates a duplicate of this tracker.
 
-        A new tracker will be created and all events
-        will be replayed."""
+        The copy shares the events and the cached states with this
+        tracker, so copying doesn't depend on the length of the story."""
 
-        # This is an optimization, we could use the original copy, but
-        # the states would be lost and we would need to recalculate them
-
-        tracker = self.init_copy()
+        tracker = super(TrackerWithCachedStates, self).copy()
         tracker.sender_id = sender_id
-
-        for event in self.events:
-            tracker.update(event, skip_states=True)
-
         tracker._states = copy.copy(self._states)
-
-        return tracker  # yields the final state
+        return tracker
 
     def _append_current_state(self) -> None:
         if self._states is None:
             self._states = self.past_states(self.domain)
         else:
             state = self.domain.get_active_states(self)
-            self._states.append(frozenset(state.items()))
+            self._states.append(self._unique_state(state))
+
+    def _unique_state(self, state: Dict[Text, float]) -> FrozenSet:
+        frozen = frozenset(state.items())
+        return self._unique_states.setdefault(frozen, frozen)
 
     def update(self, event: Event, skip_states: bool = False) -> None:
         """Modify the state of the tracker according to an ``Event``. """
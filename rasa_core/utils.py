@@ -1,4 +1,6 @@
 # -*- coding: utf-8 -*-
+import collections
+import copy
 import errno
 import io
 import json
@@ -286,6 +288,153 @@ class HashableNDArray(object):
         return self.__wrapped
 
 
+class PersistentDeque(object):
+    """Deque whose copies share their items.
+
+    The items are stored as a linked list of ``(item, previous node)``
+    tuples, starting at the latest item. Appending or popping an item
+    only replaces the head of the list, the nodes themselves are never
+    modified. Hence a copy just references the same head and copying is
+    O(1), no matter how many items are stored.
+
+    Items close to the end are accessed in O(1), accessing an item at
+    the start or iterating over the items walks the whole list.
+
+    Like a ``deque``, a deque with a ``maxlen`` only keeps the latest
+    ``maxlen`` items."""
+
+    __slots__ = ("_head", "_len", "_nodes", "_appended", "maxlen")
+
+    def __init__(self, items=(), maxlen: Optional[int] = None) -> None:
+        self._head = None
+        # number of visible items
+        self._len = 0
+        # number of nodes in the linked list, might be more than the
+        # visible items if there is a `maxlen`
+        self._nodes = 0
+        self._appended = 0
+        self.maxlen = maxlen
+        self.extend(items)
+
+    @property
+    def num_appended(self) -> int:
+        """Number of items appended and not popped again, including the
+        items which were dropped because of the `maxlen`."""
+        return self._appended
+
+    def append(self, item: Any) -> None:
+        self._head = (item, self._head)
+        self._nodes += 1
+        self._appended += 1
+        if self.maxlen is None or self._len < self.maxlen:
+            self._len += 1
+        elif self._nodes > 2 * self.maxlen:
+            # drop the nodes which aren't visible anymore
+            self._rebuild()
+
+    def extend(self, items) -> None:
+        for item in items:
+            self.append(item)
+
+    def pop(self) -> Any:
+        if not self._len:
+            raise IndexError("pop from an empty deque")
+        item, self._head = self._head
+        self._len -= 1
+        self._nodes -= 1
+        self._appended -= 1
+        return item
+
+    def clear(self) -> None:
+        self._head = None
+        self._len = 0
+        self._nodes = 0
+        self._appended = 0
+
+    def copy(self) -> 'PersistentDeque':
+        copied = PersistentDeque.__new__(PersistentDeque)
+        copied._head = self._head
+        copied._len = self._len
+        copied._nodes = self._nodes
+        copied._appended = self._appended
+        copied.maxlen = self.maxlen
+        return copied
+
+    def _rebuild(self) -> None:
+        items = self._latest(self._len)
+        appended = self._appended
+        self.clear()
+        self.extend(items)
+        self._appended = appended
+
+    def _latest(self, n: int) -> List[Any]:
+        """The latest `n` items in their order."""
+
+        items = [None] * n
+        node = self._head
+        for i in range(n - 1, -1, -1):
+            items[i], node = node
+        return items
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self):
+        return iter(self._latest(self._len))
+
+    def __reversed__(self):
+        node = self._head
+        for _ in range(self._len):
+            item, node = node
+            yield item
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            start, stop, step = idx.indices(self._len)
+            if step != 1:
+                return list(self)[idx]
+            # only the items after `start` are collected
+            return self._latest(self._len - start)[:max(0, stop - start)]
+
+        if idx < 0:
+            idx += self._len
+        if not 0 <= idx < self._len:
+            raise IndexError("deque index out of range")
+
+        node = self._head
+        for _ in range(self._len - 1 - idx):
+            node = node[1]
+        return node[0]
+
+    def __eq__(self, other):
+        if isinstance(other, PersistentDeque):
+            return (self._len == other._len and
+                    (self._head is other._head or list(self) == list(other)))
+        elif isinstance(other, (list, tuple, collections.deque)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def __copy__(self) -> 'PersistentDeque':
+        return self.copy()
+
+    def __deepcopy__(self, memo) -> 'PersistentDeque':
+        return PersistentDeque(copy.deepcopy(list(self), memo), self.maxlen)
+
+    def __reduce__(self):
+        # the nested nodes would exceed the recursion limit of pickle
+        return PersistentDeque, (list(self), self.maxlen)
+
+    def __repr__(self) -> Text:
+        return "PersistentDeque({!r}, maxlen={})".format(
+            list(self), self.maxlen)
+
+
 def replace_environment_variables():
     """Enable yaml loader to process the environment variables in the yaml."""
     import ruamel.yaml as yaml
@@ -69,6 +69,58 @@ def test_domain_action_instantiation():
     assert instantiated_actions[8].name() == "utter_test"
 
 
+def test_domain_action_lookups_share_instances():
+    domain = Domain(
+        intent_properties={},
+        entities=[],
+        slots=[],
+        templates={},
+        action_names=["my_module.ActionTest", "utter_test"],
+        form_names=["some_form"])
+    endpoint = EndpointConfig("https://example.com/webhooks/actions")
+
+    for i, name in enumerate(domain.action_names):
+        assert domain.index_for_action(name) == i
+        assert domain.action_for_name(name, endpoint).name() == name
+        assert (domain.action_for_index(i, endpoint) is
+                domain.action_for_name(name, endpoint))
+
+    remote_action = domain.action_for_name("some_form", endpoint)
+    assert isinstance(remote_action, RemoteAction)
+    assert remote_action.action_endpoint is endpoint
+
+    other_endpoint = EndpointConfig("https://example.com/webhooks/actions")
+    other_action = domain.action_for_name("some_form", other_endpoint)
+    assert other_action is not remote_action
+    assert other_action.action_endpoint is other_endpoint
+
+    with pytest.raises(NameError):
+        domain.index_for_action("unknown_action")
+    with pytest.raises(NameError):
+        domain.action_for_name("unknown_action", endpoint)
+
+
+def test_domain_keeps_actions_of_recent_endpoints():
+    domain = Domain(
+        intent_properties={},
+        entities=[],
+        slots=[],
+        templates={},
+        action_names=["utter_test"],
+        form_names=["some_form"])
+    endpoint = EndpointConfig("https://example.com/webhooks/actions")
+    remote_action = domain.action_for_name("some_form", endpoint)
+
+    for _ in range(domain.MAX_CACHED_ENDPOINTS * 2):
+        other_endpoint = EndpointConfig("https://example.com/webhooks/other")
+        other_action = domain.action_for_name("some_form", other_endpoint)
+        assert other_action.action_endpoint is other_endpoint
+        # the first endpoint is used on every request
+        assert domain.action_for_name("some_form", endpoint) is remote_action
+
+    assert len(domain._actions_by_endpoint) == domain.MAX_CACHED_ENDPOINTS
+
+
 def test_domain_fails_on_duplicated_actions():
     with pytest.raises(ValueError):
         Domain(intent_properties={},
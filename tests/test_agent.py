@@ -45,6 +45,20 @@ def test_agent_handle_message(default_agent):
                        'text': 'hey there Rasa!'}]
 
 
+def test_agent_shutdown_writes_deferred_saves(default_domain):
+    from rasa_core.tracker_store import (
+        InMemoryTrackerStore, WriteBehindTrackerStore)
+
+    inner = InMemoryTrackerStore(default_domain)
+    agent = Agent(default_domain,
+                  tracker_store=WriteBehindTrackerStore(inner, max_delay=60))
+    agent.tracker_store.save(inner.init_tracker("deferred"))
+    assert inner.retrieve("deferred") is None
+
+    agent.shutdown()
+    assert inner.retrieve("deferred") is not None
+
+
 def test_agent_wrong_use_of_load(tmpdir, default_domain):
     training_data_file = 'examples/moodbot/data/stories.md'
     agent = Agent("examples/moodbot/domain.yml",
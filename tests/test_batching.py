@@ -0,0 +1,147 @@
+import threading
+
+import pytest
+
+from rasa_core.agent import Agent
+from rasa_core.batching import InferenceScheduler
+from rasa_core.interpreter import INTENT_MESSAGE_PREFIX
+from rasa_core.policies.ensemble import PolicyEnsemble
+
+
+class RecordingEnsemble(PolicyEnsemble):
+    def __init__(self):
+        super(RecordingEnsemble, self).__init__([])
+        self.batches = []
+
+    def predict_batch(self, trackers, domain):
+        self.batches.append(list(trackers))
+        if "fail" in trackers:
+            raise ValueError("failed")
+        return [([float(t)], "policy_{}".format(domain)) for t in trackers]
+
+
+def predict_concurrently(scheduler, ensemble, requests, domain="domain"):
+    results = [None] * len(requests)
+    errors = [None] * len(requests)
+
+    def predict(i):
+        try:
+            results[i] = scheduler.predict(ensemble, requests[i], domain)
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=predict, args=(i,))
+               for i in range(len(requests))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, errors
+
+
+def test_scheduler_batches_concurrent_predictions():
+    # the batch is full before the waiting time is over
+    scheduler = InferenceScheduler(max_batch_size=4, max_wait=10)
+    ensemble = RecordingEnsemble()
+
+    results, errors = predict_concurrently(scheduler, ensemble,
+                                           [[1], [2, 3], [4]])
+
+    assert errors == [None, None, None]
+    assert len(ensemble.batches) == 1
+    assert sorted(ensemble.batches[0]) == [1, 2, 3, 4]
+    # every request gets back the predictions of its own trackers
+    assert results == [[([1.0], "policy_domain")],
+                       [([2.0], "policy_domain"), ([3.0], "policy_domain")],
+                       [([4.0], "policy_domain")]]
+
+    metrics = scheduler.metrics()
+    assert metrics["batches"] == 1
+    assert metrics["predictions"] == 4
+    assert metrics["batch_sizes"] == {4: 1}
+    assert metrics["mean_batch_size"] == 4
+    assert metrics["queue_depth"] == 0
+    assert metrics["requests"] == 3
+    assert (0 <= metrics["mean_queueing_delay"] <=
+            metrics["max_queueing_delay"])
+    scheduler.shutdown()
+
+
+def test_scheduler_runs_prediction_after_waiting_time():
+    scheduler = InferenceScheduler(max_batch_size=32, max_wait=0.001)
+    ensemble = RecordingEnsemble()
+
+    assert scheduler.predict(ensemble, [7], "domain") == [
+        ([7.0], "policy_domain")]
+    assert scheduler.predict(ensemble, [], "domain") == []
+    assert ensemble.batches == [[7]]
+    assert scheduler.metrics()["batch_sizes"] == {1: 1}
+    scheduler.shutdown()
+
+
+def test_scheduler_batches_predictions_of_the_same_model():
+    scheduler = InferenceScheduler(max_batch_size=4, max_wait=10)
+    first = RecordingEnsemble()
+    second = RecordingEnsemble()
+    results = [None] * 4
+
+    def predict(i, ensemble, domain):
+        results[i] = scheduler.predict(ensemble, [i], domain)
+
+    threads = [threading.Thread(target=predict, args=args)
+               for args in [(0, first, "a"), (1, second, "a"),
+                            (2, first, "b"), (3, first, "a")]]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sorted(first.batches) == [[0, 3], [2]]
+    assert second.batches == [[1]]
+    assert results == [[([0.0], "policy_a")], [([1.0], "policy_a")],
+                       [([2.0], "policy_b")], [([3.0], "policy_a")]]
+    scheduler.shutdown()
+
+
+def test_scheduler_raises_errors_of_batch_for_every_request():
+    scheduler = InferenceScheduler(max_batch_size=2, max_wait=10)
+    ensemble = RecordingEnsemble()
+
+    results, errors = predict_concurrently(scheduler, ensemble,
+                                           [[1], ["fail"]])
+
+    assert results == [None, None]
+    assert all(isinstance(e, ValueError) for e in errors)
+
+    # the scheduler keeps predicting after a failed batch
+    scheduler.max_batch_size = 1
+    assert scheduler.predict(ensemble, [2], "domain") == [
+        ([2.0], "policy_domain")]
+    scheduler.shutdown()
+
+
+@pytest.mark.parametrize("max_batch_size, max_wait", [(0, 0.002),
+                                                      (32, -1)])
+def test_invalid_scheduler_configuration(max_batch_size, max_wait):
+    with pytest.raises(ValueError):
+        InferenceScheduler(max_batch_size, max_wait)
+
+
+def test_agent_predicts_with_scheduler(default_agent):
+    scheduler = InferenceScheduler(max_batch_size=8, max_wait=0.001)
+    agent = Agent(default_agent.domain,
+                  policies=default_agent.policy_ensemble,
+                  interpreter=default_agent.interpreter,
+                  tracker_store=default_agent.tracker_store,
+                  inference_scheduler=scheduler)
+
+    message = INTENT_MESSAGE_PREFIX + 'greet{"name":"Rasa"}'
+    result = agent.handle_message(message, sender_id="batched-user")
+    assert result == [{'recipient_id': 'batched-user',
+                       'text': 'hey there Rasa!'}]
+
+    tracker = agent.tracker_store.retrieve("batched-user")
+    assert (agent.predict_trackers([tracker]) ==
+            default_agent.predict_trackers([tracker]))
+    assert scheduler.metrics()["predictions"] > 1
+    scheduler.shutdown()
@@ -4,8 +4,10 @@ from rasa_core.policies import Policy
 from rasa_core.policies.ensemble import (PolicyEnsemble, InvalidPolicyConfig,
                                          SimplePolicyEnsemble)
 from rasa_core.domain import Domain
+from rasa_core.featurizers import (MaxHistoryTrackerFeaturizer,
+                                   BinarySingleStateFeaturizer)
 from rasa_core.trackers import DialogueStateTracker
-from rasa_core.events import UserUttered
+from rasa_core.events import UserUttered, ActionExecutionRejected
 
 
 class WorkingPolicy(Policy):
@@ -85,6 +87,82 @@ def test_policy_priority():
     assert (result.tolist() == priority_2_result)
 
 
+def test_predict_batch():
+    domain = Domain.load("data/test_domains/default.yml")
+    trackers = [DialogueStateTracker.from_events(str(i), [UserUttered("hi")],
+                                                 domain.slots)
+                for i in range(3)]
+    trackers.append(DialogueStateTracker.from_events(
+        "rejected", [UserUttered("hi"),
+                     ActionExecutionRejected(domain.action_names[1])],
+        domain.slots))
+
+    ensemble = SimplePolicyEnsemble([
+        ConstantPolicy(priority=1, predict_index=0),
+        ConstantPolicy(priority=2, predict_index=1)])
+    predictions = ensemble.predict_batch(trackers, domain)
+
+    assert len(predictions) == len(trackers)
+    for tracker, (result, best_policy) in zip(trackers, predictions):
+        expected, expected_policy = \
+            ensemble.probabilities_using_best_policy(tracker, domain)
+        assert best_policy == expected_policy
+        assert result.tolist() == expected.tolist()
+    # the rejected action of the last tracker isn't predicted
+    assert [p for _, p in predictions] == ["policy_1_ConstantPolicy"] * 3 + [
+        "policy_0_ConstantPolicy"]
+    assert ensemble.predict_batch([], domain) == []
+
+
+class FeaturizingPolicy(ConstantPolicy):
+    def __init__(self, featurizer, predict_index=0):
+        super(FeaturizingPolicy, self).__init__(predict_index=predict_index)
+        self.__featurizer = featurizer
+        self.X = None
+
+    @property
+    def featurizer(self):
+        return self.__featurizer
+
+    def predict_batch(self, trackers, domain):
+        self.X = self.featurizer.create_X(trackers, domain)
+        return [self.predict_action_probabilities(tracker, domain)
+                for tracker in trackers]
+
+
+def test_policies_share_featurization():
+    domain = Domain.load("data/test_domains/default.yml")
+    tracker = DialogueStateTracker.from_events("test", [UserUttered("hi")],
+                                               domain.slots)
+
+    def featurizer(max_history):
+        f = MaxHistoryTrackerFeaturizer(BinarySingleStateFeaturizer(),
+                                        max_history=max_history)
+        f.state_featurizer.prepare_from_domain(domain)
+        return f
+
+    policies = [FeaturizingPolicy(featurizer(3)),
+                FeaturizingPolicy(featurizer(3)),
+                FeaturizingPolicy(featurizer(2))]
+    ensemble = SimplePolicyEnsemble(policies)
+    ensemble.probabilities_using_best_policy(tracker, domain)
+
+    assert ensemble.num_reused_featurizations == 1
+    assert policies[0].X is policies[1].X
+    assert policies[2].X.shape == (1, 2, domain.num_states)
+    assert (policies[0].X == featurizer(3).create_X([tracker], domain)).all()
+
+    ensemble.probabilities_using_best_policy(tracker, domain)
+    assert ensemble.num_reused_featurizations == 2
+
+    other = DialogueStateTracker.from_events("other", [UserUttered("hey")],
+                                             domain.slots)
+    ensemble.predict_batch([tracker, other], domain)
+    assert ensemble.num_reused_featurizations == 3
+    assert policies[0].X is policies[1].X
+    assert policies[0].X.shape == (2, 3, domain.num_states)
+
+
 class LoadReturnsNonePolicy(Policy):
     @classmethod
     def load(cls, path):
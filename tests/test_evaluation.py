@@ -1,9 +1,14 @@
 import os
 
+import pytest
+
+from rasa_core.actions.action import ACTION_LISTEN_NAME
+from rasa_core.events import ActionExecuted
 from rasa_core.test import (
     test,
     _generate_trackers,
     collect_story_predictions)
+from rasa_core.trackers import DialogueStateTracker
 from tests.conftest import (DEFAULT_STORIES_FILE, END_TO_END_STORY_FILE,
                             E2E_STORY_FILE_UNKNOWN_ENTITY)
 
@@ -69,3 +74,38 @@ def test_end_to_end_evaluation_script_unknown_entity(tmpdir, default_agent):
         has_prediction_target_mismatch()
     assert len(story_evaluation.failed_stories) == 1
     assert num_stories == 1
+
+
+def _with_wrong_action(tracker, sender_id, action_idx, domain):
+    """Copy of the tracker whose `action_idx`th bot action is wrong."""
+
+    bot_actions = [i for i, e in enumerate(tracker.events)
+                   if isinstance(e, ActionExecuted) and
+                   e.action_name != ACTION_LISTEN_NAME]
+    events = list(tracker.events)
+    wrong = bot_actions[action_idx]
+    other = [a for a in domain.user_actions
+             if a != events[wrong].action_name][0]
+    events[wrong] = ActionExecuted(other)
+    return DialogueStateTracker.from_events(sender_id, events, domain.slots)
+
+
+def test_action_evaluation_fails_on_first_failed_story(default_agent):
+    completed_trackers = _generate_trackers(
+        DEFAULT_STORIES_FILE, default_agent, use_e2e=False)
+    domain = default_agent.domain
+    # the stories are evaluated side by side, but the first story fails
+    # later than the second one
+    failing = [_with_wrong_action(completed_trackers[0], "late", -1, domain),
+               _with_wrong_action(completed_trackers[0], "early", 0, domain)]
+
+    with pytest.raises(ValueError) as execinfo:
+        collect_story_predictions(completed_trackers[1:] + failing,
+                                  default_agent,
+                                  fail_on_prediction_errors=True)
+    assert "## late" in str(execinfo.value)
+
+    story_evaluation, _ = collect_story_predictions(
+        failing + completed_trackers, default_agent)
+    assert [t.sender_id for t in story_evaluation.failed_stories] == [
+        "late", "early"]
@@ -1,6 +1,7 @@
 import pytz
 from datetime import datetime
 import copy
+import pickle
 
 import pytest
 from dateutil import parser
@@ -9,7 +10,7 @@ from rasa_core.events import (
     ActionExecuted, AllSlotsReset,
     ReminderScheduled, ConversationResumed, ConversationPaused,
     StoryExported, ActionReverted, BotUttered, FollowupAction,
-    UserUtteranceReverted, AgentUttered)
+    UserUtteranceReverted, AgentUttered, deserialise_events)
 
 
 @pytest.mark.parametrize("one_event,another_event", [
@@ -114,6 +115,80 @@ def test_dict_serialisation(one_event):
     assert hash(one_event) == hash(recovered_event)
 
 
+@pytest.mark.parametrize("one_event", [
+    UserUttered("/greet", {"name": "greet", "confidence": 1.0}, []),
+    SlotSet("name", "rasa"),
+    Restarted(),
+    ActionExecuted("my_action", "policy_1_KerasPolicy", 0.8),
+    ReminderScheduled("my_action", datetime.now()),
+])
+def test_events_are_compact_and_picklable(one_event):
+    assert not hasattr(one_event, "__dict__")
+
+    recovered_event = pickle.loads(pickle.dumps(one_event))
+    assert recovered_event == one_event
+    assert recovered_event.as_dict() == one_event.as_dict()
+
+
+def test_unpickle_event_without_slots():
+    # events were pickled with their `__dict__` before they had `__slots__`
+    event = ActionExecuted.__new__(ActionExecuted)
+    event.__setstate__({"action_name": "my_action",
+                        "timestamp": 12,
+                        "unpredictable": False})
+
+    assert event == ActionExecuted("my_action")
+    assert event.as_dict()["policy"] is None
+
+
+def test_event_names_are_interned():
+    name = "".join(["my_", "action"])
+    assert ActionExecuted(name).action_name is ActionExecuted(
+        "my_action").action_name
+
+
+def test_compact_intent_ranking():
+    parse_data = {"text": "/greet",
+                  "intent": {"name": "greet", "confidence": 0.9},
+                  "entities": [],
+                  "intent_ranking": [{"name": "greet", "confidence": 0.9},
+                                     {"name": "goodbye", "confidence": 0.1}]}
+    event = UserUttered("/greet", parse_data["intent"], [], parse_data)
+    as_dict = event.as_dict()
+
+    event.compact()
+    assert event.as_dict() == as_dict
+    assert event.ranked_intents == [("greet", 0.9), ("goodbye", 0.1)]
+    assert pickle.loads(pickle.dumps(event)).as_dict() == as_dict
+
+    event.compact(strip_intent_ranking=True)
+    assert "intent_ranking" not in event.as_dict()["parse_data"]
+    assert event.ranked_intents is None
+    assert event.intent == {"name": "greet", "confidence": 0.9}
+
+
+def test_deserialise_custom_events():
+    class CustomEvent(Event):
+        type_name = "custom_test_event"
+
+    evts = deserialise_events([{"event": "custom_test_event",
+                                "timestamp": 1},
+                               {"event": "topic", "topic": "old"},
+                               {"event": "action", "name": "my_action"},
+                               {"text": "without a type"}])
+
+    assert [type(e) for e in evts] == [CustomEvent, ActionExecuted]
+    assert Event.resolve_by_type("custom_test_event") is CustomEvent
+
+
+def test_resolve_unknown_event():
+    with pytest.raises(ValueError):
+        deserialise_events([{"event": "unknown_test_event"}])
+
+    assert Event.resolve_by_type("unknown_test_event",
+                                 default=ActionExecuted) is ActionExecuted
+
+
 def test_json_parse_setslot():
     # DOCS MARKER SetSlot
     evt = \
@@ -1,6 +1,15 @@
+from rasa_core import training
+from rasa_core.actions.action import ACTION_LISTEN_NAME
+from rasa_core.events import ActionExecuted, UserUttered
 from rasa_core.featurizers import TrackerFeaturizer, \
-    BinarySingleStateFeaturizer, LabelTokenizerSingleStateFeaturizer
+    BinarySingleStateFeaturizer, LabelTokenizerSingleStateFeaturizer, \
+    MaxHistoryTrackerFeaturizer, FullDialogueTrackerFeaturizer, \
+    FeaturizationContext, last_state_indices
+from rasa_core.trackers import DialogueStateTracker
+from rasa_core.training.data import SparseFeatureArray
+from tests.conftest import DEFAULT_STORIES_FILE
 import numpy as np
+import pytest
 
 
 def test_fail_to_load_non_existent_featurizer():
@@ -115,3 +124,156 @@ def test_label_tokenizer_featurizer_handles_probabilistic_intents():
     encoded = f.encode({"intent_a": 0.5, "prev_b": 0.2, "intent_d": 1.0,
                         "prev_action_listen": 1.0})
     assert (encoded == np.array([0.5, 1.0, 1.5, 0.0, 0.2])).all()
+
+
+def test_featurization_context_shares_states(default_domain):
+    tracker = DialogueStateTracker.from_events(
+        "default", [ActionExecuted(ACTION_LISTEN_NAME),
+                    UserUttered("hi", {"name": "greet", "confidence": 1.0})],
+        default_domain.slots)
+    # like the memoization policy, which doesn't encode the states
+    memo = MaxHistoryTrackerFeaturizer(None, max_history=3)
+    binary = MaxHistoryTrackerFeaturizer(BinarySingleStateFeaturizer(),
+                                         max_history=3)
+    binary.state_featurizer.prepare_from_domain(default_domain)
+
+    with FeaturizationContext() as context:
+        states = memo.prediction_states([tracker], default_domain)
+        X = binary.create_X([tracker], default_domain)
+
+        assert binary.prediction_states([tracker], default_domain) is states
+        # the tracker changed, so the states are created again
+        tracker.update(ActionExecuted("utter_greet"))
+        assert binary.prediction_states([tracker],
+                                        default_domain) is not states
+
+    assert FeaturizationContext.current() is None
+    assert context.num_reused == 2
+    assert context.num_created == 3
+    assert X.shape == (1, 3, default_domain.num_states)
+
+
+def test_featurization_context_with_max_event_history(default_domain):
+    tracker = DialogueStateTracker.from_events(
+        "default", [ActionExecuted(ACTION_LISTEN_NAME),
+                    UserUttered("hi", {"name": "greet", "confidence": 1.0})],
+        default_domain.slots, max_event_history=2)
+    featurizer = MaxHistoryTrackerFeaturizer(None, max_history=3)
+
+    with FeaturizationContext() as context:
+        states = featurizer.prediction_states([tracker], default_domain)
+        # the number of kept events doesn't change, but the tracker does
+        tracker.update(ActionExecuted("utter_greet"))
+        assert len(tracker.events) == 2
+        assert featurizer.prediction_states([tracker],
+                                            default_domain) != states
+
+    assert context.num_reused == 0
+
+
+def test_binary_featurizer_encodes_batch_like_single_states():
+    f = BinarySingleStateFeaturizer()
+    f.input_state_map = {"a": 0, "b": 3, "c": 2, "d": 1}
+    f.num_features = len(f.input_state_map)
+    state = {"a": 1.0, "b": 1.0}
+    trackers_as_states = [[None, state, {"c": 1.0}],
+                          [state, {"d": 1.0, "e": 1.0}, state]]
+
+    encoded = f.encode_batch(trackers_as_states)
+    expected = np.array([[f.encode(s) for s in states]
+                         for states in trackers_as_states])
+
+    assert encoded.dtype == expected.dtype
+    assert (encoded == expected).all()
+
+
+def test_label_tokenizer_featurizer_encodes_batch_like_single_states():
+    f = LabelTokenizerSingleStateFeaturizer()
+    f.user_labels = ["a_d"]
+    f.bot_labels = ["c_b"]
+    f.user_vocab = {"a": 0, "d": 1}
+    f.bot_vocab = {"b": 1, "c": 0}
+    f.num_features = (len(f.user_vocab) +
+                      len(f.slot_labels) +
+                      len(f.bot_vocab))
+    trackers_as_states = [[{"intent_a_d": 0.5, "prev_c_b": 0.2}],
+                          [{"intent_a_d": 1.0, "prev_action_listen": 1.0}]]
+
+    encoded = f.encode_batch(trackers_as_states)
+    expected = np.array([[f.encode(s) for s in states]
+                         for states in trackers_as_states])
+
+    assert encoded.dtype == expected.dtype
+    assert (encoded == expected).all()
+
+
+def test_full_dialogue_featurizer_pads_trackers_of_different_length(
+        default_domain):
+    featurizer = FullDialogueTrackerFeaturizer(BinarySingleStateFeaturizer())
+    featurizer.state_featurizer.prepare_from_domain(default_domain)
+    featurizer.max_len = 3
+    state = {"prev_action_listen": 1.0, "intent_greet": 1.0}
+
+    X, true_lengths = featurizer._featurize_states([[state],
+                                                    [state, state, state]])
+
+    assert true_lengths == [1, 3]
+    assert X.shape == (2, 3, default_domain.num_states)
+    assert (X[0, 1:] == -1).all()
+    assert (X[0, 0] == X[1, 0]).all()
+
+
+def test_full_dialogue_featurizer_pads_trackers_for_prediction(
+        default_domain):
+    featurizer = FullDialogueTrackerFeaturizer(BinarySingleStateFeaturizer())
+    featurizer.state_featurizer.prepare_from_domain(default_domain)
+    # the trackers are longer than the longest training dialogue
+    featurizer.max_len = 1
+    events = [ActionExecuted(ACTION_LISTEN_NAME), UserUttered("hi"),
+              ActionExecuted("utter_greet"),
+              ActionExecuted(ACTION_LISTEN_NAME)]
+    short = DialogueStateTracker.from_events("short", events[:2],
+                                             default_domain.slots)
+    long = DialogueStateTracker.from_events("long", events,
+                                            default_domain.slots)
+
+    X = featurizer.create_X([short, long], default_domain)
+
+    assert X.shape == (2, 4, default_domain.num_states)
+    assert (X[0, 2:] == -1).all()
+    assert (X[0, :2] == X[1, :2]).all()
+    assert last_state_indices(X).tolist() == [1, 3]
+
+
+@pytest.mark.parametrize("featurizer", [
+    MaxHistoryTrackerFeaturizer(BinarySingleStateFeaturizer(),
+                                max_history=5),
+    FullDialogueTrackerFeaturizer(LabelTokenizerSingleStateFeaturizer())])
+def test_sparse_featurization_equals_dense(featurizer, default_domain):
+    trackers = training.load_data(DEFAULT_STORIES_FILE, default_domain)
+    dense = featurizer.featurize_trackers(trackers, default_domain)
+    sparse = featurizer.featurize_trackers(trackers, default_domain,
+                                           sparse=True)
+
+    assert sparse.is_sparse()
+    assert sparse.X.shape == dense.X.shape
+    assert sparse.dense_X().dtype == dense.X.dtype
+    assert (sparse.dense_X() == dense.X).all()
+    assert (sparse.X.flattened().toarray() ==
+            dense.X.reshape(dense.X.shape[0], -1)).all()
+    assert (sparse.y == dense.y).all()
+    assert sparse.true_length == dense.true_length
+
+
+def test_sparse_feature_array_indexing():
+    X = np.array([[[-1, -1], [0, 1]],
+                  [[1, 0], [0, 0]],
+                  [[-1, -1], [-1, -1]]])
+    sparse = SparseFeatureArray.from_dense(X)
+
+    assert len(sparse) == 3
+    assert (sparse.toarray() == X).all()
+    assert (sparse[np.array([2, 0])].toarray() == X[[2, 0]]).all()
+    assert (sparse[1:].toarray() == X[1:]).all()
+    with pytest.raises(TypeError):
+        _ = sparse[0]
@@ -0,0 +1,158 @@
+import datetime
+import json
+import threading
+import time
+
+import pytest
+
+from rasa_core.agent import Agent
+from rasa_core.interpreter import INTENT_MESSAGE_PREFIX
+from rasa_core.lanes import LaneDispatcher
+
+
+def test_lanes_keep_order_of_a_conversation():
+    lanes = LaneDispatcher(4)
+    handled = []
+
+    def handle(i):
+        time.sleep(0.01 * (5 - i))
+        handled.append(i)
+        return i
+
+    threads = []
+    results = []
+    for i in range(5):
+        t = threading.Thread(target=lambda i=i: results.append(
+            lanes.run("ordered-user", handle, i)))
+        t.start()
+        # make sure the messages are submitted in order
+        time.sleep(0.005)
+        threads.append(t)
+    for t in threads:
+        t.join()
+
+    assert handled == list(range(5))
+    assert sorted(results) == list(range(5))
+
+    metrics = lanes.metrics()
+    assert len(metrics) == 4
+    assert sum(m["processed"] for m in metrics) == 5
+    assert all(m["queue_depth"] == 0 for m in metrics)
+    lanes.shutdown()
+
+
+def test_lanes_run_conversations_in_parallel():
+    lanes = LaneDispatcher(2)
+    first = lanes.lane_for("user-a")
+    other = next(s for s in ("user-{}".format(i) for i in range(100))
+                 if lanes.lane_for(s) is not first)
+    started = threading.Event()
+
+    def block():
+        started.set()
+        assert continue_blocked.wait(2)
+
+    continue_blocked = threading.Event()
+    t = threading.Thread(target=lanes.run, args=("user-a", block))
+    t.start()
+    assert started.wait(2)
+
+    # the other lane isn't blocked by the running work
+    assert lanes.run(other, lambda: "done") == "done"
+    assert first.queue_depth == 1
+
+    continue_blocked.set()
+    t.join()
+    assert first.queue_depth == 0
+    lanes.shutdown()
+
+
+def test_lanes_run_nested_work_directly():
+    lanes = LaneDispatcher(1)
+
+    assert lanes.run("nested", lanes.run, "nested", lambda: 42) == 42
+    lanes.shutdown()
+
+
+def test_lane_threads_are_named_after_their_lane():
+    lanes = LaneDispatcher(2)
+    lane = lanes.lane_for("named")
+
+    assert (lanes.run("named", lambda: threading.current_thread().name) ==
+            lane.name)
+    lanes.shutdown()
+
+
+def test_lanes_raise_errors_of_work():
+    lanes = LaneDispatcher(1)
+
+    def fail():
+        raise ValueError("failed")
+
+    with pytest.raises(ValueError):
+        lanes.run("failing", fail)
+    assert lanes.metrics()[0]["processed"] == 1
+    lanes.shutdown()
+
+
+def test_invalid_number_of_lanes():
+    with pytest.raises(ValueError):
+        LaneDispatcher(0)
+
+
+def test_agent_handles_messages_on_lanes(default_agent):
+    agent = Agent(default_agent.domain,
+                  policies=default_agent.policy_ensemble,
+                  interpreter=default_agent.interpreter,
+                  tracker_store=default_agent.tracker_store,
+                  lanes=LaneDispatcher(2))
+
+    message = INTENT_MESSAGE_PREFIX + 'greet{"name":"Rasa"}'
+    result = agent.handle_message(message, sender_id="lane-user")
+    assert result == [{'recipient_id': 'lane-user',
+                       'text': 'hey there Rasa!'}]
+    assert sum(m["processed"] for m in agent.lanes.metrics()) == 1
+    agent.lanes.shutdown()
+
+
+def test_server_changes_trackers_on_lanes(default_agent):
+    from rasa_core import server
+    from rasa_core.events import SlotSet
+
+    agent = Agent(default_agent.domain,
+                  policies=default_agent.policy_ensemble,
+                  interpreter=default_agent.interpreter,
+                  tracker_store=default_agent.tracker_store,
+                  lanes=LaneDispatcher(2))
+    app = server.create_app(agent).test_client()
+
+    data = json.dumps(SlotSet("name", "Rasa").as_dict())
+    response = app.post("http://dummy/conversations/lane-user/tracker/events",
+                        data=data, content_type='application/json')
+    assert response.status_code == 200
+    response = app.get("http://dummy/conversations/lane-user/tracker")
+    assert response.get_json()["slots"]["name"] == "Rasa"
+
+    assert sum(m["processed"] for m in agent.lanes.metrics()) == 2
+    agent.lanes.shutdown()
+
+
+def test_reminders_are_handled_on_lanes(default_agent):
+    from rasa_core.channels import CollectingOutputChannel
+    from rasa_core.dispatcher import Dispatcher
+    from rasa_core.events import ReminderScheduled
+
+    agent = Agent(default_agent.domain,
+                  policies=default_agent.policy_ensemble,
+                  interpreter=default_agent.interpreter,
+                  tracker_store=default_agent.tracker_store,
+                  lanes=LaneDispatcher(2))
+    processor = agent.create_processor()
+    dispatcher = Dispatcher("reminded-user", CollectingOutputChannel(),
+                            agent.nlg)
+    reminder = ReminderScheduled("utter_greet", datetime.datetime.now(),
+                                 kill_on_user_message=False)
+
+    processor.handle_reminder(reminder, dispatcher)
+    assert sum(m["processed"] for m in agent.lanes.metrics()) == 1
+    agent.lanes.shutdown()
@@ -1,7 +1,11 @@
+import base64
+import json
+import zlib
 from unittest.mock import patch
 
 import numpy as np
 import pytest
+import tensorflow as tf
 
 from rasa_core import training
 from rasa_core.actions.action import (ACTION_LISTEN_NAME,
@@ -11,17 +15,22 @@ from rasa_core.actions.action import (ACTION_LISTEN_NAME,
                                       ACTION_DEFAULT_FALLBACK_NAME)
 from rasa_core.channels import UserMessage
 from rasa_core.domain import Domain, InvalidDomain
-from rasa_core.events import ActionExecuted
+from rasa_core.events import (
+    ActionExecuted, ActionExecutionRejected, BotUttered, SlotSet,
+    UserUttered)
 from rasa_core.featurizers import (
     MaxHistoryTrackerFeaturizer,
+    FullDialogueTrackerFeaturizer,
     BinarySingleStateFeaturizer)
 from rasa_core.policies import TwoStageFallbackPolicy
 from rasa_core.policies.embedding_policy import EmbeddingPolicy
+from rasa_core.policies.ensemble import SimplePolicyEnsemble
 from rasa_core.policies.fallback import FallbackPolicy
 from rasa_core.policies.form_policy import FormPolicy
 from rasa_core.policies.keras_policy import KerasPolicy
 from rasa_core.policies.memoization import (
     MemoizationPolicy, AugmentedMemoizationPolicy)
+from rasa_core.policies.rnn_state_cache import RnnStateCache
 from rasa_core.policies.sklearn_policy import SklearnPolicy
 from rasa_core.trackers import DialogueStateTracker
 from tests.conftest import DEFAULT_DOMAIN_PATH, DEFAULT_STORIES_FILE
@@ -119,6 +128,24 @@ class PolicyTestCollection(object):
         assert max(probabilities) <= 1.0
         assert min(probabilities) >= 0.0
 
+    def test_predict_batch(self, trained_policy, default_domain):
+        trackers = train_trackers(default_domain)
+        empty_tracker = DialogueStateTracker(UserMessage.DEFAULT_SENDER_ID,
+                                             default_domain.slots)
+        # longer than any dialogue the policy was trained on
+        longest = max(trackers, key=lambda t: len(t.events))
+        long_tracker = DialogueStateTracker.from_events(
+            "long", list(longest.events) * 2, default_domain.slots)
+        trackers = [empty_tracker, long_tracker] + trackers
+
+        predictions = trained_policy.predict_batch(trackers, default_domain)
+
+        assert len(predictions) == len(trackers)
+        for tracker, probabilities in zip(trackers, predictions):
+            expected = trained_policy.predict_action_probabilities(
+                tracker, default_domain)
+            assert np.allclose(probabilities, expected, atol=1e-6)
+
     def test_persist_and_load_empty_policy(self, tmpdir):
         empty_policy = self.create_policy(None, None)
         empty_policy.persist(tmpdir.strpath)
@@ -135,6 +162,94 @@ class PolicyTestCollection(object):
             assert loaded.session._config is None
 
 
+class RecurrentPolicyTestCollection(PolicyTestCollection):
+    """Tests of policies which continue the rnn of a dialogue."""
+
+    def test_continue_dialogues(self, trained_policy, default_domain,
+                                tmpdir):
+        trained_policy.persist(tmpdir.strpath)
+        policy = trained_policy.__class__.load(tmpdir.strpath)
+        full = trained_policy.__class__.load(tmpdir.strpath)
+        full.rnn_state_cache_size = 0
+
+        trackers = sorted(train_trackers(default_domain),
+                          key=lambda t: len(t.events))
+        dialogues = [list(t.events) * 2 for t in trackers[-2:]]
+        # the next action is predicted before an action is executed
+        turns = [[i for i, e in enumerate(events)
+                  if isinstance(e, ActionExecuted)] + [len(events)]
+                 for events in dialogues]
+
+        for turn in range(max(len(t) for t in turns)):
+            batch = [DialogueStateTracker.from_events(
+                str(k), events[:cuts[min(turn, len(cuts) - 1)]],
+                default_domain.slots)
+                for k, (events, cuts) in enumerate(zip(dialogues, turns))]
+            assert np.allclose(policy.predict_batch(batch, default_domain),
+                               full.predict_batch(batch, default_domain),
+                               atol=1e-6)
+
+        # only the first predictions run the whole dialogues
+        assert policy.rnn_state_cache.misses == 2
+        assert len(policy.rnn_state_cache) == 2
+        assert len(full.rnn_state_cache) == 0
+
+        # a rewound dialogue is run from its beginning
+        rewound = DialogueStateTracker.from_events(
+            "0", dialogues[0][:turns[0][2]], default_domain.slots)
+        assert np.allclose(
+            policy.predict_action_probabilities(rewound, default_domain),
+            full.predict_action_probabilities(rewound, default_domain),
+            atol=1e-6)
+        assert policy.rnn_state_cache.misses == 3
+
+    def test_reject_actions_in_a_row(self, trained_policy, default_domain,
+                                     tmpdir):
+        trained_policy.persist(tmpdir.strpath)
+        policy = trained_policy.__class__.load(tmpdir.strpath)
+        full = trained_policy.__class__.load(tmpdir.strpath)
+        full.rnn_state_cache_size = 0
+        ensemble = SimplePolicyEnsemble([policy])
+        expected_ensemble = SimplePolicyEnsemble([full])
+
+        tracker = DialogueStateTracker.from_events(
+            "rejecting", list(train_trackers(default_domain)[0].events)[:3],
+            default_domain.slots)
+        # the rejections don't change the featurized dialogue, so the
+        # cached prediction is used every time
+        for _ in range(3):
+            result, _ = ensemble.probabilities_using_best_policy(
+                tracker, default_domain)
+            expected, _ = expected_ensemble.probabilities_using_best_policy(
+                tracker, default_domain)
+            assert np.allclose(result, expected, atol=1e-6)
+
+            rejected = default_domain.action_names[int(np.argmax(result))]
+            tracker.update(ActionExecutionRejected(rejected))
+
+
+def test_rnn_state_cache():
+    cache = RnnStateCache(max_size=2)
+    X = np.arange(6).reshape(3, 2)
+
+    cache.put("a", X[:2], [np.ones(3)], [0.5])
+    cached = cache.get("a", X)
+    assert np.array_equal(cached.X, X[:2])
+    assert cached.prediction == [0.5]
+    # the dialogue doesn't continue the cached states
+    assert cache.get("a", X[:1]) is None
+    assert cache.get("a", X[::-1]) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+    cache.put("b", X, [np.ones(3)], [0.5])
+    cache.get("a", X)
+    cache.put("c", X, [np.ones(3)], [0.5])
+    # the least recently used dialogue is dropped
+    assert cache.get("b", X) is None
+    assert cache.get("a", X) is not None
+    assert len(cache) == 2
+
+
 class TestKerasPolicy(PolicyTestCollection):
 
     @pytest.fixture(scope="module")
@@ -159,6 +274,26 @@ class TestKerasPolicyWithTfConfig(PolicyTestCollection):
         assert loaded.session._config == session_config()
 
 
+class TestKerasPolicyWithSparseFeatures(PolicyTestCollection):
+
+    @pytest.fixture(scope="module")
+    def create_policy(self, featurizer, priority):
+        p = KerasPolicy(featurizer, priority, use_sparse_features=True)
+        return p
+
+
+class TestKerasPolicyWithFullDialogue(RecurrentPolicyTestCollection):
+
+    @pytest.fixture(scope="module")
+    def featurizer(self):
+        return FullDialogueTrackerFeaturizer(BinarySingleStateFeaturizer())
+
+    @pytest.fixture(scope="module")
+    def create_policy(self, featurizer, priority):
+        p = KerasPolicy(featurizer, priority)
+        return p
+
+
 class TestFallbackPolicy(PolicyTestCollection):
 
     @pytest.fixture(scope="module")
@@ -224,6 +359,47 @@ class TestMemoizationPolicy(PolicyTestCollection):
         recalled = trained_policy.recall(states, tracker, default_domain)
         assert recalled is not None
 
+    def test_feature_key_is_stable_hash(self, trained_policy):
+        states = [None, {"prev_action_listen": 1.0, "intent_greet": 1.0}]
+
+        key = trained_policy._create_feature_key(states)
+
+        assert key == "ab1672716cbe63ddad5d7722c86e4873"
+        assert key == trained_policy._create_feature_key(
+            [None, {"intent_greet": 1.0, "prev_action_listen": 1.0}])
+
+    @pytest.mark.parametrize("compress", [True, False])
+    def test_load_migrates_legacy_lookup(self, trained_policy, default_domain,
+                                         tmpdir, compress):
+        trackers = train_trackers(default_domain)
+        (all_states, all_actions) = \
+            trained_policy.featurizer.training_states_and_actions(
+                trackers, default_domain)
+
+        # lookup with the feature strings as keys, like old versions did
+        legacy_lookup = {}
+        expected_lookup = {}
+        for states, actions in zip(all_states, all_actions):
+            feature_str = json.dumps(states, sort_keys=True).replace("\"", "")
+            if compress:
+                compressed = zlib.compress(bytes(feature_str, "utf-8"))
+                feature_str = base64.b64encode(compressed).decode("utf-8")
+            action_idx = default_domain.index_for_action(actions[0])
+            legacy_lookup[feature_str] = action_idx
+            expected_lookup[trained_policy._create_feature_key(states)] = \
+                action_idx
+
+        trained_policy.persist(tmpdir.strpath)
+        memorized_file = tmpdir.join("memorized_turns.json")
+        data = json.loads(memorized_file.read())
+        del data["key_format"]
+        data["lookup"] = legacy_lookup
+        memorized_file.write(json.dumps(data))
+
+        loaded = trained_policy.__class__.load(tmpdir.strpath)
+
+        assert loaded.lookup == expected_lookup
+
 
 class TestAugmentedMemoizationPolicy(PolicyTestCollection):
 
@@ -236,6 +412,40 @@ class TestAugmentedMemoizationPolicy(PolicyTestCollection):
                                        max_history=max_history)
         return p
 
+    def test_future_trackers_have_states_of_replayed_trackers(
+            self, trained_policy, default_domain):
+        events = [ActionExecuted(ACTION_LISTEN_NAME)]
+        for i in range(8):
+            events.append(UserUttered("hi", {"name": "greet",
+                                             "confidence": 1.0}))
+            if i % 3 == 0:
+                events.append(SlotSet("name", "Peter{}".format(i % 2)))
+            events.append(ActionExecuted("utter_greet"))
+            events.append(BotUttered("hey there"))
+            events.append(ActionExecuted(ACTION_LISTEN_NAME))
+        tracker = DialogueStateTracker.from_events("sender", events,
+                                                   default_domain.slots)
+        featurizer = trained_policy.featurizer
+
+        replayed_states = []
+        mcfly_tracker = trained_policy._back_to_the_future_again(tracker)
+        while mcfly_tracker is not None:
+            replayed_states.append(featurizer.prediction_states(
+                [mcfly_tracker], default_domain)[0])
+            mcfly_tracker = trained_policy._back_to_the_future_again(
+                mcfly_tracker)
+
+        future_states = []
+        for future_tracker in trained_policy._future_trackers(tracker):
+            if future_tracker is None:
+                # the states didn't change
+                future_states.append(future_states[-1])
+            else:
+                future_states.append(featurizer.prediction_states(
+                    [future_tracker], default_domain)[0])
+
+        assert future_states == replayed_states
+
 
 class TestSklearnPolicy(PolicyTestCollection):
 
@@ -355,8 +565,26 @@ class TestSklearnPolicy(PolicyTestCollection):
         # does not raise
         policy.train(trackers, domain=default_domain)
 
+    def test_train_with_sparse_features(
+            self, default_domain, trackers, tracker, featurizer, priority):
+        dense_policy = self.create_policy(featurizer=featurizer,
+                                          priority=priority,
+                                          shuffle=False)
+        dense_policy.train(trackers, domain=default_domain)
+        sparse_policy = self.create_policy(featurizer=featurizer,
+                                           priority=priority,
+                                           shuffle=False,
+                                           use_sparse_features=True)
+        sparse_policy.train(trackers, domain=default_domain)
+
+        assert np.allclose(
+            sparse_policy.predict_action_probabilities(tracker,
+                                                       default_domain),
+            dense_policy.predict_action_probabilities(tracker,
+                                                      default_domain))
+
 
-class TestEmbeddingPolicyNoAttention(PolicyTestCollection):
+class TestEmbeddingPolicyNoAttention(RecurrentPolicyTestCollection):
 
     @pytest.fixture(scope="module")
     def create_policy(self, featurizer, priority):
@@ -367,7 +595,7 @@ class TestEmbeddingPolicyNoAttention(PolicyTestCollection):
         return p
 
 
-class TestEmbeddingPolicyAttentionBeforeRNN(PolicyTestCollection):
+class TestEmbeddingPolicyAttentionBeforeRNN(RecurrentPolicyTestCollection):
 
     @pytest.fixture(scope="module")
     def create_policy(self, featurizer, priority):
@@ -378,7 +606,7 @@ class TestEmbeddingPolicyAttentionBeforeRNN(PolicyTestCollection):
         return p
 
 
-class TestEmbeddingPolicyAttentionAfterRNN(PolicyTestCollection):
+class TestEmbeddingPolicyAttentionAfterRNN(RecurrentPolicyTestCollection):
 
     @pytest.fixture(scope="module")
     def create_policy(self, featurizer, priority):
@@ -389,7 +617,7 @@ class TestEmbeddingPolicyAttentionAfterRNN(PolicyTestCollection):
         return p
 
 
-class TestEmbeddingPolicyAttentionBoth(PolicyTestCollection):
+class TestEmbeddingPolicyAttentionBoth(RecurrentPolicyTestCollection):
 
     @pytest.fixture(scope="module")
     def create_policy(self, featurizer, priority):
@@ -399,6 +627,37 @@ class TestEmbeddingPolicyAttentionBoth(PolicyTestCollection):
                             attn_after_rnn=True)
         return p
 
+    def test_persist_inference_graph(self, trained_policy, default_domain,
+                                     tmpdir):
+        trained_policy.persist(tmpdir.strpath)
+        loaded = trained_policy.__class__.load(tmpdir.strpath)
+
+        # the inference graph neither embeds candidate actions
+        # nor contains the optimizer
+        assert loaded.b_in is None
+        assert loaded.sim_op is None
+        with loaded.graph.as_default():
+            assert not any("Adam" in v.name for v in tf.global_variables())
+        assert loaded.all_actions_embed.shape == (
+            default_domain.num_actions, trained_policy.embed_dim)
+        assert np.array_equal(loaded.all_actions_embed,
+                              trained_policy.all_actions_embed)
+
+        # models persisted without an inference graph load the full graph
+        for f in tmpdir.listdir("tensorflow_embedding_inference.ckpt*"):
+            f.remove()
+        full = trained_policy.__class__.load(tmpdir.strpath)
+        assert full.b_in is not None
+
+        trackers = train_trackers(default_domain)
+        assert np.allclose(full.predict_batch(trackers, default_domain),
+                           loaded.predict_batch(trackers, default_domain))
+
+        # neither graph contains the optimizer to continue the training
+        for policy in [loaded, full]:
+            with pytest.raises(ValueError):
+                policy.continue_training(trackers, default_domain)
+
 
 class TestEmbeddingPolicyWithTfConfig(PolicyTestCollection):
 
@@ -1,11 +1,13 @@
 import datetime
 import uuid
 
+import pytest
+
 from rasa_core.channels import CollectingOutputChannel, UserMessage
 from rasa_core.dispatcher import Button, Dispatcher
 from rasa_core.events import (
     ReminderScheduled, UserUttered, ActionExecuted,
-    BotUttered, Restarted)
+    BotUttered, Restarted, SlotSet)
 from rasa_nlu.training_data import Message
 from rasa_core.processor import MessageProcessor
 from rasa_core.interpreter import RasaNLUHttpInterpreter
@@ -20,6 +22,94 @@ def test_message_processor(default_processor):
             'text': 'hey there Core!'} == out.latest_output()
 
 
+def test_message_processor_saves_tracker_once(default_processor):
+    from rasa_core.tracker_store import WriteBehindTrackerStore
+    from tests.utilities import CountingTrackerStore
+
+    inner = CountingTrackerStore(default_processor.domain)
+    default_processor.tracker_store = WriteBehindTrackerStore(inner)
+
+    default_processor.handle_message(
+        UserMessage('/greet{"name":"Core"}', CollectingOutputChannel()))
+    assert inner.num_writes == 1
+
+    default_processor.handle_message(
+        UserMessage('/greet{"name":"Core"}', CollectingOutputChannel()))
+    assert inner.num_writes == 2
+
+
+def test_message_processor_retrieves_and_saves_once(
+        default_processor, monkeypatch):
+    sessions = []
+    create_session = default_processor.create_session
+
+    def recording_session():
+        session = create_session()
+        sessions.append(session)
+        return session
+
+    monkeypatch.setattr(default_processor, "create_session",
+                        recording_session)
+
+    for _ in range(2):
+        default_processor.handle_message(
+            UserMessage('/greet{"name":"Core"}', CollectingOutputChannel(),
+                        "session-user"))
+
+    assert len(sessions) == 2
+    for session in sessions:
+        assert session.num_retrieves == 1
+        assert session.num_saves == 1
+
+
+def test_message_processor_keeps_message_on_error(
+        default_processor, monkeypatch):
+    def fail(message, tracker):
+        tracker.update(ActionExecuted("utter_greet"))
+        raise RuntimeError("action server unavailable")
+
+    monkeypatch.setattr(default_processor,
+                        "_predict_and_execute_next_action", fail)
+
+    with pytest.raises(RuntimeError):
+        default_processor.handle_message(
+            UserMessage('/greet{"name":"Core"}', CollectingOutputChannel(),
+                        "failing-user"))
+
+    # the user message is stored, the events of the actions are discarded
+    tracker = default_processor.tracker_store.retrieve("failing-user")
+    assert [type(e) for e in tracker.events] == [ActionExecuted, UserUttered,
+                                                 SlotSet]
+    assert tracker.latest_message.text == '/greet{"name":"Core"}'
+    assert tracker.latest_action_name == "action_listen"
+
+
+def test_predict_next_batch(default_processor, monkeypatch):
+    for sender_id in ["batch-1", "batch-2"]:
+        default_processor.log_message(
+            UserMessage('/greet{"name":"Core"}', CollectingOutputChannel(),
+                        sender_id))
+    default_processor.log_message(
+        UserMessage('/goodbye', CollectingOutputChannel(), "batch-3"))
+
+    batches = []
+    predict_batch = default_processor.policy_ensemble.predict_batch
+
+    def recording_predict_batch(trackers, domain):
+        batches.append([t.sender_id for t in trackers])
+        return predict_batch(trackers, domain)
+
+    monkeypatch.setattr(default_processor.policy_ensemble, "predict_batch",
+                        recording_predict_batch)
+
+    sender_ids = ["batch-1", "batch-2", "batch-3"]
+    results = default_processor.predict_next_batch(sender_ids)
+
+    assert batches == [sender_ids]
+    for sender_id, result in zip(sender_ids, results):
+        assert result == default_processor.predict_next(sender_id)
+
+
 def test_message_id_logging(default_processor):
     from rasa_core.trackers import DialogueStateTracker
 
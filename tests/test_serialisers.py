@@ -0,0 +1,96 @@
+import pickle
+
+import pytest
+
+from rasa_core.domain import Domain
+from rasa_core.serialisers import (
+    BinarySerialiser, JsonSerialiser, PickleSerialiser, create_serialiser)
+from rasa_core.tracker_store import InMemoryTrackerStore
+from tests.conftest import TEST_DIALOGUES, EXAMPLE_DOMAINS
+from tests.utilities import tracker_from_dialogue_file
+
+
+@pytest.mark.parametrize("serialiser", ["pickle", "json", "binary"])
+@pytest.mark.parametrize("pair", zip(TEST_DIALOGUES, EXAMPLE_DOMAINS))
+def test_serialiser_roundtrip(serialiser, pair):
+    filename, domainpath = pair
+    domain = Domain.load(domainpath)
+    tracker = tracker_from_dialogue_file(filename, domain)
+    serialiser = create_serialiser(serialiser)
+
+    dialogue = serialiser.loads(serialiser.dumps(tracker.as_dialogue()))
+
+    assert dialogue.name == tracker.sender_id
+    assert dialogue.events == list(tracker.events)
+    assert ([e.as_dict() for e in dialogue.events] ==
+            [e.as_dict() for e in tracker.events])
+
+
+@pytest.mark.parametrize("filename", TEST_DIALOGUES)
+def test_binary_serialiser_is_smaller_than_pickle(filename):
+    tracker = tracker_from_dialogue_file(filename)
+    dialogue = tracker.as_dialogue()
+
+    assert (len(BinarySerialiser().dumps(dialogue)) <
+            len(pickle.dumps(dialogue)))
+
+
+def test_binary_serialiser_values():
+    serialiser = BinarySerialiser()
+    value = [None, True, False, 0, -1, 2 ** 70, -2 ** 70, 1.5, "ü", {"a": []}]
+    buf = bytearray()
+    strings = {}
+    serialiser._encode(value, buf, strings)
+    table = sorted(strings, key=strings.get)
+
+    decoded, pos = serialiser._decode(memoryview(bytes(buf)), 0, table)
+    assert decoded == value
+    assert pos == len(buf)
+
+
+def test_binary_serialiser_encodes_subclasses_of_builtins():
+    from collections import OrderedDict
+
+    serialiser = BinarySerialiser()
+    buf = bytearray()
+    strings = {}
+    serialiser._encode(OrderedDict([("a", (1, 2))]), buf, strings)
+    table = sorted(strings, key=strings.get)
+
+    assert serialiser._decode(bytes(buf), 0, table)[0] == {"a": [1, 2]}
+    with pytest.raises(TypeError):
+        serialiser._encode(object(), bytearray(), {})
+
+
+def test_binary_serialiser_rejects_other_formats():
+    tracker = tracker_from_dialogue_file(TEST_DIALOGUES[0])
+    pickled = PickleSerialiser().dumps(tracker.as_dialogue())
+    with pytest.raises(ValueError):
+        BinarySerialiser().loads(pickled)
+
+    data = bytearray(BinarySerialiser().dumps(tracker.as_dialogue()))
+    data[len(BinarySerialiser.MAGIC)] = BinarySerialiser.version + 1
+    with pytest.raises(ValueError):
+        BinarySerialiser().loads(bytes(data))
+
+
+def test_create_serialiser():
+    assert isinstance(create_serialiser(None), PickleSerialiser)
+    assert isinstance(create_serialiser("json"), JsonSerialiser)
+    assert isinstance(create_serialiser(
+        "rasa_core.serialisers.BinarySerialiser"), BinarySerialiser)
+
+    serialiser = JsonSerialiser()
+    assert create_serialiser(serialiser) is serialiser
+
+    with pytest.raises(ValueError):
+        create_serialiser("unknown")
+
+
+@pytest.mark.parametrize("serialiser", ["json", "binary"])
+def test_tracker_store_with_serialiser(serialiser, default_domain):
+    store = InMemoryTrackerStore(default_domain, serialiser=serialiser)
+    tracker = tracker_from_dialogue_file(TEST_DIALOGUES[0], default_domain)
+    store.save(tracker)
+
+    assert store.retrieve(tracker.sender_id) == tracker
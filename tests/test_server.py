@@ -9,6 +9,7 @@ from freezegun import freeze_time
 import rasa_core
 from rasa_core import events, constants
 from rasa_core.actions.action import ACTION_LISTEN_NAME
+from rasa_core.agent import Agent
 from rasa_core.domain import Domain
 from rasa_core.events import (
     UserUttered, BotUttered, SlotSet, Event, ActionExecuted)
@@ -155,6 +156,23 @@ def test_put_tracker(app):
     assert events.deserialise_events(evts) == test_events
 
 
+def test_pushed_events_are_written_through_deferred_saves(default_agent):
+    from rasa_core import server
+    from rasa_core.tracker_store import (
+        InMemoryTrackerStore, WriteBehindTrackerStore)
+
+    inner = InMemoryTrackerStore(default_agent.domain)
+    agent = Agent(default_agent.domain, default_agent.policy_ensemble,
+                  tracker_store=WriteBehindTrackerStore(inner))
+    app = server.create_app(agent).test_client()
+
+    data = json.dumps(SlotSet("name", "Core").as_dict())
+    response = app.post("http://dummy/conversations/deferred/tracker/events",
+                        data=data, content_type='application/json')
+    assert response.status_code == 200
+    assert inner.retrieve("deferred").get_slot("name") == "Core"
+
+
 def test_list_conversations(app):
     data = json.dumps({"query": "/greet"})
     response = app.post("http://dummy/conversations/myid/respond",
@@ -169,6 +187,49 @@ def test_list_conversations(app):
     assert "myid" in content
 
 
+def test_list_conversations_with_pagination(app):
+    for sender_id in ["paged-1", "paged-2"]:
+        data = json.dumps({"query": "/greet"})
+        response = app.post("http://dummy/conversations/{}/respond"
+                            "".format(sender_id),
+                            data=data, content_type='application/json')
+        assert response.status_code == 200
+
+    sender_ids = []
+    cursor = ""
+    while cursor is not None:
+        response = app.get("http://dummy/conversations?limit=1&cursor={}"
+                           "".format(cursor))
+        content = response.get_json()
+        assert response.status_code == 200
+        assert len(content["conversations"]) <= 1
+        sender_ids.extend(content["conversations"])
+        cursor = content["next_cursor"]
+
+    assert {"paged-1", "paged-2"}.issubset(sender_ids)
+
+    for invalid in ["limit=many", "limit=0", "limit=-1"]:
+        response = app.get("http://dummy/conversations?{}".format(invalid))
+        assert response.status_code == 400
+        assert response.get_json()["details"]["parameter"] == "limit"
+
+
+def test_list_conversations_with_invalid_cursor(default_agent):
+    import fakeredis
+    from rasa_core import server
+    from rasa_core.tracker_store import RedisTrackerStore
+
+    store = RedisTrackerStore(default_agent.domain)
+    store.red = fakeredis.FakeStrictRedis()
+    agent = Agent(default_agent.domain, default_agent.policy_ensemble,
+                  tracker_store=store)
+    app = server.create_app(agent).test_client()
+
+    response = app.get("http://dummy/conversations?cursor=invalid")
+    assert response.status_code == 400
+    assert response.get_json()["details"]["parameter"] == "cursor"
+
+
 def test_remote_status(http_app):
     client = RasaCoreClient(EndpointConfig(http_app))
 
@@ -217,6 +278,27 @@ def test_predict(http_app, app):
     assert response.status_code == 200
 
 
+def test_predict_batch(app):
+    trackers = [[ActionExecuted(ACTION_LISTEN_NAME).as_dict(),
+                 test_events[0].as_dict()],
+                [ActionExecuted(ACTION_LISTEN_NAME).as_dict()]]
+
+    response = app.post('/predict/batch', json=trackers)
+    content = response.get_json()
+
+    assert response.status_code == 200
+    assert len(content) == 2
+    for events, prediction in zip(trackers, content):
+        expected = app.post('/predict', json=events).get_json()
+        assert prediction["scores"] == expected["scores"]
+        assert prediction["policy"] == expected["policy"]
+
+
+def test_predict_batch_invalid_events(app):
+    response = app.post('/predict/batch', json=[[{"event": "unknown"}]])
+    assert response.status_code == 400
+
+
 def test_sorted_predict(http_app, app):
     client = RasaCoreClient(EndpointConfig(http_app))
     cid = str(uuid.uuid1())
@@ -156,3 +156,14 @@ class TestCategoricalSlot(SlotTestCollection):
                             ({"three": 3}, [0, 0, 0, 1, 0])])
     def value_feature_pair(self, request):
         return request.param
+
+
+def test_custom_slot_type_is_resolved_by_its_type_name():
+    class CustomSlot(TextSlot):
+        type_name = "custom_test_slot"
+
+    class InheritingSlot(TextSlot):
+        pass
+
+    assert Slot.resolve_by_type("custom_test_slot") is CustomSlot
+    assert Slot.resolve_by_type("text") is TextSlot
@@ -1,14 +1,26 @@
+import time
+
+import fakeredis
+import pytest
+
 from rasa_core import utils
+from rasa_core.broker import EventChannel
 from rasa_core.channels import UserMessage
 from rasa_core.domain import Domain
-from rasa_core.events import SlotSet, ActionExecuted, Restarted
+from rasa_core.events import (
+    SlotSet, ActionExecuted, Restarted, UserUttered, UserUtteranceReverted)
+from rasa_core.exceptions import TrackerConflictError
 from rasa_core.tracker_store import (
     TrackerStore,
     InMemoryTrackerStore,
-    RedisTrackerStore)
+    RedisTrackerStore,
+    WriteBehindTrackerStore,
+    CachedTrackerStore,
+    TrackerSession)
 from rasa_core.trackers import DialogueStateTracker
 from rasa_core.utils import EndpointConfig
 from tests.conftest import DEFAULT_ENDPOINTS_FILE
+from tests.utilities import CountingTrackerStore
 
 domain = Domain.load("data/test_domains/default.yml")
 
@@ -124,3 +136,653 @@ def test_tracker_store_from_invalid_string(default_domain):
                                                     store_config)
 
     assert isinstance(tracker_store, InMemoryTrackerStore)
+
+
+def test_append_only_redis_store_appends_new_events(default_domain):
+    store = RedisTrackerStore(default_domain, append_only=True)
+    store.red = fakeredis.FakeStrictRedis()
+    key = store.event_log_key("append-user")
+
+    tracker = store.get_or_create_tracker("append-user")
+    assert store.red.llen(key) == 1
+
+    tracker = store.retrieve("append-user")
+    tracker.update(UserUttered("hi", {"name": "greet"}))
+    tracker.update(SlotSet("name", "Core"))
+    store.save(tracker)
+    assert store.red.llen(key) == 3
+
+    # saving without new events doesn't write anything
+    store.save(tracker)
+    assert store.red.llen(key) == 3
+
+    restored = store.retrieve("append-user")
+    assert restored == tracker
+    assert restored.get_slot("name") == "Core"
+    assert restored.latest_message.intent.get("name") == "greet"
+
+
+def test_append_only_redis_store_rewrites_truncated_history(default_domain):
+    store = RedisTrackerStore(default_domain, append_only=True)
+    store.red = fakeredis.FakeStrictRedis()
+    key = store.event_log_key("truncated-user")
+
+    tracker = store.get_or_create_tracker("truncated-user", max_event_history=3)
+    for _ in range(5):
+        tracker.update(ActionExecuted("action_listen"))
+    store.save(tracker)
+
+    assert store.red.llen(key) == 3
+    restored = store.retrieve("truncated-user")
+    assert restored.num_events == tracker.num_events
+    assert restored.current_state() == tracker.current_state()
+
+    # the new events of the truncated tracker are appended, only the ones
+    # after the snapshot of the rewrite are loaded
+    tracker.update(ActionExecuted("utter_greet"))
+    store.save(tracker)
+    assert store.red.llen(key) == 4
+    restored = store.retrieve("truncated-user")
+    assert list(restored.events) == list(tracker.events)[-1:]
+    assert restored.num_events == tracker.num_events
+
+
+def test_redis_store_snapshots(default_domain):
+    store = RedisTrackerStore(default_domain, append_only=True,
+                              snapshot_interval=3)
+    store.red = fakeredis.FakeStrictRedis()
+    snapshot_key = store.snapshot_key("snapshot-user")
+
+    tracker = store.get_or_create_tracker("snapshot-user")
+    assert store.red.get(snapshot_key) is None
+
+    tracker.update(UserUttered("hi", {"name": "greet"}))
+    tracker.update(SlotSet("name", "Core"))
+    tracker.update(ActionExecuted("utter_greet"))
+    store.save(tracker)
+    assert store.red.get(snapshot_key) is not None
+
+    tracker.update(SlotSet("name", "Rasa"))
+    store.save(tracker)
+
+    restored = store.retrieve("snapshot-user")
+    assert list(restored.events) == list(tracker.events)[4:]
+    assert restored.num_events == tracker.num_events
+    assert restored.get_slot("name") == "Rasa"
+    assert restored.latest_action_name == "utter_greet"
+    assert restored.current_state() == tracker.current_state()
+
+
+def test_redis_store_loads_events_after_snapshot(default_domain):
+    store = RedisTrackerStore(default_domain, append_only=True,
+                              snapshot_interval=4)
+    store.red = fakeredis.FakeStrictRedis()
+
+    tracker = store.get_or_create_tracker("tail-user")
+    tracker.update(UserUttered("hi", {"name": "greet"}))
+    tracker.update(SlotSet("name", "Core"))
+    tracker.update(ActionExecuted("utter_greet"))
+    store.save(tracker)
+
+    tracker.update(ActionExecuted("action_listen"))
+    tracker.update(UserUttered("bye", {"name": "goodbye"}))
+    tracker.update(SlotSet("name", "Rasa"))
+    store.save(tracker)
+
+    restored = store.retrieve("tail-user")
+    assert list(restored.events) == list(tracker.events)[4:]
+    assert restored.num_events == tracker.num_events
+    assert restored.get_slot("name") == "Rasa"
+
+    # reverting the latest user message replays the events after the
+    # snapshot on top of its state
+    restored.update(UserUtteranceReverted())
+    assert restored.get_slot("name") == "Core"
+    assert restored.latest_message.intent.get("name") == "greet"
+    assert restored.latest_action_name == "utter_greet"
+
+
+def test_write_behind_store_coalesces_saves(default_domain):
+    inner = CountingTrackerStore(default_domain)
+    store = WriteBehindTrackerStore(inner)
+
+    tracker = store.get_or_create_tracker("coalesced")
+    tracker.update(SlotSet("name", "Core"))
+    store.save(tracker)
+    other = store.get_or_create_tracker("other")
+    store.save(other)
+    assert inner.num_writes == 0
+
+    # changes after a save are not written
+    tracker.update(SlotSet("name", "Rasa"))
+
+    store.end_request()
+    assert inner.num_batches == 1
+    assert inner.num_writes == 2
+    assert inner.retrieve("coalesced").get_slot("name") == "Core"
+    assert inner.retrieve("other") == other
+
+
+def test_write_behind_store_reads_pending_writes(default_domain):
+    inner = CountingTrackerStore(default_domain)
+    store = WriteBehindTrackerStore(inner)
+
+    tracker = store.get_or_create_tracker("pending")
+    tracker.update(SlotSet("name", "Core"))
+    store.save(tracker)
+
+    assert store.retrieve("pending").get_slot("name") == "Core"
+    assert store.latest_event_time("pending") == tracker.events[-1].timestamp
+    assert inner.num_writes == 0
+
+
+def test_write_behind_store_with_max_delay(default_domain):
+    inner = CountingTrackerStore(default_domain)
+    store = WriteBehindTrackerStore(inner, max_delay=0.05)
+
+    store.get_or_create_tracker("delayed")
+    store.end_request()
+    assert inner.num_writes == 0
+
+    time.sleep(0.5)
+    assert inner.num_writes == 1
+    assert inner.retrieve("delayed") is not None
+
+
+def test_write_behind_store_defers_sessions(default_domain):
+    inner = CountingTrackerStore(default_domain)
+    store = WriteBehindTrackerStore(inner, max_delay=60)
+
+    for name in ["Core", "Rasa"]:
+        session = TrackerSession(store)
+        tracker = session.get_or_create_tracker("deferred-session")
+        tracker.update(SlotSet("name", name))
+        session.save(tracker)
+        session.commit()
+    assert inner.num_writes == 0
+    assert store.get_version("deferred-session") == 1
+
+    store.flush()
+    assert inner.num_writes == 1
+    assert inner.get_version("deferred-session") == 1
+    assert inner.retrieve("deferred-session").get_slot("name") == "Rasa"
+
+
+def test_write_behind_store_checks_versions_when_writing(default_domain):
+    inner = InMemoryTrackerStore(default_domain)
+    inner.get_or_create_tracker("concurrent-user")
+    store = WriteBehindTrackerStore(inner)
+
+    session = TrackerSession(store)
+    tracker = session.get_or_create_tracker("concurrent-user")
+    tracker.update(SlotSet("name", "Core"))
+    session.save(tracker)
+
+    # another process changes the conversation before the write
+    concurrent = inner.retrieve("concurrent-user")
+    concurrent.update(UserUttered("hi", {"name": "greet"}))
+    inner.save(concurrent)
+
+    session.commit()
+    assert session.num_conflicts == 1
+    stored = inner.retrieve("concurrent-user")
+    assert stored.latest_message.intent.get("name") == "greet"
+    assert stored.get_slot("name") == "Core"
+    assert inner.get_version("concurrent-user") == 3
+
+
+def test_find_write_behind_tracker_store(default_domain):
+    config = EndpointConfig(write_behind=True, write_behind_max_delay=2)
+    store = TrackerStore.find_tracker_store(default_domain, config)
+
+    assert isinstance(store, WriteBehindTrackerStore)
+    assert isinstance(store.tracker_store, InMemoryTrackerStore)
+    assert store.max_delay == 2
+    assert config.kwargs["write_behind"]
+
+
+def test_redis_store_saves_many_trackers(default_domain):
+    store = RedisTrackerStore(default_domain)
+    store.red = fakeredis.FakeStrictRedis()
+
+    trackers = [store.init_tracker("batch-{}".format(i)) for i in range(3)]
+    for tracker in trackers:
+        tracker.update(ActionExecuted("action_listen"))
+    store.save_many(trackers)
+
+    for tracker in trackers:
+        assert store.retrieve(tracker.sender_id) == tracker
+
+
+def test_tracker_session(default_domain):
+    store = CountingTrackerStore(default_domain)
+    session = TrackerSession(store)
+
+    tracker = session.get_or_create_tracker("session-user")
+    assert session.get_or_create_tracker("session-user") is tracker
+    tracker.update(SlotSet("name", "Core"))
+    session.save(tracker)
+    session.save(tracker)
+    assert store.num_writes == 0
+
+    session.commit()
+    assert session.num_retrieves == 1
+    assert session.num_saves == 1
+    assert store.num_batches == 1
+    assert store.retrieve("session-user").get_slot("name") == "Core"
+
+
+def test_tracker_store_versions(default_domain):
+    redis_store = RedisTrackerStore(default_domain)
+    redis_store.red = fakeredis.FakeStrictRedis()
+    append_only_store = RedisTrackerStore(default_domain, append_only=True)
+    append_only_store.red = fakeredis.FakeStrictRedis()
+
+    stores = [InMemoryTrackerStore(default_domain),
+              redis_store, append_only_store]
+    for i, store in enumerate(stores):
+        sender_id = "versioned-{}".format(i)
+        assert store.get_version(sender_id) == 0
+        tracker = store.get_or_create_tracker(sender_id)
+        assert store.get_version(sender_id) == 1
+        store.save(tracker)
+        assert store.get_version(sender_id) == 2
+
+
+def test_cached_store_serves_unchanged_trackers(default_domain):
+    store = CachedTrackerStore(InMemoryTrackerStore(default_domain))
+
+    tracker = store.get_or_create_tracker("cached")
+    assert store.misses == 1
+    tracker.update(SlotSet("name", "Core"))
+    store.save(tracker)
+
+    # changes after a save don't affect the cached tracker
+    tracker.update(SlotSet("name", "Rasa"))
+
+    cached = store.retrieve("cached")
+    assert store.hits == 1
+    assert store.misses == 1
+    assert cached.get_slot("name") == "Core"
+    assert cached is not tracker
+
+
+def test_cached_store_detects_changes_of_other_processes(default_domain):
+    redis = fakeredis.FakeStrictRedis()
+    stores = []
+    for _ in range(2):
+        inner = RedisTrackerStore(default_domain)
+        inner.red = redis
+        stores.append(CachedTrackerStore(inner))
+    first, second = stores
+
+    tracker = first.get_or_create_tracker("shared-user")
+    assert second.retrieve("shared-user") == tracker
+
+    tracker.update(SlotSet("name", "Core"))
+    first.save(tracker)
+
+    assert second.retrieve("shared-user").get_slot("name") == "Core"
+    assert second.misses == 2
+    assert first.retrieve("shared-user").get_slot("name") == "Core"
+    assert first.hits == 1
+
+
+def test_cached_store_evicts_least_recently_used(default_domain):
+    store = CachedTrackerStore(InMemoryTrackerStore(default_domain),
+                               max_events=2)
+
+    for sender_id in ["first", "second", "third"]:
+        store.get_or_create_tracker(sender_id)
+    assert store.evictions == 1
+
+    store.retrieve("second")
+    store.retrieve("third")
+    assert store.hits == 2
+    store.retrieve("first")
+    assert store.misses == 4
+    assert store.evictions == 2
+
+
+def test_cached_store_with_ttl(default_domain):
+    store = CachedTrackerStore(InMemoryTrackerStore(default_domain), ttl=0.05)
+
+    store.get_or_create_tracker("expiring")
+    store.retrieve("expiring")
+    assert store.hits == 1
+
+    time.sleep(0.1)
+    assert store.retrieve("expiring") is not None
+    assert store.hits == 1
+    assert store.misses == 2
+
+
+def test_find_cached_tracker_store(default_domain):
+    config = EndpointConfig(cache=True, cache_max_events=10, cache_ttl=60,
+                            write_behind=True)
+    store = TrackerStore.find_tracker_store(default_domain, config)
+
+    assert isinstance(store, WriteBehindTrackerStore)
+    cache = store.tracker_store
+    assert isinstance(cache, CachedTrackerStore)
+    assert cache.max_events == 10
+    assert cache.ttl == 60
+
+
+def test_save_with_outdated_version_raises_conflict(default_domain):
+    redis_store = RedisTrackerStore(default_domain, append_only=True)
+    redis_store.red = fakeredis.FakeStrictRedis()
+
+    stores = [InMemoryTrackerStore(default_domain), redis_store]
+    for i, store in enumerate(stores):
+        sender_id = "conflicting-{}".format(i)
+        tracker = store.get_or_create_tracker(sender_id)
+        other = store.init_tracker("unchanged-{}".format(i))
+
+        with pytest.raises(TrackerConflictError) as e:
+            store.save_many([tracker, other],
+                            expected_versions={sender_id: 0,
+                                               other.sender_id: 0})
+        assert e.value.sender_ids == [sender_id]
+        assert store.get_version(sender_id) == 1
+        assert store.get_version(other.sender_id) == 1
+
+
+def test_redis_store_takes_expected_versions_like_other_stores(
+        default_domain):
+    store = RedisTrackerStore(default_domain)
+    store.red = fakeredis.FakeStrictRedis()
+    tracker = store.get_or_create_tracker("positional-versions")
+
+    with pytest.raises(TrackerConflictError):
+        store.save_many([tracker], {tracker.sender_id: 0})
+    assert store.get_version(tracker.sender_id) == 1
+
+
+class RecordingEventChannel(EventChannel):
+    def __init__(self):
+        self.published = []
+
+    def publish(self, event):
+        self.published.append(event)
+
+
+class RacingRedisTrackerStore(RedisTrackerStore):
+    """Touches the version of the conversation the first time the writes
+    are queued, so the transaction of the save has to be retried."""
+
+    def __init__(self, *args, **kwargs):
+        super(RacingRedisTrackerStore, self).__init__(*args, **kwargs)
+        self.num_races = 1
+
+    def _queue_writes(self, trackers, pipe, timeout=None):
+        if self.num_races:
+            self.num_races -= 1
+            for tracker in trackers:
+                key = self.version_key(tracker.sender_id)
+                self.red.set(key, self.red.get(key) or 0)
+        return super(RacingRedisTrackerStore, self)._queue_writes(
+            trackers, pipe, timeout)
+
+
+@pytest.mark.parametrize("append_only", [True, False])
+def test_redis_store_streams_events_once_after_retries(default_domain,
+                                                       append_only):
+    broker = RecordingEventChannel()
+    store = RacingRedisTrackerStore(default_domain, append_only=append_only,
+                                    event_broker=broker)
+    store.red = fakeredis.FakeStrictRedis()
+    store.red.flushdb()
+
+    tracker = store.init_tracker("racing-user")
+    tracker.update(ActionExecuted("action_listen"))
+    tracker.update(UserUttered("hi", {"name": "greet"}))
+    store.save_many([tracker], expected_versions={tracker.sender_id: 0})
+
+    assert store.num_races == 0
+    assert store.get_version(tracker.sender_id) == 1
+    assert [e["event"] for e in broker.published] == ["action", "user"]
+
+
+def test_tracker_session_retries_conflicting_saves(default_domain):
+    redis = fakeredis.FakeStrictRedis()
+    stores = []
+    for _ in range(2):
+        store = RedisTrackerStore(default_domain, append_only=True)
+        store.red = redis
+        stores.append(store)
+    stores[0].get_or_create_tracker("concurrent-user")
+
+    first = TrackerSession(stores[0])
+    second = TrackerSession(stores[1])
+    first_tracker = first.get_or_create_tracker("concurrent-user")
+    second_tracker = second.get_or_create_tracker("concurrent-user")
+
+    first_tracker.update(UserUttered("hi", {"name": "greet"}))
+    first.save(first_tracker)
+    second_tracker.update(SlotSet("name", "Core"))
+    second.save(second_tracker)
+
+    first.commit()
+    second.commit()
+    assert first.num_conflicts == 0
+    assert second.num_conflicts == 1
+
+    stored = stores[0].retrieve("concurrent-user")
+    assert stored.latest_message.intent.get("name") == "greet"
+    assert stored.get_slot("name") == "Core"
+    assert len(stored.events) == 3
+    assert stores[0].get_version("concurrent-user") == 3
+
+
+def test_tracker_session_rebases_trackers_with_max_event_history(
+        default_domain):
+    store = InMemoryTrackerStore(default_domain)
+    tracker = store.get_or_create_tracker("bounded-user",
+                                          max_event_history=3)
+    for _ in range(2):
+        tracker.update(ActionExecuted("action_listen"))
+    store.save(tracker)
+
+    first = TrackerSession(store)
+    second = TrackerSession(store)
+    first_tracker = first.get_or_create_tracker("bounded-user")
+    second_tracker = second.get_or_create_tracker("bounded-user")
+
+    first_tracker.update(SlotSet("name", "Core"))
+    first.save(first_tracker)
+    # the length of the events doesn't change anymore
+    for _ in range(2):
+        second_tracker.update(UserUttered("hi", {"name": "greet"}))
+    second.save(second_tracker)
+
+    first.commit()
+    second.commit()
+    assert second.num_conflicts == 1
+
+    stored = store.retrieve("bounded-user")
+    assert [e.type_name for e in stored.events] == ["slot", "user", "user"]
+    assert stored.get_slot("name") == "Core"
+
+
+def test_cached_store_forgets_conflicting_trackers(default_domain):
+    inner = InMemoryTrackerStore(default_domain)
+    store = CachedTrackerStore(inner)
+
+    tracker = store.get_or_create_tracker("cached-conflict")
+    inner.save(tracker)
+
+    with pytest.raises(TrackerConflictError):
+        store.save_many([tracker], expected_versions={tracker.sender_id: 1})
+    store.retrieve("cached-conflict")
+    assert store.hits == 0
+
+
+def _store_conversations(store, sender_ids):
+    for i, sender_id in enumerate(sender_ids):
+        tracker = store.init_tracker(sender_id)
+        tracker.update(ActionExecuted("action_listen", timestamp=100 + i))
+        store.save(tracker)
+
+
+def _list_all(store, **kwargs):
+    pages = []
+    cursor = None
+    while True:
+        page, cursor = store.list_conversations(cursor, **kwargs)
+        pages.append(page)
+        if cursor is None:
+            return pages
+
+
+def test_in_memory_store_lists_conversations(default_domain):
+    store = InMemoryTrackerStore(default_domain)
+    _store_conversations(store, ["c", "a", "e", "b", "d"])
+
+    assert _list_all(store, limit=2) == [["a", "b"], ["c", "d"], ["e"]]
+    assert _list_all(store, limit=5) == [["a", "b", "c", "d", "e"]]
+    # conversation "c" is the first one which was saved
+    assert _list_all(store, limit=2, active_since=101,
+                     active_until=104) == [["a", "b"], ["e"]]
+
+
+def test_redis_store_lists_conversations(default_domain):
+    store = RedisTrackerStore(default_domain)
+    store.red = fakeredis.FakeStrictRedis()
+    store.red.flushdb()
+    sender_ids = ["listed-{}".format(i) for i in range(7)]
+    _store_conversations(store, sender_ids)
+
+    pages = _list_all(store, limit=3)
+    assert sorted(s for page in pages for s in page) == sender_ids
+    assert sorted(store.keys()) == sender_ids
+
+    pages = _list_all(store, limit=3, active_since=105)
+    assert sorted(s for page in pages for s in page) == sender_ids[5:]
+    assert store.latest_event_time("listed-1") == 101
+
+    with pytest.raises(ValueError):
+        store.list_conversations("not-a-cursor")
+
+
+def test_redis_store_lists_conversations_without_version(default_domain):
+    store = RedisTrackerStore(default_domain)
+    store.red = fakeredis.FakeStrictRedis()
+    store.red.flushdb()
+    _store_conversations(store, ["versioned"])
+    # conversations stored before versions were introduced
+    legacy = store.init_tracker("legacy")
+    store.red.set(store.tracker_key("legacy"),
+                  store.serialise_tracker(legacy))
+    # keys of other applications sharing the database
+    store.red.set("session", b"not a dialogue")
+    store.red.set("user:42", b"\x80\x03}q\x00.")
+    store.red.rpush("jobs", b"job")
+
+    assert sorted(store.keys()) == ["legacy", "versioned"]
+    pages = _list_all(store, limit=1)
+    assert sorted(s for page in pages for s in page) == ["legacy",
+                                                         "versioned"]
+    assert store.retrieve("legacy") == legacy
+
+
+def test_listing_conversations_requires_positive_limit(default_domain):
+    store = InMemoryTrackerStore(default_domain)
+    _store_conversations(store, ["a", "b"])
+
+    for limit in [0, -1]:
+        with pytest.raises(ValueError):
+            store.list_conversations(limit=limit)
+
+
+def test_redis_store_with_key_prefix(default_domain):
+    store = RedisTrackerStore(default_domain, key_prefix="prefixed:")
+    store.red = fakeredis.FakeStrictRedis()
+    store.red.flushdb()
+
+    tracker = store.get_or_create_tracker("prefixed-user")
+    assert store.red.exists("prefixed:prefixed-user")
+    assert not store.red.exists("prefixed-user")
+    assert store.keys() == ["prefixed-user"]
+    assert store.retrieve("prefixed-user") == tracker
+
+
+def test_redis_store_with_sliding_expiration(default_domain):
+    store = RedisTrackerStore(default_domain, record_exp=100,
+                              sliding_expiration=True)
+    store.red = fakeredis.FakeStrictRedis()
+
+    store.get_or_create_tracker("sliding-user")
+    store.red.expire(store.tracker_key("sliding-user"), 5)
+    store.red.expire(store.version_key("sliding-user"), 5)
+
+    store.retrieve("sliding-user")
+    assert store.red.ttl(store.tracker_key("sliding-user")) > 5
+    assert store.red.ttl(store.version_key("sliding-user")) > 5
+
+
+def test_redis_store_compacts_old_events(default_domain):
+    store = RedisTrackerStore(default_domain, append_only=True,
+                              snapshot_interval=2)
+    store.red = fakeredis.FakeStrictRedis()
+    store.red.flushdb()
+    key = store.event_log_key("compacted-user")
+
+    tracker = store.init_tracker("compacted-user")
+    tracker.update(ActionExecuted("action_listen", timestamp=1))
+    tracker.update(UserUttered("hi", {"name": "greet"}, timestamp=2))
+    tracker.update(SlotSet("name", "Core", timestamp=3))
+    tracker.update(ActionExecuted("utter_greet"))
+    store.save(tracker)
+    version = store.get_version("compacted-user")
+
+    assert store.compact(horizon=60) == 1
+    assert store.red.llen(key) == 1
+    assert store.get_version("compacted-user") == version + 1
+
+    restored = store.retrieve("compacted-user")
+    assert restored.num_events == tracker.num_events
+    assert restored.get_slot("name") == "Core"
+    assert restored.latest_message.intent.get("name") == "greet"
+    assert restored.latest_action_name == "utter_greet"
+
+    # new events are appended to the compacted log
+    restored.update(SlotSet("name", "Rasa"))
+    store.save(restored)
+    assert store.red.llen(key) == 2
+    assert store.retrieve("compacted-user").get_slot("name") == "Rasa"
+
+    # the latest event of a conversation is kept
+    assert store.compact(horizon=0) == 1
+    assert store.red.llen(key) == 1
+    assert store.retrieve("compacted-user").get_slot("name") == "Rasa"
+    assert store.compact(horizon=0) == 0
+
+
+def test_redis_store_appends_to_log_compacted_after_retrieve(default_domain):
+    store = RedisTrackerStore(default_domain, append_only=True)
+    store.red = fakeredis.FakeStrictRedis()
+    store.red.flushdb()
+    key = store.event_log_key("compacted-user")
+
+    tracker = store.init_tracker("compacted-user")
+    tracker.update(ActionExecuted("action_listen", timestamp=1))
+    tracker.update(UserUttered("hi", {"name": "greet"}, timestamp=2))
+    tracker.update(SlotSet("name", "Core", timestamp=3))
+    tracker.update(ActionExecuted("utter_greet"))
+    store.save(tracker)
+
+    retrieved = store.retrieve("compacted-user")
+    assert store.compact(horizon=60) == 1
+    assert store.red.llen(key) == 1
+
+    # the tracker still has the compacted events, they are not stored again
+    retrieved.update(SlotSet("name", "Rasa"))
+    store.save(retrieved)
+    assert store.red.llen(key) == 2
+
+    restored = store.retrieve("compacted-user")
+    assert list(restored.events) == list(retrieved.events)[3:]
+    assert restored.num_events == retrieved.num_events == 5
+    assert restored.get_slot("name") == "Rasa"
+    assert restored.latest_message.intent.get("name") == "greet"
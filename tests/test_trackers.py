@@ -9,7 +9,8 @@ from rasa_core.actions.action import ACTION_LISTEN_NAME
 from rasa_core.domain import Domain
 from rasa_core.events import (
     UserUttered, ActionExecuted, Restarted, ActionReverted,
-    UserUtteranceReverted)
+    UserUtteranceReverted, Form, FormValidation, ActionExecutionRejected,
+    SlotSet)
 from rasa_core.tracker_store import InMemoryTrackerStore, RedisTrackerStore
 from rasa_core.tracker_store import TrackerStore
 from rasa_core.trackers import DialogueStateTracker, EventVerbosity
@@ -22,19 +23,27 @@ domain = Domain.load("examples/moodbot/domain.yml")
 
 
 class MockRedisTrackerStore(RedisTrackerStore):
-    def __init__(self, domain):
+    def __init__(self, domain, append_only=False, snapshot_interval=None,
+                 key_prefix=""):
         self.red = fakeredis.FakeStrictRedis()
         self.record_exp = None
+        self.append_only = append_only
+        self.key_prefix = key_prefix
+        self.sliding_expiration = False
         TrackerStore.__init__(self, domain)
+        self.snapshot_interval = snapshot_interval
 
 
 def stores_to_be_tested():
     return [MockRedisTrackerStore(domain),
+            MockRedisTrackerStore(domain, append_only=True,
+                                  key_prefix="rasa:"),
             InMemoryTrackerStore(domain)]
 
 
 def stores_to_be_tested_ids():
     return ["redis-tracker",
+            "append-only-redis-tracker",
             "in-memory-tracker"]
 
 
@@ -53,6 +62,60 @@ def test_tracker_duplicate():
     assert len(list(tracker.generate_all_prior_trackers())) == num_actions + 1
 
 
+@pytest.mark.parametrize("pair", zip(TEST_DIALOGUES, EXAMPLE_DOMAINS))
+def test_tracker_copy_equals_replayed_tracker(pair):
+    filename, domainpath = pair
+    domain = Domain.load(domainpath)
+    tracker = tracker_from_dialogue_file(filename, domain)
+
+    copied = tracker.copy()
+    replayed = tracker.travel_back_in_time(float("inf"))
+
+    assert copied == replayed
+    assert copied.current_state() == replayed.current_state()
+
+
+def test_tracker_copy_is_independent(default_domain):
+    tracker = DialogueStateTracker("default", default_domain.slots)
+    tracker.update(ActionExecuted(ACTION_LISTEN_NAME))
+    tracker.update(SlotSet("name", "Peter"))
+
+    copied = tracker.copy()
+    copied.update(SlotSet("name", "Paul"))
+    tracker.update(ActionExecuted("utter_greet"))
+
+    assert tracker.get_slot("name") == "Peter"
+    assert copied.get_slot("name") == "Paul"
+    assert len(tracker.events) == 3
+    assert list(copied.events)[-1] == SlotSet("name", "Paul")
+    assert copied.applied_events() == list(copied.events)
+
+
+def test_compact_events_keeps_current_state(default_domain):
+    def message(text, intent):
+        parse_data = {"text": text,
+                      "intent": {"name": intent, "confidence": 0.8},
+                      "entities": [],
+                      "intent_ranking": [{"name": intent, "confidence": 0.8},
+                                         {"name": "deny", "confidence": 0.2}]}
+        return UserUttered(text, parse_data["intent"], [], parse_data)
+
+    tracker = DialogueStateTracker("default", default_domain.slots)
+    tracker.update(ActionExecuted(ACTION_LISTEN_NAME))
+    tracker.update(message("hi", "greet"))
+    tracker.update(ActionExecuted("utter_greet"))
+    tracker.update(ActionExecuted(ACTION_LISTEN_NAME))
+    tracker.update(message("bye", "goodbye"))
+    states = tracker.past_states(default_domain)
+
+    tracker.compact_events(strip_intent_ranking=True)
+
+    first_message = list(tracker.events)[1]
+    assert "intent_ranking" not in first_message.parse_data
+    assert "intent_ranking" in tracker.latest_message.parse_data
+    assert tracker.past_states(default_domain) == states
+
+
 @pytest.mark.parametrize("store", stores_to_be_tested(),
                          ids=stores_to_be_tested_ids())
 def test_tracker_store_storage_and_retrieval(store):
@@ -93,6 +156,130 @@ def test_tracker_store(store, pair):
     assert restored == tracker
 
 
+@pytest.mark.parametrize("store", [
+    MockRedisTrackerStore(domain, append_only=True, snapshot_interval=4)])
+@pytest.mark.parametrize("pair", zip(TEST_DIALOGUES, EXAMPLE_DOMAINS))
+def test_tracker_store_with_snapshots(store, pair):
+    filename, domainpath = pair
+    domain = Domain.load(domainpath)
+    store.domain = domain
+    tracker = tracker_from_dialogue_file(filename, domain)
+    store.save(tracker)
+    restored = store.retrieve(tracker.sender_id)
+    assert restored.num_events == tracker.num_events
+    assert restored.current_state() == tracker.current_state()
+
+
+@pytest.mark.parametrize("pair", zip(TEST_DIALOGUES, EXAMPLE_DOMAINS))
+def test_recreate_from_snapshot(pair):
+    filename, domainpath = pair
+    domain = Domain.load(domainpath)
+    tracker = tracker_from_dialogue_file(filename, domain)
+    evts = list(tracker.events)
+
+    for offset in range(len(evts) + 1):
+        partial = DialogueStateTracker.from_events(tracker.sender_id,
+                                                   evts[:offset],
+                                                   domain.slots)
+        snapshot = json.loads(json.dumps(partial.as_snapshot()))
+        assert snapshot["event_offset"] == offset
+
+        recovered = DialogueStateTracker(tracker.sender_id, domain.slots)
+        recovered.recreate_from_snapshot(snapshot, evts[offset:])
+
+        assert list(recovered.events) == evts[offset:]
+        assert recovered.num_events == len(evts)
+        assert recovered.current_state() == tracker.current_state()
+        assert recovered.latest_action_name == tracker.latest_action_name
+
+
+def _generate_past_states(tracker, domain):
+    return [frozenset(s.items())
+            for s in domain.states_for_tracker_history(tracker)]
+
+
+@pytest.mark.parametrize("pair", zip(TEST_DIALOGUES, EXAMPLE_DOMAINS))
+def test_past_states_are_extended_incrementally(pair):
+    filename, domainpath = pair
+    domain = Domain.load(domainpath)
+    tracker = tracker_from_dialogue_file(filename, domain)
+
+    partial = DialogueStateTracker(tracker.sender_id, domain.slots)
+    for event in tracker.events:
+        partial.update(event)
+        expected = _generate_past_states(partial, domain)
+        assert list(partial.past_states(domain)) == expected
+        assert list(partial.past_states(domain, 3)) == expected[-3:]
+
+
+def test_past_states_with_rejected_form():
+    domain = Domain.load("examples/formbot/domain.yml")
+    form = "restaurant_form"
+    events = [ActionExecuted(ACTION_LISTEN_NAME),
+              user_uttered("request_restaurant", 1),
+              ActionExecuted(form),
+              Form(form),
+              ActionExecuted(ACTION_LISTEN_NAME),
+              user_uttered("chitchat", 1),
+              ActionExecutionRejected(form),
+              ActionExecuted("utter_chitchat"),
+              ActionExecuted(form),
+              FormValidation(False),
+              ActionExecuted(ACTION_LISTEN_NAME),
+              user_uttered("inform", 1),
+              ActionExecuted(form),
+              Form(None),
+              ActionExecuted(ACTION_LISTEN_NAME)]
+
+    tracker = DialogueStateTracker("default", domain.slots)
+    for event in events:
+        tracker.update(event)
+        assert (list(tracker.past_states(domain)) ==
+                _generate_past_states(tracker, domain))
+
+
+@pytest.mark.parametrize("pair", zip(TEST_DIALOGUES, EXAMPLE_DOMAINS))
+def test_past_states_are_restored_from_snapshot(pair):
+    filename, domainpath = pair
+    domain = Domain.load(domainpath)
+    tracker = tracker_from_dialogue_file(filename, domain)
+    evts = list(tracker.events)
+    expected = _generate_past_states(tracker, domain)
+
+    for offset in range(len(evts) + 1):
+        partial = DialogueStateTracker.from_events(tracker.sender_id,
+                                                   evts[:offset],
+                                                   domain.slots)
+        partial.past_states(domain)
+        snapshot = json.loads(json.dumps(partial.as_snapshot()))
+        assert "past_states" in snapshot
+
+        recovered = DialogueStateTracker(tracker.sender_id, domain.slots)
+        recovered.recreate_from_snapshot(snapshot, evts[offset:])
+
+        assert list(recovered.past_states(domain)) == expected
+        assert (recovered._past_states.states[:len(snapshot["past_states"][
+            "states"])] == partial._past_states.states)
+
+
+def test_past_states_are_not_restored_for_other_domain(default_domain):
+    tracker = DialogueStateTracker.from_events(
+        "sender", [ActionExecuted(ACTION_LISTEN_NAME)], default_domain.slots)
+    tracker.past_states(default_domain)
+    snapshot = tracker.as_snapshot()
+    snapshot["past_states"]["fingerprint"] = "other"
+
+    recovered = DialogueStateTracker(tracker.sender_id, default_domain.slots)
+    recovered.recreate_from_snapshot(snapshot, [
+        UserUttered("/greet", {"name": "greet", "confidence": 1.0}, [])])
+
+    # the states of the events before the snapshot are lost, only the
+    # events after it are featurized again
+    assert (list(recovered.past_states(default_domain)) ==
+            _generate_past_states(recovered, default_domain))
+    assert len(list(recovered.past_states(default_domain))) == 1
+
+
 def test_tracker_write_to_story(tmpdir, moodbot_domain):
     tracker = tracker_from_dialogue_file(
         "data/test_dialogues/moodbot.json", moodbot_domain)
@@ -490,3 +677,63 @@ def test_last_executed_has_not_name():
     tracker = get_tracker(events)
 
     assert tracker.last_executed_action_has('another') is False
+
+
+def _replay_applied_events(events):
+    applied = []
+    for event in events:
+        if isinstance(event, Restarted):
+            applied = []
+        elif isinstance(event, ActionReverted):
+            while applied and not isinstance(applied.pop(), ActionExecuted):
+                pass
+        elif isinstance(event, UserUtteranceReverted):
+            while applied and not isinstance(applied.pop(), UserUttered):
+                pass
+            while applied and not isinstance(applied.pop(), ActionExecuted):
+                pass
+        else:
+            applied.append(event)
+    return applied
+
+
+def test_applied_events_are_updated_incrementally(default_domain):
+    tracker = DialogueStateTracker("default", default_domain.slots)
+    events = [ActionExecuted(ACTION_LISTEN_NAME),
+              user_uttered("greet", 1),
+              ActionExecuted("utter_greet"),
+              ActionReverted(),
+              ActionExecuted(ACTION_LISTEN_NAME),
+              user_uttered("goodbye", 1),
+              UserUtteranceReverted(),
+              Restarted(),
+              ActionExecuted(ACTION_LISTEN_NAME),
+              user_uttered("greet", 1),
+              ActionExecuted("utter_greet")]
+
+    for event in events:
+        tracker.update(event)
+        assert tracker.applied_events() == \
+            _replay_applied_events(tracker.events)
+
+    # modifying the returned list must not change the tracker
+    tracker.applied_events().clear()
+    assert tracker.applied_events() == _replay_applied_events(events)
+
+    # replaced events are indexed from scratch
+    tracker.events = tracker._create_events(events[:3])
+    assert tracker.applied_events() == events[:3]
+
+
+def test_applied_events_with_max_event_history(default_domain):
+    tracker = DialogueStateTracker("default", default_domain.slots,
+                                   max_event_history=3)
+    for i in range(5):
+        tracker.update(ActionExecuted(ACTION_LISTEN_NAME))
+        tracker.update(user_uttered("greet", 1))
+        tracker.update(ActionExecuted("utter_{}".format(i)))
+        assert tracker.applied_events() == list(tracker.events)
+
+    tracker.update(ActionReverted())
+    assert tracker.applied_events() == \
+        _replay_applied_events(tracker.events)
@@ -1,5 +1,7 @@
+import collections
 import json
 import os
+import pickle
 
 import pytest
 from httpretty import httpretty
@@ -71,6 +73,42 @@ def test_pad_list_to_size():
             ["e1", "e2", "other", "other"])
 
 
+def test_persistent_deque_copies_share_items():
+    original = utils.PersistentDeque([1, 2, 3])
+    copied = original.copy()
+    copied.append(4)
+    original.append(5)
+
+    assert list(original) == [1, 2, 3, 5]
+    assert list(copied) == [1, 2, 3, 4]
+    assert copied.pop() == 4
+    assert copied == [1, 2, 3]
+    assert copied[-1] == 3
+    assert copied[0] == 1
+    assert copied[1:] == [2, 3]
+    assert list(reversed(original)) == [5, 3, 2, 1]
+
+    with pytest.raises(IndexError):
+        copied[3]
+
+
+def test_persistent_deque_with_maxlen():
+    d = utils.PersistentDeque(maxlen=3)
+    for i in range(10):
+        d.append(i)
+        assert list(d) == list(range(max(0, i - 2), i + 1))
+        assert d == collections.deque(range(i + 1), 3)
+
+    assert d.num_appended == 10
+    assert d.copy().num_appended == 10
+
+    assert d.pop() == 9
+    assert list(d) == [7, 8]
+    assert d.num_appended == 9
+    assert pickle.loads(pickle.dumps(d)) == d
+    assert pickle.loads(pickle.dumps(d)).maxlen == 3
+
+
 def test_read_lines():
     lines = utils.read_lines("data/test_stories/stories.md",
                              max_line_limit=2,
@@ -10,6 +10,7 @@ import os
 from rasa_core import utils
 from rasa_core.domain import Domain
 from rasa_core.events import UserUttered, Event
+from rasa_core.tracker_store import InMemoryTrackerStore
 from rasa_core.trackers import DialogueStateTracker
 from tests.conftest import DEFAULT_DOMAIN_PATH
 
@@ -75,3 +76,19 @@ def user_uttered(text: Text, confidence: float) -> UserUttered:
 
 def get_tracker(events: List[Event]) -> DialogueStateTracker:
     return DialogueStateTracker.from_events("sender", events, [], 20)
+
+
+class CountingTrackerStore(InMemoryTrackerStore):
+    def __init__(self, domain):
+        self.num_writes = 0
+        self.num_batches = 0
+        super(CountingTrackerStore, self).__init__(domain)
+
+    def save(self, tracker):
+        self.num_writes += 1
+        super(CountingTrackerStore, self).save(tracker)
+
+    def save_many(self, trackers, expected_versions=None):
+        self.num_batches += 1
+        super(CountingTrackerStore, self).save_many(trackers,
+                                                    expected_versions)